@@ -23,7 +23,7 @@ from app.schemas.auth import (
 )
 from app.schemas.user import UserResponse
 from app.services.notification_service import NotificationService
-from app.utils.logging_config import get_security_logger
+from app.monitoring.logging_config import get_security_logger
 from app.core.constants import UserRole
 
 router = APIRouter()
@@ -10,8 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.services.exam_request_service import ExamRequestService
 from app.services.medical_guidelines_engine import (
-    MotorDiretrizesMedicasIA,
-    ValidadorConformidadeDiretrizes)
+    get_motor_diretrizes,
+    get_validador_conformidade)
 
 router = APIRouter()
 
@@ -23,7 +23,7 @@ async def validate_prescription_guidelines(
 ) -> dict[str, Any]:
     """Valida prescrição contra diretrizes médicas"""
     try:
-        validator = ValidadorConformidadeDiretrizes()
+        validator = get_validador_conformidade()
         result = await validator.validar_acao_medica(
             acao=prescription_data,
             tipo_acao="prescricao",
@@ -80,7 +80,7 @@ async def get_guidelines_for_condition(
 ) -> dict[str, Any]:
     """Obtém diretrizes para uma condição específica"""
     try:
-        guidelines_engine = MotorDiretrizesMedicasIA()
+        guidelines_engine = get_motor_diretrizes()
         guideline = await guidelines_engine.obter_diretriz_para_condicao(
             condicao=condition,
             contexto_paciente={}
@@ -6,9 +6,11 @@ Enhanced with clinical protocols and medical record management.
 import logging
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.serialization import FastJSONResponse, dumps
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.patient import (
@@ -17,6 +19,7 @@ from app.schemas.patient import (
     PatientList,
     PatientSearch,
     PatientUpdate)
+from app.repositories.medical_history_repository import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.services.clinical_protocols_service import (
     ClinicalProtocolsService,
     ProtocolType)
@@ -28,6 +31,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Patients per ward screening request
+MAX_SCREENING_PATIENTS = 5000
+
 @router.post("/", response_model=Patient)
 async def create_patient(
     patient_data: PatientCreate,
@@ -96,11 +102,11 @@ async def list_patients(
     patients, total = await patient_service.get_patients(limit, offset)
 
     patients_schemas = [Patient.from_orm(p) for p in patients]
-    return PatientList(
+    return FastJSONResponse(content=PatientList(
         patients=patients_schemas,
         total=total,
         page=offset // limit + 1,
-        size=limit)
+        size=limit))
 
 @router.post("/search", response_model=PatientList)
 async def search_patients(
@@ -117,11 +123,44 @@ async def search_patients(
     )
 
     patients_schemas = [Patient.from_orm(p) for p in patients]
-    return PatientList(
+    return FastJSONResponse(content=PatientList(
         patients=patients_schemas,
         total=total,
         page=offset // limit + 1,
-        size=limit)
+        size=limit))
+
+@router.post("/clinical-protocols/screen")
+async def screen_clinical_protocols(
+    patients: list[dict[str, Any]],
+    protocol_types: list[ProtocolType] | None = None,
+    current_user: User = Depends(UserService.get_current_user),
+    db: AsyncSession = Depends(get_db)) -> Any:
+    """
+    Screen a ward for clinical protocols in one vectorized pass.
+
+    Each entry holds ``patient_id``, ``patient_data`` and ``clinical_data``.
+    """
+    if len(patients) > MAX_SCREENING_PATIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {MAX_SCREENING_PATIENTS} patients per screening"
+        )
+
+    protocols_service = ClinicalProtocolsService(db)
+    try:
+        screening = await protocols_service.screen_ward(patients, protocol_types)
+    except Exception as e:
+        logger.error(f"Error screening clinical protocols: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error screening clinical protocols"
+        ) from e
+
+    return {
+        "patients": screening,
+        "screened": len(patients),
+        "screened_by": current_user.id
+    }
 
 @router.post("/{patient_id}/clinical-protocols")
 async def assess_clinical_protocols(
@@ -150,12 +189,10 @@ async def assess_clinical_protocols(
         }
 
         if protocol_types:
-            assessments = []
-            for protocol_type in protocol_types:
-                assessment = await protocols_service.assess_protocol(
-                    protocol_type, patient_data, clinical_data
-                )
-                assessments.append(assessment)
+            assessments = [
+                await protocols_service.assess_protocol(protocol_type, patient_data, clinical_data)
+                for protocol_type in protocol_types
+            ]
         else:
             assessments = await protocols_service.get_applicable_protocols(
                 patient_data, clinical_data
@@ -214,11 +251,19 @@ async def create_medical_record(
 @router.get("/{patient_id}/medical-history")
 async def get_medical_history(
     patient_id: str,
-    record_types: list[RecordType] | None = None,
-    limit: int = 100,
+    record_types: list[RecordType] | None = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: list[str] | None = Query(None),
+    include_summary: bool | None = None,
     current_user: User = Depends(UserService.get_current_user),
     db: AsyncSession = Depends(get_db)) -> Any:
-    """Get comprehensive medical history for a patient."""
+    """
+    Get one page of a patient's medical history; follow ``next_cursor`` for more.
+
+    ``records_summary`` covers the whole history and is only returned on the
+    first page (no ``cursor``) unless ``include_summary`` is set.
+    """
     patient_service = PatientService(db)
     medical_record_service = MedicalRecordService(db)
 
@@ -231,13 +276,49 @@ async def get_medical_history(
 
     try:
         medical_history = await medical_record_service.get_patient_medical_history(
-            patient_id, record_types, limit
+            patient_id, record_types, limit, cursor=cursor, fields=fields, include_summary=include_summary
         )
-        return medical_history
+        return FastJSONResponse(content=medical_history)
 
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        ) from e
     except Exception as e:
         logger.error(f"Error retrieving medical history: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error retrieving medical history"
         ) from e
+
+@router.get("/{patient_id}/medical-history/stream")
+async def stream_medical_history(
+    patient_id: str,
+    record_types: list[RecordType] | None = Query(None),
+    fields: list[str] | None = Query(None),
+    current_user: User = Depends(UserService.get_current_user),
+    db: AsyncSession = Depends(get_db)) -> StreamingResponse:
+    """
+    Stream the full medical history as NDJSON, one record per line.
+
+    Records are encoded like the paged endpoint (ISO 8601 dates), without
+    ``records_summary``.
+    """
+    patient_service = PatientService(db)
+    medical_record_service = MedicalRecordService(db)
+
+    patient = await patient_service.get_patient_by_patient_id(patient_id)
+    if not patient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+
+    async def lines():
+        async for records in medical_record_service.stream_patient_medical_history(
+            patient_id, record_types, fields
+        ):
+            yield b"".join(dumps(record) + b"\n" for record in records)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
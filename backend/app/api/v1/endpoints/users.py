@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.constants import UserRoles
+from app.core.serialization import FastJSONResponse
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import PasswordChange, UserList, UserUpdate
@@ -81,11 +82,11 @@ async def list_users(
     users = await user_service.repository.get_users(limit, offset)
 
     users_schemas = [UserSchema.from_orm(u) for u in users]
-    return UserList(
+    return FastJSONResponse(content=UserList(
         users=users_schemas,
         total=len(users),  # Simplified - in production, get actual count
         page=offset // limit + 1,
-        size=limit)
+        size=limit))
 
 @router.get("/{user_id}", response_model=UserSchema)
 async def get_user(
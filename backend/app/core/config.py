@@ -65,6 +65,15 @@ class Settings(BaseSettings):
     INFERENCE_TIMEOUT: int = Field(default=30, env="INFERENCE_TIMEOUT")
     MAX_BATCH_SIZE: int = Field(default=32, env="MAX_BATCH_SIZE")
     MODEL_CACHE_TTL: int = Field(default=3600, env="MODEL_CACHE_TTL")
+    ADAPTIVE_THRESHOLDS_DB: str = Field(default="./data/adaptive_thresholds.db", env="ADAPTIVE_THRESHOLDS_DB")
+    GUIDELINES_PATH: str = Field(default="", env="GUIDELINES_PATH")  # vazio = diretrizes embarcadas
+    FARMACIA_LEDGER_DB: str = Field(default="./data/farmacia_ledger.db", env="FARMACIA_LEDGER_DB")
+    FARMACIA_INVENTARIO_DB: str = Field(default="./data/farmacia_inventario.db", env="FARMACIA_INVENTARIO_DB")
+    FARMACIA_ANTIBIOGRAMA_DB: str = Field(default="./data/farmacia_antibiograma.db", env="FARMACIA_ANTIBIOGRAMA_DB")
+    FARMACIA_KPIS_DB: str = Field(default="./data/farmacia_kpis.db", env="FARMACIA_KPIS_DB")
+    FARMACIA_TELEMETRIA_DB: str = Field(default="./data/farmacia_telemetria.db", env="FARMACIA_TELEMETRIA_DB")
+    FARMACIA_PREVISAO_ESTADO: str = Field(default="./data/farmacia_previsao.npz", env="FARMACIA_PREVISAO_ESTADO")
+    FARMACIA_LAYOUT_HOSPITAL: str = Field(default="", env="FARMACIA_LAYOUT_HOSPITAL")  # JSON {"unidade": [x, y, andar]}
     
     # === CONFIGURAÇÕES DE ARQUIVOS ===
     UPLOAD_PATH: str = Field(default="/app/uploads", env="UPLOAD_PATH")
@@ -73,6 +82,7 @@ class Settings(BaseSettings):
         default=["jpg", "jpeg", "png", "pdf", "dicom"],
         env="ALLOWED_EXTENSIONS"
     )
+    IMAGE_VARIANT_WORKERS: int = Field(default=2, env="IMAGE_VARIANT_WORKERS")  # 0 = thread em vez de processos
     
     # === CONFIGURAÇÕES DE LOGGING ===
     LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
@@ -91,6 +101,15 @@ class Settings(BaseSettings):
     MONITORING_ENABLED: bool = Field(default=True, env="MONITORING_ENABLED")
     METRICS_PORT: int = Field(default=9090, env="METRICS_PORT")
     HEALTH_CHECK_TIMEOUT: int = Field(default=5, env="HEALTH_CHECK_TIMEOUT")
+    MEMORY_SAMPLE_INTERVAL: float = Field(default=30.0, env="MEMORY_SAMPLE_INTERVAL")  # segundos
+    MEMORY_TRACE_ALLOCATIONS: bool = Field(default=False, env="MEMORY_TRACE_ALLOCATIONS")  # sempre ligado
+    MEMORY_TRACE_ON_LEAK: bool = Field(default=True, env="MEMORY_TRACE_ON_LEAK")  # liga ao detectar vazamento
+    MEMORY_BUDGET_MB: Optional[float] = Field(default=None, env="MEMORY_BUDGET_MB")
+    MEMORY_LEAK_THRESHOLD_MB: float = Field(default=50.0, env="MEMORY_LEAK_THRESHOLD_MB")
+    MEMORY_LEAK_WINDOW: int = Field(default=3600, env="MEMORY_LEAK_WINDOW")  # segundos
+    APPOINTMENT_SWEEP_ENABLED: bool = Field(default=False, env="APPOINTMENT_SWEEP_ENABLED")
+    APPOINTMENT_SWEEP_INTERVAL: int = Field(default=60, env="APPOINTMENT_SWEEP_INTERVAL")  # segundos
+    APPOINTMENT_SWEEP_BATCH_SIZE: int = Field(default=500, env="APPOINTMENT_SWEEP_BATCH_SIZE")
     
     # === VALIDADORES ===
     @validator("ENVIRONMENT")
@@ -49,16 +49,17 @@ def create_database_engine() -> Engine:
         })
     elif settings.is_development:
         engine_options.update({
-            "poolclass": StaticPool,
+            "poolclass": QueuePool,
             "pool_size": 5,
             "max_overflow": 10,
             "echo": True
         })
     else:  # testing
+        # StaticPool mantém uma única conexão e não aceita opções de tamanho
+        for option in ("pool_size", "max_overflow", "pool_recycle"):
+            engine_options.pop(option, None)
         engine_options.update({
             "poolclass": StaticPool,
-            "pool_size": 1,
-            "max_overflow": 0,
             "echo": False
         })
     
@@ -381,6 +382,19 @@ class DatabaseHealthChecker:
 
 # === UTILITÁRIOS DE MIGRAÇÃO ===
 
+# Colunas e índices adicionados a tabelas já existentes, em ordem de aplicação.
+# create_all só cria tabelas novas, então bancos criados antes de cada entrada
+# recebem as alterações por ``MigrationUtils.apply_schema_migrations``.
+SCHEMA_MIGRATIONS: List[Dict[str, Any]] = [
+    {
+        "name": "appointment_sweeps",
+        "table": "appointments",
+        "columns": ["confirmation_requested_at", "sweep_lease_owner", "sweep_lease_until"],
+        "indexes": ["ix_appointments_reminder_due"],
+    },
+]
+
+
 class MigrationUtils:
     """Utilitários para migrações do banco de dados"""
     
@@ -424,6 +438,48 @@ class MigrationUtils:
             logger.error(f"Error restoring backup: {e}")
             return False
     
+    def apply_schema_migrations(self) -> List[str]:
+        """
+        Adiciona as colunas e índices de ``SCHEMA_MIGRATIONS`` que faltam no banco
+        
+        Idempotente: o que já existe é ignorado, assim como tabelas ainda não
+        criadas (create_all as cria completas).
+        
+        Returns:
+            Lista das alterações aplicadas ("tabela.coluna" ou nome do índice)
+        """
+        import app.models  # noqa: F401 - registra as tabelas em Base.metadata
+        
+        applied = []
+        inspector = inspect(self.engine)
+        tables = set(inspector.get_table_names())
+        
+        with self.engine.begin() as conn:
+            for migration in SCHEMA_MIGRATIONS:
+                table_name = migration["table"]
+                if table_name not in tables:
+                    continue
+                table = Base.metadata.tables[table_name]
+                
+                existing_columns = {column["name"] for column in inspector.get_columns(table_name)}
+                for column_name in migration["columns"]:
+                    if column_name in existing_columns:
+                        continue
+                    column = table.columns[column_name]
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+                    applied.append(f"{table_name}.{column_name}")
+                
+                existing_indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+                for index in table.indexes:
+                    if index.name in migration["indexes"] and index.name not in existing_indexes:
+                        index.create(bind=conn)
+                        applied.append(index.name)
+        
+        if applied:
+            logger.info(f"Schema migrations applied: {', '.join(applied)}")
+        return applied
+    
     def get_migration_status(self) -> Dict[str, Any]:
         """
         Retorna status das migrações
@@ -485,6 +541,8 @@ def init_database():
         if settings.ENVIRONMENT == "development":
             db_manager.create_all_tables()
         
+        migration_utils.apply_schema_migrations()
+        
         logger.info("Database initialized successfully")
         
     except Exception as e:
@@ -0,0 +1,321 @@
+"""
+Validação e normalização de identificadores brasileiros
+CPF, CNS (Cartão Nacional de Saúde) e telefone, em lote sobre matrizes de
+dígitos NumPy e, para valores individuais, por um caminho escalar com cache LRU
+"""
+
+from functools import lru_cache
+from operator import mul
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Identificadores mais longos que isso são rejeitados sem análise
+MAX_IDENTIFIER_LENGTH = 32
+SCALAR_CACHE_SIZE = 65536
+
+# Caracteres de formatação aceitos entre os dígitos
+SEPARATORS = " .-/()"
+_STRIP_SEPARATORS = str.maketrans("", "", SEPARATORS)
+
+# Classe de cada byte: fim da string (0), dígito, separador ou outro caractere
+_END, _DIGIT, _SEPARATOR, _OTHER = range(4)
+_CHAR_CLASS = np.full(256, _OTHER, dtype=np.uint8)
+_CHAR_CLASS[0] = _END
+_CHAR_CLASS[ord("0"):ord("9") + 1] = _DIGIT
+_CHAR_CLASS[[ord(char) for char in SEPARATORS]] = _SEPARATOR
+
+CPF_LENGTH = 11
+CNS_LENGTH = 15
+# Somas ponderadas em uma única multiplicação de matrizes (colunas = conjuntos de pesos)
+CPF_WEIGHTS = np.array([[*range(10, 1, -1), 0], list(range(11, 1, -1))], dtype=np.float64).T
+CNS_WEIGHTS = np.array([[*range(15, 4, -1), 0, 0, 0, 0], list(range(15, 0, -1))], dtype=np.float64).T
+_CPF_FIRST = tuple(range(10, 1, -1))
+_CPF_SECOND = tuple(range(11, 1, -1))
+_CNS_WEIGHTS = tuple(range(15, 0, -1))
+
+BRAZIL_COUNTRY_CODE = "55"
+MIN_INTERNATIONAL_DIGITS = 8
+MAX_INTERNATIONAL_DIGITS = 15
+
+
+# === MATRIZES DE DÍGITOS ===
+
+def _char_matrix(values: Sequence[Any]) -> np.ndarray:
+    """
+    Bytes dos valores em uma matriz uint8 (n, largura)
+
+    Valores que não são ``str`` ou que excedem ``MAX_IDENTIFIER_LENGTH`` viram
+    linhas vazias (e portanto inválidas). Posições após o fim da string são 0;
+    caracteres não ASCII viram bytes >= 128, classificados como inválidos.
+    """
+    strings = [value if type(value) is str and len(value) <= MAX_IDENTIFIER_LENGTH else ""
+               for value in values]
+    try:
+        array = np.array(strings, dtype="S")
+    except UnicodeEncodeError:
+        codes = np.array(strings, dtype=str)
+        array = np.minimum(codes.view(np.uint32).reshape(len(strings), -1), 255).astype(np.uint8)
+    if array.size == 0 or array.itemsize == 0:
+        return np.zeros((len(strings), 0), dtype=np.uint8)
+    return array.view(np.uint8).reshape(len(strings), -1)
+
+
+def _classify(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Máscara de dígitos e máscara de posições que não são dígito, separador ou fim"""
+    classes = _CHAR_CLASS[codes]
+    return classes == _DIGIT, classes == _OTHER
+
+
+def _extract(codes: np.ndarray, digits: np.ndarray, rows: np.ndarray, width: int) -> np.ndarray:
+    """Dígitos das linhas ``rows`` (todas com exatamente ``width`` dígitos) como matriz uint8"""
+    return codes[rows][digits[rows]].reshape(-1, width) - ord("0")
+
+
+def digit_matrix(values: Sequence[Any], width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matriz (m, width) com os dígitos dos valores bem formados
+
+    Um valor é bem formado quando contém apenas dígitos ASCII e separadores
+    (``SEPARATORS``) e exatamente ``width`` dígitos.
+
+    Returns:
+        (máscara booleana por valor, matriz de dígitos das linhas da máscara)
+    """
+    codes = _char_matrix(values)
+    digits, other = _classify(codes)
+    well_formed = ~other.any(axis=1) & (digits.sum(axis=1) == width)
+    return well_formed, _extract(codes, digits, np.flatnonzero(well_formed), width)
+
+
+def digit_strings(matrix: np.ndarray) -> List[str]:
+    """Converte uma matriz de dígitos de volta em strings"""
+    if matrix.size == 0:
+        return [""] * len(matrix)
+    raw = (matrix + ord("0")).astype(np.uint8)
+    return raw.view(f"S{matrix.shape[1]}").ravel().astype(str).tolist()
+
+
+def _scalar_digits(value: str, width: int) -> Optional[bytes]:
+    """Dígitos ASCII (como bytes) de um valor com exatamente ``width`` dígitos e apenas separadores"""
+    if len(value) > MAX_IDENTIFIER_LENGTH:
+        return None
+    stripped = value.translate(_STRIP_SEPARATORS)
+    if len(stripped) != width or not (stripped.isascii() and stripped.isdigit()):
+        return None
+    return stripped.encode("ascii")
+
+
+def _weighted_sum(ascii_digits: bytes, weights: Sequence[int]) -> int:
+    """Soma ponderada de dígitos ASCII (descontando o código de ``'0'``)"""
+    return sum(map(mul, ascii_digits, weights)) - ord("0") * sum(weights[:len(ascii_digits)])
+
+
+# === CPF ===
+
+def _check_digit(totals: Any) -> Any:
+    remainder = totals % 11
+    return np.where(remainder < 2, 0, 11 - remainder)
+
+
+def cpf_digits_valid(digits: np.ndarray) -> np.ndarray:
+    """
+    Verifica CPFs em uma matriz (n, 11) de dígitos
+
+    Rejeita sequências repetidas e confere os dois dígitos verificadores.
+    """
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    totals = (digits[:, :10] @ CPF_WEIGHTS).astype(np.int64)
+    check = _check_digit(totals)
+    return ~repeated & (check[:, 0] == digits[:, 9]) & (check[:, 1] == digits[:, 10])
+
+
+def cpf_valid(values: Sequence[Any]) -> np.ndarray:
+    """Máscara de CPFs válidos (com ou sem formatação)"""
+    well_formed, digits = digit_matrix(values, CPF_LENGTH)
+    valid = np.zeros(len(well_formed), dtype=bool)
+    valid[well_formed] = cpf_digits_valid(digits)
+    return valid
+
+
+def normalize_cpf(values: Sequence[Any]) -> List[Optional[str]]:
+    """CPFs como 11 dígitos sem formatação; ``None`` para os inválidos"""
+    well_formed, digits = digit_matrix(values, CPF_LENGTH)
+    rows = np.flatnonzero(well_formed)
+    valid = cpf_digits_valid(digits)
+
+    normalized: List[Optional[str]] = [None] * len(well_formed)
+    for row, text in zip(rows[valid], digit_strings(digits[valid])):
+        normalized[row] = text
+    return normalized
+
+
+def is_valid_cpf(value: Any) -> bool:
+    """Valida um CPF (com ou sem formatação); valores repetidos vêm do cache"""
+    return type(value) is str and _is_valid_cpf(value)
+
+
+@lru_cache(maxsize=SCALAR_CACHE_SIZE)
+def _is_valid_cpf(value: str) -> bool:
+    digits = _scalar_digits(value, CPF_LENGTH)
+    if digits is None or digits.count(digits[0]) == CPF_LENGTH:
+        return False
+    first = _weighted_sum(digits[:9], _CPF_FIRST) % 11
+    second = _weighted_sum(digits[:10], _CPF_SECOND) % 11
+    return (digits[9] - 48 == (0 if first < 2 else 11 - first)
+            and digits[10] - 48 == (0 if second < 2 else 11 - second))
+
+
+def format_cpf(cpf: str) -> str:
+    """Formata 11 dígitos como ``000.000.000-00``"""
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+# === CNS ===
+
+def cns_digits_valid(digits: np.ndarray) -> np.ndarray:
+    """
+    Verifica CNS em uma matriz (n, 15) de dígitos
+
+    Definitivos (iniciados por 1 ou 2) são gerados a partir dos 11 primeiros
+    dígitos: sufixo ``000`` + DV, ou ``001`` + DV quando o DV calculado é 10.
+    Provisórios (7, 8 ou 9) exigem soma ponderada múltipla de 11.
+    """
+    first = digits[:, 0]
+    totals = (digits @ CNS_WEIGHTS).astype(np.int64)
+    weighted = totals[:, 1]
+
+    remainder = totals[:, 0] % 11
+    adjusted = remainder == 1  # DV 10: soma + 2, o que sempre resulta em DV 8
+    check = np.where(adjusted, 8, np.where(remainder == 0, 0, 11 - remainder))
+    definitive = (
+        (digits[:, 11] == 0) & (digits[:, 12] == 0)
+        & (digits[:, 13] == adjusted) & (digits[:, 14] == check)
+    )
+
+    return np.where(
+        (first == 1) | (first == 2),
+        definitive,
+        (first >= 7) & (weighted % 11 == 0)
+    )
+
+
+def cns_valid(values: Sequence[Any]) -> np.ndarray:
+    """Máscara de números de CNS válidos (com ou sem espaços)"""
+    well_formed, digits = digit_matrix(values, CNS_LENGTH)
+    valid = np.zeros(len(well_formed), dtype=bool)
+    valid[well_formed] = cns_digits_valid(digits)
+    return valid
+
+
+def normalize_cns(values: Sequence[Any]) -> List[Optional[str]]:
+    """CNS como 15 dígitos sem formatação; ``None`` para os inválidos"""
+    well_formed, digits = digit_matrix(values, CNS_LENGTH)
+    rows = np.flatnonzero(well_formed)
+    valid = cns_digits_valid(digits)
+
+    normalized: List[Optional[str]] = [None] * len(well_formed)
+    for row, text in zip(rows[valid], digit_strings(digits[valid])):
+        normalized[row] = text
+    return normalized
+
+
+def is_valid_cns(value: Any) -> bool:
+    """Valida um número de CNS; valores repetidos vêm do cache"""
+    return type(value) is str and _is_valid_cns(value)
+
+
+@lru_cache(maxsize=SCALAR_CACHE_SIZE)
+def _is_valid_cns(value: str) -> bool:
+    digits = _scalar_digits(value, CNS_LENGTH)
+    if digits is None:
+        return False
+    if digits[:1] in (b"1", b"2"):
+        remainder = _weighted_sum(digits[:11], _CNS_WEIGHTS) % 11
+        expected = "0018" if remainder == 1 else f"000{0 if remainder == 0 else 11 - remainder}"
+        return digits[11:] == expected.encode("ascii")
+    if digits[:1] in (b"7", b"8", b"9"):
+        return _weighted_sum(digits, _CNS_WEIGHTS) % 11 == 0
+    return False
+
+
+# === TELEFONE ===
+
+def _national_valid(national: np.ndarray) -> np.ndarray:
+    """
+    Números nacionais: DDD sem zeros + celular (9 dígitos iniciados por 9)
+    ou fixo (8 dígitos iniciados por 2 a 5)
+    """
+    valid = (national[:, 0] >= 1) & (national[:, 1] >= 1)
+    if national.shape[1] == 11:
+        return valid & (national[:, 2] == 9)
+    if national.shape[1] == 10:
+        return valid & (national[:, 2] >= 2) & (national[:, 2] <= 5)
+    return np.zeros(len(national), dtype=bool)
+
+
+def _phone_group(digits: np.ndarray, has_plus: np.ndarray) -> List[Optional[str]]:
+    """Normaliza um grupo de telefones com a mesma quantidade de dígitos"""
+    count, width = digits.shape
+    normalized: List[Optional[str]] = [None] * count
+    brazil = (digits[:, 0] == 5) & (digits[:, 1] == 5) if width >= 2 else np.zeros(count, dtype=bool)
+    trunk = digits[:, 0] == 0
+
+    # (linhas, início do número nacional)
+    national_forms = []
+    if width in (12, 13):
+        national_forms.append((brazil, 2))
+    if width in (10, 11):
+        national_forms.append((~has_plus & ~trunk, 0))
+    if width in (11, 12):
+        national_forms.append((~has_plus & trunk, 1))
+
+    for mask, start in national_forms:
+        rows = np.flatnonzero(mask)
+        national = digits[rows, start:]
+        valid = _national_valid(national)
+        for row, text in zip(rows[valid], digit_strings(national[valid])):
+            normalized[row] = f"+{BRAZIL_COUNTRY_CODE}{text}"
+
+    if MIN_INTERNATIONAL_DIGITS <= width <= MAX_INTERNATIONAL_DIGITS:
+        rows = np.flatnonzero(has_plus & ~brazil & ~trunk)
+        for row, text in zip(rows, digit_strings(digits[rows])):
+            normalized[row] = f"+{text}"
+    return normalized
+
+
+def normalize_phone(values: Sequence[Any]) -> List[Optional[str]]:
+    """
+    Telefones em formato E.164 (``+5511987654321``); ``None`` para os inválidos
+
+    Sem ``+``, números com DDD (10 ou 11 dígitos, opcionalmente precedidos de 0
+    ou de 55) são tratados como brasileiros. Com ``+``, o código 55 é validado
+    como brasileiro e os demais países são aceitos com 8 a 15 dígitos.
+    """
+    codes = _char_matrix(values)
+    normalized: List[Optional[str]] = [None] * len(codes)
+    if codes.shape[1] == 0:
+        return normalized
+
+    digits, other = _classify(codes)
+    has_plus = codes[:, 0] == ord("+")
+    other[:, 0] &= ~has_plus
+    counts = digits.sum(axis=1)
+    well_formed = ~other.any(axis=1)
+
+    for width in np.unique(counts[well_formed & (counts >= 2)]):
+        rows = np.flatnonzero(well_formed & (counts == width))
+        group = _phone_group(_extract(codes, digits, rows, int(width)), has_plus[rows])
+        for row, text in zip(rows, group):
+            normalized[row] = text
+    return normalized
+
+
+def normalize_phone_number(value: Any) -> Optional[str]:
+    """Versão escalar (com cache) de ``normalize_phone``"""
+    return _normalize_phone_number(value) if type(value) is str else None
+
+
+@lru_cache(maxsize=SCALAR_CACHE_SIZE)
+def _normalize_phone_number(value: str) -> Optional[str]:
+    return normalize_phone([value])[0]
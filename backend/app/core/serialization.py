@@ -0,0 +1,255 @@
+"""
+Serialização rápida de modelos para respostas da API
+Gera, uma única vez por modelo, uma função de serialização a partir do mapper
+do SQLAlchemy e emite JSON em bytes diretamente (orjson quando disponível)
+"""
+
+import json
+import logging
+import threading
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import types as sqltypes
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+def _is_uuid_type(column_type: Any) -> bool:
+    try:
+        return column_type.python_type is uuid.UUID
+    except NotImplementedError:
+        return type(column_type).__name__.upper() == "UUID"
+
+
+def _column_expression(column: Any, accessor: str) -> str:
+    """
+    Expressão Python que converte o valor da coluna para o formato de ``to_dict``
+
+    datetime vira ISO 8601 e UUID vira string; os demais valores seguem como estão.
+    """
+    if isinstance(column.type, sqltypes.DateTime):
+        return f"(_v.isoformat() if (_v := {accessor}) is not None else None)"
+    if _is_uuid_type(column.type):
+        return f"(str(_v) if (_v := {accessor}) is not None else None)"
+    return accessor
+
+
+def _compile(name: str, params: str, entries: Sequence[Tuple[str, str]]) -> Callable:
+    """Compila uma função que monta um dicionário literal com as entradas"""
+    body = ", ".join(f"{key!r}: {expression}" for key, expression in entries)
+    source = f"def {name}({params}):\n    return {{{body}}}\n"
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, f"<serializer {name}>", "exec"), {"str": str}, namespace)
+    return namespace[name]
+
+
+def json_default(value: Any) -> Any:
+    """Conversão de tipos que o codificador JSON não conhece"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if np is not None:
+        # Escalares numpy (float32, int64, bool_...) e arrays que o orjson não serializa nativamente
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+    if hasattr(value, "__table__"):
+        return get_serializer(type(value)).serialize(value, raw=True)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Objeto do tipo {type(value).__name__} não é serializável em JSON")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa para JSON em bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=json_default, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        content, default=json_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class ModelSerializer:
+    """
+    Serializador compilado de um modelo
+
+    Os nomes das colunas e as conversões são resolvidos uma vez a partir do
+    mapper; cada projeção (subconjunto de campos) gera e guarda sua própria
+    função. Relacionamentos nunca são lidos, portanto a serialização não
+    dispara carregamento lazy.
+    """
+
+    def __init__(self, model_class: type):
+        self.model_class = model_class
+        mapper = sa_inspect(model_class)
+        # nome da coluna -> (atributo no modelo, coluna)
+        self._columns: Dict[str, Tuple[str, Any]] = {}
+        for prop in mapper.column_attrs:
+            column = prop.columns[0]
+            self._columns.setdefault(column.name, (prop.key, column))
+        self.fields: Tuple[str, ...] = tuple(self._columns)
+        self._compiled: Dict[Tuple[Tuple[str, ...], bool], Callable] = {}
+        self._lock = threading.Lock()
+
+    def _function(self, fields: Optional[Sequence[str]], raw: bool) -> Callable:
+        key = (tuple(fields) if fields is not None else self.fields, raw)
+        function = self._compiled.get(key)
+        if function is not None:
+            return function
+
+        unknown = [field for field in key[0] if field not in self._columns]
+        if unknown:
+            raise ValueError(f"Campos inexistentes em {self.model_class.__name__}: {', '.join(unknown)}")
+
+        entries = []
+        for field in key[0]:
+            attribute, column = self._columns[field]
+            accessor = f"obj.{attribute}" if attribute.isidentifier() else f"getattr(obj, {attribute!r})"
+            entries.append((field, accessor if raw else _column_expression(column, accessor)))
+
+        function = _compile(f"serialize_{self.model_class.__name__}", "obj", entries)
+        with self._lock:
+            self._compiled.setdefault(key, function)
+        return self._compiled[key]
+
+    def project(self, fields: Optional[Iterable[str]] = None,
+                exclude: Optional[Iterable[str]] = None) -> Optional[Tuple[str, ...]]:
+        """Resolve a lista de campos de uma projeção, na ordem das colunas"""
+        if fields is None and not exclude:
+            return None
+        wanted = set(fields) if fields is not None else set(self.fields)
+        unknown = wanted.difference(self.fields)
+        if unknown:
+            raise ValueError(f"Campos inexistentes em {self.model_class.__name__}: {', '.join(sorted(unknown))}")
+        wanted.difference_update(exclude or ())
+        return tuple(field for field in self.fields if field in wanted)
+
+    def serialize(self, obj: Any, fields: Optional[Iterable[str]] = None,
+                  exclude: Optional[Iterable[str]] = None, raw: bool = False) -> Dict[str, Any]:
+        """
+        Converte uma instância em dicionário
+
+        Args:
+            obj: Instância do modelo
+            fields: Campos a incluir (todos por padrão)
+            exclude: Campos a excluir
+            raw: Mantém datetime/UUID nativos (para o codificador JSON)
+        """
+        return self._function(self.project(fields, exclude), raw)(obj)
+
+    def serialize_many(self, objs: Iterable[Any], fields: Optional[Iterable[str]] = None,
+                       exclude: Optional[Iterable[str]] = None, raw: bool = False) -> List[Dict[str, Any]]:
+        function = self._function(self.project(fields, exclude), raw)
+        return [function(obj) for obj in objs]
+
+    def dumps(self, objs: Any, fields: Optional[Iterable[str]] = None,
+              exclude: Optional[Iterable[str]] = None) -> bytes:
+        """Serializa uma instância ou uma lista de instâncias direto para JSON"""
+        if isinstance(objs, self.model_class):
+            return dumps(self.serialize(objs, fields, exclude, raw=True))
+        return dumps(self.serialize_many(objs, fields, exclude, raw=True))
+
+
+_serializers: Dict[type, ModelSerializer] = {}
+_serializers_lock = threading.Lock()
+
+
+def get_serializer(model_class: type) -> ModelSerializer:
+    """Retorna o serializador compilado do modelo (criado no primeiro uso)"""
+    serializer = _serializers.get(model_class)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.get(model_class)
+            if serializer is None:
+                serializer = ModelSerializer(model_class)
+                _serializers[model_class] = serializer
+    return serializer
+
+
+def loaded_relationship(obj: Any, name: str) -> Any:
+    """
+    Valor de um relacionamento somente se já estiver carregado
+
+    Nunca dispara carregamento lazy; para incluir o relacionamento, carregue-o
+    na consulta (``selectinload``/``joinedload``).
+    """
+    return obj.__dict__.get(name)
+
+
+_row_functions: Dict[Tuple[str, ...], Callable] = {}
+
+
+def _row_function(fields: Tuple[str, ...]) -> Callable:
+    function = _row_functions.get(fields)
+    if function is None:
+        function = _compile("serialize_row", "row", [(field, f"row[{i}]") for i, field in enumerate(fields)])
+        _row_functions[fields] = function
+    return function
+
+
+def serialize_rows(rows: Sequence[Any], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Converte tuplas de colunas (ex.: ``db.query(Exam.id, Exam.status)``) em dicionários
+
+    Os nomes vêm de ``fields`` ou dos rótulos da própria linha.
+    """
+    if not rows:
+        return []
+    if fields is None:
+        fields = rows[0]._fields
+    function = _row_function(tuple(fields))
+    return [function(row) for row in rows]
+
+
+def dumps_rows(rows: Sequence[Any], fields: Optional[Sequence[str]] = None) -> bytes:
+    """Serializa tuplas de colunas direto para JSON, sem instanciar modelos"""
+    return dumps(serialize_rows(rows, fields))
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Resposta JSON padrão da aplicação
+
+    Usa orjson quando disponível, aceita instâncias de modelos, schemas
+    Pydantic, escalares e arrays numpy e bytes já serializados (de
+    ``ModelSerializer.dumps``/``dumps_rows``) sem recodificar.
+
+    Como classe padrão ela só troca o codificador: o FastAPI passa o valor
+    retornado pela rota por ``jsonable_encoder`` (e pelo ``response_model``)
+    antes de ``render``, o que recodifica bytes como string e rejeita numpy.
+    Rotas que devolvem esses valores, ou listas grandes, retornam
+    ``FastJSONResponse(content=...)`` explicitamente.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
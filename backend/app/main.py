@@ -1,14 +1,22 @@
 """
 FastAPI application
 """
+import asyncio
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.serialization import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
 # Criar app
 app = FastAPI(
     title="CardioAI Pro",
     version="1.0.0",
-    description="Sistema de analise de ECG com IA"
+    description="Sistema de analise de ECG com IA",
+    default_response_class=FastJSONResponse
 )
 
 # CORS
@@ -29,6 +37,122 @@ async def health_check():
     """Health check"""
     return {"status": "healthy"}
 
+@app.get("/health/memory")
+def memory_health_check():
+    """Perfil de memoria amostrado e deteccao de vazamentos"""
+    from app.core.config import settings
+    from app.monitoring.memory import get_memory_monitor
+
+    monitor = get_memory_monitor()
+    profile = monitor.get_profile()
+    leaks = monitor.detect_memory_leaks(
+        threshold_mb=settings.MEMORY_LEAK_THRESHOLD_MB,
+        time_window_seconds=settings.MEMORY_LEAK_WINDOW
+    )
+    return {
+        "status": "warning" if leaks["has_leak"] else "healthy",
+        "profile": profile,
+        "leaks": leaks
+    }
+
+@app.on_event("startup")
+async def start_memory_monitor():
+    """Inicia o amostrador de memoria em segundo plano"""
+    from app.core.config import settings
+    if not settings.MONITORING_ENABLED:
+        return
+    from app.monitoring.memory import get_memory_monitor
+    get_memory_monitor().start()
+
+@app.on_event("shutdown")
+async def stop_memory_monitor():
+    """Para o amostrador de memoria"""
+    from app.core.config import settings
+    if not settings.MONITORING_ENABLED:
+        return
+    from app.monitoring.memory import get_memory_monitor
+    get_memory_monitor().stop()
+
+@app.on_event("startup")
+async def start_appointment_sweeps():
+    """Inicia as varreduras de lembretes e confirmacoes de consultas"""
+    from app.core.config import settings
+    if not settings.APPOINTMENT_SWEEP_ENABLED:
+        return
+    try:
+        from app.core.database import migration_utils
+        from app.services.appointment_sweeper import get_appointment_sweep_scheduler
+    except Exception as e:  # modelos ou banco indisponíveis não impedem a subida da API
+        logger.warning(f"Varredura de consultas desativada: {e}")
+        return
+    # As varreduras usam as colunas de reserva adicionadas por SCHEMA_MIGRATIONS
+    await asyncio.to_thread(migration_utils.apply_schema_migrations)
+    get_appointment_sweep_scheduler().start()
+
+@app.on_event("shutdown")
+async def stop_appointment_sweeps():
+    """Para as varreduras de consultas"""
+    from app.core.config import settings
+    if not settings.APPOINTMENT_SWEEP_ENABLED:
+        return
+    try:
+        from app.services.appointment_sweeper import get_appointment_sweep_scheduler
+    except Exception:
+        return
+    get_appointment_sweep_scheduler().stop()
+
+@app.on_event("startup")
+async def start_farmacia_services():
+    """Carrega o estado persistido dos servicos da farmacia"""
+    try:
+        from app.modules.farmacia.servicos import iniciar_servicos
+        import app.modules.farmacia  # noqa: F401  (registra os servicos)
+    except Exception as e:
+        logger.warning(f"Servicos da farmacia indisponiveis: {e}")
+        return
+    # Carregar os bancos locais e I/O sincrono: fora do event loop
+    await asyncio.to_thread(iniciar_servicos)
+
+@app.on_event("shutdown")
+async def stop_farmacia_services():
+    """Fecha os servicos da farmacia (conexoes com os bancos locais)"""
+    try:
+        from app.modules.farmacia.rastreador_medicamentos import drenar_gravacoes
+        from app.modules.farmacia.servicos import encerrar_servicos
+    except Exception:
+        return
+    # Blocos ainda em group commit sao gravados antes de fechar o ledger
+    await drenar_gravacoes()
+    encerrar_servicos()
+
+@app.on_event("startup")
+async def load_adaptive_thresholds():
+    """Carrega os limiares adaptativos (snapshot e historico posterior)"""
+    try:
+        from app.services.adaptive_thresholds import get_adaptive_threshold_manager
+    except Exception as e:
+        logger.warning(f"Limiares adaptativos indisponiveis: {e}")
+        return
+    await asyncio.to_thread(get_adaptive_threshold_manager)
+
+@app.on_event("shutdown")
+async def save_adaptive_thresholds():
+    """Grava um snapshot dos limiares aprendidos e fecha o historico"""
+    try:
+        from app.services.adaptive_thresholds import close_adaptive_threshold_manager
+    except Exception:
+        return
+    close_adaptive_threshold_manager()
+
+@app.on_event("shutdown")
+async def stop_image_workers():
+    """Encerra o pool de processos de variantes de imagem"""
+    try:
+        from app.services.image_variants import get_image_variant_service
+    except Exception:
+        return
+    get_image_variant_service().shutdown()
+
 # Tentar importar rotas, mas nao falhar se nao existirem
 try:
     from app.api.endpoints import api_router
@@ -8,8 +8,9 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy import Column, String, Text, DateTime, Boolean, ForeignKey, Index, Integer
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship, Session
-from sqlalchemy.ext.hybrid_property import hybrid_property
+from sqlalchemy.ext.hybrid import hybrid_property
 
+from app.core.serialization import loaded_relationship
 from app.models.base import AuditableModel, StatusMixin, MetadataMixin
 from app.core.constants import AppointmentStatus, Priority
 
@@ -375,6 +376,25 @@ class Appointment(AuditableModel, StatusMixin, MetadataMixin):
         doc="Quem confirmou"
     )
     
+    confirmation_requested_at = Column(
+        DateTime,
+        nullable=True,
+        doc="Data do pedido de confirmação ao paciente"
+    )
+    
+    # === VARREDURAS EM LOTE ===
+    sweep_lease_owner = Column(
+        String(100),
+        nullable=True,
+        doc="Worker que reservou a consulta na varredura atual"
+    )
+    
+    sweep_lease_until = Column(
+        DateTime,
+        nullable=True,
+        doc="Expiração da reserva da varredura"
+    )
+    
     # === FATURAMENTO ===
     billable = Column(
         Boolean,
@@ -421,6 +441,7 @@ class Appointment(AuditableModel, StatusMixin, MetadataMixin):
         Index('ix_appointments_type', 'appointment_type'),
         Index('ix_appointments_urgent', 'urgent'),
         Index('ix_appointments_location_type', 'location_type'),
+        Index('ix_appointments_reminder_due', 'reminder_sent', 'scheduled_datetime'),
     )
     
     # === PROPRIEDADES CALCULADAS ===
@@ -725,62 +746,86 @@ class Appointment(AuditableModel, StatusMixin, MetadataMixin):
         
         return query.order_by(cls.scheduled_datetime.asc()).all()
     
-    @classmethod
-    def get_pending_confirmation(cls, db: Session) -> List['Appointment']:
-        """Busca consultas pendentes de confirmação"""
-        return db.query(cls).filter(
-            cls.appointment_status == AppointmentStatus.SCHEDULED.value,
-            cls.confirmation_required.is_(True),
-            cls.confirmed_at.is_(None),
-            cls.scheduled_datetime > datetime.utcnow(),
-            cls.is_deleted.is_(False)
-        ).order_by(cls.scheduled_datetime.asc()).all()
-    
-    @classmethod
-    def get_need_reminder(cls, db: Session) -> List['Appointment']:
-        """Busca consultas que precisam de lembrete"""
-        reminder_threshold = datetime.utcnow() + timedelta(hours=24)
-        
-        return db.query(cls).filter(
-            cls.appointment_status == AppointmentStatus.SCHEDULED.value,
-            cls.reminder_sent.is_(False),
-            cls.scheduled_datetime <= reminder_threshold,
-            cls.scheduled_datetime > datetime.utcnow(),
-            cls.is_deleted.is_(False)
-        ).order_by(cls.scheduled_datetime.asc()).all()
-    
     @classmethod
     def check_availability(cls, db: Session, physician_id: uuid.UUID, 
-                          start_time: datetime, duration_minutes: int = 30) -> bool:
+                          start_time: datetime, duration_minutes: int = 30,
+                          exclude_id: uuid.UUID = None, for_update: bool = False) -> bool:
         """
         Verifica disponibilidade de horário
         
+        Consulta o banco diretamente: o índice de agendas é um cache por
+        processo e serve apenas para sugestões e listagens de horários. Antes
+        de gravar uma marcação use ``for_update=True``, que trava a linha do
+        médico até o commit da transação e serializa marcações concorrentes.
+        
         Args:
             db: Sessão do banco
             physician_id: ID do médico
             start_time: Horário de início
             duration_minutes: Duração em minutos
+            exclude_id: Consulta ignorada na verificação (reagendamento)
+            for_update: Trava a agenda do médico até o fim da transação
             
         Returns:
             True se disponível
         """
-        end_time = start_time + timedelta(minutes=duration_minutes)
+        from app.models.user import User
+        from app.services.schedule_index import BLOCKING_STATUSES, MAX_APPOINTMENT_DURATION
+        
+        if for_update:
+            db.query(User.id).filter(User.id == physician_id).with_for_update().first()
         
-        # Buscar consultas conflitantes
-        conflicting = db.query(cls).filter(
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        query = db.query(
+            cls.scheduled_datetime, cls.end_datetime, cls.duration_minutes
+        ).filter(
             cls.physician_id == physician_id,
-            cls.appointment_status.in_([
-                AppointmentStatus.SCHEDULED.value,
-                AppointmentStatus.CONFIRMED.value,
-                AppointmentStatus.IN_PROGRESS.value
-            ]),
-            # Verificar sobreposição de horários
+            cls.appointment_status.in_(BLOCKING_STATUSES),
+            cls.scheduled_datetime >= start_time - MAX_APPOINTMENT_DURATION,
             cls.scheduled_datetime < end_time,
-            cls.end_datetime > start_time,
             cls.is_deleted.is_(False)
-        ).first()
+        )
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        
+        for row in query.all():
+            row_end = row.end_datetime or row.scheduled_datetime + timedelta(minutes=row.duration_minutes or 30)
+            if row_end > start_time:
+                return False
+        return True
+    
+    @classmethod
+    def find_available_slots(cls, db: Session, physician_id: uuid.UUID, start_time: datetime,
+                             duration_minutes: int = 30, limit: int = 20,
+                             room_number: str = None, building: str = None,
+                             equipment: Optional[List[str]] = None) -> List[datetime]:
+        """
+        Busca os próximos horários livres do médico
         
-        return conflicting is None
+        Args:
+            db: Sessão do banco
+            physician_id: ID do médico
+            start_time: Início da busca
+            duration_minutes: Duração em minutos
+            limit: Quantidade máxima de horários
+            room_number: Sala que também precisa estar livre
+            building: Prédio da sala
+            equipment: Equipamentos que também precisam estar livres
+            
+        Returns:
+            Horários de início disponíveis em ordem cronológica
+        """
+        from app.services.schedule_index import (
+            equipment_key, get_schedule_engine, physician_key, room_key)
+        
+        keys = [physician_key(physician_id)]
+        if room_number:
+            keys.append(room_key(room_number, building))
+        keys.extend(equipment_key(e) for e in equipment or [])
+        
+        return get_schedule_engine().find_free_slots(
+            db, keys, start_time, duration_minutes=duration_minutes, limit=limit
+        )
     
     # === MÉTODOS DE LIFECYCLE ===
     
@@ -814,7 +859,8 @@ class Appointment(AuditableModel, StatusMixin, MetadataMixin):
         
         Args:
             exclude: Campos para excluir
-            include_relationships: Se deve incluir dados relacionados
+            include_relationships: Se deve incluir dados relacionados já carregados
+                (não dispara carregamento lazy)
             
         Returns:
             Dicionário com dados da consulta
@@ -836,9 +882,11 @@ class Appointment(AuditableModel, StatusMixin, MetadataMixin):
         
         # Incluir dados relacionados se solicitado
         if include_relationships:
-            if hasattr(self, 'patient') and self.patient:
-                result['patient_data'] = self.patient.to_dict()
-            if hasattr(self, 'physician') and self.physician:
-                result['physician_data'] = self.physician.to_dict(include_sensitive=False)
+            patient = loaded_relationship(self, 'patient')
+            if patient:
+                result['patient_data'] = patient.to_dict()
+            physician = loaded_relationship(self, 'physician')
+            if physician:
+                result['physician_data'] = physician.to_dict(include_sensitive=False)
         
         return result
\ No newline at end of file
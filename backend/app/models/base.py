@@ -11,6 +11,7 @@ from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import Session
 
 from app.core.database import Base
+from app.core.serialization import get_serializer
 
 
 class TimestampMixin:
@@ -121,23 +122,7 @@ class BaseModel(Base, TimestampMixin, SoftDeleteMixin):
         Returns:
             Dicionário com os dados do modelo
         """
-        exclude = exclude or []
-        exclude.extend(['_sa_instance_state'])
-        
-        result = {}
-        for column in self.__table__.columns:
-            if column.name not in exclude:
-                value = getattr(self, column.name)
-                
-                # Serializar valores especiais
-                if isinstance(value, datetime):
-                    result[column.name] = value.isoformat()
-                elif isinstance(value, uuid.UUID):
-                    result[column.name] = str(value)
-                else:
-                    result[column.name] = value
-        
-        return result
+        return get_serializer(type(self)).serialize(self, exclude=exclude)
     
     def update_from_dict(self, data: Dict[str, Any], exclude: Optional[list] = None):
         """
@@ -512,18 +497,4 @@ def model_to_dict(instance, exclude: Optional[list] = None) -> Dict[str, Any]:
     if hasattr(instance, 'to_dict'):
         return instance.to_dict(exclude)
     
-    exclude = exclude or []
-    result = {}
-    
-    for column in instance.__table__.columns:
-        if column.name not in exclude:
-            value = getattr(instance, column.name)
-            
-            if isinstance(value, datetime):
-                result[column.name] = value.isoformat()
-            elif isinstance(value, uuid.UUID):
-                result[column.name] = str(value)
-            else:
-                result[column.name] = value
-    
-    return result
\ No newline at end of file
+    return get_serializer(type(instance)).serialize(instance, exclude=exclude)
\ No newline at end of file
@@ -8,8 +8,9 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy import Column, String, Text, DateTime, Boolean, ForeignKey, Index, Numeric
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship, Session
-from sqlalchemy.ext.hybrid_property import hybrid_property
+from sqlalchemy.ext.hybrid import hybrid_property
 
+from app.core.serialization import loaded_relationship
 from app.models.base import AuditableModel, StatusMixin, MetadataMixin
 from app.core.constants import ExamType, ExamStatus, Priority
 
@@ -741,7 +742,8 @@ class Exam(AuditableModel, StatusMixin, MetadataMixin):
         
         Args:
             exclude: Campos para excluir
-            include_relationships: Se deve incluir dados relacionados
+            include_relationships: Se deve incluir dados relacionados já carregados
+                (não dispara carregamento lazy)
             
         Returns:
             Dicionário com dados do exame
@@ -761,11 +763,14 @@ class Exam(AuditableModel, StatusMixin, MetadataMixin):
         
         # Incluir dados relacionados se solicitado
         if include_relationships:
-            if hasattr(self, 'patient') and self.patient:
-                result['patient_data'] = self.patient.to_dict(include_user_data=True)
-            if hasattr(self, 'physician') and self.physician:
-                result['physician_data'] = self.physician.to_dict(include_sensitive=False)
-            if hasattr(self, 'technician') and self.technician:
-                result['technician_data'] = self.technician.to_dict(include_sensitive=False)
+            patient = loaded_relationship(self, 'patient')
+            if patient:
+                result['patient_data'] = patient.to_dict(include_user_data=True)
+            physician = loaded_relationship(self, 'physician')
+            if physician:
+                result['physician_data'] = physician.to_dict(include_sensitive=False)
+            technician = loaded_relationship(self, 'technician')
+            if technician:
+                result['technician_data'] = technician.to_dict(include_sensitive=False)
         
         return result
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""
+Antibiograma local incremental
+
+Resultados de cultura alimentam um cubo organismo × antimicrobiano ×
+unidade × período (mês). Cada resultado também é somado às janelas móveis
+que o contêm e às margens "todas as unidades" / "todos os organismos", de
+modo que a taxa de resistência de qualquer combinação numa janela é uma
+única consulta a dicionário. Segue a recomendação CLSI M39 de contar só o
+primeiro isolado por paciente no período de análise (a janela inteira, não
+só o mês) e de sinalizar estimativas com menos de 30 isolados.
+
+Os resultados recebidos ficam numa tabela SQLite só de inclusão; o cubo é
+reconstruído a partir dela ao abrir. Os resultados gravados por outros
+processos são aplicados antes de cada inclusão e, para as consultas, pela
+sincronização periódica do armazém: consultar nunca toca o banco.
+"""
+
+import logging
+from bisect import bisect_left, insort
+from collections import Counter
+from collections.abc import Iterable
+from datetime import date
+from typing import Any
+
+from .armazem_sqlite import INTERVALO_SINCRONIZACAO_PADRAO, ArmazemSQLite, gatilhos_somente_inclusao
+from .periodos import periodo_de
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.Antibiograma')
+
+TODOS = '*'
+JANELA_PADRAO = 12  # meses
+MINIMO_ISOLADOS = 30
+
+# Índices dos contadores de cada célula
+TESTADOS, SENSIVEIS, INTERMEDIARIOS, RESISTENTES = range(4)
+_INDICE_RESULTADO = {'S': SENSIVEIS, 'I': INTERMEDIARIOS, 'R': RESISTENTES}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS resultados ("
+    " seq INTEGER PRIMARY KEY, paciente_id TEXT, organismo TEXT NOT NULL, antimicrobiano TEXT NOT NULL,"
+    " unidade TEXT NOT NULL, periodo INTEGER NOT NULL, resultado TEXT NOT NULL)",
+    *gatilhos_somente_inclusao(('resultados',), 'antibiograma')
+)
+
+
+def normalizar(nome: str) -> str:
+    return str(nome).strip().lower().replace(' ', '_')
+
+
+class AntibiogramaLocal(ArmazemSQLite):
+    """Cubo de suscetibilidade com janelas móveis materializadas, persistido em SQLite"""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, janela: int = JANELA_PADRAO, minimo_isolados: int = MINIMO_ISOLADOS,
+                 caminho: str = ":memory:", intervalo_sincronizacao: float = INTERVALO_SINCRONIZACAO_PADRAO):
+        super().__init__(caminho, intervalo_sincronizacao)
+        self.janela = janela
+        self.minimo_isolados = minimo_isolados
+        self._mensal: dict[tuple[str, str, str, int], list[int]] = {}
+        self._janelas: dict[tuple[str, str, str, int], list[int]] = {}
+        # (paciente, organismo, antimicrobiano) -> meses com isolado (ordenados) e o isolado de cada mês
+        self._meses_paciente: dict[tuple[str, str, str], list[int]] = {}
+        self._isolados: dict[tuple[str, str, str, int], tuple[str, int]] = {}
+        self.ultimo_periodo: int | None = None
+        self._aplicado = 0  # último seq já incorporado ao cubo
+        self._abrir()
+        if self._aplicado:
+            logger.info(f"Antibiograma carregado: {self._aplicado} resultados")
+
+    def registrar_resultados(self, resultados: Iterable[dict[str, Any]]) -> int:
+        """
+        Incorpora resultados de cultura ('organismo', 'antimicrobiano',
+        'unidade', 'data', 'resultado' S/I/R e, opcionalmente, 'paciente_id')
+
+        Devolve quantos resultados foram contados (repetições do mesmo
+        paciente/organismo/antimicrobiano no mês são ignoradas).
+        """
+        linhas = []
+        for resultado in resultados:
+            interpretacao = str(resultado.get('resultado', '')).upper()[:1]
+            if interpretacao not in _INDICE_RESULTADO:
+                continue
+            paciente = resultado.get('paciente_id')
+            linhas.append((
+                None if paciente is None else str(paciente),
+                normalizar(resultado['organismo']),
+                normalizar(resultado['antimicrobiano']),
+                normalizar(resultado.get('unidade') or TODOS),
+                periodo_de(resultado['data']),
+                interpretacao
+            ))
+        if not linhas:
+            return 0
+
+        with self._lock:
+            with self._transacao():
+                self._sincronizar()
+                self._conn.executemany(
+                    "INSERT INTO resultados (paciente_id, organismo, antimicrobiano, unidade, periodo, resultado)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", linhas
+                )
+                ultimo = self._conn.execute("SELECT MAX(seq) FROM resultados").fetchone()[0]
+            self._aplicado = ultimo
+            return self._incorporar(linhas)
+
+    def _sincronizar(self) -> None:
+        """Incorpora (com o lock) os resultados gravados desde a última sincronização"""
+        linhas = self._conn.execute(
+            "SELECT seq, paciente_id, organismo, antimicrobiano, unidade, periodo, resultado"
+            " FROM resultados WHERE seq > ? ORDER BY seq", (self._aplicado,)
+        ).fetchall()
+        if linhas:
+            self._aplicado = linhas[-1][0]
+            self._incorporar([linha[1:] for linha in linhas])
+
+    def _incorporar(self, linhas: list[tuple]) -> int:
+        """
+        Soma os resultados ao cubo (com o lock); devolve quantos foram contados
+
+        Com paciente identificado, um isolado entra nas janelas que não contêm
+        isolado anterior do mesmo paciente/organismo/antimicrobiano. Um
+        resultado atrasado de um mês anterior tira o isolado seguinte das
+        janelas que passam a conter os dois.
+        """
+        mensal: Counter = Counter()
+        janelas: Counter = Counter()
+        contados = 0
+        for paciente, organismo, antimicrobiano, unidade, periodo, interpretacao in linhas:
+            indice = _INDICE_RESULTADO[interpretacao]
+            fim = periodo + self.janela
+            if paciente is not None:
+                chave_paciente = (paciente, organismo, antimicrobiano)
+                if (*chave_paciente, periodo) in self._isolados:
+                    continue
+                meses = self._meses_paciente.setdefault(chave_paciente, [])
+                posicao = bisect_left(meses, periodo)
+                anterior = meses[posicao - 1] if posicao else None
+                inicio = periodo if anterior is None else max(periodo, anterior + self.janela)
+                if posicao < len(meses):
+                    seguinte = meses[posicao]
+                    unidade_seguinte, indice_seguinte = self._isolados[(*chave_paciente, seguinte)]
+                    inicio_antigo = seguinte if anterior is None else max(seguinte, anterior + self.janela)
+                    for mes in range(inicio_antigo, max(seguinte, periodo + self.janela)):
+                        janelas[(organismo, antimicrobiano, unidade_seguinte, mes, indice_seguinte)] -= 1
+                insort(meses, periodo)
+                self._isolados[(*chave_paciente, periodo)] = (unidade, indice)
+            else:
+                inicio = periodo
+            mensal[(organismo, antimicrobiano, unidade, periodo, indice)] += 1
+            for mes in range(inicio, fim):
+                janelas[(organismo, antimicrobiano, unidade, mes, indice)] += 1
+            contados += 1
+            if self.ultimo_periodo is None or periodo > self.ultimo_periodo:
+                self.ultimo_periodo = periodo
+
+        for cubo, deltas in ((self._mensal, mensal), (self._janelas, janelas)):
+            for (organismo, antimicrobiano, unidade, mes, indice), quantidade in deltas.items():
+                if not quantidade:
+                    continue
+                for chave in {(organismo, antimicrobiano, unidade), (organismo, antimicrobiano, TODOS),
+                              (TODOS, antimicrobiano, unidade), (TODOS, antimicrobiano, TODOS)}:
+                    self._somar(cubo, (*chave, mes), indice, quantidade)
+        return contados
+
+    @staticmethod
+    def _somar(cubo: dict, chave: tuple, indice: int, quantidade: int) -> None:
+        celula = cubo.get(chave)
+        if celula is None:
+            celula = cubo[chave] = [0, 0, 0, 0]
+        celula[TESTADOS] += quantidade
+        celula[indice] += quantidade
+        if not celula[TESTADOS]:
+            del cubo[chave]
+
+    def _periodo(self, periodo: int | date | str | None) -> int | None:
+        if periodo is None:
+            return self.ultimo_periodo
+        return periodo if isinstance(periodo, int) else periodo_de(periodo)
+
+    def suscetibilidade(self, antimicrobiano: str, organismo: str | None = None, unidade: str | None = None,
+                        periodo: int | date | str | None = None, janela: bool = True) -> dict[str, Any]:
+        """
+        Contagens e taxas de uma célula: janela móvel terminada em ``periodo``
+        (padrão: último mês com dados) ou só o próprio mês
+        """
+        fim = self._periodo(periodo)
+        chave = (normalizar(organismo) if organismo else TODOS, normalizar(antimicrobiano),
+                 normalizar(unidade) if unidade else TODOS, fim)
+        with self._lock:
+            celula = tuple((self._janelas if janela else self._mensal).get(chave, (0, 0, 0, 0)))
+        testados = celula[TESTADOS]
+        return {
+            'testados': testados,
+            'sensiveis': celula[SENSIVEIS],
+            'intermediarios': celula[INTERMEDIARIOS],
+            'resistentes': celula[RESISTENTES],
+            'taxa_sensibilidade': celula[SENSIVEIS] / testados if testados else None,
+            'taxa_resistencia': celula[RESISTENTES] / testados if testados else None,
+            'confiavel': testados >= self.minimo_isolados
+        }
+
+    def taxa_resistencia(self, antimicrobiano: str, organismo: str | None = None, unidade: str | None = None,
+                         periodo: int | date | str | None = None) -> tuple[float | None, str]:
+        """
+        Taxa de resistência na janela, do recorte mais específico com isolados
+        suficientes: organismo na unidade, organismo no hospital, antimicrobiano
+        na unidade, antimicrobiano no hospital. Devolve (taxa, recorte usado).
+        """
+        recortes = []
+        if organismo:
+            if unidade:
+                recortes.append((organismo, unidade, 'organismo_unidade'))
+            recortes.append((organismo, None, 'organismo_hospital'))
+        if unidade:
+            recortes.append((None, unidade, 'unidade'))
+        recortes.append((None, None, 'hospital'))
+
+        melhor = (None, 'sem_dados')
+        for organismo_recorte, unidade_recorte, nome in recortes:
+            dados = self.suscetibilidade(antimicrobiano, organismo_recorte, unidade_recorte, periodo)
+            if dados['confiavel']:
+                return dados['taxa_resistencia'], nome
+            if melhor[0] is None and dados['testados']:
+                melhor = (dados['taxa_resistencia'], nome)
+        return melhor
+
+    def tabela(self, unidade: str | None = None, periodo: int | date | str | None = None) -> list[dict[str, Any]]:
+        """Antibiograma (organismo × antimicrobiano) da janela, para relatório"""
+        fim = self._periodo(periodo)
+        alvo = normalizar(unidade) if unidade else TODOS
+        with self._lock:
+            celulas = [
+                (organismo, antimicrobiano, tuple(celula))
+                for (organismo, antimicrobiano, unidade_celula, periodo_celula), celula in self._janelas.items()
+                if periodo_celula == fim and unidade_celula == alvo and organismo != TODOS
+            ]
+        linhas = []
+        for organismo, antimicrobiano, celula in celulas:
+            linhas.append({
+                'organismo': organismo,
+                'antimicrobiano': antimicrobiano,
+                'testados': celula[TESTADOS],
+                'taxa_sensibilidade': celula[SENSIVEIS] / celula[TESTADOS],
+                'taxa_resistencia': celula[RESISTENTES] / celula[TESTADOS],
+                'confiavel': celula[TESTADOS] >= self.minimo_isolados
+            })
+        return sorted(linhas, key=lambda linha: (linha['organismo'], linha['antimicrobiano']))
+
+
+def _criar_antibiograma() -> AntibiogramaLocal:
+    from app.core.config import settings
+    return AntibiogramaLocal(caminho=settings.FARMACIA_ANTIBIOGRAMA_DB)
+
+
+_antibiograma = ServicoProcesso('antibiograma_local', _criar_antibiograma, iniciar_no_startup=True)
+
+
+def obter_antibiograma_local() -> AntibiogramaLocal:
+    """Antibiograma compartilhado do processo, carregado do arquivo configurado"""
+    return _antibiograma.obter()
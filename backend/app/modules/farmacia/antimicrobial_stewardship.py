@@ -2,29 +2,45 @@
 Gestão inteligente de antimicrobianos
 """
 
+import asyncio
 import logging
 from datetime import datetime
 
+from .antibiograma import AntibiogramaLocal, obter_antibiograma_local
+
 logger = logging.getLogger('MedAI.Farmacia.AntimicrobialStewardship')
 
 class AntimicrobialStewardshipIA:
     """Gestão inteligente de antimicrobianos"""
 
-    def __init__(self):
+    def __init__(self, antibiograma: AntibiogramaLocal | None = None):
+        self.antibiograma = antibiograma or obter_antibiograma_local()
         self.analisador_resistencia = AnalisadorResistenciaML()
         self.otimizador_terapia = OtimizadorTerapiaAntimicrobiana()
         self.monitor_consumo = MonitorConsumoAntimicrobianos()
 
+    async def registrar_culturas(self, resultados: list[dict]) -> dict:
+        """
+        Recebe resultados de cultura do laboratório e os incorpora ao antibiograma local
+
+        A gravação (SQLite) e a atualização do cubo rodam fora do event loop.
+        """
+
+        try:
+            contados = await asyncio.to_thread(self.antibiograma.registrar_resultados, resultados)
+            return {'recebidos': len(resultados), 'contados': contados}
+        except Exception as e:
+            logger.error(f"Erro ao registrar resultados de cultura: {e}")
+            return {'error': str(e), 'recebidos': len(resultados), 'contados': 0}
+
     async def avaliar_prescricao_antimicrobiana(self, prescricao: dict) -> dict:
         """Avaliação completa de prescrição antimicrobiana"""
 
         try:
+            # Regras sobre o dicionário e consultas ao cubo em memória: nada a sobrepor
             adequacao = await self.analisar_adequacao_terapia(prescricao)
-
             risco_resistencia = await self.prever_resistencia_bacteriana(prescricao)
-
             descalonamento = await self.sugerir_descalonamento(prescricao)
-
             duracao_otima = await self.calcular_duracao_otima(prescricao)
 
             return {
@@ -46,6 +62,33 @@ class AntimicrobialStewardshipIA:
                 'duracao_otima': {}
             }
 
+    async def revisar_prescricoes_ativas(self, prescricoes: list[dict]) -> dict:
+        """Revisão diária de todas as prescrições antimicrobianas ativas"""
+
+        avaliacoes = []
+        for prescricao in prescricoes:
+            avaliacao = await self.avaliar_prescricao_antimicrobiana(prescricao)
+            avaliacao['prescricao_id'] = prescricao.get('id')
+            avaliacoes.append(avaliacao)
+        validas = [a for a in avaliacoes if 'error' not in a]
+
+        return {
+            'avaliacoes': avaliacoes,
+            'resumo': {
+                'total_prescricoes': len(prescricoes),
+                'erros': len(avaliacoes) - len(validas),
+                'adequadas': sum(1 for a in validas if a['adequacao']['score_adequacao'] == 1.0),
+                'descalonamento_possivel': sum(1 for a in validas if a['descalonamento']['pode_descalonar']),
+                'risco_resistencia_alto': sum(
+                    1 for a in validas if a['risco_resistencia']['nivel_risco'] in ('alto', 'muito_alto')
+                ),
+                'score_stewardship_medio': (
+                    sum(a['score_stewardship'] for a in validas) / len(validas) if validas else 0.0
+                )
+            },
+            'timestamp': datetime.now().isoformat()
+        }
+
     async def analisar_adequacao_terapia(self, prescricao: dict) -> dict:
         """Analisa adequação da terapia antimicrobiana"""
 
@@ -181,8 +224,14 @@ class AntimicrobialStewardshipIA:
             fatores_risco.append('Antimicrobiano de amplo espectro')
             score_risco += 0.2
 
-        taxa_resistencia_local = self.obter_taxa_resistencia_local(antimicrobiano.get('nome'))
-        if taxa_resistencia_local > 0.2:  # 20%
+        taxa_resistencia_local = self.obter_taxa_resistencia_local(
+            antimicrobiano.get('nome'),
+            microorganismo=prescricao.get('microorganismo_isolado'),
+            unidade=prescricao.get('unidade') or paciente.get('unidade')
+        )
+        if taxa_resistencia_local is None:
+            fatores_risco.append('Sem dados locais de resistência (antibiograma)')
+        elif taxa_resistencia_local > 0.2:  # 20%
             fatores_risco.append(f'Alta taxa de resistência local ({taxa_resistencia_local*100:.1f}%)')
             score_risco += 0.3
 
@@ -196,18 +245,12 @@ class AntimicrobialStewardshipIA:
             'taxa_resistencia_local': taxa_resistencia_local
         }
 
-    def obter_taxa_resistencia_local(self, antimicrobiano: str) -> float:
-        """Obtém taxa de resistência local do antimicrobiano"""
+    def obter_taxa_resistencia_local(self, antimicrobiano: str, microorganismo: str | None = None,
+                                     unidade: str | None = None) -> float | None:
+        """Taxa de resistência local do antimicrobiano (janela móvel do antibiograma); None sem isolados"""
 
-        taxas_resistencia = {
-            'amoxicilina': 0.15,
-            'ceftriaxona': 0.08,
-            'vancomicina': 0.02,
-            'meropenem': 0.12,
-            'ciprofloxacina': 0.25
-        }
-
-        return taxas_resistencia.get(antimicrobiano.lower(), 0.1)
+        taxa, _ = self.antibiograma.taxa_resistencia(antimicrobiano, microorganismo, unidade)
+        return taxa
 
     def classificar_nivel_risco(self, score: float) -> str:
         """Classifica nível de risco de resistência"""
@@ -358,6 +401,41 @@ class AntimicrobialStewardshipIA:
 
         return score_adequacao
 
+    def resumir_resistencia_local(self) -> dict:
+        """Resistência média, organismos críticos e tendência a partir do antibiograma local"""
+
+        atual = self.antibiograma.tabela()
+
+        if not atual:
+            return {
+                'taxa_resistencia_media': None,
+                'microorganismos_criticos': [],
+                'tendencia_resistencia': 'sem_dados'
+            }
+
+        def media(linhas: list[dict]) -> float:
+            testados = sum(linha['testados'] for linha in linhas)
+            return sum(linha['taxa_resistencia'] * linha['testados'] for linha in linhas) / testados
+
+        resistencia_por_organismo = {}
+        for linha in atual:
+            if linha['confiavel']:
+                organismo = linha['organismo']
+                resistencia_por_organismo[organismo] = max(resistencia_por_organismo.get(organismo, 0.0), linha['taxa_resistencia'])
+
+        taxa_atual = media(atual)
+        anterior = self.antibiograma.tabela(periodo=self.antibiograma.ultimo_periodo - self.antibiograma.janela)
+        tendencia = 'sem_historico'
+        if anterior:
+            variacao = taxa_atual - media(anterior)
+            tendencia = 'crescente' if variacao > 0.02 else 'decrescente' if variacao < -0.02 else 'estavel'
+
+        return {
+            'taxa_resistencia_media': round(taxa_atual, 4),
+            'microorganismos_criticos': sorted(resistencia_por_organismo, key=resistencia_por_organismo.get, reverse=True)[:3],
+            'tendencia_resistencia': tendencia
+        }
+
     async def gerar_relatorio_stewardship(self, periodo: str = '30_dias') -> dict:
         """Gera relatório de antimicrobial stewardship"""
 
@@ -383,15 +461,7 @@ class AntimicrobialStewardshipIA:
                     'Dose inadequada'
                 ]
             },
-            'resistencia_bacteriana': {
-                'taxa_resistencia_media': 0.18,  # 18%
-                'microorganismos_criticos': [
-                    'Acinetobacter baumannii',
-                    'Pseudomonas aeruginosa',
-                    'Klebsiella pneumoniae'
-                ],
-                'tendencia_resistencia': 'estavel'
-            },
+            'resistencia_bacteriana': self.resumir_resistencia_local(),
             'intervencoes_realizadas': {
                 'total_intervencoes': 89,
                 'descalonamentos': 34,
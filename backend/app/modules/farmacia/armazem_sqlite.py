@@ -0,0 +1,125 @@
+"""
+Base dos serviços da farmácia persistidos em SQLite
+
+Cada serviço mantém em memória uma estrutura derivada das suas tabelas
+(saldos, cubos, rollups) e grava no banco dentro de ``_transacao``: BEGIN
+IMMEDIATE serializa os escritores entre processos, e quem escreve aplica
+antes o que os outros gravaram (``_sincronizar``) para validar contra o
+estado atual.
+
+Com o banco em arquivo, uma thread verifica a cada
+``intervalo_sincronizacao`` segundos se outra conexão alterou o banco
+(``PRAGMA data_version``) e só então sincroniza; as consultas leem apenas
+a memória e nunca fazem I/O.
+"""
+
+import logging
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger('MedAI.Farmacia.ArmazemSQLite')
+
+INTERVALO_SINCRONIZACAO_PADRAO = 1.0  # segundos
+
+
+def gatilhos_somente_inclusao(tabelas: Iterable[str], rotulo: str) -> tuple[str, ...]:
+    """Triggers que rejeitam UPDATE e DELETE: correções entram como novas linhas"""
+    return tuple(
+        f"CREATE TRIGGER IF NOT EXISTS {tabela}_append_only_{operacao} BEFORE {operacao.upper()} ON {tabela}"
+        f" BEGIN SELECT RAISE(ABORT, '{rotulo} append-only'); END"
+        for tabela in tabelas for operacao in ('update', 'delete')
+    )
+
+
+class ArmazemSQLite:
+    """
+    Estado em memória derivado de um banco SQLite compartilhável entre processos
+
+    Subclasses definem ``SCHEMA`` e ``_sincronizar`` e chamam ``_abrir()`` ao
+    fim do ``__init__``, depois de criar as estruturas em memória.
+    """
+
+    SCHEMA: tuple[str, ...] = ()
+
+    def __init__(self, caminho: str = ":memory:",
+                 intervalo_sincronizacao: float = INTERVALO_SINCRONIZACAO_PADRAO):
+        self.caminho = caminho
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self._lock = threading.Lock()
+
+        # Outros processos só escrevem no mesmo banco quando ele é um arquivo
+        self._compartilhado = caminho != ":memory:"
+        if self._compartilhado:
+            Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for comando in self.SCHEMA:
+            self._conn.execute(comando)
+        self._versao_banco: int | None = None
+        self._parar = threading.Event()
+        self._vigia: threading.Thread | None = None
+
+    def _abrir(self) -> None:
+        """Carrega o estado gravado e inicia a sincronização periódica"""
+        with self._lock:
+            self._versao_banco = self._versao()
+            self._sincronizar()
+        if self._compartilhado and self.intervalo_sincronizacao > 0:
+            self._vigia = threading.Thread(
+                target=self._vigiar, name=f"{type(self).__name__}-sincronizacao", daemon=True
+            )
+            self._vigia.start()
+
+    def _versao(self) -> int:
+        """Muda quando outra conexão grava no banco (as gravações desta não contam)"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def _transacao(self) -> Iterator[None]:
+        """Transação de escrita (com o lock); BEGIN IMMEDIATE serializa escritores entre processos"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _sincronizar(self) -> Any:
+        """Aplica em memória (com o lock) as linhas gravadas desde a última sincronização"""
+        raise NotImplementedError
+
+    def sincronizar(self) -> Any:
+        """
+        Aplica agora o que outros processos gravaram
+
+        Devolve o resultado de ``_sincronizar``, ou None se o banco não mudou.
+        """
+        if not self._compartilhado:
+            return None
+        with self._lock:
+            if self._parar.is_set():
+                return None
+            versao = self._versao()
+            if versao == self._versao_banco:
+                return None
+            self._versao_banco = versao
+            return self._sincronizar()
+
+    def _vigiar(self) -> None:
+        while not self._parar.wait(self.intervalo_sincronizacao):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                logger.error(f"Erro ao sincronizar {type(self).__name__}: {e}")
+
+    def fechar(self) -> None:
+        self._parar.set()
+        if self._vigia is not None and self._vigia is not threading.current_thread():
+            self._vigia.join()
+        with self._lock:
+            self._conn.close()
@@ -1,38 +1,118 @@
 """
 Dashboard executivo da farmácia hospitalar
+
+Os indicadores vêm da camada materializada de KPIs (somas diárias
+alimentadas por eventos); cada seção soma poucas linhas em memória e o
+dashboard pronto fica em cache por período até que cheguem eventos de
+algum dia que ele cobre (os menos usados saem quando o cache
+enche). Período sem nenhum evento é reportado como ``sem_dados``, sem
+pontuar indicadores zerados.
 """
 
+import copy
 import logging
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from .kpis_farmacia import KPIsFarmacia, dias_do_periodo, obter_kpis_farmacia
 
 logger = logging.getLogger('MedAI.Farmacia.DashboardExecutivo')
 
+SEMANAS_TENDENCIA = 12
+CACHE_MAXIMO = 64  # dashboards (período, dia de referência) mantidos em cache
+
+# Indicadores ainda não alimentados por eventos (inventário físico, pesquisas de satisfação)
+INDICADORES_REFERENCIA = {
+    'giro_estoque': 8.5,
+    'acuracia_inventario': 98.7,  # %
+    'satisfacao_cliente': {
+        'score_satisfacao': 4.6,  # escala 1-5
+        'tempo_resposta_solicitacoes': 8.3,  # minutos
+        'reclamacoes': 12,
+        'elogios': 45,
+        'meta_satisfacao': 4.5
+    },
+    'reducao_desperdicio': 0.18,  # 18%
+    'medicamentos_vencidos': 0.8  # %
+}
+
+
+def _razao(numerador: float, denominador: float) -> float:
+    return numerador / denominador if denominador else 0.0
+
+
+def calcular_indicadores(totais: dict[str, float]) -> dict[str, float]:
+    """Indicadores do dashboard a partir das somas de um período"""
+
+    custo_operacional = totais['custo_pessoal'] + totais['custo_infraestrutura'] + totais['custo_tecnologia']
+    return {
+        'erros_medicacao_evitados': totais['erros_evitados'],
+        'intervencoes_farmaceuticas': totais['intervencoes'],
+        'taxa_intervencao': _razao(totais['intervencoes'], totais['prescricoes_analisadas']) * 100,
+        # Prescrição segura: adequada na análise ou corrigida por intervenção aceita
+        'score_seguranca': min(1.0, _razao(totais['prescricoes_adequadas'] + totais['intervencoes_aceitas'],
+                                           totais['prescricoes_analisadas'])),
+        'tempo_medio_dispensacao': _razao(totais['tempo_dispensacao_total'], totais['dispensacoes_cronometradas']),
+        'taxa_falta_medicamentos': _razao(totais['faltas'], totais['solicitacoes']) * 100,
+        'economia_gerada': totais['economia_negociacao'] + totais['economia_genericos'] + totais['custo_evitado'],
+        'taxa_adequacao': _razao(totais['prescricoes_adequadas'], totais['prescricoes_analisadas']) * 100,
+        'taxa_aceitacao_intervencoes': _razao(totais['intervencoes_aceitas'], totais['intervencoes']),
+        'tempo_medio_analise': _razao(totais['tempo_analise_total'], totais['prescricoes_analisadas']),
+        'entregas_no_prazo': _razao(totais['entregas_no_prazo'], totais['entregas_avaliadas']),
+        'custo_operacional': custo_operacional
+    }
+
+
 class DashboardFarmaciaExecutivo:
     """Dashboard executivo da farmácia hospitalar"""
 
-    def __init__(self):
+    def __init__(self, kpis: KPIsFarmacia | None = None, equipe_farmaceuticos: int = 10,
+                 cache_maximo: int = CACHE_MAXIMO):
         self.analisador_kpis = AnalisadorKPIsFarmacia()
         self.gerador_insights = GeradorInsightsExecutivos()
         self.predictor_tendencias = PredictorTendenciasFarmacia()
+        self.kpis = kpis or obter_kpis_farmacia()
+        self.equipe_farmaceuticos = equipe_farmaceuticos
+        # (periodo, último dia) -> (primeiro dia lido, último dia, dashboard), do menos ao mais usado
+        self._cache: OrderedDict[tuple[str, int], tuple[int, int, dict]] = OrderedDict()
+        self.cache_maximo = cache_maximo
+        self._cache_lock = threading.Lock()
+        self.kpis.inscrever(self.invalidar_cache)
 
-    async def gerar_dashboard_executivo(self, periodo: str = '30_dias') -> dict:
-        """Gera dashboard executivo completo"""
+    async def gerar_dashboard_executivo(self, periodo: str = '30_dias', referencia: date | None = None) -> dict:
+        """Gera dashboard executivo completo (``referencia``: último dia do período, padrão hoje)"""
 
         try:
-            kpis_principais = await self.calcular_kpis_principais(periodo)
-
-            analise_financeira = await self.analisar_performance_financeira(periodo)
-
-            indicadores_qualidade = await self.calcular_indicadores_qualidade(periodo)
-
-            analise_operacional = await self.analisar_eficiencia_operacional(periodo)
-
+            referencia = referencia or date.today()
+            chave = (periodo, referencia.toordinal())
+            with self._cache_lock:
+                em_cache = self._cache.get(chave)
+                if em_cache is not None:
+                    self._cache.move_to_end(chave)
+            if em_cache is not None:
+                return copy.deepcopy(em_cache[2])
+
+            versao = self.kpis.versao
+            inicio, fim, inicio_anterior, _ = self._janela(periodo, referencia)
+            if not self.kpis.tem_eventos(inicio, fim):
+                dashboard = self.dashboard_sem_dados(periodo)
+                self._guardar(chave, versao, inicio.toordinal(), dashboard)
+                return copy.deepcopy(dashboard)
+
+            # Cada seção soma poucas linhas do rollup em memória: em sequência, sem I/O
+            kpis_principais = await self.calcular_kpis_principais(periodo, referencia)
+            analise_financeira = await self.analisar_performance_financeira(periodo, referencia)
+            indicadores_qualidade = await self.calcular_indicadores_qualidade(periodo, referencia)
+            analise_operacional = await self.analisar_eficiencia_operacional(periodo, referencia)
+            previsoes = await self.gerar_previsoes_tendencias(periodo, referencia)
             insights = await self.gerar_insights_executivos(kpis_principais, analise_financeira)
 
-            previsoes = await self.gerar_previsoes_tendencias(periodo)
-
-            return {
+            dashboard = {
                 'periodo': periodo,
+                'status': 'ok',
                 'data_atualizacao': datetime.now().isoformat(),
                 'kpis_principais': kpis_principais,
                 'analise_financeira': analise_financeira,
@@ -43,6 +123,10 @@ class DashboardFarmaciaExecutivo:
                 'score_performance_geral': self.calcular_score_performance_geral(kpis_principais)
             }
 
+            primeiro_lido = min(inicio_anterior, referencia - timedelta(weeks=SEMANAS_TENDENCIA))
+            self._guardar(chave, versao, primeiro_lido.toordinal(), dashboard)
+            return copy.deepcopy(dashboard)
+
         except Exception as e:
             logger.error(f"Erro na geração do dashboard executivo: {e}")
             return {
@@ -51,84 +135,140 @@ class DashboardFarmaciaExecutivo:
                 'data_atualizacao': datetime.now().isoformat()
             }
 
-    async def calcular_kpis_principais(self, periodo: str) -> dict:
+    def dashboard_sem_dados(self, periodo: str) -> dict:
+        """Dashboard de um período sem eventos: nada a pontuar"""
+
+        return {
+            'periodo': periodo,
+            'status': 'sem_dados',
+            'data_atualizacao': datetime.now().isoformat(),
+            'kpis_principais': {},
+            'score_performance_geral': {'score_geral': None, 'classificacao': 'sem_dados'}
+        }
+
+    def _guardar(self, chave: tuple[str, int], versao: int, primeiro_lido: int, dashboard: dict) -> None:
+        """Guarda no cache se nenhum evento chegou durante o cálculo, descartando o menos usado"""
+
+        with self._cache_lock:
+            if self.kpis.versao != versao:
+                return
+            self._cache[chave] = (primeiro_lido, chave[1], dashboard)
+            self._cache.move_to_end(chave)
+            while len(self._cache) > self.cache_maximo:
+                self._cache.popitem(last=False)
+
+    def invalidar_cache(self, primeiro_dia: int, ultimo_dia: int) -> None:
+        """Descarta dashboards em cache que leram algum dia entre ``primeiro_dia`` e ``ultimo_dia`` (ordinais)"""
+
+        with self._cache_lock:
+            for chave, (inicio, fim, _) in list(self._cache.items()):
+                if inicio <= ultimo_dia and primeiro_dia <= fim:
+                    del self._cache[chave]
+
+    def _janela(self, periodo: str, referencia: date | None) -> tuple[date, date, date, date]:
+        """Início e fim do período e do período anterior de mesma duração"""
+
+        dias = dias_do_periodo(periodo)
+        fim = referencia or date.today()
+        inicio = fim - timedelta(days=dias - 1)
+        fim_anterior = inicio - timedelta(days=1)
+        return inicio, fim, fim_anterior - timedelta(days=dias - 1), fim_anterior
+
+    def _totais(self, periodo: str, referencia: date | None) -> tuple[dict[str, float], dict[str, float]]:
+        inicio, fim, inicio_anterior, fim_anterior = self._janela(periodo, referencia)
+        return self.kpis.totais(inicio, fim), self.kpis.totais(inicio_anterior, fim_anterior)
+
+    async def calcular_kpis_principais(self, periodo: str, referencia: date | None = None) -> dict:
         """Calcula KPIs principais da farmácia"""
 
+        totais, totais_anteriores = self._totais(periodo, referencia)
+        atual, anterior = calcular_indicadores(totais), calcular_indicadores(totais_anteriores)
+
         kpis = {
             'seguranca_medicamentosa': {
-                'erros_medicacao_evitados': 45,
-                'intervencoes_farmaceuticas': 123,
-                'taxa_intervencao': 8.2,  # %
-                'score_seguranca': 0.94,
+                'erros_medicacao_evitados': atual['erros_medicacao_evitados'],
+                'intervencoes_farmaceuticas': atual['intervencoes_farmaceuticas'],
+                'taxa_intervencao': atual['taxa_intervencao'],  # %
+                'score_seguranca': atual['score_seguranca'],
                 'meta': 0.95,
-                'tendencia': 'crescente'
+                'tendencia': (self.classificar_tendencia(atual['score_seguranca'], anterior['score_seguranca'])
+                              if totais_anteriores['prescricoes_analisadas'] else 'sem_historico')
             },
             'eficiencia_operacional': {
-                'tempo_medio_dispensacao': 12.5,  # minutos
-                'taxa_falta_medicamentos': 2.1,  # %
-                'giro_estoque': 8.5,
-                'acuracia_inventario': 98.7,  # %
+                'tempo_medio_dispensacao': atual['tempo_medio_dispensacao'],  # minutos
+                'taxa_falta_medicamentos': atual['taxa_falta_medicamentos'],  # %
+                'giro_estoque': INDICADORES_REFERENCIA['giro_estoque'],
+                'acuracia_inventario': INDICADORES_REFERENCIA['acuracia_inventario'],  # %
                 'meta_tempo_dispensacao': 15.0,
                 'meta_falta_medicamentos': 3.0
             },
-            'satisfacao_cliente': {
-                'score_satisfacao': 4.6,  # escala 1-5
-                'tempo_resposta_solicitacoes': 8.3,  # minutos
-                'reclamacoes': 12,
-                'elogios': 45,
-                'meta_satisfacao': 4.5
-            },
+            'satisfacao_cliente': dict(INDICADORES_REFERENCIA['satisfacao_cliente']),
             'sustentabilidade': {
-                'economia_gerada': 125000.00,  # R$
-                'reducao_desperdicio': 0.18,  # 18%
-                'medicamentos_vencidos': 0.8,  # %
+                'economia_gerada': atual['economia_gerada'],  # R$
+                'reducao_desperdicio': INDICADORES_REFERENCIA['reducao_desperdicio'],
+                'medicamentos_vencidos': INDICADORES_REFERENCIA['medicamentos_vencidos'],  # %
                 'meta_economia': 100000.00
             }
         }
 
-        for _, metricas in kpis.items():
-            for metrica, valor in metricas.items():
-                if isinstance(valor, int | float) and metrica != 'meta':
-                    variacao = self.simular_variacao_periodo_anterior()
-                    metricas[f'{metrica}_variacao'] = variacao
+        # Variação só para o que é medido por eventos (há período anterior comparável)
+        for metricas in kpis.values():
+            for metrica in list(metricas):
+                if metrica in atual:
+                    metricas[f'{metrica}_variacao'] = self.calcular_variacao(atual[metrica], anterior[metrica])
 
         return kpis
 
-    def simular_variacao_periodo_anterior(self) -> dict:
-        """Simula variação em relação ao período anterior"""
-
-        import random
+    def calcular_variacao(self, atual: float, anterior: float) -> dict:
+        """Variação em relação ao período anterior"""
 
-        variacao_percentual = random.uniform(-15, 25)  # -15% a +25%
+        if not anterior:
+            return {'percentual': None, 'tendencia': 'sem_historico', 'significativa': False}
 
+        variacao_percentual = (atual - anterior) / abs(anterior) * 100
         return {
             'percentual': variacao_percentual,
             'tendencia': 'positiva' if variacao_percentual > 0 else 'negativa',
             'significativa': abs(variacao_percentual) > 10
         }
 
-    async def analisar_performance_financeira(self, periodo: str) -> dict:
+    def classificar_tendencia(self, atual: float, anterior: float, tolerancia: float = 0.01) -> str:
+        """Tendência de um indicador entre dois períodos"""
+
+        if atual > anterior + tolerancia:
+            return 'crescente'
+        if atual < anterior - tolerancia:
+            return 'decrescente'
+        return 'estavel'
+
+    async def analisar_performance_financeira(self, periodo: str, referencia: date | None = None) -> dict:
         """Analisa performance financeira da farmácia"""
 
+        totais, _ = self._totais(periodo, referencia)
+        inicio, fim, _, _ = self._janela(periodo, referencia)
+        indicadores = calcular_indicadores(totais)
+        receita, custo_medicamentos = totais['receita'], totais['custo_medicamentos']
+        custos = {
+            'medicamentos': custo_medicamentos,
+            'pessoal': totais['custo_pessoal'],
+            'infraestrutura': totais['custo_infraestrutura'],
+            'tecnologia': totais['custo_tecnologia']
+        }
+        custo_total = sum(custos.values())
+
         analise = {
-            'receita_total': 2850000.00,  # R$
-            'custo_medicamentos': 1995000.00,  # R$
-            'margem_bruta': 855000.00,  # R$
-            'margem_bruta_percentual': 30.0,  # %
-            'economia_negociacao': 185000.00,  # R$
-            'economia_genericos': 95000.00,  # R$
-            'custo_operacional': 320000.00,  # R$
-            'roi_farmacia_clinica': 3.2,  # retorno sobre investimento
-            'breakdown_custos': {
-                'medicamentos': 70.0,  # %
-                'pessoal': 18.0,  # %
-                'infraestrutura': 8.0,  # %
-                'tecnologia': 4.0  # %
-            },
+            'receita_total': receita,  # R$
+            'custo_medicamentos': custo_medicamentos,  # R$
+            'margem_bruta': receita - custo_medicamentos,  # R$
+            'margem_bruta_percentual': _razao(receita - custo_medicamentos, receita) * 100,  # %
+            'economia_negociacao': totais['economia_negociacao'],  # R$
+            'economia_genericos': totais['economia_genericos'],  # R$
+            'custo_operacional': indicadores['custo_operacional'],  # R$
+            'roi_farmacia_clinica': _razao(totais['custo_evitado'], totais['custo_pessoal']),
+            'breakdown_custos': {categoria: _razao(valor, custo_total) * 100 for categoria, valor in custos.items()},
             'top_medicamentos_custo': [
-                {'nome': 'Imunoglobulina', 'custo': 285000.00, 'percentual': 14.3},
-                {'nome': 'Quimioterápicos', 'custo': 195000.00, 'percentual': 9.8},
-                {'nome': 'Antibióticos especiais', 'custo': 145000.00, 'percentual': 7.3}
+                {'nome': nome, 'custo': custo, 'percentual': _razao(custo, custo_medicamentos) * 100}
+                for nome, custo in self.kpis.custos_por_medicamento(inicio, fim, limite=3)
             ],
             'oportunidades_economia': [
                 {'area': 'Padronização medicamentos', 'economia_potencial': 85000.00},
@@ -138,27 +278,30 @@ class DashboardFarmaciaExecutivo:
         }
 
         analise['margem_liquida'] = analise['margem_bruta'] - analise['custo_operacional']
-        analise['margem_liquida_percentual'] = (analise['margem_liquida'] / analise['receita_total']) * 100
+        analise['margem_liquida_percentual'] = _razao(analise['margem_liquida'], receita) * 100
 
         return analise
 
-    async def calcular_indicadores_qualidade(self, periodo: str) -> dict:
+    async def calcular_indicadores_qualidade(self, periodo: str, referencia: date | None = None) -> dict:
         """Calcula indicadores de qualidade"""
 
-        indicadores = {
+        totais, _ = self._totais(periodo, referencia)
+        indicadores = calcular_indicadores(totais)
+
+        return {
             'seguranca_paciente': {
-                'eventos_adversos_evitados': 28,
+                'eventos_adversos_evitados': totais['erros_evitados'],
                 'near_miss_detectados': 15,
                 'taxa_notificacao_eventos': 0.95,  # 95%
                 'score_cultura_seguranca': 4.3,  # escala 1-5
                 'meta_eventos_adversos': 0
             },
             'qualidade_prescricoes': {
-                'prescricoes_analisadas': 1850,
-                'prescricoes_adequadas': 1665,
-                'taxa_adequacao': 90.0,  # %
-                'intervencoes_aceitas': 0.87,  # 87%
-                'tempo_medio_analise': 6.5  # minutos
+                'prescricoes_analisadas': totais['prescricoes_analisadas'],
+                'prescricoes_adequadas': totais['prescricoes_adequadas'],
+                'taxa_adequacao': indicadores['taxa_adequacao'],  # %
+                'intervencoes_aceitas': indicadores['taxa_aceitacao_intervencoes'],
+                'tempo_medio_analise': indicadores['tempo_medio_analise']  # minutos
             },
             'farmacia_clinica': {
                 'acompanhamentos_realizados': 156,
@@ -182,15 +325,16 @@ class DashboardFarmaciaExecutivo:
             }
         }
 
-        return indicadores
-
-    async def analisar_eficiencia_operacional(self, periodo: str) -> dict:
+    async def analisar_eficiencia_operacional(self, periodo: str, referencia: date | None = None) -> dict:
         """Analisa eficiência operacional"""
 
-        analise = {
+        totais, _ = self._totais(periodo, referencia)
+        indicadores = calcular_indicadores(totais)
+
+        return {
             'produtividade_equipe': {
-                'dispensacoes_por_farmaceutico': 125,
-                'intervencoes_por_farmaceutico': 18,
+                'dispensacoes_por_farmaceutico': _razao(totais['dispensacoes'], self.equipe_farmaceuticos),
+                'intervencoes_por_farmaceutico': _razao(totais['intervencoes'], self.equipe_farmaceuticos),
                 'horas_farmacia_clinica': 240,
                 'eficiencia_equipe': 0.89,  # 89%
                 'satisfacao_equipe': 4.2  # escala 1-5
@@ -199,7 +343,7 @@ class DashboardFarmaciaExecutivo:
                 'giro_estoque_anual': 10.2,
                 'dias_estoque': 36,
                 'taxa_obsolescencia': 1.8,  # %
-                'acuracia_inventario': 98.7,  # %
+                'acuracia_inventario': INDICADORES_REFERENCIA['acuracia_inventario'],  # %
                 'custo_manutencao_estoque': 2.5  # % do valor estoque
             },
             'tecnologia_automacao': {
@@ -209,7 +353,7 @@ class DashboardFarmaciaExecutivo:
                 'roi_tecnologia': 2.8
             },
             'distribuicao_interna': {
-                'entregas_no_prazo': 0.96,  # 96%
+                'entregas_no_prazo': indicadores['entregas_no_prazo'],
                 'tempo_medio_entrega': 18,  # minutos
                 'distancia_media_percorrida': 2.8,  # km/dia
                 'eficiencia_rotas': 0.92  # 92%
@@ -222,8 +366,6 @@ class DashboardFarmaciaExecutivo:
             }
         }
 
-        return analise
-
     async def gerar_insights_executivos(self, kpis: dict, financeiro: dict) -> dict:
         """Gera insights executivos baseados nos dados"""
 
@@ -285,18 +427,25 @@ class DashboardFarmaciaExecutivo:
 
         return insights
 
-    async def gerar_previsoes_tendencias(self, periodo: str) -> dict:
+    async def gerar_previsoes_tendencias(self, periodo: str, referencia: date | None = None) -> dict:
         """Gera previsões e análise de tendências"""
 
+        crescimento = self.estimar_crescimento_mensal(referencia)
+        fim = referencia or date.today()
+        mais_custosos = [nome for nome, _ in self.kpis.custos_por_medicamento(
+            fim - timedelta(weeks=SEMANAS_TENDENCIA) + timedelta(days=1), fim, limite=3)]
+
         previsoes = {
             'demanda_medicamentos': {
                 'proximo_mes': {
-                    'crescimento_esperado': 0.08,  # 8%
-                    'medicamentos_criticos': ['Insulina', 'Antibióticos', 'Analgésicos'],
+                    'crescimento_esperado': crescimento,
+                    'medicamentos_criticos': mais_custosos or ['Insulina', 'Antibióticos', 'Analgésicos'],
                     'sazonalidade': 'inverno_aumenta_respiratorios'
                 },
                 'proximo_trimestre': {
-                    'tendencia_geral': 'crescimento_moderado',
+                    'tendencia_geral': ('crescimento_acelerado' if crescimento > 0.05
+                                        else 'crescimento_moderado' if crescimento > 0.01
+                                        else 'estavel' if crescimento > -0.01 else 'queda'),
                     'fatores_influencia': ['Envelhecimento populacional', 'Novos protocolos'],
                     'investimento_recomendado': 285000.00
                 }
@@ -341,6 +490,18 @@ class DashboardFarmaciaExecutivo:
 
         return previsoes
 
+    def estimar_crescimento_mensal(self, referencia: date | None = None) -> float:
+        """Crescimento mensal dos itens dispensados pela reta das últimas semanas"""
+
+        fim = referencia or date.today()
+        inicio = fim - timedelta(weeks=SEMANAS_TENDENCIA) + timedelta(days=1)
+        semanais = self.kpis.serie('itens_dispensados', inicio, fim).reshape(SEMANAS_TENDENCIA, 7).sum(axis=1)
+        media = semanais.mean()
+        if not media:
+            return 0.0
+        inclinacao = np.polyfit(np.arange(SEMANAS_TENDENCIA), semanais, 1)[0]
+        return float(inclinacao * 30 / 7 / media)
+
     def calcular_score_performance_geral(self, kpis: dict) -> dict:
         """Calcula score geral de performance"""
 
@@ -2,18 +2,39 @@
 Serviços de farmácia clínica com IA
 """
 
+import asyncio
 import logging
-from datetime import datetime
+from datetime import date, datetime
+
+from .kpis_farmacia import KPIsFarmacia, obter_kpis_farmacia
+from .triagem_clinica import TriagemCensoClinico, normalizar_dose, normalizar_medicamento, obter_triagem_clinica
 
 logger = logging.getLogger('MedAI.Farmacia.FarmaciaClinica')
 
 class FarmaciaClinicaAvancada:
     """Serviços de farmácia clínica com IA"""
 
-    def __init__(self):
+    def __init__(self, triagem: TriagemCensoClinico | None = None, kpis: KPIsFarmacia | None = None):
         self.analisador_terapeutico = AnalisadorTerapeuticoIA()
         self.monitor_adesao = MonitorAdesaoTerapeutica()
         self.educador_farmaceutico = EducadorFarmaceuticoIA()
+        self.triagem = triagem or obter_triagem_clinica()
+        self.kpis = kpis or obter_kpis_farmacia()
+
+    async def triar_censo(self, pacientes: list[dict]) -> dict:
+        """
+        Triagem de todos os pacientes ativos (lista da manhã do farmacêutico)
+
+        Cada paciente traz 'medicamentos_domicilio', 'medicamentos_hospital',
+        'exames_laboratoriais', 'alergias', 'adesao_estimada' e 'leito'. A
+        triagem roda fora do event loop.
+        """
+
+        try:
+            return await asyncio.to_thread(self.triagem.triar, pacientes)
+        except Exception as e:
+            logger.error(f"Erro na triagem clínica do censo: {e}")
+            return {'error': str(e), 'fila_intervencoes': [], 'resumo': {}}
 
     async def realizar_acompanhamento_farmacoterapeutico(self, paciente_id: str) -> dict:
         """Acompanhamento farmacoterapêutico completo com IA"""
@@ -25,6 +46,8 @@ class FarmaciaClinicaAvancada:
 
             intervencoes = await self.sugerir_intervencoes(prms)
 
+            await self.registrar_kpis_intervencoes(intervencoes)
+
             monitoramento = await self.configurar_monitoramento(intervencoes)
 
             return {
@@ -141,6 +164,21 @@ class FarmaciaClinicaAvancada:
         }
         return scores.get(gravidade, 0)
 
+    async def registrar_kpis_intervencoes(self, intervencoes: list[dict], aceitas: bool = False) -> None:
+        """Registra as intervenções farmacêuticas na camada de KPIs"""
+
+        if not intervencoes:
+            return
+        hoje = date.today().isoformat()
+        eventos = [
+            {'tipo': 'intervencao', 'data': hoje, 'motivo': intervencao['tipo'], 'aceita': aceitas}
+            for intervencao in intervencoes
+        ]
+        try:
+            await asyncio.to_thread(self.kpis.registrar_eventos, eventos)
+        except Exception as e:
+            logger.error(f"Erro ao registrar KPIs das intervenções: {e}")
+
     async def sugerir_intervencoes(self, prms: list[dict]) -> list[dict]:
         """Sugere intervenções farmacêuticas baseadas nos PRMs"""
 
@@ -343,40 +381,41 @@ class FarmaciaClinicaAvancada:
         ]
 
     def identificar_discrepancias(self, medicamentos_domicilio: list[dict], medicamentos_hospital: list[dict]) -> list[dict]:
-        """Identifica discrepancias entre medicamentos"""
+        """Identifica discrepancias entre medicamentos (pareados pelo nome normalizado)"""
 
-        discrepancias = []
+        domicilio_dict = {normalizar_medicamento(med['nome']): med for med in medicamentos_domicilio}
+        hospital_dict = {normalizar_medicamento(med['nome']): med for med in medicamentos_hospital}
 
-        domicilio_dict = {med['nome']: med for med in medicamentos_domicilio}
-        hospital_dict = {med['nome']: med for med in medicamentos_hospital}
+        discrepancias = []
 
-        for nome, _ in domicilio_dict.items():
-            if nome not in hospital_dict:
+        for chave, med_dom in domicilio_dict.items():
+            if chave not in hospital_dict:
                 discrepancias.append({
                     'tipo': 'descontinuacao',
-                    'medicamento': nome,
-                    'detalhes': f"Medicamento {nome} usado em casa não foi prescrito no hospital",
+                    'medicamento': med_dom['nome'],
+                    'detalhes': f"Medicamento {med_dom['nome']} usado em casa não foi prescrito no hospital",
                     'gravidade': 'moderada'
                 })
 
-        for nome, _ in hospital_dict.items():
-            if nome not in domicilio_dict:
+        for chave, med_hosp in hospital_dict.items():
+            if chave not in domicilio_dict:
                 discrepancias.append({
                     'tipo': 'adicao',
-                    'medicamento': nome,
-                    'detalhes': f"Novo medicamento {nome} prescrito no hospital",
+                    'medicamento': med_hosp['nome'],
+                    'detalhes': f"Novo medicamento {med_hosp['nome']} prescrito no hospital",
                     'gravidade': 'baixa'
                 })
 
-        for nome in set(domicilio_dict.keys()) & set(hospital_dict.keys()):
-            med_dom = domicilio_dict[nome]
-            med_hosp = hospital_dict[nome]
+        for chave, med_dom in domicilio_dict.items():
+            med_hosp = hospital_dict.get(chave)
+            if med_hosp is None:
+                continue
 
-            if med_dom['dose'] != med_hosp['dose']:
+            if normalizar_dose(med_dom.get('dose')) != normalizar_dose(med_hosp.get('dose')):
                 discrepancias.append({
                     'tipo': 'alteracao_dose',
-                    'medicamento': nome,
-                    'detalhes': f"Dose alterada de {med_dom['dose']} para {med_hosp['dose']}",
+                    'medicamento': med_dom['nome'],
+                    'detalhes': f"Dose alterada de {med_dom.get('dose')} para {med_hosp.get('dose')}",
                     'gravidade': 'alta'
                 })
 
@@ -3,11 +3,13 @@ Sistema Inteligente de Farmácia Hospitalar - MedIA Pro
 Gestão completa de medicamentos, farmácia clínica avançada e segurança medicamentosa com IA
 """
 
+import asyncio
 import logging
-from datetime import datetime
+from datetime import date, datetime
 
 from .farmacia_clinica import FarmaciaClinicaAvancada
 from .gestor_estoque import GestorEstoqueInteligente
+from .kpis_farmacia import KPIsFarmacia, obter_kpis_farmacia
 from .otimizador_distribuicao import OtimizadorDistribuicaoIA
 from .rastreador_medicamentos import RastreadorMedicamentosBlockchain
 from .validador_prescricoes import ValidadorPrescricoesIA
@@ -17,10 +19,11 @@ logger = logging.getLogger('MedAI.Farmacia.FarmaciaService')
 class FarmaciaHospitalarIA:
     """Sistema principal de gestão farmacêutica hospitalar com IA"""
 
-    def __init__(self):
+    def __init__(self, kpis: KPIsFarmacia | None = None):
+        self.kpis = kpis or obter_kpis_farmacia()
         self.validador_prescricoes = ValidadorPrescricoesIA()
         self.gestor_estoque = GestorEstoqueInteligente()
-        self.farmacia_clinica = FarmaciaClinicaAvancada()
+        self.farmacia_clinica = FarmaciaClinicaAvancada(kpis=self.kpis)
         self.rastreador_medicamentos = RastreadorMedicamentosBlockchain()
         self.otimizador_distribuicao = OtimizadorDistribuicaoIA()
 
@@ -36,12 +39,16 @@ class FarmaciaHospitalarIA:
 
             dispensacao = await self.preparar_dispensacao_otimizada(prescricao)
 
+            alertas_criticos = self.consolidar_alertas(validacao, interacoes)
+
+            await self.registrar_kpis_prescricao(prescricao, validacao, otimizacao, dispensacao, alertas_criticos)
+
             return {
                 'validacao': validacao,
                 'interacoes': interacoes,
                 'otimizacao': otimizacao,
                 'dispensacao': dispensacao,
-                'alertas_criticos': self.consolidar_alertas(validacao, interacoes),
+                'alertas_criticos': alertas_criticos,
                 'timestamp': datetime.now().isoformat()
             }
 
@@ -55,6 +62,43 @@ class FarmaciaHospitalarIA:
                 'dispensacao': {}
             }
 
+    async def registrar_kpis_prescricao(self, prescricao: dict, validacao: dict, otimizacao: dict,
+                                        dispensacao: dict, alertas_criticos: list[dict]) -> None:
+        """Alimenta os KPIs com a análise, as intervenções, a economia e a dispensação da prescrição"""
+
+        data = prescricao.get('data') or date.today().isoformat()
+        eventos = [{
+            'tipo': 'analise_prescricao',
+            'data': data,
+            'adequada': bool(validacao.get('aprovacao_automatica', False)),
+            'tempo_min': prescricao.get('tempo_analise_min', 0.0)
+        }]
+        eventos.extend({'tipo': 'intervencao', 'data': data, 'motivo': alerta['tipo']} for alerta in alertas_criticos)
+
+        if otimizacao.get('recomendacao_aplicar'):
+            eventos.append({
+                'tipo': 'custo',
+                'data': data,
+                'categoria': 'economia_genericos',
+                'valor': otimizacao.get('economia_total_estimada', 0.0)
+            })
+
+        custos = {med.get('nome'): med.get('custo', 0.0) for med in prescricao.get('medicamentos', [])}
+        for item in dispensacao.get('itens_dispensacao', []):
+            eventos.append({
+                'tipo': 'dispensacao',
+                'data': data,
+                'medicamento': item['medicamento'],
+                'quantidade': item['quantidade'],
+                'custo': custos.get(item['medicamento'], 0.0),
+                'tempo_min': item['tempo_preparacao']
+            })
+
+        try:
+            await asyncio.to_thread(self.kpis.registrar_eventos, eventos)
+        except Exception as e:
+            logger.error(f"Erro ao registrar KPIs da prescrição: {e}")
+
     async def analisar_interacoes_multiplas(self, prescricao: dict) -> dict:
         """Análise avançada de interações medicamentosas"""
 
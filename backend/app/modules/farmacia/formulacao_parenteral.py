@@ -0,0 +1,429 @@
+"""
+Formulação de nutrição parenteral por otimização
+
+Os volumes de cada solução-estoque são as variáveis de um problema
+quadrático pequeno: minimizar o desvio relativo (ponderado) das metas de
+macro e micronutrientes e do volume prescrito, sujeito a volume máximo,
+osmolaridade máxima da via, taxa máxima de infusão de glicose, dose máxima
+de lipídios e solubilidade cálcio-fosfato. A curva de solubilidade
+(produto Ca × P por litro) é trocada pela sua tangente no ponto da razão
+prescrita, que fica inteiramente dentro da região segura, de modo que
+todas as restrições são lineares.
+
+O solver é um ADMM (no estilo do OSQP) vetorizado sobre um lote de bolsas:
+as matrizes de cada bolsa têm a mesma forma, então as bolsas da UTI do dia
+são resolvidas juntas. O estado do solver de cada paciente é guardado e
+usado como ponto de partida (warm start) na próxima bolsa ou no próximo
+ajuste do farmacêutico.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.FormulacaoParenteral')
+
+NUTRIENTES = ('aminoacidos', 'glicose', 'lipidios', 'sodio', 'potassio', 'calcio', 'magnesio', 'fosforo')
+UNIDADES = {'aminoacidos': 'g', 'glicose': 'g', 'lipidios': 'g', 'sodio': 'mEq', 'potassio': 'mEq',
+            'calcio': 'mEq', 'magnesio': 'mEq', 'fosforo': 'mmol'}
+
+# Peso de cada meta no objetivo (o desvio é relativo à meta)
+PESOS_METAS = {'aminoacidos': 10.0, 'glicose': 5.0, 'lipidios': 3.0, 'sodio': 1.0, 'potassio': 1.0,
+               'calcio': 1.0, 'magnesio': 1.0, 'fosforo': 1.0}
+PESO_VOLUME = 0.5
+REGULARIZACAO = 1e-6
+
+OSMOLARIDADE_MAXIMA = {'central': 1800.0, 'periferica': 900.0}  # mOsm/L
+LIMITE_PRODUTO_CALCIO_FOSFATO = 200.0  # (mEq/L de Ca) × (mmol/L de P)
+TAXA_GLICOSE_MAXIMA = 5.0  # mg/kg/min
+LIPIDIOS_MAXIMO_G_KG = 2.5  # g/kg/dia
+
+# Aditivos de volume fixo por bolsa (mL)
+ADITIVOS_FIXOS = {'complexo_vitaminico_adulto': 10.0, 'oligoelementos_adulto': 10.0}
+
+
+@dataclass(frozen=True)
+class SolucaoEstoque:
+    """Solução disponível na farmácia: conteúdo e osmolaridade por mL"""
+    nome: str
+    conteudo: dict[str, float]
+    osmolaridade: float  # mOsm/mL
+
+
+SOLUCOES_PADRAO = (
+    SolucaoEstoque('aminoacidos_10%', {'aminoacidos': 0.1}, 1.0),
+    SolucaoEstoque('glicose_50%', {'glicose': 0.5}, 2.75),
+    SolucaoEstoque('lipidios_20%', {'lipidios': 0.2}, 0.27),
+    SolucaoEstoque('cloreto_sodio_20%', {'sodio': 3.4}, 6.8),
+    SolucaoEstoque('cloreto_potassio_19,1%', {'potassio': 2.56}, 5.12),
+    SolucaoEstoque('gluconato_calcio_10%', {'calcio': 0.465}, 0.68),
+    SolucaoEstoque('sulfato_magnesio_50%', {'magnesio': 4.06}, 4.06),
+    SolucaoEstoque('glicerofosfato_sodio', {'fosforo': 1.0, 'sodio': 2.0}, 3.0),
+    SolucaoEstoque('agua_esteril', {}, 0.0)
+)
+
+# Linhas de restrição além das de não negatividade, na ordem da matriz
+RESTRICOES = ('volume', 'osmolaridade', 'calcio_fosforo', 'taxa_glicose', 'lipidios_max')
+
+
+@dataclass
+class MetaNutricional:
+    """Metas diárias de uma bolsa e limites que dependem do paciente"""
+    alvos: dict[str, float]
+    volume_alvo: float
+    volume_maximo: float
+    peso: float
+    via: str = 'central'
+    osmolaridade_maxima: float | None = None
+    paciente_id: Any = None
+
+    def __post_init__(self):
+        if self.osmolaridade_maxima is None:
+            self.osmolaridade_maxima = OSMOLARIDADE_MAXIMA.get(self.via, OSMOLARIDADE_MAXIMA['central'])
+
+
+def meta_de_necessidades(necessidades: Mapping[str, Any], paciente: Mapping[str, Any]) -> MetaNutricional:
+    """Converte as necessidades calculadas por NutricaoParenteralIA em metas da bolsa"""
+    peso = paciente.get('antropometria', {}).get('peso', 70)
+    eletrolitos = necessidades.get('micronutrientes', {}).get('eletroliticos', {})
+    alvos = {
+        'aminoacidos': necessidades.get('proteinas', {}).get('gramas', 80),
+        'glicose': necessidades.get('carboidratos', {}).get('gramas', 250),
+        'lipidios': necessidades.get('lipidios', {}).get('gramas', 70)
+    }
+    alvos.update({nutriente: eletrolitos.get(nutriente, 0.0) for nutriente in NUTRIENTES[3:]})
+    volume_alvo = necessidades.get('volume_total', {}).get('volume_total_ml', 2000)
+    return MetaNutricional(
+        alvos=alvos,
+        volume_alvo=volume_alvo,
+        volume_maximo=paciente.get('clinicos', {}).get('volume_maximo_ml', volume_alvo),
+        peso=peso,
+        via=paciente.get('acesso_venoso', 'central'),
+        paciente_id=paciente.get('id')
+    )
+
+
+@dataclass
+class _Problema:
+    """Lote de QPs escalados: min ½ξᵀPξ + qᵀξ  s.a.  l ≤ Aξ ≤ u, com x = s ⊙ ξ"""
+    P: np.ndarray
+    q: np.ndarray
+    A: np.ndarray
+    l: np.ndarray
+    u: np.ndarray
+    escala_colunas: np.ndarray
+    escala_linhas: np.ndarray
+
+
+@dataclass
+class _EstadoSolver:
+    volumes: np.ndarray
+    duais: np.ndarray
+    rho: float
+
+
+@dataclass
+class _ResultadoLote:
+    volumes: np.ndarray
+    iteracoes: np.ndarray
+    convergiu: np.ndarray
+    warm_start: np.ndarray
+    tempo_ms: float
+    estados: list[_EstadoSolver] = field(default_factory=list)
+
+
+class FormuladorNutricaoParenteral:
+    """Resolve os volumes das soluções-estoque de uma ou várias bolsas"""
+
+    def __init__(self, solucoes: Sequence[SolucaoEstoque] = SOLUCOES_PADRAO, tolerancia: float = 1e-5,
+                 max_iteracoes: int = 5000):
+        self.solucoes = tuple(solucoes)
+        self.tolerancia = tolerancia
+        self.max_iteracoes = max_iteracoes
+        self._conteudo = np.array([[solucao.conteudo.get(nutriente, 0.0) for solucao in self.solucoes]
+                                   for nutriente in NUTRIENTES])
+        self._osmolaridade = np.array([solucao.osmolaridade for solucao in self.solucoes])
+        self._volume_fixo = sum(ADITIVOS_FIXOS.values())
+        self._estados: dict[Any, _EstadoSolver] = {}
+        self._lock = threading.Lock()
+
+    def formular(self, meta: MetaNutricional, bolsa_anterior: Mapping[str, float] | None = None) -> dict[str, Any]:
+        """Formula uma bolsa; ``bolsa_anterior`` (volumes por solução) serve de ponto de partida"""
+        return self.formular_lote([meta], [bolsa_anterior])[0]
+
+    def formular_lote(self, metas: Sequence[MetaNutricional],
+                      bolsas_anteriores: Sequence[Mapping[str, float] | None] | None = None) -> list[dict[str, Any]]:
+        """Formula todas as bolsas num único solve vetorizado"""
+        if not metas:
+            return []
+        bolsas_anteriores = bolsas_anteriores or [None] * len(metas)
+        resultado = self._resolver(metas, bolsas_anteriores)
+        if not resultado.convergiu.all():
+            logger.warning(f"{int((~resultado.convergiu).sum())} bolsa(s) sem convergência em "
+                           f"{self.max_iteracoes} iterações")
+        with self._lock:
+            for meta, estado in zip(metas, resultado.estados):
+                if meta.paciente_id is not None:
+                    self._estados[meta.paciente_id] = estado
+        tempo_por_bolsa = resultado.tempo_ms / len(metas)
+        return [self._formulacao(meta, resultado.volumes[i], {
+            'iteracoes': int(resultado.iteracoes[i]),
+            'convergiu': bool(resultado.convergiu[i]),
+            'warm_start': bool(resultado.warm_start[i]),
+            'tempo_ms': tempo_por_bolsa
+        }) for i, meta in enumerate(metas)]
+
+    def esquecer(self, paciente_id: Any) -> None:
+        """Descarta o warm start guardado de um paciente (alta, suspensão da NP)"""
+        with self._lock:
+            self._estados.pop(paciente_id, None)
+
+    def _montar(self, metas: Sequence[MetaNutricional]) -> _Problema:
+        lote, n = len(metas), len(self.solucoes)
+        m = n + len(RESTRICOES)
+        conteudo, osmolaridade, volume_fixo = self._conteudo, self._osmolaridade, self._volume_fixo
+        indice = {nutriente: k for k, nutriente in enumerate(NUTRIENTES)}
+        pesos = np.array([PESOS_METAS[nutriente] for nutriente in NUTRIENTES])
+
+        P = np.empty((lote, n, n))
+        q = np.empty((lote, n))
+        A = np.zeros((lote, m, n))
+        l = np.full((lote, m), -np.inf)
+        u = np.full((lote, m), np.inf)
+        escala_colunas = np.empty((lote, n))
+
+        for b, meta in enumerate(metas):
+            alvos = np.array([meta.alvos.get(nutriente, 0.0) for nutriente in NUTRIENTES])
+            com_meta = alvos > 0
+            # Desvio relativo: linhas de conteúdo divididas pela meta (metas nulas não entram)
+            W = np.where(com_meta, np.sqrt(pesos) / np.where(com_meta, alvos, 1.0), 0.0)
+            N = W[:, None] * conteudo
+            alvo_volume = meta.volume_alvo - volume_fixo
+            v = np.full(n, np.sqrt(PESO_VOLUME) / meta.volume_alvo)
+
+            # Escala das colunas: volume que, sozinho, atingiria a meta do nutriente principal
+            fornecido = conteudo * np.where(com_meta, 1.0 / np.where(com_meta, alvos, 1.0), 0.0)[:, None]
+            maximo = fornecido.max(axis=0)
+            s = np.where(maximo > 0, 1.0 / np.where(maximo > 0, maximo, 1.0), meta.volume_maximo)
+            escala_colunas[b] = s = np.minimum(s, meta.volume_maximo)
+
+            Ns, vs = N * s, v * s
+            P[b] = 2 * (Ns.T @ Ns + np.outer(vs, vs)) + REGULARIZACAO * np.eye(n)
+            q[b] = -2 * (Ns.T @ (W * alvos) + vs * (alvo_volume * v[0]))
+
+            A[b, :n] = np.eye(n)
+            l[b, :n] = 0.0
+            A[b, n] = 1.0
+            u[b, n] = meta.volume_maximo - volume_fixo
+            # Σ osm_i x_i ≤ osm_max · (Σ x_i + fixo) / 1000
+            A[b, n + 1] = osmolaridade - meta.osmolaridade_maxima / 1000
+            u[b, n + 1] = meta.osmolaridade_maxima * volume_fixo / 1000
+            # Tangente de [Ca]·[P] = limite no ponto da razão prescrita: [Ca]/a + [P]/b ≤ 2
+            calcio, fosforo = alvos[indice['calcio']], alvos[indice['fosforo']]
+            razao = calcio / fosforo if calcio > 0 and fosforo > 0 else 1.0
+            eixo_calcio = np.sqrt(LIMITE_PRODUTO_CALCIO_FOSFATO * razao)
+            eixo_fosforo = np.sqrt(LIMITE_PRODUTO_CALCIO_FOSFATO / razao)
+            A[b, n + 2] = 1000 * (conteudo[indice['calcio']] / eixo_calcio
+                                  + conteudo[indice['fosforo']] / eixo_fosforo) - 2.0
+            u[b, n + 2] = 2.0 * volume_fixo
+            # Glicose (g/dia) ≤ taxa máxima (mg/kg/min) · peso · 1440 / 1000
+            A[b, n + 3] = conteudo[indice['glicose']]
+            u[b, n + 3] = TAXA_GLICOSE_MAXIMA * meta.peso * 1.44
+            A[b, n + 4] = conteudo[indice['lipidios']]
+            u[b, n + 4] = LIPIDIOS_MAXIMO_G_KG * meta.peso
+            A[b] *= s
+
+        # Equilibra as linhas de A (norma infinito unitária)
+        escala_linhas = 1.0 / np.maximum(np.abs(A).max(axis=2), 1e-12)
+        A *= escala_linhas[:, :, None]
+        l *= escala_linhas
+        u *= escala_linhas
+        return _Problema(P, q, A, l, u, escala_colunas, escala_linhas)
+
+    def _resolver(self, metas: Sequence[MetaNutricional],
+                  bolsas_anteriores: Sequence[Mapping[str, float] | None]) -> _ResultadoLote:
+        inicio = time.perf_counter()
+        problema = self._montar(metas)
+        lote, m, n = problema.A.shape
+        x = np.zeros((lote, n))
+        y = np.zeros((lote, m))
+        rho = np.full(lote, 0.1)
+        warm_start = np.zeros(lote, dtype=bool)
+        indice_solucao = {solucao.nome: i for i, solucao in enumerate(self.solucoes)}
+
+        with self._lock:
+            estados = [self._estados.get(meta.paciente_id) if meta.paciente_id is not None else None for meta in metas]
+        for b, (estado, anterior) in enumerate(zip(estados, bolsas_anteriores)):
+            if anterior:
+                volumes = np.zeros(n)
+                for nome, volume in anterior.items():
+                    if nome in indice_solucao:
+                        volumes[indice_solucao[nome]] = volume
+                x[b] = volumes / problema.escala_colunas[b]
+                warm_start[b] = True
+            elif estado is not None:
+                x[b] = estado.volumes / problema.escala_colunas[b]
+                y[b] = estado.duais / problema.escala_linhas[b]
+                rho[b] = estado.rho
+                warm_start[b] = True
+        z = np.clip(np.einsum('bmn,bn->bm', problema.A, x), problema.l, problema.u)
+
+        x, y, rho, iteracoes, convergiu = _admm(problema, x, z, y, rho, self.tolerancia, self.max_iteracoes)
+        volumes = np.maximum(x * problema.escala_colunas, 0.0)
+        duais = y * problema.escala_linhas
+        return _ResultadoLote(
+            volumes=volumes,
+            iteracoes=iteracoes,
+            convergiu=convergiu,
+            warm_start=warm_start,
+            tempo_ms=(time.perf_counter() - inicio) * 1000,
+            estados=[_EstadoSolver(volumes[b].copy(), duais[b].copy(), float(rho[b])) for b in range(lote)]
+        )
+
+    def _formulacao(self, meta: MetaNutricional, volumes: np.ndarray, solver: dict[str, Any]) -> dict[str, Any]:
+        entregue = dict(zip(NUTRIENTES, (self._conteudo @ volumes).tolist()))
+        volume_final = float(volumes.sum() + self._volume_fixo)
+        litros = volume_final / 1000
+        osmolaridade = float(self._osmolaridade @ volumes) / litros
+        calcio_l, fosforo_l = entregue['calcio'] / litros, entregue['fosforo'] / litros
+        produto = calcio_l * fosforo_l
+        volumes_ml = {solucao.nome: round(float(volume), 1) for solucao, volume in zip(self.solucoes, volumes)}
+
+        desvios = {nutriente: (entregue[nutriente] - alvo) / alvo
+                   for nutriente, alvo in meta.alvos.items() if alvo > 0}
+        folgas = {
+            'volume': meta.volume_maximo - volume_final,
+            'osmolaridade': meta.osmolaridade_maxima - osmolaridade,
+            'calcio_fosforo': LIMITE_PRODUTO_CALCIO_FOSFATO - produto,
+            'taxa_glicose': TAXA_GLICOSE_MAXIMA * meta.peso * 1.44 - entregue['glicose'],
+            'lipidios_max': LIPIDIOS_MAXIMO_G_KG * meta.peso - entregue['lipidios']
+        }
+        limites = {'volume': meta.volume_maximo, 'osmolaridade': meta.osmolaridade_maxima,
+                   'calcio_fosforo': LIMITE_PRODUTO_CALCIO_FOSFATO,
+                   'taxa_glicose': TAXA_GLICOSE_MAXIMA * meta.peso * 1.44,
+                   'lipidios_max': LIPIDIOS_MAXIMO_G_KG * meta.peso}
+        ativas = [nome for nome in RESTRICOES if folgas[nome] <= 1e-3 * max(limites[nome], 1.0)]
+        alertas = [f"{nutriente}: {entregue[nutriente]:.1f} {UNIDADES[nutriente]} de "
+                   f"{meta.alvos[nutriente]:.1f} ({desvio:+.0%})"
+                   for nutriente, desvio in desvios.items() if abs(desvio) > 0.05]
+        if alertas and ativas:
+            alertas.append(f"Metas limitadas por: {', '.join(ativas)}")
+
+        return {
+            'componentes': {
+                'aminoacidos': {
+                    'quantidade_g': entregue['aminoacidos'],
+                    'solucao': 'aminoacidos_10%',
+                    'volume_ml': volumes_ml['aminoacidos_10%'],
+                    'nitrogenio_g': entregue['aminoacidos'] / 6.25
+                },
+                'glicose': {
+                    'quantidade_g': entregue['glicose'],
+                    'concentracao': '50%',
+                    'volume_ml': volumes_ml['glicose_50%'],
+                    'taxa_infusao_mg_kg_min': entregue['glicose'] * 1000 / (24 * 60) / meta.peso
+                },
+                'lipidios': {
+                    'quantidade_g': entregue['lipidios'],
+                    'emulsao': 'lipidios_20%',
+                    'volume_ml': volumes_ml['lipidios_20%'],
+                    'tipo': 'MCT/LCT'
+                },
+                'eletrolitos': {nutriente: entregue[nutriente] for nutriente in NUTRIENTES[3:]},
+                'vitaminas': 'complexo_vitaminico_adulto_1_ampola',
+                'oligoelementos': 'oligoelementos_adulto_1_ampola'
+            },
+            'volumes_ml': volumes_ml,
+            'concentracoes': {
+                'aminoacidos_g_l': entregue['aminoacidos'] / litros,
+                'glicose_g_l': entregue['glicose'] / litros,
+                'lipidios_g_l': entregue['lipidios'] / litros,
+                'calcio_meq_l': calcio_l,
+                'fosforo_mmol_l': fosforo_l,
+                'produto_calcio_fosforo': produto
+            },
+            'volume_final': volume_final,
+            'osmolaridade': osmolaridade,
+            'estabilidade': produto <= LIMITE_PRODUTO_CALCIO_FOSFATO * 1.01,
+            'via_administracao': 'central' if osmolaridade > OSMOLARIDADE_MAXIMA['periferica'] else 'periferica',
+            'desvios_metas': desvios,
+            'restricoes_ativas': ativas,
+            'alertas': alertas,
+            'solver': solver
+        }
+
+
+def _admm(problema: _Problema, x: np.ndarray, z: np.ndarray, y: np.ndarray, rho: np.ndarray,
+          tolerancia: float, max_iteracoes: int) -> tuple[np.ndarray, ...]:
+    """ADMM em lote; cada bolsa para quando seus resíduos primal e dual ficam abaixo da tolerância"""
+    P, q, A, l, u = problema.P, problema.q, problema.A, problema.l, problema.u
+    lote, m, n = A.shape
+    sigma, alfa = 1e-6, 1.6
+    AtA = np.einsum('bmi,bmj->bij', A, A)
+    identidade = np.eye(n)
+
+    def fatorar(indices: np.ndarray) -> None:
+        K[indices] = np.linalg.inv(P[indices] + sigma * identidade + rho[indices, None, None] * AtA[indices])
+
+    K = np.empty((lote, n, n))
+    fatorar(np.arange(lote))
+    ativos = np.ones(lote, dtype=bool)
+    iteracoes = np.full(lote, max_iteracoes)
+    convergiu = np.zeros(lote, dtype=bool)
+
+    for k in range(1, max_iteracoes + 1):
+        idx = np.flatnonzero(ativos)
+        Ab, rb = A[idx], rho[idx, None]
+        lado_direito = sigma * x[idx] - q[idx] + np.einsum('bmn,bm->bn', Ab, rb * z[idx] - y[idx])
+        x_til = np.einsum('bij,bj->bi', K[idx], lado_direito)
+        z_til = np.einsum('bmn,bn->bm', Ab, x_til)
+        z_relaxado = alfa * z_til + (1 - alfa) * z[idx]
+        x[idx] = alfa * x_til + (1 - alfa) * x[idx]
+        z_novo = np.clip(z_relaxado + y[idx] / rb, l[idx], u[idx])
+        y[idx] += rb * (z_relaxado - z_novo)
+        z[idx] = z_novo
+
+        if k % 10 and k != max_iteracoes:
+            continue
+        Ax = np.einsum('bmn,bn->bm', Ab, x[idx])
+        Px = np.einsum('bij,bj->bi', P[idx], x[idx])
+        Aty = np.einsum('bmn,bm->bn', Ab, y[idx])
+        norma_primal = np.maximum(np.abs(Ax).max(axis=1), np.abs(z[idx]).max(axis=1))
+        norma_dual = np.maximum.reduce([np.abs(Px).max(axis=1), np.abs(Aty).max(axis=1), np.abs(q[idx]).max(axis=1)])
+        residuo_primal = np.abs(Ax - z[idx]).max(axis=1)
+        residuo_dual = np.abs(Px + q[idx] + Aty).max(axis=1)
+        pronto = ((residuo_primal <= tolerancia * (1 + norma_primal))
+                  & (residuo_dual <= tolerancia * (1 + norma_dual)))
+        convergiu[idx[pronto]] = True
+        iteracoes[idx[pronto]] = k
+        ativos[idx[pronto]] = False
+        if not ativos.any():
+            break
+
+        if k % 50 == 0:
+            # Ajuste de ρ pela razão dos resíduos normalizados
+            restantes = ~pronto
+            razao = np.sqrt((residuo_primal / np.maximum(norma_primal, 1e-12))
+                            / np.maximum(residuo_dual / np.maximum(norma_dual, 1e-12), 1e-12))
+            ajustar = restantes & ((razao > 5) | (razao < 0.2))
+            if ajustar.any():
+                alvo = idx[ajustar]
+                rho[alvo] = np.clip(rho[alvo] * razao[ajustar], 1e-6, 1e6)
+                fatorar(alvo)
+
+    return x, y, rho, iteracoes, convergiu
+
+
+_formulador = ServicoProcesso('formulador_np', FormuladorNutricaoParenteral)
+
+
+def obter_formulador_np() -> FormuladorNutricaoParenteral:
+    """Formulador compartilhado do processo (mantém os warm starts por paciente)"""
+    return _formulador.obter()
@@ -2,15 +2,23 @@
 Gestão de estoque farmacêutico com IA preditiva
 """
 
+import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from .inventario_lotes import PRECO_PADRAO, InventarioLotes, calcular_reposicao, obter_inventario_lotes
+from .periodos import periodo_de, rotulo_periodo
+from .previsao_demanda import MotorPrevisaoDemanda, obter_motor_previsao
 
 logger = logging.getLogger('MedAI.Farmacia.GestorEstoque')
 
 class GestorEstoqueInteligente:
     """Gestão de estoque farmacêutico com IA preditiva"""
 
-    def __init__(self):
+    def __init__(self, inventario: InventarioLotes | None = None):
+        self.inventario = inventario or obter_inventario_lotes()
         self.predictor_demanda = PredictorDemandaMedicamentos()
         self.otimizador_compras = OtimizadorComprasML()
         self.monitor_validade = MonitorValidadeAutomatico()
@@ -46,18 +54,13 @@ class GestorEstoqueInteligente:
             }
 
     async def prever_demanda_30_dias(self) -> dict:
-        """Previsão de demanda usando ensemble de modelos"""
+        """Previsão de demanda com o modelo selecionado por medicamento"""
 
         historico = await self.coletar_historico_consumo()
 
-        modelos = {
-            'prophet': self.predictor_demanda.prophet_forecast(historico),
-            'lstm': self.predictor_demanda.lstm_forecast(historico),
-            'xgboost': self.predictor_demanda.xgboost_forecast(historico),
-            'arima': self.predictor_demanda.arima_forecast(historico)
-        }
-
-        previsao_final = self.combinar_previsoes(modelos)
+        # Ajuste e espera do pool de processos fora do event loop
+        previsoes = await asyncio.to_thread(self.predictor_demanda.prever, historico, 1)
+        previsao_final = self.combinar_previsoes(previsoes)
 
         previsao_ajustada = self.ajustar_por_contexto(
             previsao_final,
@@ -70,8 +73,11 @@ class GestorEstoqueInteligente:
     async def coletar_historico_consumo(self) -> dict:
         """Coleta histórico de consumo de medicamentos"""
 
+        hoje = date.today()
         return {
             'periodo': '12_meses',
+            # Último mês fechado da janela; 'consumo_mensal' termina nele
+            'referencia': rotulo_periodo(periodo_de(hoje) - 1),
             'medicamentos': {
                 'omeprazol': {
                     'consumo_mensal': [120, 135, 128, 142, 156, 148, 139, 145, 152, 138, 144, 149],
@@ -91,19 +97,29 @@ class GestorEstoqueInteligente:
             }
         }
 
-    def combinar_previsoes(self, modelos: dict) -> dict:
-        """Combina previsões de diferentes modelos"""
+    def combinar_previsoes(self, previsoes: dict) -> dict:
+        """Converte as previsões do motor no formato consumido pelo plano de compras"""
 
         previsao_combinada = {}
 
-        medicamentos_exemplo = ['omeprazol', 'paracetamol', 'insulina']
+        for medicamento, previsao in previsoes.items():
+            total = previsao['total']
+            minimo, maximo = previsao['intervalo']
+            variacao = (maximo - total) / max(total, 1e-9)
+            inclinacao = previsao['inclinacao_relativa']
+            if inclinacao > 0.01:
+                tendencia = 'crescente'
+            elif inclinacao < -0.01:
+                tendencia = 'decrescente'
+            else:
+                tendencia = 'estavel'
 
-        for medicamento in medicamentos_exemplo:
             previsao_combinada[medicamento] = {
-                'demanda_30_dias': 150,  # Exemplo
-                'confianca': 0.85,
-                'intervalo_confianca': {'min': 135, 'max': 165},
-                'tendencia': 'estavel'
+                'demanda_30_dias': round(total, 1),
+                'confianca': round(min(max(1 - variacao / 2, 0.0), 0.99), 2),
+                'intervalo_confianca': {'min': round(minimo, 1), 'max': round(maximo, 1)},
+                'tendencia': tendencia,
+                'modelo': previsao['modelo']
             }
 
         return previsao_combinada
@@ -213,68 +229,65 @@ class GestorEstoqueInteligente:
             'fornecedores_recomendados': {}
         }
 
-        for medicamento, previsao in previsao_demanda.items():
-            demanda_prevista = previsao.get('demanda_30_dias', 0)
-
-            quantidade_otima = self.calcular_quantidade_otima_compra(
-                demanda_prevista=demanda_prevista,
-                estoque_atual=self.obter_estoque_atual(medicamento),
-                lead_time=7,  # dias
-                estoque_seguranca=0.2  # 20%
-            )
-
-            if quantidade_otima > 0:
-                compra = {
-                    'medicamento': medicamento,
-                    'quantidade': quantidade_otima,
-                    'custo_estimado': quantidade_otima * self.obter_preco_unitario(medicamento),
-                    'fornecedor_recomendado': self.selecionar_melhor_fornecedor(medicamento),
-                    'prazo_entrega': 7,
-                    'prioridade': self.calcular_prioridade_compra(medicamento)
-                }
+        medicamentos = list(previsao_demanda)
+        if not medicamentos:
+            return plano_compras
+
+        parametros = self.inventario.parametros_reposicao(medicamentos)
+        reposicao = calcular_reposicao(
+            demanda_30_dias=np.array([p.get('demanda_30_dias', 0) for p in previsao_demanda.values()], dtype=float),
+            estoque=self.estoques_atuais(medicamentos),
+            preco=parametros['preco'],
+            lead_time=parametros['lead_time'],
+            custo_pedido=parametros['custo_pedido'],
+            taxa_manutencao=parametros['taxa_manutencao']
+        )
+        custos = reposicao['quantidade'] * parametros['preco']
+
+        for i in np.flatnonzero(reposicao['quantidade'] > 0):
+            medicamento = medicamentos[i]
+            compra = {
+                'medicamento': medicamento,
+                'quantidade': int(reposicao['quantidade'][i]),
+                'custo_estimado': float(custos[i]),
+                'ponto_reposicao': round(float(reposicao['ponto_reposicao'][i]), 1),
+                'lote_economico': round(float(reposicao['eoq'][i]), 1),
+                'fornecedor_recomendado': self.selecionar_melhor_fornecedor(medicamento),
+                'prazo_entrega': int(parametros['lead_time'][i]),
+                'prioridade': self.calcular_prioridade_compra(medicamento)
+            }
 
-                if compra['prioridade'] == 'urgente':
-                    plano_compras['compras_urgentes'].append(compra)
-                else:
-                    plano_compras['compras_programadas'].append(compra)
+            if compra['prioridade'] == 'urgente':
+                plano_compras['compras_urgentes'].append(compra)
+            else:
+                plano_compras['compras_programadas'].append(compra)
 
         return plano_compras
 
     def calcular_quantidade_otima_compra(self, demanda_prevista: float, estoque_atual: int, lead_time: int, estoque_seguranca: float) -> int:
-        """Calcula quantidade ótima de compra usando modelo EOQ modificado"""
-
-        demanda_lead_time = (demanda_prevista / 30) * lead_time
+        """Calcula quantidade de compra pelo ponto de reposição, com lote igual à demanda de 30 dias"""
 
-        estoque_seg = demanda_prevista * estoque_seguranca
-
-        ponto_reposicao = demanda_lead_time + estoque_seg
-
-        if estoque_atual < ponto_reposicao:
-            return max(0, int(ponto_reposicao - estoque_atual + demanda_prevista))
-
-        return 0
+        reposicao = calcular_reposicao(
+            np.array([demanda_prevista]), np.array([estoque_atual]), np.array([0.0]),
+            np.array([lead_time]), np.array([0.0]), np.array([0.0]), estoque_seguranca
+        )
+        return int(reposicao['quantidade'][0])
 
     def obter_estoque_atual(self, medicamento: str) -> int:
-        """Obtém estoque atual do medicamento"""
+        """Obtém estoque atual do medicamento (saldo materializado do inventário)"""
 
-        estoques_simulados = {
-            'omeprazol': 85,
-            'paracetamol': 320,
-            'insulina': 15
-        }
+        return int(self.estoques_atuais([medicamento])[0])
+
+    def estoques_atuais(self, medicamentos: list[str]) -> np.ndarray:
+        """Saldos do inventário (0 para medicamentos sem lotes registrados)"""
 
-        return estoques_simulados.get(medicamento, 50)
+        return self.inventario.saldos(medicamentos)
 
     def obter_preco_unitario(self, medicamento: str) -> float:
         """Obtém preço unitário do medicamento"""
 
-        precos = {
-            'omeprazol': 2.50,
-            'paracetamol': 0.80,
-            'insulina': 45.00
-        }
-
-        return precos.get(medicamento, 10.00)
+        cadastro = self.inventario.cadastro(medicamento)
+        return cadastro.preco_unitario if cadastro else PRECO_PADRAO
 
     def selecionar_melhor_fornecedor(self, medicamento: str) -> dict:
         """Seleciona melhor fornecedor baseado em critérios múltiplos"""
@@ -288,13 +301,16 @@ class GestorEstoqueInteligente:
         }
 
     def calcular_prioridade_compra(self, medicamento: str) -> str:
-        """Calcula prioridade da compra"""
+        """Calcula prioridade da compra ('desconhecida' sem lotes no inventário)"""
 
+        if not self.inventario.rastreados([medicamento])[0]:
+            return 'desconhecida'
         estoque_atual = self.obter_estoque_atual(medicamento)
 
         medicamentos_criticos = ['insulina', 'adrenalina', 'morfina']
+        cadastro = self.inventario.cadastro(medicamento)
 
-        if any(critico in medicamento.lower() for critico in medicamentos_criticos):
+        if (cadastro and cadastro.critico) or any(critico in medicamento.lower() for critico in medicamentos_criticos):
             if estoque_atual < 20:
                 return 'urgente'
 
@@ -310,60 +326,45 @@ class GestorEstoqueInteligente:
 
         medicamentos_vencimento = await self.identificar_medicamentos_vencimento()
 
-        acoes_recomendadas = []
-
-        for med in medicamentos_vencimento:
-            dias_vencimento = med['dias_para_vencimento']
-
-            if dias_vencimento <= 30:
-                if dias_vencimento <= 7:
-                    acao = 'descarte_imediato'
-                elif dias_vencimento <= 15:
-                    acao = 'uso_prioritario'
-                else:
-                    acao = 'promocao_interna'
-
-                acoes_recomendadas.append({
-                    'medicamento': med['nome'],
-                    'lote': med['lote'],
-                    'validade': med['validade'],
-                    'quantidade': med['quantidade'],
-                    'acao': acao,
-                    'valor_perda': med['quantidade'] * self.obter_preco_unitario(med['nome'])
-                })
+        vencendo = self.inventario.lotes_vencendo(30)
+        dias = vencendo['dias_para_vencimento']
+        acoes = np.select([dias <= 7, dias <= 15], ['descarte_imediato', 'uso_prioritario'], 'promocao_interna')
+        precos = self.inventario.parametros_reposicao(vencendo['medicamento'])['preco']
+        valores_perda = vencendo['quantidade'] * precos
+
+        acoes_recomendadas = [
+            {
+                'medicamento': vencendo['medicamento'][i],
+                'lote': vencendo['lote'][i],
+                'validade': vencendo['validade'][i].isoformat(),
+                'quantidade': int(vencendo['quantidade'][i]),
+                'acao': str(acoes[i]),
+                'valor_perda': float(valores_perda[i])
+            }
+            for i in range(len(vencendo['lote']))
+        ]
 
         return {
             'medicamentos_vencimento': medicamentos_vencimento,
             'acoes_recomendadas': acoes_recomendadas,
-            'valor_total_risco': sum(acao['valor_perda'] for acao in acoes_recomendadas),
+            'valor_total_risco': float(valores_perda.sum()),
             'economia_possivel': self.calcular_economia_gestao_validade(acoes_recomendadas)
         }
 
-    async def identificar_medicamentos_vencimento(self) -> list[dict]:
-        """Identifica medicamentos próximos do vencimento"""
+    async def identificar_medicamentos_vencimento(self, dias: int = 60) -> list[dict]:
+        """Identifica lotes com saldo que vencem nos próximos ``dias`` (inclui vencidos)"""
+
+        vencendo = self.inventario.lotes_vencendo(dias)
 
         return [
             {
-                'nome': 'omeprazol',
-                'lote': 'OME2024001',
-                'validade': '2024-07-15',
-                'quantidade': 45,
-                'dias_para_vencimento': 25
-            },
-            {
-                'nome': 'paracetamol',
-                'lote': 'PAR2024002',
-                'validade': '2024-06-30',
-                'quantidade': 120,
-                'dias_para_vencimento': 10
-            },
-            {
-                'nome': 'amoxicilina',
-                'lote': 'AMO2024003',
-                'validade': '2024-06-20',
-                'quantidade': 30,
-                'dias_para_vencimento': 0  # Vencido
+                'nome': vencendo['medicamento'][i],
+                'lote': vencendo['lote'][i],
+                'validade': vencendo['validade'][i].isoformat(),
+                'quantidade': int(vencendo['quantidade'][i]),
+                'dias_para_vencimento': int(vencendo['dias_para_vencimento'][i])
             }
+            for i in range(len(vencendo['lote']))
         ]
 
     def calcular_economia_gestao_validade(self, acoes: list[dict]) -> float:
@@ -435,21 +436,41 @@ class GestorEstoqueInteligente:
         }
 
 class PredictorDemandaMedicamentos:
-    def prophet_forecast(self, historico: dict) -> dict:
-        """Previsão usando Prophet"""
-        return {'modelo': 'prophet', 'confianca': 0.85}
-
-    def lstm_forecast(self, historico: dict) -> dict:
-        """Previsão usando LSTM"""
-        return {'modelo': 'lstm', 'confianca': 0.80}
-
-    def xgboost_forecast(self, historico: dict) -> dict:
-        """Previsão usando XGBoost"""
-        return {'modelo': 'xgboost', 'confianca': 0.82}
-
-    def arima_forecast(self, historico: dict) -> dict:
-        """Previsão usando ARIMA"""
-        return {'modelo': 'arima', 'confianca': 0.75}
+    """Sincroniza o histórico de consumo com o motor de previsão e consulta as previsões"""
+
+    def __init__(self, motor: MotorPrevisaoDemanda | None = None):
+        self.motor = motor or obter_motor_previsao()
+
+    def sincronizar(self, historico: dict) -> None:
+        """
+        Ajusta SKUs novos (ou com histórico reescrito) em lote e avança os
+        demais só com os meses ainda não incorporados
+
+        O histórico é uma janela móvel terminada no mês ``referencia``
+        ('AAAA-MM', no histórico ou no medicamento); o que já foi incorporado
+        é decidido pelo rótulo do mês, não pelo tamanho da lista. Sem
+        referência o SKU é sempre reajustado.
+        """
+        reajustar, novos_periodos = {}, {}
+        for medicamento, dados in historico['medicamentos'].items():
+            consumo = dados['consumo_mensal']
+            rotulo = dados.get('referencia', historico.get('referencia'))
+            referencia = periodo_de(rotulo) if rotulo else None
+            ultimo = self.motor.ultimo_periodo(medicamento)
+            if referencia is None or ultimo is None or referencia < ultimo or referencia - ultimo >= len(consumo):
+                reajustar.setdefault(referencia, {})[medicamento] = consumo
+            elif referencia > ultimo:
+                novos_periodos.setdefault(referencia, {})[medicamento] = consumo[len(consumo) - (referencia - ultimo):]
+
+        for referencia, series in reajustar.items():
+            self.motor.ajustar(series, ultimo_periodo=referencia)
+        for referencia, consumo in novos_periodos.items():
+            self.motor.registrar_consumo(consumo, ultimo_periodo=referencia)
+
+    def prever(self, historico: dict, horizonte: int = 1) -> dict:
+        """Previsão por medicamento para os próximos ``horizonte`` meses"""
+        self.sincronizar(historico)
+        return self.motor.prever(list(historico['medicamentos']), horizonte)
 
 class OtimizadorComprasML:
     pass
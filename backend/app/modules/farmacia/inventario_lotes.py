@@ -0,0 +1,388 @@
+"""
+Inventário farmacêutico por lote
+
+Medicamentos, lotes e movimentações são gravados em tabelas SQLite só de
+inclusão; em memória ficam colunas numpy (que crescem por duplicação de
+capacidade) com os saldos por lote e por medicamento materializados, de
+modo que consultar saldo é O(1) independente do tamanho do ledger. O ledger
+em si fica só no banco: ao abrir, e a cada sincronização, as movimentações
+novas chegam somadas por lote (GROUP BY), e o histórico de um lote é lido
+pelo índice ``(lote, seq)``. Um índice ordenado por validade, só com os
+lotes que têm saldo, responde "lotes que vencem em N dias" com busca
+binária seguida de varredura do intervalo.
+"""
+
+import json
+import logging
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+
+from .armazem_sqlite import INTERVALO_SINCRONIZACAO_PADRAO, ArmazemSQLite, gatilhos_somente_inclusao
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.Inventario')
+
+TIPOS_MOVIMENTACAO = ('entrada', 'dispensacao', 'transferencia', 'devolucao', 'descarte', 'ajuste')
+
+PRECO_PADRAO = 10.00
+LEAD_TIME_PADRAO = 7  # dias
+CUSTO_PEDIDO_PADRAO = 50.00
+TAXA_MANUTENCAO_PADRAO = 0.25  # fração do preço por ano
+ESTOQUE_SEGURANCA_PADRAO = 0.2  # fração da demanda de 30 dias
+
+_CAPACIDADE_INICIAL = 1024
+_LIMITE_AJUSTE_INDICE = 64  # acima disso o índice de validade é reordenado de uma vez
+
+_TABELAS = ('medicamentos', 'lotes', 'movimentacoes')
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS medicamentos (seq INTEGER PRIMARY KEY, nome TEXT NOT NULL, parametros TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS lotes ("
+    " seq INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, medicamento TEXT NOT NULL, validade INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS movimentacoes ("
+    " seq INTEGER PRIMARY KEY, lote TEXT NOT NULL, quantidade INTEGER NOT NULL, tipo TEXT NOT NULL,"
+    " instante REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS movimentacoes_por_lote ON movimentacoes (lote, seq)",
+    # Nada é alterado nem removido: correções entram como novas linhas (ajuste, novo cadastro)
+    *gatilhos_somente_inclusao(_TABELAS, 'inventario')
+)
+
+
+def _com_capacidade(array: np.ndarray, usados: int, necessario: int) -> np.ndarray:
+    """Devolve o array (ou uma cópia com capacidade dobrada) com espaço para ``necessario`` itens"""
+    capacidade = max(array.shape[0], 1)
+    if necessario <= array.shape[0]:
+        return array
+    while capacidade < necessario:
+        capacidade *= 2
+    novo = np.zeros(capacidade, dtype=array.dtype)
+    novo[:usados] = array[:usados]
+    return novo
+
+
+@dataclass
+class CadastroMedicamento:
+    """Parâmetros de reposição de um medicamento"""
+    nome: str
+    preco_unitario: float = PRECO_PADRAO
+    lead_time: int = LEAD_TIME_PADRAO
+    custo_pedido: float = CUSTO_PEDIDO_PADRAO
+    taxa_manutencao: float = TAXA_MANUTENCAO_PADRAO
+    critico: bool = False
+
+
+def calcular_reposicao(demanda_30_dias: np.ndarray, estoque: np.ndarray, preco: np.ndarray,
+                       lead_time: np.ndarray, custo_pedido: np.ndarray, taxa_manutencao: np.ndarray,
+                       estoque_seguranca: float = ESTOQUE_SEGURANCA_PADRAO) -> dict[str, np.ndarray]:
+    """
+    Lote econômico (EOQ) e ponto de reposição para todos os SKUs de uma vez
+
+    Quando o estoque está abaixo do ponto de reposição, compra-se o que falta
+    até ele mais um lote econômico; sem custo de manutenção definido o lote
+    é a demanda de 30 dias.
+    """
+    demanda = np.maximum(np.asarray(demanda_30_dias, dtype=float), 0.0)
+    estoque = np.asarray(estoque, dtype=float)
+    manutencao = np.asarray(taxa_manutencao, dtype=float) * np.asarray(preco, dtype=float)
+
+    demanda_anual = demanda * 365 / 30
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.where(manutencao > 0, np.sqrt(2 * demanda_anual * np.asarray(custo_pedido) / manutencao), demanda)
+    ponto_reposicao = demanda / 30 * np.asarray(lead_time, dtype=float) + demanda * estoque_seguranca
+    quantidade = np.where(estoque < ponto_reposicao, np.ceil(ponto_reposicao - estoque + eoq), 0.0)
+    return {
+        'eoq': eoq,
+        'ponto_reposicao': ponto_reposicao,
+        'quantidade': quantidade.astype(np.int64)
+    }
+
+
+class InventarioLotes(ArmazemSQLite):
+    """Ledger de movimentações em SQLite com saldos materializados e índice de validade"""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, caminho: str = ":memory:",
+                 intervalo_sincronizacao: float = INTERVALO_SINCRONIZACAO_PADRAO):
+        super().__init__(caminho, intervalo_sincronizacao)
+        self._medicamentos: dict[str, int] = {}
+        self._cadastros: list[CadastroMedicamento] = []
+        self._saldo_medicamento = np.zeros(_CAPACIDADE_INICIAL, dtype=np.int64)
+        self._lotes_medicamento = np.zeros(_CAPACIDADE_INICIAL, dtype=np.int64)  # lotes por medicamento
+
+        self._lotes: dict[str, int] = {}
+        self._codigos_lote: list[str] = []
+        self._lote_medicamento = np.zeros(_CAPACIDADE_INICIAL, dtype=np.int32)
+        self._lote_validade = np.zeros(_CAPACIDADE_INICIAL, dtype=np.int32)  # ordinal da data
+        self._saldo_lote = np.zeros(_CAPACIDADE_INICIAL, dtype=np.int64)
+        self._indice_validade: list[tuple[int, int]] = []  # (validade, lote) dos lotes com saldo, ordenado
+
+        self._total = 0
+        self._aplicados = dict.fromkeys(_TABELAS, 0)  # último seq já aplicado em memória
+        self._abrir()
+        if self._total:
+            logger.info(f"Inventário carregado: {len(self._codigos_lote)} lotes, {self._total} movimentações")
+
+    @property
+    def total_movimentacoes(self) -> int:
+        return self._total
+
+    # === Persistência ===
+
+    def _novas(self, tabela: str, colunas: str) -> list[tuple]:
+        linhas = self._conn.execute(
+            f"SELECT seq, {colunas} FROM {tabela} WHERE seq > ? ORDER BY seq", (self._aplicados[tabela],)
+        ).fetchall()
+        if linhas:
+            self._aplicados[tabela] = linhas[-1][0]
+        return linhas
+
+    def _sincronizar(self) -> None:
+        """Aplica em memória as linhas gravadas desde a última sincronização (com o lock)"""
+        # O limite das movimentações é lido antes dos lotes: toda movimentação até ele
+        # referencia um lote já gravado quando os lotes forem lidos
+        ultimo = self._conn.execute("SELECT MAX(seq) FROM movimentacoes").fetchone()[0] or 0
+        for _, nome, parametros in self._novas('medicamentos', 'nome, parametros'):
+            self._aplicar_cadastro(nome, json.loads(parametros))
+        for _, codigo, medicamento, validade in self._novas('lotes', 'codigo, medicamento, validade'):
+            self._aplicar_lote(codigo, medicamento, validade)
+        if ultimo <= self._aplicados['movimentacoes']:
+            return
+
+        # Só os saldos interessam à memória: o ledger é somado por lote no próprio SQLite
+        somas = self._conn.execute(
+            "SELECT lote, SUM(quantidade), COUNT(*) FROM movimentacoes WHERE seq > ? AND seq <= ? GROUP BY lote",
+            (self._aplicados['movimentacoes'], ultimo)
+        ).fetchall()
+        self._aplicados['movimentacoes'] = ultimo
+        lotes, deltas, contagens = zip(*somas)
+        self._aplicar_saldos(
+            np.fromiter((self._lotes[lote] for lote in lotes), dtype=np.int64, count=len(lotes)),
+            np.array(deltas, dtype=np.int64),
+            sum(contagens)
+        )
+
+    # === Aplicação em memória ===
+
+    def _aplicar_cadastro(self, nome: str, parametros: dict[str, Any]) -> CadastroMedicamento:
+        indice = self._medicamentos.get(nome)
+        if indice is None:
+            cadastro = CadastroMedicamento(nome, **parametros)
+            total = len(self._cadastros)
+            self._saldo_medicamento = _com_capacidade(self._saldo_medicamento, total, total + 1)
+            self._lotes_medicamento = _com_capacidade(self._lotes_medicamento, total, total + 1)
+            self._medicamentos[nome] = total
+            self._cadastros.append(cadastro)
+            return cadastro
+        cadastro = self._cadastros[indice]
+        for campo, valor in parametros.items():
+            setattr(cadastro, campo, valor)
+        return cadastro
+
+    def _aplicar_lote(self, lote: str, medicamento: str, validade: int) -> None:
+        indice = len(self._codigos_lote)
+        for campo in ('_lote_medicamento', '_lote_validade', '_saldo_lote'):
+            setattr(self, campo, _com_capacidade(getattr(self, campo), indice, indice + 1))
+        self._lotes[lote] = indice
+        self._codigos_lote.append(lote)
+        self._lote_medicamento[indice] = self._medicamentos[medicamento]
+        self._lotes_medicamento[self._medicamentos[medicamento]] += 1
+        self._lote_validade[indice] = validade
+
+    def _aplicar_saldos(self, tocados: np.ndarray, delta: np.ndarray, movimentacoes: int) -> None:
+        """Soma ``delta`` aos lotes tocados (sem repetição): o custo não cresce com o inventário nem com o ledger"""
+        antes = self._saldo_lote[tocados]
+        self._saldo_lote[tocados] = antes + delta
+        np.add.at(self._saldo_medicamento, self._lote_medicamento[tocados], delta)
+        self._total += movimentacoes
+        self._reindexar_validade(tocados[(antes <= 0) & (antes + delta > 0)], tocados[(antes > 0) & (antes + delta <= 0)])
+
+    def _reindexar_validade(self, entrando: np.ndarray, saindo: np.ndarray) -> None:
+        """Mantém no índice de validade só os lotes com saldo"""
+        if entrando.size + saindo.size > _LIMITE_AJUSTE_INDICE:
+            # Carga inicial ou movimentação em massa: reordenar sai mais barato que inserir um a um
+            com_saldo = np.flatnonzero(self._saldo_lote[:len(self._codigos_lote)] > 0)
+            validades = self._lote_validade[com_saldo]
+            ordem = np.lexsort((com_saldo, validades))
+            self._indice_validade = list(zip(validades[ordem].tolist(), com_saldo[ordem].tolist()))
+            return
+        for lote in saindo.tolist():
+            del self._indice_validade[bisect_left(self._indice_validade, (int(self._lote_validade[lote]), lote))]
+        for lote in entrando.tolist():
+            insort(self._indice_validade, (int(self._lote_validade[lote]), lote))
+
+    # === Escrita ===
+
+    def cadastrar_medicamento(self, nome: str, **parametros: Any) -> CadastroMedicamento:
+        """Cadastra (ou atualiza) os parâmetros de reposição de um medicamento"""
+        CadastroMedicamento(nome, **parametros)  # valida os nomes dos parâmetros antes de gravar
+        with self._lock:
+            with self._transacao():
+                self._sincronizar()
+                seq = self._conn.execute(
+                    "INSERT INTO medicamentos (nome, parametros) VALUES (?, ?)", (nome, json.dumps(parametros))
+                ).lastrowid
+            self._aplicados['medicamentos'] = seq
+            return self._aplicar_cadastro(nome, parametros)
+
+    def cadastro(self, nome: str) -> CadastroMedicamento | None:
+        with self._lock:
+            indice = self._medicamentos.get(nome)
+            return None if indice is None else self._cadastros[indice]
+
+    def registrar_lote(self, medicamento: str, lote: str, validade: date) -> None:
+        """Registra um lote; o medicamento é cadastrado com parâmetros padrão se necessário"""
+        with self._lock:
+            with self._transacao():
+                self._sincronizar()
+                if lote in self._lotes:
+                    raise ValueError(f"Lote {lote} já registrado")
+                seq_medicamento = None
+                if medicamento not in self._medicamentos:
+                    seq_medicamento = self._conn.execute(
+                        "INSERT INTO medicamentos (nome, parametros) VALUES (?, '{}')", (medicamento,)
+                    ).lastrowid
+                seq_lote = self._conn.execute(
+                    "INSERT INTO lotes (codigo, medicamento, validade) VALUES (?, ?, ?)",
+                    (lote, medicamento, validade.toordinal())
+                ).lastrowid
+            if seq_medicamento is not None:
+                self._aplicados['medicamentos'] = seq_medicamento
+                self._aplicar_cadastro(medicamento, {})
+            self._aplicados['lotes'] = seq_lote
+            self._aplicar_lote(lote, medicamento, validade.toordinal())
+
+    def registrar_movimentacoes(self, lotes: Sequence[str], quantidades: Sequence[int],
+                                tipos: Sequence[str] | str = 'ajuste',
+                                instantes: Sequence[float] | None = None) -> None:
+        """
+        Inclui movimentações em lote (quantidade positiva entra, negativa sai)
+
+        O lote inteiro é rejeitado se algum saldo de lote ficaria negativo.
+        """
+        lotes = [str(lote) for lote in lotes]
+        quantidades = np.asarray(quantidades, dtype=np.int64)
+        tipos = [tipos] * len(lotes) if isinstance(tipos, str) else list(tipos)
+        invalidos = set(tipos).difference(TIPOS_MOVIMENTACAO)
+        if invalidos:
+            raise KeyError(f"Tipo de movimentação inválido: {sorted(invalidos)[0]}")
+        instantes = np.full(len(lotes), datetime.now().timestamp()) if instantes is None \
+            else np.asarray(instantes, dtype=np.float64)
+
+        with self._lock:
+            with self._transacao():
+                self._sincronizar()
+                try:
+                    indices = np.fromiter((self._lotes[lote] for lote in lotes), dtype=np.int64, count=len(lotes))
+                except KeyError as e:
+                    raise KeyError(f"Lote não registrado: {e.args[0]}") from None
+                tocados, posicoes = np.unique(indices, return_inverse=True)
+                delta = np.bincount(posicoes, weights=quantidades).astype(np.int64)
+                negativos = np.flatnonzero(self._saldo_lote[tocados] + delta < 0)
+                if negativos.size:
+                    raise ValueError(f"Saldo insuficiente no lote {self._codigos_lote[tocados[negativos[0]]]}")
+
+                self._conn.executemany(
+                    "INSERT INTO movimentacoes (lote, quantidade, tipo, instante) VALUES (?, ?, ?, ?)",
+                    zip(lotes, quantidades.tolist(), tipos, instantes.tolist())
+                )
+                ultimo = self._conn.execute("SELECT MAX(seq) FROM movimentacoes").fetchone()[0]
+            if indices.size:
+                self._aplicados['movimentacoes'] = ultimo
+                self._aplicar_saldos(tocados, delta, indices.size)
+
+    def movimentar(self, lote: str, quantidade: int, tipo: str = 'ajuste') -> None:
+        self.registrar_movimentacoes([lote], [quantidade], tipo)
+
+    # === Consultas ===
+
+    def saldo_lote(self, lote: str) -> int:
+        with self._lock:
+            indice = self._lotes.get(lote)
+            return 0 if indice is None else int(self._saldo_lote[indice])
+
+    def saldo(self, medicamento: str) -> int:
+        with self._lock:
+            indice = self._medicamentos.get(medicamento)
+            return 0 if indice is None else int(self._saldo_medicamento[indice])
+
+    def saldos(self, medicamentos: Sequence[str]) -> np.ndarray:
+        """Saldos de vários medicamentos (0 para os não cadastrados)"""
+        with self._lock:
+            indices = np.array([self._medicamentos.get(nome, -1) for nome in medicamentos], dtype=np.int64)
+            return np.where(indices >= 0, self._saldo_medicamento[np.maximum(indices, 0)], 0)
+
+    def rastreados(self, medicamentos: Sequence[str]) -> np.ndarray:
+        """Quais medicamentos têm ao menos um lote no inventário (saldo conhecido, ainda que zero)"""
+        with self._lock:
+            indices = np.array([self._medicamentos.get(nome, -1) for nome in medicamentos], dtype=np.int64)
+            return (indices >= 0) & (self._lotes_medicamento[np.maximum(indices, 0)] > 0)
+
+    def parametros_reposicao(self, medicamentos: Sequence[str]) -> dict[str, np.ndarray]:
+        """Colunas de preço, lead time e custos (padrões para os não cadastrados)"""
+        with self._lock:
+            cadastros = [
+                self._cadastros[self._medicamentos[nome]] if nome in self._medicamentos else CadastroMedicamento(nome)
+                for nome in medicamentos
+            ]
+        return {
+            'preco': np.array([c.preco_unitario for c in cadastros], dtype=float),
+            'lead_time': np.array([c.lead_time for c in cadastros], dtype=float),
+            'custo_pedido': np.array([c.custo_pedido for c in cadastros], dtype=float),
+            'taxa_manutencao': np.array([c.taxa_manutencao for c in cadastros], dtype=float),
+            'critico': np.array([c.critico for c in cadastros], dtype=bool)
+        }
+
+    def lotes_vencendo(self, dias: int, referencia: date | None = None, incluir_vencidos: bool = True) -> dict[str, Any]:
+        """
+        Lotes com saldo que vencem até ``dias`` após a referência, em ordem de validade
+
+        O índice só guarda lotes com saldo, então a varredura (inclusive dos
+        vencidos) é do tamanho da resposta. Retorna colunas: lote,
+        medicamento, validade, quantidade, dias_para_vencimento.
+        """
+        hoje = (referencia or date.today()).toordinal()
+        with self._lock:
+            inicio = 0 if incluir_vencidos else bisect_right(self._indice_validade, (hoje, -1))
+            fim = bisect_right(self._indice_validade, (hoje + dias, len(self._codigos_lote)))
+            faixa = np.array([lote for _, lote in self._indice_validade[inicio:fim]], dtype=np.int64)
+            validades = self._lote_validade[faixa]
+            return {
+                'lote': [self._codigos_lote[i] for i in faixa],
+                'medicamento': [self._cadastros[i].nome for i in self._lote_medicamento[faixa]],
+                'validade': [date.fromordinal(int(v)) for v in validades],
+                'quantidade': self._saldo_lote[faixa],
+                'dias_para_vencimento': validades - hoje
+            }
+
+    def movimentacoes_lote(self, lote: str) -> dict[str, np.ndarray]:
+        """Histórico de movimentações de um lote, em ordem de inclusão (consulta pelo índice do lote)"""
+        with self._lock:
+            if lote not in self._lotes:
+                raise KeyError(f"Lote não registrado: {lote}")
+            linhas = self._conn.execute(
+                "SELECT quantidade, tipo, instante FROM movimentacoes WHERE lote = ? ORDER BY seq", (lote,)
+            ).fetchall()
+        quantidades, tipos, instantes = zip(*linhas) if linhas else ((), (), ())
+        return {
+            'quantidade': np.array(quantidades, dtype=np.int64),
+            'tipo': np.array(tipos, dtype=str),
+            'instante': np.array(instantes, dtype=np.float64)
+        }
+
+
+def _criar_inventario() -> InventarioLotes:
+    from app.core.config import settings
+    return InventarioLotes(settings.FARMACIA_INVENTARIO_DB)
+
+
+_inventario = ServicoProcesso('inventario_lotes', _criar_inventario, iniciar_no_startup=True)
+
+
+def obter_inventario_lotes() -> InventarioLotes:
+    """Inventário compartilhado do processo, no arquivo configurado"""
+    return _inventario.obter()
@@ -0,0 +1,344 @@
+"""
+Camada materializada de KPIs da farmácia
+
+Eventos de dispensação, custo, intervenção farmacêutica e análise de
+prescrição são somados, na chegada, numa tabela diária (um dia por linha,
+uma métrica aditiva por coluna). Qualquer período do dashboard é respondido
+somando as linhas dos seus dias, sem reler eventos. O custo por
+medicamento, que não cabe em colunas fixas, é mantido em baldes diários e
+mensais: um período soma os meses inteiros que cobre e só os dias das
+pontas.
+
+A tabela diária e os custos diários por medicamento são gravados em SQLite
+(uma linha por dia e métrica, somada a cada lote), de modo que o rollup
+sobrevive a reinícios e é compartilhado entre processos: cada linha guarda o
+número do lote que a alterou por último, e as linhas alteradas por outros
+processos são recarregadas antes de cada escrita e pela sincronização
+periódica de ``ArmazemSQLite``.
+
+Quem mantém resultados derivados (ex.: o cache do dashboard executivo) se
+inscreve para ser avisado dos dias alterados a cada lote de eventos.
+"""
+
+import logging
+import re
+import time
+import weakref
+from collections import Counter
+from collections.abc import Callable, Iterable
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from .armazem_sqlite import INTERVALO_SINCRONIZACAO_PADRAO, ArmazemSQLite
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.KPIs')
+
+METRICAS = (
+    'solicitacoes', 'dispensacoes', 'faltas', 'itens_dispensados', 'custo_medicamentos', 'receita',
+    'dispensacoes_cronometradas', 'tempo_dispensacao_total', 'entregas_avaliadas', 'entregas_no_prazo',
+    'custo_pessoal', 'custo_infraestrutura', 'custo_tecnologia', 'economia_negociacao', 'economia_genericos',
+    'intervencoes', 'intervencoes_aceitas', 'erros_evitados', 'custo_evitado',
+    'prescricoes_analisadas', 'prescricoes_adequadas', 'tempo_analise_total'
+)
+_COLUNA = {metrica: i for i, metrica in enumerate(METRICAS)}
+
+CATEGORIAS_CUSTO = {
+    'pessoal': 'custo_pessoal',
+    'infraestrutura': 'custo_infraestrutura',
+    'tecnologia': 'custo_tecnologia',
+    'economia_negociacao': 'economia_negociacao',
+    'economia_genericos': 'economia_genericos'
+}
+TIPOS_EVENTO = ('dispensacao', 'custo', 'intervencao', 'analise_prescricao')
+
+_DIAS_INICIAIS = 800
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS lotes (seq INTEGER PRIMARY KEY, registrado_em REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS metricas_diarias ("
+    " dia INTEGER NOT NULL, metrica TEXT NOT NULL, valor REAL NOT NULL, lote INTEGER NOT NULL,"
+    " PRIMARY KEY (dia, metrica))",
+    "CREATE INDEX IF NOT EXISTS metricas_diarias_lote ON metricas_diarias (lote)",
+    "CREATE TABLE IF NOT EXISTS custos_diarios ("
+    " dia INTEGER NOT NULL, medicamento TEXT NOT NULL, valor REAL NOT NULL, lote INTEGER NOT NULL,"
+    " PRIMARY KEY (dia, medicamento))",
+    "CREATE INDEX IF NOT EXISTS custos_diarios_lote ON custos_diarios (lote)",
+)
+_PERIODO = re.compile(r'^(\d+)_(dia|dias|semana|semanas|mes|meses|ano|anos)$')
+_DIAS_POR_UNIDADE = {'dia': 1, 'semana': 7, 'mes': 30, 'ano': 365}
+
+
+def dias_do_periodo(periodo: str) -> int:
+    """Número de dias de um período no formato do dashboard ('30_dias', '12_meses', '2_anos')"""
+    correspondencia = _PERIODO.match(periodo)
+    if not correspondencia:
+        raise ValueError(f"Período inválido: {periodo}")
+    quantidade, unidade = int(correspondencia.group(1)), correspondencia.group(2)
+    unidade = {'meses': 'mes', 'dias': 'dia', 'semanas': 'semana', 'anos': 'ano'}.get(unidade, unidade)
+    return quantidade * _DIAS_POR_UNIDADE[unidade]
+
+
+def _dia(data: date | datetime | str) -> int:
+    if isinstance(data, str):
+        data = date.fromisoformat(data[:10])
+    elif isinstance(data, datetime):
+        data = data.date()
+    return data.toordinal()
+
+
+class KPIsFarmacia(ArmazemSQLite):
+    """Tabela diária de métricas aditivas alimentada por eventos"""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, caminho: str = ":memory:",
+                 intervalo_sincronizacao: float = INTERVALO_SINCRONIZACAO_PADRAO):
+        super().__init__(caminho, intervalo_sincronizacao)
+        self._origem: int | None = None  # ordinal do dia da linha 0
+        self._tabela = np.zeros((0, len(METRICAS)))
+        self._custo_dia: dict[int, Counter] = {}
+        self._custo_mes: dict[tuple[int, int], Counter] = {}
+        self._ouvintes: list[Callable[[], Callable[[int, int], None] | None]] = []
+        self.versao = 0
+        self._ultimo_lote = 0  # último lote já refletido em memória
+        self._abrir()
+        if self._origem is not None:
+            logger.info(f"KPIs da farmácia carregados até o lote {self._ultimo_lote}")
+
+    def inscrever(self, ouvinte: Callable[[int, int], None]) -> None:
+        """
+        Registra ``ouvinte(primeiro_dia, ultimo_dia)`` (ordinais), chamado após
+        cada lote; métodos são guardados por referência fraca
+        """
+        referencia = weakref.WeakMethod(ouvinte) if hasattr(ouvinte, '__self__') else (lambda: ouvinte)
+        with self._lock:
+            self._ouvintes.append(referencia)
+
+    def registrar_eventos(self, eventos: Iterable[dict[str, Any]]) -> int:
+        """
+        Incorpora eventos ('tipo' em TIPOS_EVENTO e 'data'); devolve quantos entraram
+
+        O lote é validado inteiro antes de tocar na tabela: um evento inválido
+        rejeita o lote com ValueError.
+        """
+        incrementos: dict[tuple[int, int], float] = {}
+        custos: list[tuple[int, str, float]] = []
+
+        def somar(dia: int, metrica: str, valor: float) -> None:
+            chave = (dia, _COLUNA[metrica])
+            incrementos[chave] = incrementos.get(chave, 0.0) + valor
+
+        total = 0
+        for evento in eventos:
+            tipo = evento.get('tipo')
+            try:
+                dia = _dia(evento['data'])
+            except (KeyError, ValueError, AttributeError):
+                raise ValueError(f"Evento sem data válida: {evento}") from None
+
+            if tipo == 'dispensacao':
+                somar(dia, 'solicitacoes', 1)
+                if not evento.get('atendida', True):
+                    somar(dia, 'faltas', 1)
+                else:
+                    custo = float(evento.get('custo', 0.0))
+                    somar(dia, 'dispensacoes', 1)
+                    somar(dia, 'itens_dispensados', evento.get('quantidade', 1))
+                    somar(dia, 'custo_medicamentos', custo)
+                    somar(dia, 'receita', evento.get('receita', 0.0))
+                    if evento.get('tempo_min') is not None:
+                        somar(dia, 'dispensacoes_cronometradas', 1)
+                        somar(dia, 'tempo_dispensacao_total', evento['tempo_min'])
+                    if evento.get('no_prazo') is not None:
+                        somar(dia, 'entregas_avaliadas', 1)
+                        somar(dia, 'entregas_no_prazo', bool(evento['no_prazo']))
+                    if custo and evento.get('medicamento'):
+                        custos.append((dia, evento['medicamento'], custo))
+            elif tipo == 'custo':
+                metrica = CATEGORIAS_CUSTO.get(evento.get('categoria'))
+                if metrica is None:
+                    raise ValueError(f"Categoria de custo desconhecida: {evento.get('categoria')}")
+                somar(dia, metrica, evento.get('valor', 0.0))
+            elif tipo == 'intervencao':
+                somar(dia, 'intervencoes', 1)
+                somar(dia, 'intervencoes_aceitas', bool(evento.get('aceita', False)))
+                somar(dia, 'erros_evitados', bool(evento.get('erro_evitado', False)))
+                somar(dia, 'custo_evitado', evento.get('custo_evitado', 0.0))
+            elif tipo == 'analise_prescricao':
+                somar(dia, 'prescricoes_analisadas', 1)
+                somar(dia, 'prescricoes_adequadas', bool(evento.get('adequada', True)))
+                somar(dia, 'tempo_analise_total', evento.get('tempo_min', 0.0))
+            else:
+                raise ValueError(f"Tipo de evento desconhecido: {tipo}")
+            total += 1
+
+        if not incrementos:
+            return total
+
+        chaves = np.array(list(incrementos), dtype=np.int64)
+        valores = np.fromiter(incrementos.values(), dtype=float, count=len(incrementos))
+        primeiro, ultimo = int(chaves[:, 0].min()), int(chaves[:, 0].max())
+        custos_agregados: Counter = Counter()
+        for dia, medicamento, custo in custos:
+            custos_agregados[(dia, medicamento)] += custo
+
+        with self._lock:
+            with self._transacao():
+                alterados = self._sincronizar()
+                lote = self._conn.execute("INSERT INTO lotes (registrado_em) VALUES (?)", (time.time(),)).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO metricas_diarias (dia, metrica, valor, lote) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (dia, metrica) DO UPDATE SET valor = valor + excluded.valor, lote = excluded.lote",
+                    ((dia, METRICAS[coluna], valor, lote) for (dia, coluna), valor in incrementos.items())
+                )
+                self._conn.executemany(
+                    "INSERT INTO custos_diarios (dia, medicamento, valor, lote) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (dia, medicamento) DO UPDATE SET valor = valor + excluded.valor,"
+                    " lote = excluded.lote",
+                    ((dia, medicamento, custo, lote) for (dia, medicamento), custo in custos_agregados.items())
+                )
+
+            self._garantir_dias(primeiro, ultimo)
+            np.add.at(self._tabela, (chaves[:, 0] - self._origem, chaves[:, 1]), valores)
+            for (dia, medicamento), custo in custos_agregados.items():
+                self._somar_custo(dia, medicamento, custo)
+            self._ultimo_lote = lote
+            self.versao += 1
+            if alterados is not None:
+                primeiro, ultimo = min(primeiro, alterados[0]), max(ultimo, alterados[1])
+            ouvintes = self._ouvintes_ativos()
+
+        self._avisar(ouvintes, primeiro, ultimo)
+        return total
+
+    def _somar_custo(self, dia: int, medicamento: str, custo: float) -> None:
+        self._custo_dia.setdefault(dia, Counter())[medicamento] += custo
+        data = date.fromordinal(dia)
+        self._custo_mes.setdefault((data.year, data.month), Counter())[medicamento] += custo
+
+    def _ouvintes_ativos(self) -> list[Callable[[int, int], None]]:
+        self._ouvintes = [referencia for referencia in self._ouvintes if referencia() is not None]
+        return [ouvinte for ouvinte in (referencia() for referencia in self._ouvintes) if ouvinte is not None]
+
+    @staticmethod
+    def _avisar(ouvintes: list[Callable[[int, int], None]], primeiro: int, ultimo: int) -> None:
+        for ouvinte in ouvintes:
+            ouvinte(primeiro, ultimo)
+
+    def _sincronizar(self) -> tuple[int, int] | None:
+        """
+        Recarrega (com o lock) as linhas alteradas por lotes ainda não vistos
+
+        O banco guarda o valor acumulado de cada dia, que substitui o de
+        memória. Devolve a faixa de dias alterados, ou None.
+        """
+        ultimo_lote = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM lotes").fetchone()[0]
+        if ultimo_lote <= self._ultimo_lote:
+            return None
+        metricas = self._conn.execute(
+            "SELECT dia, metrica, valor FROM metricas_diarias WHERE lote > ?", (self._ultimo_lote,)
+        ).fetchall()
+        custos = self._conn.execute(
+            "SELECT dia, medicamento, valor FROM custos_diarios WHERE lote > ?", (self._ultimo_lote,)
+        ).fetchall()
+        self._ultimo_lote = ultimo_lote
+        dias = [dia for dia, _, _ in metricas] + [dia for dia, _, _ in custos]
+        if not dias:
+            return None
+
+        self._garantir_dias(min(dias), max(dias))
+        for dia, metrica, valor in metricas:
+            if metrica in _COLUNA:  # métricas removidas do código ficam só no banco
+                self._tabela[dia - self._origem, _COLUNA[metrica]] = valor
+        for dia, medicamento, valor in custos:
+            self._somar_custo(dia, medicamento, valor - self._custo_dia.get(dia, Counter())[medicamento])
+        self.versao += 1
+        return min(dias), max(dias)
+
+    def sincronizar(self) -> tuple[int, int] | None:
+        """Aplica o que outros processos gravaram e avisa os inscritos dos dias alterados"""
+        alterados = super().sincronizar()
+        if alterados:
+            with self._lock:
+                ouvintes = self._ouvintes_ativos()
+            self._avisar(ouvintes, *alterados)
+        return alterados
+
+    def _garantir_dias(self, primeiro: int, ultimo: int) -> None:
+        if self._origem is None:
+            self._origem = primeiro
+            self._tabela = np.zeros((max(_DIAS_INICIAIS, ultimo - primeiro + 1), len(METRICAS)))
+            return
+        if primeiro < self._origem:
+            # Histórico retroativo: abre espaço antes da origem (com folga para cargas seguintes)
+            deslocamento = max(self._origem - primeiro, self._tabela.shape[0] // 2)
+            tabela = np.zeros((self._tabela.shape[0] + deslocamento, len(METRICAS)))
+            tabela[deslocamento:] = self._tabela
+            self._tabela, self._origem = tabela, self._origem - deslocamento
+        necessario = ultimo - self._origem + 1
+        if necessario > self._tabela.shape[0]:
+            tabela = np.zeros((max(necessario, 2 * self._tabela.shape[0]), len(METRICAS)))
+            tabela[:self._tabela.shape[0]] = self._tabela
+            self._tabela = tabela
+
+    def _faixa(self, inicio: date, fim: date) -> tuple[int, int]:
+        if self._origem is None:
+            return 0, 0
+        primeira = min(max(inicio.toordinal() - self._origem, 0), self._tabela.shape[0])
+        ultima = min(max(fim.toordinal() - self._origem + 1, 0), self._tabela.shape[0])
+        return primeira, max(primeira, ultima)
+
+    def tem_eventos(self, inicio: date, fim: date) -> bool:
+        """Se algum evento foi registrado de ``inicio`` a ``fim`` (inclusive)"""
+        with self._lock:
+            primeira, ultima = self._faixa(inicio, fim)
+            return bool(np.any(self._tabela[primeira:ultima]))
+
+    def totais(self, inicio: date, fim: date) -> dict[str, float]:
+        """Soma de cada métrica de ``inicio`` a ``fim`` (inclusive)"""
+        with self._lock:
+            primeira, ultima = self._faixa(inicio, fim)
+            somas = self._tabela[primeira:ultima].sum(axis=0) if ultima > primeira else np.zeros(len(METRICAS))
+        return dict(zip(METRICAS, somas.tolist()))
+
+    def serie(self, metrica: str, inicio: date, fim: date) -> np.ndarray:
+        """Valores diários de uma métrica (dias sem eventos valem 0)"""
+        dias = fim.toordinal() - inicio.toordinal() + 1
+        serie = np.zeros(max(dias, 0))
+        with self._lock:
+            primeira, ultima = self._faixa(inicio, fim)
+            if ultima > primeira:
+                deslocamento = self._origem + primeira - inicio.toordinal()
+                serie[deslocamento:deslocamento + ultima - primeira] = self._tabela[primeira:ultima, _COLUNA[metrica]]
+        return serie
+
+    def custos_por_medicamento(self, inicio: date, fim: date, limite: int | None = None) -> list[tuple[str, float]]:
+        """Medicamentos de maior custo no período, somando meses inteiros e dias das pontas"""
+        total: Counter = Counter()
+        dia = inicio
+        with self._lock:
+            while dia <= fim:
+                proximo_mes = date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+                if dia.day == 1 and proximo_mes - timedelta(days=1) <= fim:
+                    total.update(self._custo_mes.get((dia.year, dia.month), {}))
+                    dia = proximo_mes
+                    continue
+                total.update(self._custo_dia.get(dia.toordinal(), {}))
+                dia += timedelta(days=1)
+        return total.most_common(limite)
+
+
+def _criar_kpis() -> KPIsFarmacia:
+    from app.core.config import settings
+    return KPIsFarmacia(settings.FARMACIA_KPIS_DB)
+
+
+_kpis = ServicoProcesso('kpis_farmacia', _criar_kpis, iniciar_no_startup=True)
+
+
+def obter_kpis_farmacia() -> KPIsFarmacia:
+    """Camada de KPIs compartilhada do processo, no arquivo configurado"""
+    return _kpis.obter()
@@ -0,0 +1,278 @@
+"""
+Ledger local append-only para rastreabilidade de medicamentos
+
+Eventos são gravados em blocos: cada bloco guarda a raiz Merkle (SHA-256)
+dos seus eventos e o hash do bloco anterior, formando uma cadeia. Cada bloco
+é uma única transação SQLite (group commit, um fsync por bloco). Índices por
+código de rastreio e lote permitem consultar o histórico em O(log n), e a
+verificação da cadeia recomeça a partir do último checkpoint verificado.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from .servicos import ServicoProcesso
+
+HASH_GENESIS = "0" * 64
+TAMANHO_BLOCO_PADRAO = 1000
+# Eventos de observação (não de custódia): sozinhos não exigem registro de fabricação
+EVENTOS_OBSERVACAO = ("leitura_rfid",)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS blocos ("
+    " numero INTEGER PRIMARY KEY, hash_anterior TEXT NOT NULL, raiz_merkle TEXT NOT NULL,"
+    " hash_bloco TEXT NOT NULL, total_eventos INTEGER NOT NULL, criado_em REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS eventos ("
+    " seq INTEGER PRIMARY KEY, bloco INTEGER NOT NULL, posicao INTEGER NOT NULL,"
+    " codigo_rastreio TEXT NOT NULL, lote TEXT, tipo TEXT, hash_evento TEXT NOT NULL, payload TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_eventos_codigo ON eventos (codigo_rastreio, seq)",
+    "CREATE INDEX IF NOT EXISTS ix_eventos_lote ON eventos (lote, seq)",
+    "CREATE INDEX IF NOT EXISTS ix_eventos_bloco ON eventos (bloco, posicao)",
+    "CREATE TABLE IF NOT EXISTS checkpoint ("
+    " id INTEGER PRIMARY KEY CHECK (id = 1), bloco INTEGER NOT NULL, hash_bloco TEXT NOT NULL)",
+    # Blocos e eventos nunca são alterados nem removidos
+    "CREATE TRIGGER IF NOT EXISTS eventos_append_only_update BEFORE UPDATE ON eventos"
+    " BEGIN SELECT RAISE(ABORT, 'ledger append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS eventos_append_only_delete BEFORE DELETE ON eventos"
+    " BEGIN SELECT RAISE(ABORT, 'ledger append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS blocos_append_only_update BEFORE UPDATE ON blocos"
+    " BEGIN SELECT RAISE(ABORT, 'ledger append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS blocos_append_only_delete BEFORE DELETE ON blocos"
+    " BEGIN SELECT RAISE(ABORT, 'ledger append-only'); END",
+)
+
+
+def serializar_evento(codigo_rastreio: str, evento: dict) -> str:
+    """JSON canônico do evento (chaves ordenadas, sem espaços) usado no hash"""
+    return json.dumps(
+        {"codigo_rastreio": codigo_rastreio, "evento": evento},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+
+
+def hash_evento(payload: str) -> str:
+    # Prefixos distintos para folhas e nós (RFC 6962) evitam colisões entre níveis
+    return hashlib.sha256(b"\x00" + payload.encode()).hexdigest()
+
+
+def raiz_merkle(hashes: list[str]) -> str:
+    """Raiz Merkle dos hashes de eventos; nó ímpar sobe sem duplicação"""
+    if not hashes:
+        return hashlib.sha256(b"").hexdigest()
+    nivel = [bytes.fromhex(h) for h in hashes]
+    while len(nivel) > 1:
+        proximo = [
+            hashlib.sha256(b"\x01" + nivel[i] + nivel[i + 1]).digest()
+            for i in range(0, len(nivel) - 1, 2)
+        ]
+        if len(nivel) % 2:
+            proximo.append(nivel[-1])
+        nivel = proximo
+    return nivel[0].hex()
+
+
+def hash_bloco(numero: int, hash_anterior: str, raiz: str, total_eventos: int, criado_em: float) -> str:
+    cabecalho = f"{numero}|{hash_anterior}|{raiz}|{total_eventos}|{criado_em!r}"
+    return hashlib.sha256(cabecalho.encode()).hexdigest()
+
+
+class LedgerFarmaceutico:
+    """Ledger append-only em SQLite (WAL) com blocos encadeados por SHA-256"""
+
+    def __init__(self, caminho: str = ":memory:"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        if caminho != ":memory:":
+            Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Em WAL, FULL sincroniza o log a cada commit: um fsync por bloco
+        self._conn.execute("PRAGMA synchronous=FULL")
+        for comando in _SCHEMA:
+            self._conn.execute(comando)
+
+        ultimo = self._conn.execute(
+            "SELECT numero, hash_bloco FROM blocos ORDER BY numero DESC LIMIT 1"
+        ).fetchone()
+        self._ultimo_bloco, self._ultimo_hash = ultimo if ultimo else (0, HASH_GENESIS)
+
+    @property
+    def altura(self) -> int:
+        """Número do último bloco gravado"""
+        return self._ultimo_bloco
+
+    def anexar(self, eventos: Iterable[tuple[str, dict]]) -> list[dict[str, Any]]:
+        """
+        Grava ``(codigo_rastreio, evento)`` como um novo bloco, numa transação
+
+        Retorna um recibo por evento com hash, bloco e posição.
+        """
+        payloads = [(codigo, evento, serializar_evento(codigo, evento)) for codigo, evento in eventos]
+        if not payloads:
+            return []
+        hashes = [hash_evento(payload) for _, _, payload in payloads]
+        raiz = raiz_merkle(hashes)
+
+        with self._lock:
+            numero = self._ultimo_bloco + 1
+            criado_em = time.time()
+            hash_atual = hash_bloco(numero, self._ultimo_hash, raiz, len(payloads), criado_em)
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    "INSERT INTO blocos VALUES (?, ?, ?, ?, ?, ?)",
+                    (numero, self._ultimo_hash, raiz, hash_atual, len(payloads), criado_em)
+                )
+                self._conn.executemany(
+                    "INSERT INTO eventos (bloco, posicao, codigo_rastreio, lote, tipo, hash_evento, payload)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (numero, posicao, codigo, _texto(evento.get("lote")), _texto(evento.get("tipo")),
+                         hashes[posicao], payload)
+                        for posicao, (codigo, evento, payload) in enumerate(payloads)
+                    ]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._ultimo_bloco, self._ultimo_hash = numero, hash_atual
+
+        return [
+            {"hash": h, "bloco": numero, "posicao": posicao, "hash_bloco": hash_atual, "timestamp": criado_em}
+            for posicao, h in enumerate(hashes)
+        ]
+
+    def historico(self, codigo_rastreio: str) -> list[dict[str, Any]]:
+        """Eventos de um código de rastreio em ordem de gravação"""
+        return self._consultar("codigo_rastreio", codigo_rastreio)
+
+    def historico_lote(self, lote: str) -> list[dict[str, Any]]:
+        """Eventos que declaram o lote informado, em ordem de gravação"""
+        return self._consultar("lote", lote)
+
+    def _consultar(self, coluna: str, valor: str) -> list[dict[str, Any]]:
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT codigo_rastreio, payload, hash_evento, bloco FROM eventos WHERE {coluna} = ? ORDER BY seq",
+                (valor,)
+            ).fetchall()
+        resultado = []
+        for codigo, payload, hash_, bloco in linhas:
+            evento = json.loads(payload)["evento"]
+            resultado.append({**evento, "codigo_rastreio": codigo, "hash_evento": hash_, "bloco": bloco})
+        return resultado
+
+    def estatisticas(self, desde: float | None = None) -> dict[str, int]:
+        """Contagens dos eventos gravados a partir de ``desde`` (epoch), via índices"""
+        with self._lock:
+            primeiro = 1
+            if desde is not None:
+                linha = self._conn.execute("SELECT MIN(numero) FROM blocos WHERE criado_em >= ?", (desde,)).fetchone()
+                primeiro = linha[0] if linha[0] is not None else self._ultimo_bloco + 1
+            eventos, codigos, lotes = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT codigo_rastreio), COUNT(DISTINCT lote) FROM eventos WHERE bloco >= ?",
+                (primeiro,)
+            ).fetchone()
+            # Só códigos com eventos de custódia; leituras RFID avulsas não indicam falsificação
+            observacao = ", ".join("?" * len(EVENTOS_OBSERVACAO))
+            sem_fabricacao = self._conn.execute(
+                "SELECT COUNT(DISTINCT codigo_rastreio) FROM eventos e WHERE bloco >= ?"
+                f" AND COALESCE(tipo, '') NOT IN ({observacao}) AND NOT EXISTS"
+                " (SELECT 1 FROM eventos f WHERE f.codigo_rastreio = e.codigo_rastreio AND f.tipo = 'fabricacao')",
+                (primeiro, *EVENTOS_OBSERVACAO)
+            ).fetchone()[0]
+        return {
+            "eventos_registrados": eventos,
+            "medicamentos_rastreados": codigos,
+            "lotes_rastreados": lotes,
+            "codigos_sem_fabricacao": sem_fabricacao
+        }
+
+    def verificar_cadeia(self, completa: bool = False) -> dict[str, Any]:
+        """
+        Recalcula hashes de eventos, raízes Merkle e encadeamento dos blocos
+
+        Sem ``completa``, parte do último checkpoint; se tudo conferir, o
+        checkpoint avança para o último bloco verificado.
+        """
+        with self._lock:
+            inicio, hash_anterior = 0, HASH_GENESIS
+            if not completa:
+                checkpoint = self._conn.execute("SELECT bloco, hash_bloco FROM checkpoint WHERE id = 1").fetchone()
+                if checkpoint:
+                    inicio, hash_anterior = checkpoint
+
+            blocos = self._conn.execute(
+                "SELECT numero, hash_anterior, raiz_merkle, hash_bloco, total_eventos, criado_em"
+                " FROM blocos WHERE numero > ? ORDER BY numero", (inicio,)
+            ).fetchall()
+            eventos = self._conn.execute(
+                "SELECT bloco, hash_evento, payload FROM eventos WHERE bloco > ? ORDER BY bloco, posicao", (inicio,)
+            )
+
+            resultado = {"integra": True, "desde_bloco": inicio, "blocos_verificados": 0, "eventos_verificados": 0}
+            esperado = inicio + 1
+            pendente = eventos.fetchone()
+            for numero, anterior, raiz, hash_gravado, total, criado_em in blocos:
+                hashes = []
+                while pendente is not None and pendente[0] == numero:
+                    _, hash_gravado_evento, payload = pendente
+                    if hash_evento(payload) != hash_gravado_evento:
+                        return self._falha(resultado, numero, "hash de evento não confere")
+                    hashes.append(hash_gravado_evento)
+                    pendente = eventos.fetchone()
+
+                if numero != esperado or anterior != hash_anterior:
+                    return self._falha(resultado, numero, "encadeamento de blocos rompido")
+                if len(hashes) != total or raiz_merkle(hashes) != raiz:
+                    return self._falha(resultado, numero, "raiz Merkle não confere")
+                if hash_bloco(numero, anterior, raiz, total, criado_em) != hash_gravado:
+                    return self._falha(resultado, numero, "hash do bloco não confere")
+
+                resultado["blocos_verificados"] += 1
+                resultado["eventos_verificados"] += total
+                hash_anterior, esperado = hash_gravado, numero + 1
+
+            if pendente is not None:
+                return self._falha(resultado, pendente[0], "evento sem bloco correspondente")
+
+            if resultado["blocos_verificados"]:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoint (id, bloco, hash_bloco) VALUES (1, ?, ?)",
+                    (esperado - 1, hash_anterior)
+                )
+        resultado["checkpoint"] = esperado - 1
+        return resultado
+
+    @staticmethod
+    def _falha(resultado: dict[str, Any], bloco: int, motivo: str) -> dict[str, Any]:
+        resultado.update({"integra": False, "bloco_invalido": bloco, "motivo": motivo})
+        return resultado
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _texto(valor: Any) -> str | None:
+    return None if valor is None else str(valor)
+
+
+def _criar_ledger() -> LedgerFarmaceutico:
+    from app.core.config import settings
+    return LedgerFarmaceutico(settings.FARMACIA_LEDGER_DB)
+
+
+_ledger = ServicoProcesso('ledger_farmaceutico', _criar_ledger, iniciar_no_startup=True)
+
+
+def obter_ledger_farmaceutico() -> LedgerFarmaceutico:
+    """Ledger compartilhado pelo processo, no arquivo configurado"""
+    return _ledger.obter()
@@ -3,16 +3,19 @@ Sistema inteligente de nutrição parenteral
 """
 
 import logging
+import time
 from datetime import datetime
 
+from .formulacao_parenteral import LIMITE_PRODUTO_CALCIO_FOSFATO, meta_de_necessidades, obter_formulador_np
+
 logger = logging.getLogger('MedAI.Farmacia.NutricaoParenteral')
 
 class NutricaoParenteralIA:
     """Sistema inteligente de nutrição parenteral"""
 
-    def __init__(self):
+    def __init__(self, formulador=None):
         self.calculador_nutricional = CalculadorNutricionalIA()
-        self.formulador_np = FormuladorNutricaoParenteral()
+        self.formulador_np = formulador or obter_formulador_np()
         self.monitor_compatibilidade = MonitorCompatibilidadeNP()
 
     async def calcular_nutricao_parenteral(self, paciente: dict) -> dict:
@@ -50,6 +53,51 @@ class NutricaoParenteralIA:
                 'monitoramento': {}
             }
 
+    async def calcular_nutricao_parenteral_lote(self, pacientes: list[dict]) -> dict:
+        """
+        Calcula as bolsas do dia (ex.: todos os pacientes da UTI) com uma única
+        chamada ao formulador; cada paciente parte da sua bolsa anterior
+        """
+
+        inicio = time.perf_counter()
+        preparados, bolsas, erros = [], [], 0
+        for paciente in pacientes:
+            try:
+                avaliacao = await self.avaliar_estado_nutricional(paciente)
+                necessidades = await self.calcular_necessidades_nutricionais(paciente, avaliacao)
+                preparados.append((paciente, avaliacao, necessidades, meta_de_necessidades(necessidades, paciente)))
+            except Exception as e:
+                logger.error(f"Erro no cálculo da NP do paciente {paciente.get('id')}: {e}")
+                bolsas.append({'paciente_id': paciente.get('id'), 'error': str(e)})
+                erros += 1
+
+        formulacoes = self.formulador_np.formular_lote(
+            [meta for _, _, _, meta in preparados],
+            [paciente.get('bolsa_anterior') for paciente, _, _, _ in preparados]
+        )
+        for (paciente, avaliacao, necessidades, _), formulacao in zip(preparados, formulacoes):
+            bolsas.append({
+                'paciente_id': paciente.get('id'),
+                'avaliacao_nutricional': avaliacao,
+                'necessidades_calculadas': necessidades,
+                'formulacao_np': formulacao,
+                'compatibilidade': await self.verificar_compatibilidade_componentes(formulacao),
+                'monitoramento': await self.definir_monitoramento_laboratorial(paciente, formulacao),
+                'score_adequacao': self.calcular_score_adequacao(formulacao, necessidades)
+            })
+
+        return {
+            'bolsas': bolsas,
+            'resumo': {
+                'total_bolsas': len(pacientes),
+                'erros': erros,
+                'volume_total_ml': sum(formulacao['volume_final'] for formulacao in formulacoes),
+                'bolsas_com_alerta': sum(1 for formulacao in formulacoes if formulacao['alertas']),
+                'tempo_total_ms': (time.perf_counter() - inicio) * 1000
+            },
+            'timestamp': datetime.now().isoformat()
+        }
+
     async def avaliar_estado_nutricional(self, paciente: dict) -> dict:
         """Avaliação completa do estado nutricional"""
 
@@ -266,81 +314,10 @@ class NutricaoParenteralIA:
         }
 
     async def formular_nutricao_parenteral(self, necessidades: dict, paciente: dict) -> dict:
-        """Formula a nutrição parenteral"""
-
-        formulacao = {
-            'componentes': {},
-            'concentracoes': {},
-            'volume_final': necessidades.get('volume_total', {}).get('volume_total_ml', 2000),
-            'osmolaridade': 0,
-            'estabilidade': True,
-            'via_administracao': 'central'
-        }
-
-        proteinas_g = necessidades.get('proteinas', {}).get('gramas', 80)
-        formulacao['componentes']['aminoacidos'] = {
-            'quantidade_g': proteinas_g,
-            'solucao': 'aminoacidos_10%',
-            'volume_ml': proteinas_g * 10,  # 10% = 10g/100mL
-            'nitrogenio_g': proteinas_g / 6.25
-        }
-
-        carboidratos_g = necessidades.get('carboidratos', {}).get('gramas', 250)
-        formulacao['componentes']['glicose'] = {
-            'quantidade_g': carboidratos_g,
-            'concentracao': '50%',
-            'volume_ml': carboidratos_g * 2,  # 50% = 50g/100mL
-            'taxa_infusao_mg_kg_min': self.calcular_taxa_glicose(carboidratos_g, paciente.get('antropometria', {}).get('peso', 70))
-        }
-
-        lipidios_g = necessidades.get('lipidios', {}).get('gramas', 70)
-        formulacao['componentes']['lipidios'] = {
-            'quantidade_g': lipidios_g,
-            'emulsao': 'lipidios_20%',
-            'volume_ml': lipidios_g * 5,  # 20% = 20g/100mL
-            'tipo': 'MCT/LCT'
-        }
-
-        formulacao['componentes']['eletrolitos'] = necessidades.get('micronutrientes', {}).get('eletroliticos', {})
+        """Formula a nutrição parenteral resolvendo os volumes das soluções-estoque"""
 
-        formulacao['componentes']['vitaminas'] = 'complexo_vitaminico_adulto_1_ampola'
-        formulacao['componentes']['oligoelementos'] = 'oligoelementos_adulto_1_ampola'
-
-        formulacao['osmolaridade'] = self.calcular_osmolaridade(formulacao)
-
-        if formulacao['osmolaridade'] > 900:
-            formulacao['via_administracao'] = 'central'
-        else:
-            formulacao['via_administracao'] = 'periferica'
-
-        return formulacao
-
-    def calcular_taxa_glicose(self, glicose_g: float, peso: float) -> float:
-        """Calcula taxa de infusão de glicose"""
-
-        glicose_mg_dia = glicose_g * 1000
-        glicose_mg_min = glicose_mg_dia / (24 * 60)
-        taxa_mg_kg_min = glicose_mg_min / peso
-
-        return taxa_mg_kg_min
-
-    def calcular_osmolaridade(self, formulacao: dict) -> float:
-        """Calcula osmolaridade da formulação"""
-
-        osmolaridade = 0
-
-        aa_g = formulacao.get('componentes', {}).get('aminoacidos', {}).get('quantidade_g', 0)
-        osmolaridade += aa_g * 10
-
-        glicose_g = formulacao.get('componentes', {}).get('glicose', {}).get('quantidade_g', 0)
-        osmolaridade += glicose_g * 5.5
-
-        osmolaridade += 300  # Estimativa base para eletrólitos
-
-        volume_l = formulacao.get('volume_final', 2000) / 1000
-        osmolaridade_final = osmolaridade / volume_l
-
-        return osmolaridade_final
+        meta = meta_de_necessidades(necessidades, paciente)
+        return self.formulador_np.formular(meta, paciente.get('bolsa_anterior'))
 
     async def verificar_compatibilidade_componentes(self, formulacao: dict) -> dict:
         """Verifica compatibilidade entre componentes"""
@@ -356,10 +333,8 @@ class NutricaoParenteralIA:
         if ph_estimado < 5.0 or ph_estimado > 7.0:
             compatibilidade['alertas'].append(f'pH fora da faixa ideal: {ph_estimado:.1f}')
 
-        calcio = formulacao.get('componentes', {}).get('eletrolitos', {}).get('calcio', 0)
-        fosforo = formulacao.get('componentes', {}).get('eletrolitos', {}).get('fosforo', 0)
-
-        if calcio * fosforo > 200:  # Regra empírica
+        produto_calcio_fosforo = formulacao.get('concentracoes', {}).get('produto_calcio_fosforo', 0)
+        if produto_calcio_fosforo > LIMITE_PRODUTO_CALCIO_FOSFATO * 1.01:
             compatibilidade['incompatibilidades'].append('Risco de precipitação cálcio-fosfato')
             compatibilidade['compativel'] = False
 
@@ -533,8 +508,5 @@ class NutricaoParenteralIA:
 class CalculadorNutricionalIA:
     pass
 
-class FormuladorNutricaoParenteral:
-    pass
-
 class MonitorCompatibilidadeNP:
     pass
@@ -3,15 +3,19 @@ Otimização de distribuição interna de medicamentos
 """
 
 import logging
+import math
 from datetime import datetime
 
+from .roteamento_entregas import Entrega, PlanoDistribuicao, RoteadorInteligente, obter_matriz_hospital
+
 logger = logging.getLogger('MedAI.Farmacia.OtimizadorDistribuicao')
 
 class OtimizadorDistribuicaoIA:
     """Otimização de distribuição interna de medicamentos"""
 
-    def __init__(self):
-        self.roteador = RoteadorInteligente()
+    def __init__(self, roteador: RoteadorInteligente | None = None):
+        self.roteador = roteador or RoteadorInteligente(obter_matriz_hospital())
+        self.plano_atual: PlanoDistribuicao | None = None
         self.predictor_urgencia = PredictorUrgenciaDispensacao()
         self.alocador_recursos = AlocadorRecursosFarmacia()
 
@@ -109,6 +113,7 @@ class OtimizadorDistribuicaoIA:
                 'score_prioridade': score_prioridade,
                 'urgencia': urgencia,
                 'tempo_limite': tempo_limite,
+                'medicamentos_solicitados': dados_unidade.get('medicamentos_solicitados', 0),
                 'medicamentos_criticos': medicamentos_criticos,
                 'ordem_atendimento': 0  # Será definido após ordenação
             })
@@ -146,78 +151,54 @@ class OtimizadorDistribuicaoIA:
         return min(1.0, score)
 
     async def otimizar_rotas_distribuicao(self, priorizacao: dict) -> list[dict]:
-        """Otimiza rotas de distribuição"""
+        """Otimiza rotas de distribuição (capacidade do carrinho e prazo de cada unidade)"""
 
         dispensacoes = priorizacao.get('dispensacoes_priorizadas', [])
-        rotas_otimizadas = []
-
-        grupos_proximidade = self.agrupar_por_proximidade(dispensacoes)
-
-        for grupo in grupos_proximidade:
-            rota = await self.criar_rota_otimizada(grupo)
-            rotas_otimizadas.append(rota)
-
-        return rotas_otimizadas
-
-    def agrupar_por_proximidade(self, dispensacoes: list[dict]) -> list[list[dict]]:
-        """Agrupa unidades por proximidade física"""
+        entregas = [self.criar_entrega(dispensacao) for dispensacao in dispensacoes]
 
-        proximidade_map = {
-            'uti': ['centro_cirurgico'],
-            'emergencia': ['uti'],
-            'centro_cirurgico': ['uti'],
-            'enfermaria_clinica': ['pediatria'],
-            'pediatria': ['enfermaria_clinica']
-        }
+        self.plano_atual = self.roteador.planejar(entregas)
 
-        grupos = []
-        unidades_processadas = set()
+        return self.formatar_rotas(self.plano_atual)
 
-        for dispensacao in dispensacoes:
-            unidade = dispensacao['unidade']
+    async def despachar_urgentes(self, dispensacoes: list[dict], minutos_desde_inicio: float) -> list[dict]:
+        """Encaixa dispensações urgentes na ronda em andamento sem refazer as rotas"""
 
-            if unidade in unidades_processadas:
-                continue
+        entregas = [self.criar_entrega(dispensacao, minutos_desde_inicio) for dispensacao in dispensacoes]
 
-            grupo = [dispensacao]
-            unidades_processadas.add(unidade)
+        if self.plano_atual is None:
+            self.plano_atual = self.roteador.planejar(entregas, inicio=minutos_desde_inicio)
+        else:
+            self.plano_atual = self.roteador.reotimizar(self.plano_atual, entregas, minutos_desde_inicio)
 
-            unidades_proximas = proximidade_map.get(unidade, [])
-            for unidade_proxima in unidades_proximas:
-                dispensacao_proxima = next(
-                    (d for d in dispensacoes if d['unidade'] == unidade_proxima and unidade_proxima not in unidades_processadas),
-                    None
-                )
-                if dispensacao_proxima:
-                    grupo.append(dispensacao_proxima)
-                    unidades_processadas.add(unidade_proxima)
+        return self.formatar_rotas(self.plano_atual)
 
-            grupos.append(grupo)
+    def criar_entrega(self, dispensacao: dict, instante: float = 0.0) -> Entrega:
+        """Converte uma dispensação priorizada em entrega com prazo relativo ao instante do pedido"""
 
-        return grupos
+        tempo_limite = dispensacao.get('tempo_limite')
 
-    async def criar_rota_otimizada(self, grupo_unidades: list[dict]) -> dict:
-        """Cria rota otimizada para grupo de unidades"""
+        return Entrega(
+            id=dispensacao.get('id', f"{dispensacao['unidade']}_{int(instante)}"),
+            unidade=dispensacao['unidade'],
+            demanda=dispensacao.get('medicamentos_solicitados', 1),
+            janela_inicio=instante,
+            janela_fim=instante + tempo_limite if tempo_limite is not None else math.inf,
+            prioridade=dispensacao.get('score_prioridade', 0.0),
+            dados=dispensacao
+        )
 
-        grupo_ordenado = sorted(grupo_unidades, key=lambda x: x['score_prioridade'], reverse=True)
+    def formatar_rotas(self, plano: PlanoDistribuicao) -> list[dict]:
+        """Rotas detalhadas com os campos usados na alocação de equipe"""
 
-        tempo_total = 0
-        for i, _ in enumerate(grupo_ordenado):
-            tempo_preparacao = 10  # minutos base
-            tempo_deslocamento = 5 if i > 0 else 0  # minutos entre unidades
-            tempo_entrega = 3  # minutos para entrega
+        rotas = self.roteador.detalhar(plano)
 
-            tempo_total += tempo_preparacao + tempo_deslocamento + tempo_entrega
+        for rota in rotas:
+            visitas = [parada['dados'] for parada in rota['paradas'] if not parada.get('recarga')]
+            rota['ordem_visita'] = visitas
+            rota['prioridade_rota'] = max((v.get('score_prioridade', 0.0) for v in visitas), default=0.0)
+            rota['medicamentos_criticos'] = any(v.get('medicamentos_criticos') for v in visitas)
 
-        return {
-            'id_rota': f"rota_{datetime.now().strftime('%H%M%S')}",
-            'unidades': [u['unidade'] for u in grupo_ordenado],
-            'ordem_visita': grupo_ordenado,
-            'tempo_estimado': tempo_total,
-            'distancia_total': len(grupo_ordenado) * 100,  # metros estimados
-            'prioridade_rota': max(u['score_prioridade'] for u in grupo_ordenado),
-            'medicamentos_criticos': any(u['medicamentos_criticos'] for u in grupo_ordenado)
-        }
+        return rotas
 
     async def alocar_equipe_otimizada(self, rotas: list[dict]) -> dict:
         """Aloca equipe de forma otimizada"""
@@ -351,9 +332,6 @@ class OtimizadorDistribuicaoIA:
             ]
         }
 
-class RoteadorInteligente:
-    pass
-
 class PredictorUrgenciaDispensacao:
     pass
 
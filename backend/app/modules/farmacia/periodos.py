@@ -0,0 +1,21 @@
+"""
+Períodos mensais da farmácia
+
+Séries mensais (antibiograma, consumo para previsão) usam o índice do mês,
+ano * 12 + mês - 1, como chave inteira; o rótulo 'AAAA-MM' é a forma
+trocada com o restante do sistema.
+"""
+
+from datetime import date, datetime
+
+
+def periodo_de(data: date | datetime | str) -> int:
+    """Índice do mês (ano * 12 + mês - 1) de uma data ou de 'AAAA-MM[-DD]'"""
+    if isinstance(data, str):
+        ano, mes = data[:7].split('-')
+        return int(ano) * 12 + int(mes) - 1
+    return data.year * 12 + data.month - 1
+
+
+def rotulo_periodo(periodo: int) -> str:
+    return f"{periodo // 12:04d}-{periodo % 12 + 1:02d}"
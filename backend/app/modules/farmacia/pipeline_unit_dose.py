@@ -0,0 +1,333 @@
+"""
+Pipeline de produção de doses unitárias
+
+Prescrições chegam em fluxo durante o turno e são agrupadas de forma
+incremental (medicamento, dose e forma farmacêutica). A cada ciclo do robô
+os grupos abertos seguem, em ordem de prioridade, por estágios ligados por
+filas limitadas: preparo → controle de qualidade → etiquetagem. Cada
+estágio tem seus próprios workers, então grupos diferentes se sobrepõem; a
+etiquetagem junta as preparações aprovadas em lotes. O pipeline mede a
+vazão por ciclo e a profundidade de cada fila.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger('MedAI.Farmacia.PipelineUnitDose')
+
+CAPACIDADE_CICLO_PADRAO = 50  # doses por grupo antes de liberar sem esperar o ciclo
+TAMANHO_FILA_PADRAO = 8
+TAMANHO_LOTE_ETIQUETAS = 16
+ESPERA_LOTE_ETIQUETAS = 0.01  # segundos aguardando completar um lote de etiquetas
+
+
+def chave_agrupamento(medicamento: dict) -> tuple:
+    return (medicamento.get('nome'), medicamento.get('dose'), medicamento.get('forma_farmaceutica'))
+
+
+@dataclass
+class _Fila:
+    """Fila limitada com amostragem da profundidade a cada inclusão"""
+    nome: str
+    fila: asyncio.Queue
+    maxima: int = 0
+    soma: int = 0
+    amostras: int = 0
+
+    async def put(self, item: Any) -> None:
+        await self.fila.put(item)
+        profundidade = self.fila.qsize()
+        self.maxima = max(self.maxima, profundidade)
+        self.soma += profundidade
+        self.amostras += 1
+
+    def metricas(self) -> dict[str, float]:
+        return {
+            'atual': self.fila.qsize(),
+            'maxima': self.maxima,
+            'media': round(self.soma / self.amostras, 2) if self.amostras else 0.0,
+            'capacidade': self.fila.maxsize
+        }
+
+
+@dataclass
+class _Ciclo:
+    numero: int
+    inicio: float
+    lotes: int = 0
+    doses: int = 0
+    pendentes: int = 0
+    fim: float | None = None
+
+
+@dataclass
+class _Item:
+    grupo: dict
+    ciclo: _Ciclo
+    sequencia: int
+    preparacao: dict | None = None
+    qualidade: dict | None = None
+    etiquetas: dict | None = None
+    erro: str | None = None
+
+
+class AgrupadorIncremental:
+    """Grupos abertos por chave; prescrições novas entram no grupo aberto correspondente"""
+
+    def __init__(self, capacidade_ciclo: int = CAPACIDADE_CICLO_PADRAO,
+                 priorizar: Callable[[dict], float] | None = None,
+                 economia_tempo: Callable[[int], float] | None = None):
+        self.capacidade_ciclo = capacidade_ciclo
+        self.priorizar = priorizar
+        self.economia_tempo = economia_tempo
+        self._abertos: dict[tuple, dict] = {}
+        self._geracao: dict[tuple, int] = {}
+
+    @property
+    def abertos(self) -> int:
+        return len(self._abertos)
+
+    def adicionar(self, prescricoes: Sequence[dict]) -> list[dict]:
+        """Incorpora prescrições; devolve os grupos que atingiram a capacidade do ciclo"""
+        cheios = []
+        for prescricao in prescricoes:
+            for medicamento in prescricao.get('medicamentos', []):
+                chave = chave_agrupamento(medicamento)
+                grupo = self._abertos.get(chave)
+                if grupo is None:
+                    geracao = self._geracao.get(chave, 0) + 1
+                    self._geracao[chave] = geracao
+                    grupo = self._abertos[chave] = {
+                        'id_agrupamento': '_'.join(str(parte) for parte in chave) + (f"#{geracao}" if geracao > 1 else ''),
+                        'medicamentos': [medicamento],
+                        'quantidade': 0,
+                        'pacientes': [],
+                        'prescricoes_ids': []
+                    }
+                grupo['quantidade'] += medicamento.get('quantidade', 1)
+                grupo['pacientes'].append(prescricao.get('paciente_id'))
+                grupo['prescricoes_ids'].append(prescricao.get('id'))
+                if grupo['quantidade'] >= self.capacidade_ciclo:
+                    cheios.append(self._fechar(chave))
+        return cheios
+
+    def liberar(self) -> list[dict]:
+        """Fecha todos os grupos abertos, em ordem de prioridade"""
+        grupos = [self._fechar(chave) for chave in list(self._abertos)]
+        return sorted(grupos, key=lambda grupo: grupo['prioridade'], reverse=True)
+
+    def _fechar(self, chave: tuple) -> dict:
+        grupo = self._abertos.pop(chave)
+        if self.economia_tempo:
+            grupo['economia_tempo'] = self.economia_tempo(grupo['quantidade'])
+        grupo['prioridade'] = self.priorizar(grupo) if self.priorizar else 0.0
+        return grupo
+
+
+class PipelineUnitDose:
+    """Estágios assíncronos ligados por filas limitadas, com métricas por ciclo e por fila"""
+
+    def __init__(self, preparador: Any, verificador: Any, etiquetador: Any,
+                 agrupador: AgrupadorIncremental | None = None,
+                 workers_preparo: int = 2, workers_qualidade: int = 2,
+                 tamanho_fila: int = TAMANHO_FILA_PADRAO,
+                 tamanho_lote_etiquetas: int = TAMANHO_LOTE_ETIQUETAS,
+                 intervalo_ciclo: float | None = None):
+        self.preparador = preparador
+        self.verificador = verificador
+        self.etiquetador = etiquetador
+        self.agrupador = agrupador or AgrupadorIncremental()
+        self.workers_preparo = workers_preparo
+        self.workers_qualidade = workers_qualidade
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote_etiquetas = tamanho_lote_etiquetas
+        self.intervalo_ciclo = intervalo_ciclo
+
+        self.resultados: list[dict] = []
+        self._ciclos: list[_Ciclo] = []
+        self._sequencia = 0
+        self._chamadas_etiquetagem = 0
+        self._tarefas: list[asyncio.Task] = []
+        self._lock: asyncio.Lock | None = None
+
+    async def iniciar(self) -> 'PipelineUnitDose':
+        self._lock = asyncio.Lock()
+        self._preparo = _Fila('preparo', asyncio.Queue(self.tamanho_fila))
+        self._qualidade = _Fila('qualidade', asyncio.Queue(self.tamanho_fila))
+        self._etiquetagem = _Fila('etiquetagem', asyncio.Queue(self.tamanho_fila))
+        self._ciclo_atual = self._novo_ciclo()
+        self._tarefas = (
+            [asyncio.create_task(self._estagio_preparo()) for _ in range(self.workers_preparo)]
+            + [asyncio.create_task(self._estagio_qualidade()) for _ in range(self.workers_qualidade)]
+            + [asyncio.create_task(self._estagio_etiquetagem())]
+        )
+        if self.intervalo_ciclo:
+            self._tarefas.append(asyncio.create_task(self._relogio_ciclos()))
+        return self
+
+    def _novo_ciclo(self) -> _Ciclo:
+        ciclo = _Ciclo(len(self._ciclos) + 1, time.perf_counter())
+        self._ciclos.append(ciclo)
+        return ciclo
+
+    async def enviar(self, prescricoes: Sequence[dict]) -> None:
+        """Recebe prescrições do fluxo; grupos que encheram seguem imediatamente para o preparo"""
+        async with self._lock:
+            for grupo in self.agrupador.adicionar(prescricoes):
+                await self._despachar(grupo)
+
+    async def ciclo(self) -> int:
+        """Fecha o ciclo do robô: libera os grupos abertos e inicia a contagem do próximo ciclo"""
+        async with self._lock:
+            grupos = self.agrupador.liberar()
+            for grupo in grupos:
+                await self._despachar(grupo)
+            numero = self._ciclo_atual.numero
+            if self._ciclo_atual.lotes:
+                self._ciclo_atual = self._novo_ciclo()
+            return numero
+
+    async def _despachar(self, grupo: dict) -> None:
+        ciclo = self._ciclo_atual
+        if not ciclo.lotes:
+            ciclo.inicio = time.perf_counter()
+        ciclo.lotes += 1
+        ciclo.pendentes += 1
+        self._sequencia += 1
+        await self._preparo.put(_Item(grupo, ciclo, self._sequencia))
+
+    async def _relogio_ciclos(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo_ciclo)
+            await self.ciclo()
+
+    async def descarregar(self) -> None:
+        """Libera os grupos abertos e espera todas as filas esvaziarem"""
+        await self.ciclo()
+        for fila in (self._preparo, self._qualidade, self._etiquetagem):
+            await fila.fila.join()
+
+    async def encerrar(self) -> list[dict]:
+        """Descarrega e para os workers; devolve os resultados na ordem de despacho"""
+        await self.descarregar()
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        return sorted(self.resultados, key=lambda resultado: resultado['sequencia'])
+
+    async def _estagio_preparo(self) -> None:
+        while True:
+            item = await self._preparo.fila.get()
+            try:
+                item.preparacao = await self.preparador.preparar_lote(
+                    medicamentos=item.grupo['medicamentos'],
+                    quantidade=item.grupo['quantidade'],
+                    validacao_dupla=True
+                )
+            except Exception as e:
+                item.erro = f"preparo: {e}"
+            # task_done só depois de repassar o item, para que join() das filas em sequência não o perca
+            try:
+                if item.erro:
+                    self._concluir(item)
+                else:
+                    await self._qualidade.put(item)
+            finally:
+                self._preparo.fila.task_done()
+
+    async def _estagio_qualidade(self) -> None:
+        while True:
+            item = await self._qualidade.fila.get()
+            try:
+                item.qualidade = await self.verificador.verificar_preparacao(
+                    item.preparacao,
+                    usar_visao_computacional=True,
+                    verificar_peso=True
+                )
+            except Exception as e:
+                item.erro = f"qualidade: {e}"
+            try:
+                # Preparação reprovada não é etiquetada
+                if item.erro or not item.qualidade.get('aprovado', False):
+                    self._concluir(item)
+                else:
+                    await self._etiquetagem.put(item)
+            finally:
+                self._qualidade.fila.task_done()
+
+    async def _estagio_etiquetagem(self) -> None:
+        fila = self._etiquetagem.fila
+        while True:
+            lote = [await fila.get()]
+            limite = time.perf_counter() + ESPERA_LOTE_ETIQUETAS
+            while len(lote) < self.tamanho_lote_etiquetas:
+                restante = limite - time.perf_counter()
+                if restante <= 0 and fila.empty():
+                    break
+                try:
+                    lote.append(fila.get_nowait() if not fila.empty() else await asyncio.wait_for(fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                self._chamadas_etiquetagem += 1
+                etiquetas = await self.etiquetador.gerar_etiquetas_lote(
+                    [item.preparacao for item in lote],
+                    incluir_qr_code=True,
+                    informacoes_personalizadas=True
+                )
+                for item, etiqueta in zip(lote, etiquetas):
+                    item.etiquetas = etiqueta
+            except Exception as e:
+                for item in lote:
+                    item.erro = f"etiquetagem: {e}"
+            for item in lote:
+                self._concluir(item)
+                fila.task_done()
+
+    def _concluir(self, item: _Item) -> None:
+        if item.erro:
+            logger.error(f"Falha no grupo {item.grupo.get('id_agrupamento')}: {item.erro}")
+        self.resultados.append({
+            'sequencia': item.sequencia,
+            'ciclo': item.ciclo.numero,
+            'grupo': item.grupo,
+            'lote': item.preparacao or {},
+            'qualidade': item.qualidade or {},
+            'etiquetas': item.etiquetas,
+            'erro': item.erro
+        })
+        ciclo = item.ciclo
+        ciclo.doses += item.grupo['quantidade'] if not item.erro else 0
+        ciclo.pendentes -= 1
+        if ciclo.pendentes == 0:
+            ciclo.fim = time.perf_counter()
+
+    def metricas(self) -> dict[str, Any]:
+        """Vazão por ciclo do robô e profundidade de cada fila"""
+        ciclos = []
+        for ciclo in self._ciclos:
+            if not ciclo.lotes:
+                continue
+            duracao = ((ciclo.fim if ciclo.pendentes == 0 and ciclo.fim else time.perf_counter()) - ciclo.inicio)
+            ciclos.append({
+                'ciclo': ciclo.numero,
+                'lotes': ciclo.lotes,
+                'doses': ciclo.doses,
+                'em_andamento': ciclo.pendentes,
+                'duracao_s': round(duracao, 4),
+                'doses_por_s': round(ciclo.doses / duracao, 1) if duracao > 0 else 0.0
+            })
+        etiquetados = sum(1 for resultado in self.resultados if resultado['etiquetas'])
+        return {
+            'ciclos': ciclos,
+            'filas': {fila.nome: fila.metricas() for fila in (self._preparo, self._qualidade, self._etiquetagem)},
+            'grupos_abertos': self.agrupador.abertos,
+            'lotes_concluidos': len(self.resultados),
+            'falhas': sum(1 for resultado in self.resultados if resultado['erro']),
+            'etiquetas_por_chamada': round(etiquetados / self._chamadas_etiquetagem, 2) if self._chamadas_etiquetagem else 0.0
+        }
@@ -0,0 +1,445 @@
+"""
+Motor de previsão de demanda por item (SKU)
+
+Ajusta modelos leves vetorizados sobre milhares de SKUs de uma vez:
+- Holt-Winters aditivo com tendência amortecida (sem sazonalidade quando o
+  histórico tem menos de duas temporadas);
+- Croston (correção SBA) para demanda intermitente (ADI > 1,32).
+
+Os parâmetros de suavização são escolhidos por SKU numa grade avaliada em
+paralelo (erro de um passo). O estado final de cada SKU é guardado, de modo
+que consumo novo só avança as recursões a partir dele; previsões ficam em
+cache até chegar consumo novo do SKU. O ajuste completo roda em blocos de
+SKUs, opcionalmente num pool de processos.
+
+Com ``caminho``, o estado é regravado (npz) a cada ajuste ou consumo novo e
+o motor do processo é recarregado dele no startup, sem reprocessar o
+histórico.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.PrevisaoDemanda')
+
+HOLT_WINTERS = 0
+CROSTON = 1
+NOMES_MODELOS = {HOLT_WINTERS: 'holt_winters', CROSTON: 'croston'}
+
+LIMIAR_INTERMITENCIA = 1.32  # ADI de Syntetos-Boylan
+AMORTECIMENTO = 0.98
+Z_95 = 1.96
+
+GRADE_ALFA = (0.05, 0.1, 0.2, 0.3, 0.5)
+GRADE_BETA = (0.0, 0.02, 0.05)
+GRADE_GAMA = (0.0, 0.1, 0.3)
+GRADE_ALFA_CROSTON = (0.05, 0.1, 0.2, 0.3)
+
+TAMANHO_BLOCO_PADRAO = 1000
+MIN_SKUS_PARALELO = 2 * TAMANHO_BLOCO_PADRAO
+MAX_WORKERS_PADRAO = 8
+
+_CAMPOS_ESTADO = (
+    'modelo', 'alfa', 'beta', 'gama', 'nivel', 'tendencia', 'fase', 'tamanho', 'intervalo', 'desde_demanda',
+    'sse', 'erros', 'observacoes', 'aquecimento'
+)
+
+
+def _recursao_holt_winters(y: np.ndarray, alfa, beta, gama, nivel, tendencia, sazonal, fase, observacoes,
+                           aquecimento, periodo: int):
+    """
+    Avança Holt-Winters aditivo amortecido (forma de correção de erro)
+
+    Estados têm forma (K, n): K combinações de parâmetros por n SKUs;
+    ``sazonal`` tem forma (K, n, periodo). NaN em ``y`` (n, T) não avança o
+    SKU. Retorna o estado final e a soma dos erros quadráticos de um passo
+    (ignorando as ``aquecimento`` primeiras observações do SKU, usadas na
+    inicialização) com o número de erros somados.
+    """
+    k, n = nivel.shape
+    linhas = np.arange(n)
+    sse = np.zeros((k, n))
+    erros = np.zeros(n)
+    for t in range(y.shape[1]):
+        valor = y[:, t]
+        valido = ~np.isnan(valor)
+        if not valido.any():
+            continue
+        atual = sazonal[:, linhas, fase]
+        erro = np.where(valido, np.nan_to_num(valor) - (nivel + AMORTECIMENTO * tendencia + atual), 0.0)
+        conta = valido & (observacoes >= aquecimento)
+        sse += np.where(conta, erro * erro, 0.0)
+        erros += conta
+
+        nivel = np.where(valido, nivel + AMORTECIMENTO * tendencia + alfa * erro, nivel)
+        tendencia = np.where(valido, AMORTECIMENTO * tendencia + beta * erro, tendencia)
+        sazonal[:, linhas, fase] = atual + gama * erro
+        fase = np.where(valido, (fase + 1) % periodo, fase)
+        observacoes = observacoes + valido
+    return nivel, tendencia, sazonal, fase, observacoes, sse, erros
+
+
+def _recursao_croston(y: np.ndarray, alfa, tamanho, intervalo, desde_demanda, observacoes):
+    """Avança Croston/SBA: tamanho médio da demanda e intervalo médio entre demandas"""
+    k, n = tamanho.shape
+    sse = np.zeros((k, n))
+    erros = np.zeros(n)
+    for t in range(y.shape[1]):
+        valor = y[:, t]
+        valido = ~np.isnan(valor)
+        if not valido.any():
+            continue
+        valor = np.nan_to_num(valor)
+        previsao = (1 - alfa / 2) * tamanho / intervalo
+        erro = np.where(valido, valor - previsao, 0.0)
+        conta = valido & (observacoes >= 1)
+        sse += np.where(conta, erro * erro, 0.0)
+        erros += conta
+
+        demanda = valido & (valor > 0)
+        tamanho = np.where(demanda, tamanho + alfa * (valor - tamanho), tamanho)
+        intervalo = np.where(demanda, intervalo + alfa * (desde_demanda - intervalo), intervalo)
+        desde_demanda = np.where(demanda, 1.0, desde_demanda + valido)
+        observacoes = observacoes + valido
+    return tamanho, intervalo, desde_demanda, observacoes, sse, erros
+
+
+def ajustar_bloco(historico: np.ndarray, periodo: int) -> dict[str, np.ndarray]:
+    """
+    Ajuste completo de um bloco de SKUs (linhas) com histórico alinhado à direita
+
+    NaN marca períodos sem histórico. Função de módulo para rodar em processos.
+    """
+    y = np.asarray(historico, dtype=float)
+    n = y.shape[0]
+    valido = ~np.isnan(y)
+    contagem = valido.sum(axis=1)
+    com_demanda = (np.nan_to_num(y) > 0).sum(axis=1)
+    adi = contagem / np.maximum(com_demanda, 1)
+    croston = (adi > LIMIAR_INTERMITENCIA) | (com_demanda == 0)
+    sazonal_ok = contagem >= 2 * periodo
+
+    estado = {campo: np.zeros(n) for campo in _CAMPOS_ESTADO}
+    estado['modelo'] = np.where(croston, CROSTON, HOLT_WINTERS).astype(np.int8)
+    estado['fase'] = np.zeros(n, dtype=np.int64)
+    estado['intervalo'] = np.ones(n)
+    estado['desde_demanda'] = np.ones(n)
+    estado['sazonal'] = np.zeros((n, periodo))
+
+    # Posição de cada observação na própria sequência do SKU
+    ordem = np.cumsum(valido, axis=1) - 1
+
+    hw = np.flatnonzero(~croston)
+    if hw.size:
+        yh, vh, oh = y[hw], valido[hw], ordem[hw]
+        # Sem duas temporadas: Holt simples, nível inicial na primeira observação
+        aquecimento = np.where(sazonal_ok[hw], periodo, 1)
+        primeira_temporada = vh & (oh < aquecimento[:, None])
+        nivel0 = np.nansum(np.where(primeira_temporada, yh, 0), axis=1) / np.maximum(primeira_temporada.sum(1), 1)
+        media = np.nansum(yh, axis=1) / np.maximum(vh.sum(axis=1), 1)
+        sazonal0 = np.zeros((hw.size, periodo))
+        for j in range(periodo):
+            na_fase = vh & (oh % periodo == j)
+            sazonal0[:, j] = np.where(na_fase, yh, 0).sum(axis=1) / np.maximum(na_fase.sum(axis=1), 1) - media
+        sazonal0[~sazonal_ok[hw]] = 0.0
+
+        alfa, beta, gama = (g.reshape(-1, 1) for g in np.meshgrid(GRADE_ALFA, GRADE_BETA, GRADE_GAMA, indexing='ij'))
+        gama = np.where(sazonal_ok[hw][None, :], gama, 0.0)
+        k = alfa.shape[0]
+        resultado = _recursao_holt_winters(
+            yh, alfa, beta, gama, np.broadcast_to(nivel0, (k, hw.size)).copy(), np.zeros((k, hw.size)),
+            np.broadcast_to(sazonal0, (k, hw.size, periodo)).copy(), np.zeros(hw.size, dtype=np.int64),
+            np.zeros(hw.size), aquecimento, periodo
+        )
+        nivel, tendencia, sazonal, fase, observacoes, sse, erros = resultado
+        melhor = np.argmin(sse, axis=0)
+        colunas = np.arange(hw.size)
+        estado['alfa'][hw] = alfa[melhor, 0]
+        estado['beta'][hw] = beta[melhor, 0]
+        estado['gama'][hw] = gama[melhor, colunas]
+        estado['nivel'][hw] = nivel[melhor, colunas]
+        estado['tendencia'][hw] = tendencia[melhor, colunas]
+        estado['sazonal'][hw] = sazonal[melhor, colunas]
+        estado['fase'][hw] = fase
+        estado['observacoes'][hw] = observacoes
+        estado['sse'][hw] = sse[melhor, colunas]
+        estado['erros'][hw] = erros
+        estado['aquecimento'][hw] = aquecimento
+
+    intermitentes = np.flatnonzero(croston)
+    if intermitentes.size:
+        yc = np.nan_to_num(y[intermitentes])
+        demandas = com_demanda[intermitentes]
+        tamanho0 = np.where(demandas > 0, yc.sum(axis=1) / np.maximum(demandas, 1), 0.0)
+        intervalo0 = np.maximum(adi[intermitentes], 1.0)
+        alfa = np.asarray(GRADE_ALFA_CROSTON).reshape(-1, 1)
+        k = alfa.shape[0]
+        tamanho, intervalo, desde, observacoes, sse, erros = _recursao_croston(
+            y[intermitentes], alfa, np.broadcast_to(tamanho0, (k, intermitentes.size)).copy(),
+            np.broadcast_to(intervalo0, (k, intermitentes.size)).copy(),
+            np.ones((k, intermitentes.size)), np.zeros(intermitentes.size)
+        )
+        melhor = np.argmin(sse, axis=0)
+        colunas = np.arange(intermitentes.size)
+        estado['alfa'][intermitentes] = alfa[melhor, 0]
+        estado['tamanho'][intermitentes] = tamanho[melhor, colunas]
+        estado['intervalo'][intermitentes] = intervalo[melhor, colunas]
+        estado['desde_demanda'][intermitentes] = desde[melhor, colunas]
+        estado['observacoes'][intermitentes] = observacoes
+        estado['sse'][intermitentes] = sse[melhor, colunas]
+        estado['erros'][intermitentes] = erros
+    return estado
+
+
+def atualizar_estado(estado: dict[str, np.ndarray], novos: np.ndarray, periodo: int) -> dict[str, np.ndarray]:
+    """Avança o estado salvo com consumo novo (n, k), mantendo os parâmetros escolhidos"""
+    estado = {campo: valores.copy() for campo, valores in estado.items()}
+    y = np.asarray(novos, dtype=float)
+
+    hw = np.flatnonzero(estado['modelo'] == HOLT_WINTERS)
+    if hw.size:
+        nivel, tendencia, sazonal, fase, observacoes, sse, erros = _recursao_holt_winters(
+            y[hw], estado['alfa'][hw][None], estado['beta'][hw][None], estado['gama'][hw][None],
+            estado['nivel'][hw][None], estado['tendencia'][hw][None], estado['sazonal'][hw][None],
+            estado['fase'][hw], estado['observacoes'][hw], estado['aquecimento'][hw], periodo
+        )
+        estado['nivel'][hw], estado['tendencia'][hw], estado['sazonal'][hw] = nivel[0], tendencia[0], sazonal[0]
+        estado['fase'][hw], estado['observacoes'][hw] = fase, observacoes
+        estado['sse'][hw] += sse[0]
+        estado['erros'][hw] += erros
+
+    intermitentes = np.flatnonzero(estado['modelo'] == CROSTON)
+    if intermitentes.size:
+        tamanho, intervalo, desde, observacoes, sse, erros = _recursao_croston(
+            y[intermitentes], estado['alfa'][intermitentes][None], estado['tamanho'][intermitentes][None],
+            estado['intervalo'][intermitentes][None], estado['desde_demanda'][intermitentes][None],
+            estado['observacoes'][intermitentes]
+        )
+        estado['tamanho'][intermitentes], estado['intervalo'][intermitentes] = tamanho[0], intervalo[0]
+        estado['desde_demanda'][intermitentes] = desde[0]
+        estado['observacoes'][intermitentes] = observacoes
+        estado['sse'][intermitentes] += sse[0]
+        estado['erros'][intermitentes] += erros
+    return estado
+
+
+def prever_estado(estado: dict[str, np.ndarray], horizonte: int) -> np.ndarray:
+    """Previsões (n, horizonte) a partir do estado, sem valores negativos"""
+    periodo = estado['sazonal'].shape[1]
+    passos = np.arange(horizonte)
+    amortecimento = np.cumsum(AMORTECIMENTO ** (passos + 1))
+    indices = (estado['fase'][:, None] + passos) % periodo
+    holt_winters = (estado['nivel'][:, None] + amortecimento * estado['tendencia'][:, None]
+                    + np.take_along_axis(estado['sazonal'], indices, axis=1))
+    croston = ((1 - estado['alfa'] / 2) * estado['tamanho'] / estado['intervalo'])[:, None]
+    previsao = np.where((estado['modelo'] == CROSTON)[:, None], croston, holt_winters)
+    return np.maximum(previsao, 0.0)
+
+
+class MotorPrevisaoDemanda:
+    """Estado por SKU, ajuste em lote, atualização incremental e cache de previsões"""
+
+    def __init__(self, periodo_sazonal: int = 7, workers: int | None = None,
+                 tamanho_bloco: int = TAMANHO_BLOCO_PADRAO, caminho: str | None = None):
+        self.periodo_sazonal = periodo_sazonal
+        self.workers = workers
+        self.tamanho_bloco = tamanho_bloco
+        self.caminho = caminho  # arquivo npz regravado a cada mudança de estado
+        self._lock = threading.Lock()
+        self._indices: dict[str, int] = {}
+        self._estado: dict[str, np.ndarray] = {}
+        self._ultimo_periodo: dict[str, int] = {}
+        # Previsões por SKU e horizonte: consumo novo descarta a entrada do SKU de uma vez
+        self._cache: dict[str, dict[int, dict[str, Any]]] = {}
+
+    @property
+    def skus(self) -> list[str]:
+        return list(self._indices)
+
+    def observacoes(self, sku: str) -> int:
+        """Quantidade de períodos já incorporados ao estado do SKU (0 se desconhecido)"""
+        indice = self._indices.get(sku)
+        return 0 if indice is None else int(self._estado['observacoes'][indice])
+
+    def ultimo_periodo(self, sku: str) -> int | None:
+        """Rótulo (inteiro) do último período incorporado ao SKU, se informado no ajuste/consumo"""
+        return self._ultimo_periodo.get(sku)
+
+    def _marcar_periodo(self, skus: Sequence[str], ultimo_periodo: int | None) -> None:
+        for sku in skus:
+            if ultimo_periodo is None:
+                self._ultimo_periodo.pop(sku, None)
+            else:
+                self._ultimo_periodo[sku] = ultimo_periodo
+
+    def _resolver_workers(self, total: int) -> int:
+        if self.workers is not None:
+            return self.workers
+        if total >= MIN_SKUS_PARALELO:
+            return min(os.cpu_count() or 1, MAX_WORKERS_PADRAO)
+        return 0
+
+    def ajustar(self, series: Mapping[str, Sequence[float]], ultimo_periodo: int | None = None) -> None:
+        """
+        Ajuste completo (seleção de modelo e parâmetros) dos SKUs informados
+
+        ``ultimo_periodo`` rotula o último valor das séries (ex.: índice do mês),
+        para que o chamador saiba depois quais períodos já foram incorporados.
+        """
+        skus = list(series)
+        if not skus:
+            return
+        comprimento = max(len(valores) for valores in series.values())
+        historico = np.full((len(skus), comprimento), np.nan)
+        for i, sku in enumerate(skus):
+            valores = np.asarray(series[sku], dtype=float)
+            if valores.size:
+                historico[i, comprimento - valores.size:] = valores
+
+        blocos = [historico[i:i + self.tamanho_bloco] for i in range(0, len(skus), self.tamanho_bloco)]
+        workers = self._resolver_workers(len(skus))
+        if workers > 1 and len(blocos) > 1:
+            # spawn: o processo chamador pode ter event loop e threads ativos
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                estados = list(pool.map(ajustar_bloco, blocos, [self.periodo_sazonal] * len(blocos)))
+        else:
+            estados = [ajustar_bloco(bloco, self.periodo_sazonal) for bloco in blocos]
+        ajustado = {campo: np.concatenate([e[campo] for e in estados]) for campo in estados[0]}
+
+        with self._lock:
+            self._gravar(skus, ajustado)
+            self._marcar_periodo(skus, ultimo_periodo)
+        self._persistir()
+        logger.info(f"Previsão de demanda: {len(skus)} SKUs ajustados em {len(blocos)} blocos")
+
+    def _gravar(self, skus: list[str], valores: dict[str, np.ndarray]) -> None:
+        novos = [sku for sku in skus if sku not in self._indices]
+        for sku in novos:
+            self._indices[sku] = len(self._indices)
+        if novos:
+            total = len(self._indices)
+            for campo, coluna in valores.items():
+                atual = self._estado.get(campo)
+                forma = (total,) + coluna.shape[1:]
+                expandido = np.zeros(forma, dtype=coluna.dtype)
+                if atual is not None:
+                    expandido[:atual.shape[0]] = atual
+                self._estado[campo] = expandido
+        indices = np.array([self._indices[sku] for sku in skus])
+        for campo, coluna in valores.items():
+            self._estado[campo][indices] = coluna
+        for sku in skus:
+            self._cache.pop(sku, None)
+
+    def registrar_consumo(self, consumo: Mapping[str, Sequence[float]], ultimo_periodo: int | None = None) -> None:
+        """
+        Incorpora consumo novo (em ordem cronológica) de SKUs já ajustados
+
+        Só as recursões a partir do último estado são executadas; o cache de
+        previsões dos SKUs afetados é invalidado.
+        """
+        skus = [sku for sku in consumo if len(consumo[sku])]
+        desconhecidos = [sku for sku in skus if sku not in self._indices]
+        if desconhecidos:
+            raise KeyError(f"SKUs sem ajuste inicial: {', '.join(desconhecidos[:5])}")
+        if not skus:
+            return
+
+        comprimento = max(len(consumo[sku]) for sku in skus)
+        novos = np.full((len(skus), comprimento), np.nan)
+        for i, sku in enumerate(skus):
+            novos[i, :len(consumo[sku])] = consumo[sku]
+
+        with self._lock:
+            indices = np.array([self._indices[sku] for sku in skus])
+            parcial = {campo: valores[indices] for campo, valores in self._estado.items()}
+            self._gravar(skus, atualizar_estado(parcial, novos, self.periodo_sazonal))
+            self._marcar_periodo(skus, ultimo_periodo)
+        self._persistir()
+
+    def prever(self, skus: Sequence[str] | None = None, horizonte: int = 30) -> dict[str, dict[str, Any]]:
+        """Previsão por SKU para ``horizonte`` períodos, com intervalo de 95% do total"""
+        with self._lock:
+            skus = list(self._indices) if skus is None else list(skus)
+            faltantes = [sku for sku in skus if horizonte not in self._cache.get(sku, {})]
+            if faltantes:
+                indices = np.array([self._indices[sku] for sku in faltantes])
+                estado = {campo: valores[indices] for campo, valores in self._estado.items()}
+                previsoes = prever_estado(estado, horizonte)
+                totais = previsoes.sum(axis=1)
+                sigma = np.sqrt(estado['sse'] / np.maximum(estado['erros'], 1))
+                margem = Z_95 * sigma * np.sqrt(horizonte)
+                escala = np.maximum(np.abs(estado['nivel']) + np.abs(estado['tamanho']), 1e-9)
+                inclinacao = estado['tendencia'] / escala
+                for i, sku in enumerate(faltantes):
+                    self._cache.setdefault(sku, {})[horizonte] = {
+                        'previsao': previsoes[i],
+                        'total': float(totais[i]),
+                        'intervalo': (float(max(totais[i] - margem[i], 0.0)), float(totais[i] + margem[i])),
+                        'erro_padrao': float(sigma[i]),
+                        'modelo': NOMES_MODELOS[int(estado['modelo'][i])],
+                        'inclinacao_relativa': float(inclinacao[i])
+                    }
+            return {sku: self._cache[sku][horizonte] for sku in skus}
+
+    def salvar(self, caminho: str) -> None:
+        """Grava o estado de todos os SKUs (npz) para retomar sem reprocessar histórico"""
+        destino = Path(caminho)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_name(destino.name + '.tmp')
+        with self._lock, open(temporario, 'wb') as arquivo:
+            np.savez(arquivo, skus=np.array(list(self._indices), dtype=str),
+                     periodo=self.periodo_sazonal,
+                     ultimo_periodo=np.array([self._ultimo_periodo.get(sku, -1) for sku in self._indices],
+                                             dtype=np.int64),
+                     **self._estado)
+        # Troca atômica: uma queda no meio da gravação não corrompe o estado anterior
+        os.replace(temporario, destino)
+
+    def _persistir(self) -> None:
+        if self.caminho is not None:
+            self.salvar(self.caminho)
+
+    @classmethod
+    def carregar(cls, caminho: str, **kwargs: Any) -> 'MotorPrevisaoDemanda':
+        with np.load(caminho) as dados:
+            motor = cls(periodo_sazonal=int(dados['periodo']), **kwargs)
+            motor._indices = {sku: i for i, sku in enumerate(dados['skus'].tolist())}
+            motor._estado = {campo: dados[campo] for campo in (*_CAMPOS_ESTADO, 'sazonal')}
+            if 'ultimo_periodo' in dados:
+                motor._ultimo_periodo = {sku: int(periodo) for sku, periodo
+                                         in zip(motor._indices, dados['ultimo_periodo'].tolist()) if periodo >= 0}
+        return motor
+
+
+def _criar_motor_mensal() -> MotorPrevisaoDemanda:
+    from app.core.config import settings
+    caminho = settings.FARMACIA_PREVISAO_ESTADO
+    if os.path.exists(caminho):
+        try:
+            motor = MotorPrevisaoDemanda.carregar(caminho)
+            motor.caminho = caminho
+            logger.info(f"Previsão de demanda: estado de {len(motor.skus)} SKUs carregado")
+            return motor
+        except Exception as e:
+            # Sem estado legível os SKUs são reajustados pelo histórico na próxima previsão
+            logger.error(f"Estado da previsão de demanda ilegível ({caminho}): {e}")
+    return MotorPrevisaoDemanda(periodo_sazonal=12, caminho=caminho)
+
+
+_motor_mensal = ServicoProcesso('motor_previsao', _criar_motor_mensal, iniciar_no_startup=True)
+
+
+def obter_motor_previsao() -> MotorPrevisaoDemanda:
+    """Motor compartilhado para séries de consumo mensal (sazonalidade anual)"""
+    return _motor_mensal.obter()
@@ -2,17 +2,49 @@
 Rastreabilidade completa com blockchain
 """
 
+import asyncio
 import logging
-from datetime import datetime
+import weakref
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from .ledger_farmaceutico import TAMANHO_BLOCO_PADRAO, LedgerFarmaceutico, obter_ledger_farmaceutico
+from .telemetria_cadeia_fria import FAIXA_PADRAO, TelemetriaCadeiaFria, obter_telemetria_cadeia_fria
 
 logger = logging.getLogger('MedAI.Farmacia.RastreadorMedicamentos')
 
+
+def _instante(valor: Any) -> float:
+    """Timestamp (s) de uma leitura: número, datetime ou ISO 8601; agora se ausente"""
+    if valor is None:
+        return datetime.now().timestamp()
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, datetime):
+        return valor.timestamp()
+    return datetime.fromisoformat(str(valor)).timestamp()
+
+
+def _leituras_sensores(leituras: list[dict]) -> tuple[list[str], list[float], list[float], list[float]]:
+    """Colunas (lote, timestamp, temperatura, umidade) das leituras com lote e temperatura"""
+    validas = [leitura for leitura in leituras
+               if leitura.get('lote') is not None and leitura.get('temperatura') is not None]
+    return (
+        [str(leitura['lote']) for leitura in validas],
+        [_instante(leitura.get('timestamp')) for leitura in validas],
+        [float(leitura['temperatura']) for leitura in validas],
+        [np.nan if leitura.get('umidade') is None else float(leitura['umidade']) for leitura in validas]
+    )
+
 class RastreadorMedicamentosBlockchain:
     """Rastreabilidade completa com blockchain"""
 
-    def __init__(self):
-        self.blockchain = BlockchainFarmaceutico()
-        self.scanner_rfid = ScannerRFIDMedicamentos()
+    def __init__(self, ledger: LedgerFarmaceutico | None = None, telemetria: TelemetriaCadeiaFria | None = None):
+        self.blockchain = BlockchainFarmaceutico(ledger)
+        self.telemetria = telemetria or obter_telemetria_cadeia_fria()
+        self.scanner_rfid = ScannerRFIDMedicamentos(self.blockchain, self.telemetria)
         self.validador_autenticidade = ValidadorAutenticidadeML()
 
     async def rastrear_medicamento_completo(self, codigo_rastreio: str) -> dict:
@@ -92,24 +124,47 @@ class RastreadorMedicamentosBlockchain:
             'score_qualidade': 0.95
         }
 
-        for evento in eventos:
-            temp = evento.get('temperatura', 25)
-            umidade = evento.get('umidade', 60)
+        temperaturas = np.array([evento.get('temperatura', 25) for evento in eventos], dtype=float)
+        umidades = np.array([evento.get('umidade', 60) for evento in eventos], dtype=float)
+        violacao_temperatura = (temperaturas < 15) | (temperaturas > 30)
+        violacao_umidade = umidades > 80
+        gravidade_alta = (temperaturas < 5) | (temperaturas > 40)
 
-            if temp < 15 or temp > 30:
+        for i in np.flatnonzero(violacao_temperatura | violacao_umidade):
+            if violacao_temperatura[i]:
                 condicoes['violacoes_detectadas'].append({
                     'tipo': 'temperatura',
-                    'valor': temp,
-                    'evento': evento.get('tipo'),
-                    'gravidade': 'alta' if temp < 5 or temp > 40 else 'moderada'
+                    'valor': eventos[i].get('temperatura', 25),
+                    'evento': eventos[i].get('tipo'),
+                    'gravidade': 'alta' if gravidade_alta[i] else 'moderada'
+                })
+            if violacao_umidade[i]:
+                condicoes['violacoes_detectadas'].append({
+                    'tipo': 'umidade',
+                    'valor': eventos[i].get('umidade', 60),
+                    'evento': eventos[i].get('tipo'),
+                    'gravidade': 'moderada'
+                })
+        condicoes['temperatura_adequada'] = not violacao_temperatura.any()
+        condicoes['umidade_adequada'] = not violacao_umidade.any()
+
+        # Telemetria contínua do lote, quando houver, complementa os eventos pontuais
+        telemetria = self.telemetria.resumo_lote(historico['lote']) if historico.get('lote') else None
+        if telemetria:
+            condicoes['telemetria'] = telemetria
+            if telemetria['excursoes']:
+                condicoes['violacoes_detectadas'].append({
+                    'tipo': 'excursao_temperatura',
+                    'valor': round(telemetria['grau_hora_acima'] + telemetria['grau_hora_abaixo'], 2),
+                    'evento': 'telemetria',
+                    'gravidade': 'alta' if telemetria['fracao_fora_faixa'] > 0.05 else 'moderada'
                 })
                 condicoes['temperatura_adequada'] = False
-
-            if umidade > 80:
+            if telemetria['tempo_umidade_acima'] > 0:
                 condicoes['violacoes_detectadas'].append({
                     'tipo': 'umidade',
-                    'valor': umidade,
-                    'evento': evento.get('tipo'),
+                    'valor': round(telemetria['fracao_umidade_acima'], 4),
+                    'evento': 'telemetria',
                     'gravidade': 'moderada'
                 })
                 condicoes['umidade_adequada'] = False
@@ -163,9 +218,17 @@ class RastreadorMedicamentosBlockchain:
 
             resultado = await self.blockchain.registrar_evento(codigo_rastreio, evento)
 
+            # Faixa de armazenamento declarada no evento (ex.: fabricação de refrigerados)
+            if evento.get('lote') and 'temperatura_min' in evento and 'temperatura_max' in evento:
+                await asyncio.to_thread(
+                    self.telemetria.definir_faixa, str(evento['lote']), float(evento['temperatura_min']),
+                    float(evento['temperatura_max']), float(evento.get('umidade_max', FAIXA_PADRAO[2]))
+                )
+
             return {
                 'sucesso': True,
                 'hash_transacao': resultado.get('hash'),
+                'bloco': resultado.get('bloco'),
                 'timestamp': datetime.now().isoformat(),
                 'evento_registrado': evento
             }
@@ -197,108 +260,278 @@ class RastreadorMedicamentosBlockchain:
 
         return True
 
+    async def registrar_leituras_sensores(self, leituras: list[dict]) -> dict:
+        """
+        Ingere leituras de data loggers e sensores IoT ('lote', 'timestamp',
+        'temperatura' e, opcionalmente, 'umidade') na telemetria de cadeia fria
+        """
+
+        lotes, instantes, temperaturas, umidades = _leituras_sensores(leituras)
+        aceitas = await asyncio.to_thread(self.telemetria.registrar_leituras, lotes, instantes, temperaturas, umidades)
+        return {
+            'leituras_recebidas': len(leituras),
+            'leituras_aceitas': aceitas,
+            'lotes': len(set(lotes))
+        }
+
+    async def verificar_integridade_ledger(self, completa: bool = False) -> dict:
+        """Verifica hashes, raízes Merkle e encadeamento dos blocos do ledger"""
+
+        return await self.blockchain.verificar_integridade(completa)
+
     async def gerar_relatorio_rastreabilidade(self, periodo: str = '30_dias') -> dict:
-        """Gera relatório de rastreabilidade"""
+        """
+        Gera relatório de rastreabilidade
+
+        Contagens de eventos vêm do ledger no período; indicadores de
+        qualidade vêm dos agregados de telemetria de todos os lotes.
+        """
+
+        dias = int(periodo.split('_')[0]) if periodo.split('_')[0].isdigit() else 30
+        desde = (datetime.now() - timedelta(days=dias)).timestamp()
+        estatisticas = await asyncio.to_thread(self.blockchain.ledger.estatisticas, desde)
+
+        lotes = self.telemetria.rollups()
+        monitorados = lotes['amostras'] > 0
+        excursoes = lotes['excursoes'][monitorados]
+        temperatura_violada = (lotes['tempo_acima'] + lotes['tempo_abaixo'])[monitorados] > 0
+        umidade_violada = lotes['tempo_umidade_acima'][monitorados] > 0
+        total_monitorados = int(monitorados.sum())
+
+        def percentual(mascara: np.ndarray) -> float:
+            return round(100.0 * float(mascara.mean()), 2) if total_monitorados else 0.0
+
+        ordem_criticos = np.argsort(-lotes['fracao_fora_faixa'][monitorados])[:5]
+        alertas_criticos = [
+            f"Lote {lote} fora da faixa em {100 * fracao:.1f}% do tempo (MKT {mkt:.1f} °C)"
+            for lote, fracao, mkt in zip(
+                lotes['lote'][monitorados][ordem_criticos],
+                lotes['fracao_fora_faixa'][monitorados][ordem_criticos],
+                lotes['mkt'][monitorados][ordem_criticos]
+            )
+            if fracao > 0
+        ]
+        suspeitos = estatisticas['codigos_sem_fabricacao']
+        if suspeitos:
+            alertas_criticos.append(f"{suspeitos} códigos sem registro de fabricação")
+
+        recomendacoes = []
+        if temperatura_violada.any():
+            recomendacoes.append('Revisar protocolo de transporte refrigerado')
+        if umidade_violada.any():
+            recomendacoes.append('Revisar controle de umidade no armazenamento')
+        if estatisticas['medicamentos_rastreados'] and total_monitorados < estatisticas['lotes_rastreados']:
+            recomendacoes.append('Implementar sensores IoT em mais pontos')
+        if suspeitos:
+            recomendacoes.append('Capacitar equipe sobre identificação de falsificações')
 
         return {
             'periodo': periodo,
             'data_relatorio': datetime.now().isoformat(),
             'estatisticas_gerais': {
-                'medicamentos_rastreados': 2450,
-                'eventos_registrados': 12300,
-                'alertas_gerados': 45,
-                'violacoes_detectadas': 12
+                'medicamentos_rastreados': estatisticas['medicamentos_rastreados'],
+                'eventos_registrados': estatisticas['eventos_registrados'],
+                'alertas_gerados': int((excursoes > 0).sum()),
+                'violacoes_detectadas': int(excursoes.sum())
             },
             'qualidade_cadeia': {
-                'score_medio_qualidade': 0.92,
-                'taxa_violacao_temperatura': 0.8,  # %
-                'taxa_violacao_umidade': 0.3,  # %
-                'tempo_medio_transporte': 4.2  # dias
+                'lotes_monitorados': total_monitorados,
+                'score_medio_qualidade': round(float(lotes['score_qualidade'][monitorados].mean()), 3)
+                if total_monitorados else None,
+                'taxa_violacao_temperatura': percentual(temperatura_violada),  # % dos lotes
+                'taxa_violacao_umidade': percentual(umidade_violada),  # % dos lotes
+                'mkt_medio': round(float(np.nanmean(lotes['mkt'][monitorados])), 2) if total_monitorados else None,
+                'exposicao_grau_hora': round(float(
+                    (lotes['grau_hora_acima'] + lotes['grau_hora_abaixo'])[monitorados].sum()
+                ), 2)
             },
             'autenticidade': {
-                'medicamentos_verificados': 2450,
-                'suspeitas_falsificacao': 2,
-                'taxa_autenticidade': 99.9  # %
+                'medicamentos_verificados': estatisticas['medicamentos_rastreados'],
+                'suspeitas_falsificacao': suspeitos,
+                'taxa_autenticidade': round(
+                    100.0 * (1 - suspeitos / estatisticas['medicamentos_rastreados']), 2
+                ) if estatisticas['medicamentos_rastreados'] else None  # %
             },
-            'alertas_criticos': [
-                'Lote XYZ123 com suspeita de falsificação',
-                'Violação de temperatura em transporte ABC'
-            ],
-            'recomendacoes': [
-                'Revisar protocolo de transporte refrigerado',
-                'Implementar sensores IoT em mais pontos',
-                'Capacitar equipe sobre identificação de falsificações'
-            ]
+            'alertas_criticos': alertas_criticos,
+            'recomendacoes': recomendacoes
         }
 
 class BlockchainFarmaceutico:
+    """
+    Fachada assíncrona do ledger com group commit
+
+    Eventos avulsos aguardam numa fila até completar ``tamanho_bloco`` ou até
+    ``janela_commit`` segundos e são gravados juntos num único bloco; rajadas
+    (RFID) vão direto em blocos. A gravação roda fora do event loop, numa
+    tarefa guardada até terminar; ``encerrar`` (ou ``drenar_gravacoes`` no
+    shutdown) grava a fila e espera as tarefas em andamento.
+    """
+
+    def __init__(self, ledger: LedgerFarmaceutico | None = None,
+                 tamanho_bloco: int = TAMANHO_BLOCO_PADRAO, janela_commit: float = 0.005):
+        self._ledger = ledger
+        self.tamanho_bloco = tamanho_bloco
+        self.janela_commit = janela_commit
+        self._pendentes: list[tuple[str, dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # O event loop guarda só referências fracas às tarefas: sem este set uma
+        # gravação em andamento pode ser coletada antes de resolver os futuros
+        self._gravacoes: set[asyncio.Task] = set()
+        _fachadas.add(self)
+
+    @property
+    def ledger(self) -> LedgerFarmaceutico:
+        if self._ledger is None:
+            self._ledger = obter_ledger_farmaceutico()
+        return self._ledger
+
     async def buscar_historico(self, codigo_rastreio: str) -> dict:
         """Busca histórico na blockchain"""
 
+        eventos = await asyncio.to_thread(self.ledger.historico, codigo_rastreio)
+        fabricacao = next((evento for evento in eventos if evento.get('tipo') == 'fabricacao'), {})
+
         return {
             'codigo_rastreio': codigo_rastreio,
-            'medicamento': 'Omeprazol 20mg',
-            'fabricante': 'Laboratório ABC',
-            'lote': 'OME2024001',
-            'eventos': [
-                {
-                    'tipo': 'fabricacao',
-                    'timestamp': '2024-01-15T08:00:00Z',
-                    'responsavel': 'Laboratório ABC',
-                    'localizacao': 'Fábrica São Paulo',
-                    'temperatura': 22,
-                    'umidade': 45,
-                    'lote': 'OME2024001',
-                    'data_fabricacao': '2024-01-15'
-                },
-                {
-                    'tipo': 'controle_qualidade',
-                    'timestamp': '2024-01-15T14:00:00Z',
-                    'responsavel': 'QC Lab ABC',
-                    'localizacao': 'Lab Controle Qualidade',
-                    'resultado': 'aprovado',
-                    'certificado': 'CQ2024001'
-                },
-                {
-                    'tipo': 'armazenamento',
-                    'timestamp': '2024-01-16T09:00:00Z',
-                    'responsavel': 'Almoxarifado ABC',
-                    'localizacao': 'Depósito Central',
-                    'temperatura': 25,
-                    'umidade': 50
-                },
-                {
-                    'tipo': 'transporte',
-                    'timestamp': '2024-01-20T10:00:00Z',
-                    'responsavel': 'Transportadora XYZ',
-                    'origem': 'Depósito Central',
-                    'destino': 'Hospital MedAI',
-                    'temperatura': 28,
-                    'umidade': 55
-                },
-                {
-                    'tipo': 'recebimento',
-                    'timestamp': '2024-01-21T08:30:00Z',
-                    'responsavel': 'Farmácia Hospital',
-                    'localizacao': 'Hospital MedAI',
-                    'conferencia': 'ok',
-                    'temperatura': 24,
-                    'umidade': 48
-                }
-            ]
+            'medicamento': fabricacao.get('medicamento'),
+            'fabricante': fabricacao.get('fabricante', fabricacao.get('responsavel', '')),
+            'lote': fabricacao.get('lote', next((e['lote'] for e in eventos if e.get('lote')), None)),
+            'eventos': eventos
         }
 
+    async def buscar_historico_lote(self, lote: str) -> list[dict]:
+        """Todos os eventos registrados para um lote"""
+
+        return await asyncio.to_thread(self.ledger.historico_lote, lote)
+
     async def registrar_evento(self, codigo_rastreio: str, evento: dict) -> dict:
         """Registra evento na blockchain"""
 
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes.append((codigo_rastreio, evento, futuro))
+
+        if len(self._pendentes) >= self.tamanho_bloco:
+            self._disparar_commit()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.janela_commit, self._disparar_commit)
+
+        recibo = await futuro
         return {
-            'hash': f"0x{hash(str(evento)) % 1000000:06x}",
-            'bloco': 12345,
-            'timestamp': datetime.now().isoformat()
+            'hash': recibo['hash'],
+            'bloco': recibo['bloco'],
+            'timestamp': datetime.fromtimestamp(recibo['timestamp']).isoformat()
         }
 
+    async def registrar_eventos(self, eventos: list[tuple[str, dict]]) -> list[dict]:
+        """Registra uma rajada de eventos em blocos de ``tamanho_bloco``"""
+
+        recibos = []
+        for inicio in range(0, len(eventos), self.tamanho_bloco):
+            bloco = eventos[inicio:inicio + self.tamanho_bloco]
+            recibos.extend(await asyncio.to_thread(self.ledger.anexar, bloco))
+        return recibos
+
+    async def verificar_integridade(self, completa: bool = False) -> dict:
+        """Verifica a cadeia a partir do último checkpoint (ou desde o início)"""
+
+        return await asyncio.to_thread(self.ledger.verificar_cadeia, completa)
+
+    def _disparar_commit(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pendentes, self._pendentes = self._pendentes, []
+        if pendentes:
+            tarefa = asyncio.get_running_loop().create_task(self._gravar(pendentes))
+            self._gravacoes.add(tarefa)
+            tarefa.add_done_callback(self._gravacoes.discard)
+
+    async def encerrar(self) -> None:
+        """Grava os eventos ainda na fila e aguarda as gravações em andamento"""
+
+        self._disparar_commit()
+        if self._gravacoes:
+            await asyncio.gather(*self._gravacoes, return_exceptions=True)
+
+    async def _gravar(self, pendentes: list[tuple[str, dict, asyncio.Future]]) -> None:
+        try:
+            recibos = await asyncio.to_thread(
+                self.ledger.anexar, [(codigo, evento) for codigo, evento, _ in pendentes]
+            )
+        except Exception as e:
+            logger.error(f"Erro ao gravar bloco no ledger: {e}")
+            for _, _, futuro in pendentes:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        for (_, _, futuro), recibo in zip(pendentes, recibos):
+            if not futuro.done():
+                futuro.set_result(recibo)
+
+_fachadas: weakref.WeakSet[BlockchainFarmaceutico] = weakref.WeakSet()
+
+
+async def drenar_gravacoes() -> None:
+    """Aguarda, no shutdown, os blocos em group commit de todas as fachadas do processo"""
+    for fachada in list(_fachadas):
+        await fachada.encerrar()
+
 class ScannerRFIDMedicamentos:
-    pass
+    """Converte rajadas de leituras RFID em eventos do ledger e em telemetria dos lotes"""
+
+    def __init__(self, blockchain: BlockchainFarmaceutico | None = None,
+                 telemetria: TelemetriaCadeiaFria | None = None):
+        self.blockchain = blockchain or BlockchainFarmaceutico()
+        self.telemetria = telemetria or obter_telemetria_cadeia_fria()
+
+    async def processar_leituras(self, leituras: list[dict], responsavel: str, localizacao: str) -> dict:
+        """
+        Registra uma rajada de leituras
+
+        Leitores RFID leem a mesma etiqueta várias vezes por passagem; cada
+        etiqueta gera um único evento com o número de leituras. Toda leitura
+        com lote e temperatura (etiquetas com sensor) entra na telemetria do
+        lote.
+        """
+
+        eventos: dict[str, dict] = {}
+        sem_codigo = 0
+        for leitura in leituras:
+            codigo = leitura.get('codigo_rastreio') or leitura.get('epc')
+            if not codigo:
+                sem_codigo += 1
+                continue
+            if codigo in eventos:
+                eventos[codigo]['leituras'] += 1
+                continue
+
+            evento = {
+                'tipo': 'leitura_rfid',
+                'timestamp': leitura.get('timestamp') or datetime.now().isoformat(),
+                'responsavel': responsavel,
+                'localizacao': localizacao,
+                'leituras': 1
+            }
+            for campo in ('lote', 'antena', 'temperatura', 'umidade'):
+                if campo in leitura:
+                    evento[campo] = leitura[campo]
+            eventos[codigo] = evento
+
+        recibos = await self.blockchain.registrar_eventos(list(eventos.items()))
+        lotes, instantes, temperaturas, umidades = _leituras_sensores(leituras)
+        leituras_telemetria = await asyncio.to_thread(
+            self.telemetria.registrar_leituras, lotes, instantes, temperaturas, umidades
+        ) if lotes else 0
+
+        return {
+            'leituras_recebidas': len(leituras),
+            'etiquetas_unicas': len(eventos),
+            'leituras_sem_codigo': sem_codigo,
+            'eventos_registrados': len(recibos),
+            'leituras_telemetria': leituras_telemetria,
+            'blocos': sorted({recibo['bloco'] for recibo in recibos})
+        }
 
 class ValidadorAutenticidadeML:
     async def verificar(self, codigo: str, historico: dict) -> dict:
@@ -0,0 +1,491 @@
+"""
+Roteamento de entregas internas da farmácia
+
+A matriz de tempos entre a farmácia e as unidades do hospital é carregada
+uma vez. As rotas respeitam a capacidade do carrinho e as janelas de
+entrega (atraso é penalizado, ponderado pela prioridade). A construção
+usa economias de Clarke-Wright; depois há busca local (2-opt e or-opt)
+dentro de um orçamento de tempo. Quando chegam pedidos urgentes no meio da
+ronda, o plano vigente é reaproveitado: o trecho em execução fica
+congelado, os pedidos novos entram por inserção mais barata e a busca
+local roda só sobre o que ainda pode mudar; o que já foi concluído sai do
+plano, que não cresce ao longo da ronda.
+"""
+
+import json
+import logging
+import math
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.Roteamento')
+
+DEPOSITO = 'farmacia'
+CAPACIDADE_PADRAO = 100.0  # itens por carrinho
+TEMPO_SERVICO_PADRAO = 3.0  # minutos por entrega
+ORCAMENTO_PADRAO = 0.5  # segundos de busca local
+PESO_ATRASO = 10.0  # minutos de deslocamento equivalentes a 1 minuto de atraso
+VELOCIDADE_PADRAO = 50.0  # metros por minuto com carrinho
+TEMPO_POR_ANDAR = 1.5  # minutos de elevador por andar
+_EPS = 1e-9
+
+# Coordenadas (x, y em metros; andar) das unidades atendidas pela farmácia central
+LAYOUT_HOSPITAL = {
+    DEPOSITO: (0.0, 0.0, 0),
+    'emergencia': (40.0, 10.0, 0),
+    'uti': (30.0, 60.0, 2),
+    'centro_cirurgico': (50.0, 60.0, 2),
+    'enfermaria_clinica': (20.0, 40.0, 3),
+    'pediatria': (60.0, 30.0, 3)
+}
+# Posição assumida para unidades fora do layout: o canto mais distante da farmácia
+UNIDADE_NAO_MAPEADA = 'unidade_nao_mapeada'
+
+
+@dataclass
+class Entrega:
+    """Pedido a ser entregue numa unidade; janelas em minutos desde o início da ronda"""
+    id: str
+    unidade: str
+    demanda: float = 1.0
+    janela_inicio: float = 0.0
+    janela_fim: float = math.inf
+    tempo_servico: float = TEMPO_SERVICO_PADRAO
+    prioridade: float = 0.0
+    dados: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PlanoDistribuicao:
+    """
+    Rotas como listas de nós: 1..len(entregas) são entregas; nós seguintes
+    são passagens pela farmácia para recarga liberadas nos instantes de
+    ``recargas``
+    """
+    entregas: list[Entrega]
+    rotas: list[list[int]]
+    saidas: list[float]
+    recargas: list[float] = field(default_factory=list)
+
+
+class MatrizDistancias:
+    """Tempos (minutos) e distâncias (metros) entre a farmácia (índice 0) e as unidades"""
+
+    def __init__(self, unidades: Sequence[str], tempos: np.ndarray, distancias: np.ndarray | None = None,
+                 padrao: str | None = None):
+        self.unidades = list(unidades)
+        self.tempos = np.asarray(tempos, dtype=float)
+        self.distancias = None if distancias is None else np.asarray(distancias, dtype=float)
+        self._indices = {unidade: i for i, unidade in enumerate(self.unidades)}
+        if self.tempos.shape != (len(self.unidades), len(self.unidades)):
+            raise ValueError("Matriz de tempos incompatível com a lista de unidades")
+        if padrao is not None and padrao not in self._indices:
+            raise ValueError(f"Unidade padrão fora da matriz: {padrao}")
+        self.padrao = padrao  # posição usada para unidades sem posição própria (None: erro)
+        self._sem_posicao: set[str] = set()
+
+    @classmethod
+    def de_coordenadas(cls, coordenadas: Mapping[str, tuple[float, float, int]], deposito: str = DEPOSITO,
+                       velocidade: float = VELOCIDADE_PADRAO, tempo_por_andar: float = TEMPO_POR_ANDAR,
+                       padrao: str | None = None) -> 'MatrizDistancias':
+        """Distância de Manhattan no andar mais deslocamento vertical por elevador"""
+        unidades = [deposito] + [unidade for unidade in coordenadas if unidade != deposito]
+        pontos = np.array([coordenadas[unidade] for unidade in unidades], dtype=float)
+        horizontal = np.abs(pontos[:, None, :2] - pontos[None, :, :2]).sum(axis=2)
+        andares = np.abs(pontos[:, None, 2] - pontos[None, :, 2])
+        return cls(unidades, horizontal / velocidade + andares * tempo_por_andar, horizontal, padrao)
+
+    def indice(self, unidade: str) -> int:
+        indice = self._indices.get(unidade)
+        if indice is not None:
+            return indice
+        if self.padrao is None:
+            raise KeyError(f"Unidade sem posição na matriz de distâncias: {unidade}")
+        if unidade not in self._sem_posicao:
+            self._sem_posicao.add(unidade)
+            logger.warning(f"Unidade {unidade} sem posição no layout; usando a posição de {self.padrao}")
+        return self._indices[self.padrao]
+
+
+class _Instancia:
+    """Atributos por nó em listas Python (acesso escalar rápido nos laços da heurística)"""
+
+    def __init__(self, matriz: MatrizDistancias, plano: PlanoDistribuicao, capacidade: float):
+        entregas, recargas = plano.entregas, plano.recargas
+        self.total_entregas = len(entregas)
+        self.locais = [0] + [matriz.indice(e.unidade) for e in entregas] + [0] * len(recargas)
+        self.t = matriz.tempos[np.ix_(self.locais, self.locais)].tolist()
+        self.demanda = [0.0] + [e.demanda for e in entregas] + [0.0] * len(recargas)
+        self.inicio = [0.0] + [e.janela_inicio for e in entregas] + list(recargas)
+        self.fim = [math.inf] + [e.janela_fim for e in entregas] + [math.inf] * len(recargas)
+        self.servico = [0.0] + [e.tempo_servico for e in entregas] + [0.0] * len(recargas)
+        self.peso = [0.0] + [PESO_ATRASO * (1 + e.prioridade) for e in entregas] + [0.0] * len(recargas)
+        self.deposito = [True] + [False] * len(entregas) + [True] * len(recargas)
+        self.capacidade = capacidade
+
+    def avaliar(self, saida: float, nos: list[int]) -> tuple[float, float]:
+        """(custo, atraso): deslocamento mais atraso ponderado; infinito se exceder a capacidade"""
+        t, deposito, demanda = self.t, self.deposito, self.demanda
+        inicio, fim, servico, peso = self.inicio, self.fim, self.servico, self.peso
+        instante, anterior, custo, atraso, carga, paradas = saida, 0, 0.0, 0.0, 0.0, 0
+        for no in nos:
+            deslocamento = t[anterior][no]
+            custo += deslocamento
+            instante += deslocamento
+            if deposito[no]:
+                carga, paradas = 0.0, 0
+            else:
+                carga += demanda[no]
+                paradas += 1
+                if carga > self.capacidade and paradas > 1:
+                    return math.inf, math.inf
+            if instante < inicio[no]:
+                instante = inicio[no]
+            if instante > fim[no]:
+                atraso += instante - fim[no]
+                custo += peso[no] * (instante - fim[no])
+            instante += servico[no]
+            anterior = no
+        return custo + t[anterior][0], atraso
+
+
+class RoteadorInteligente:
+    """Rotas capacitadas com janelas de tempo: economias + 2-opt/or-opt com orçamento de tempo"""
+
+    def __init__(self, matriz: MatrizDistancias, capacidade: float = CAPACIDADE_PADRAO,
+                 orcamento: float = ORCAMENTO_PADRAO, max_rotas: int | None = None):
+        self.matriz = matriz
+        self.capacidade = capacidade
+        self.orcamento = orcamento
+        self.max_rotas = max_rotas
+
+    def planejar(self, entregas: Sequence[Entrega], inicio: float = 0.0) -> PlanoDistribuicao:
+        """Plano completo da ronda a partir de ``inicio``"""
+        prazo = time.perf_counter() + self.orcamento
+        plano = PlanoDistribuicao(list(entregas), [], [])
+        if not plano.entregas:
+            return plano
+        instancia = _Instancia(self.matriz, plano, self.capacidade)
+        plano.rotas = self._economias(instancia, inicio)
+        plano.saidas = [inicio] * len(plano.rotas)
+        self._busca_local(instancia, plano, [0] * len(plano.rotas), prazo)
+        return plano
+
+    def reotimizar(self, plano: PlanoDistribuicao, novas: Sequence[Entrega], agora: float) -> PlanoDistribuicao:
+        """
+        Incorpora pedidos que chegaram em ``agora`` sem refazer o plano
+
+        Rotas que já saíram mantêm a viagem em curso (os itens estão no
+        carrinho); novos pedidos podem entrar nas viagens seguintes (com
+        retorno à farmácia), em rotas que ainda não saíram ou em rotas novas
+        saindo agora.
+        """
+        prazo = time.perf_counter() + self.orcamento
+        total_antigo = len(plano.entregas)
+        deslocamento = len(novas)
+
+        def renumerar(no: int) -> int:
+            return no + deslocamento if no > total_antigo else no
+
+        novo = PlanoDistribuicao(
+            plano.entregas + list(novas),
+            [[renumerar(no) for no in nos] for nos in plano.rotas],
+            list(plano.saidas),
+            list(plano.recargas)
+        )
+        instancia = _Instancia(self.matriz, novo, self.capacidade)
+
+        fixos = []
+        for r, nos in enumerate(novo.rotas):
+            if novo.saidas[r] > agora:
+                fixos.append(0)
+                continue
+            iniciados = sum(1 for instante in self._inicios_servico(instancia, novo.saidas[r], nos) if instante <= agora)
+            fim_viagem = next((i for i in range(iniciados, len(nos)) if instancia.deposito[nos[i]]), None)
+            if fim_viagem is None:
+                # Retorno à farmácia ao fim da viagem em curso abre espaço para uma nova viagem
+                novo.recargas.append(agora)
+                nos.append(len(novo.entregas) + len(novo.recargas))
+                fim_viagem = len(nos) - 1
+            fixos.append(fim_viagem + 1)
+        instancia = _Instancia(self.matriz, novo, self.capacidade)
+
+        custos = [instancia.avaliar(s, nos)[0] for s, nos in zip(novo.saidas, novo.rotas)]
+        ordem = sorted(range(total_antigo + 1, len(novo.entregas) + 1), key=lambda no: instancia.fim[no])
+        for no in ordem:
+            melhor = None
+            if self.max_rotas is None or len(novo.rotas) < self.max_rotas:
+                melhor = (instancia.avaliar(agora, [no])[0], None, 0)
+            for r, nos in enumerate(novo.rotas):
+                for p in range(fixos[r], len(nos) + 1):
+                    custo = instancia.avaliar(novo.saidas[r], nos[:p] + [no] + nos[p:])[0] - custos[r]
+                    # Em empate, reaproveitar um carrinho já em circulação
+                    if melhor is None or custo < melhor[0] + _EPS:
+                        melhor = (custo, r, p)
+            _, r, p = melhor
+            if r is None:
+                novo.rotas.append([no])
+                novo.saidas.append(agora)
+                fixos.append(0)
+                custos.append(instancia.avaliar(agora, [no])[0])
+            else:
+                novo.rotas[r].insert(p, no)
+                custos[r] = instancia.avaliar(novo.saidas[r], novo.rotas[r])[0]
+
+        self._busca_local(instancia, novo, fixos, prazo)
+        # Recargas que ficaram sem entregas depois delas não são necessárias
+        for nos in novo.rotas:
+            while nos and instancia.deposito[nos[-1]]:
+                nos.pop()
+        return self._compactar(novo, agora)
+
+    def _compactar(self, plano: PlanoDistribuicao, agora: float) -> PlanoDistribuicao:
+        """
+        Remove do plano o que já foi concluído até ``agora``
+
+        Viagens encerradas (carrinho de volta à farmácia) saem da rota, que
+        passa a sair no instante da recarga; rotas terminadas são descartadas.
+        Entregas e recargas que nenhuma rota referencia deixam o plano e os
+        nós são renumerados.
+        """
+        instancia = _Instancia(self.matriz, plano, self.capacidade)
+        rotas, saidas = [], []
+        for saida, nos in zip(plano.saidas, plano.rotas):
+            if saida <= agora and nos:
+                inicios = self._inicios_servico(instancia, saida, nos)
+                if inicios[-1] + instancia.servico[nos[-1]] + instancia.t[nos[-1]][0] <= agora:
+                    continue
+                recarga = max((i for i, no in enumerate(nos) if instancia.deposito[no] and inicios[i] <= agora),
+                              default=None)
+                if recarga is not None:
+                    saida, nos = inicios[recarga], nos[recarga + 1:]
+            rotas.append(nos)
+            saidas.append(saida)
+
+        # Entregas vêm antes das recargas na numeração, e a ordem relativa se mantém
+        usados = sorted({no for nos in rotas for no in nos})
+        renumerado = {no: k + 1 for k, no in enumerate(usados)}
+        total = len(plano.entregas)
+        return PlanoDistribuicao(
+            [plano.entregas[no - 1] for no in usados if no <= total],
+            [[renumerado[no] for no in nos] for nos in rotas],
+            saidas,
+            [plano.recargas[no - total - 1] for no in usados if no > total]
+        )
+
+    def _economias(self, instancia: _Instancia, inicio: float) -> list[list[int]]:
+        """Clarke-Wright: funde rotas pelo fim/início quando a economia é positiva e o custo cai"""
+        n = instancia.total_entregas
+        t = np.asarray(instancia.t)[:n + 1, :n + 1]
+        economias = t[1:, :1] + t[:1, 1:] - t[1:, 1:]
+        np.fill_diagonal(economias, -np.inf)
+        origem, destino = np.nonzero(economias > 0)
+        ordem = np.argsort(-economias[origem, destino], kind='stable')
+
+        rotas: dict[int, list[int]] = {no: [no] for no in range(1, n + 1)}
+        rota_de = list(range(n + 1))
+        carga = {no: instancia.demanda[no] for no in rotas}
+        custo = {no: instancia.avaliar(inicio, [no])[0] for no in rotas}
+        for i, j in zip((origem[ordem] + 1).tolist(), (destino[ordem] + 1).tolist()):
+            ri, rj = rota_de[i], rota_de[j]
+            if ri == rj or rotas[ri][-1] != i or rotas[rj][0] != j:
+                continue
+            if carga[ri] + carga[rj] > self.capacidade:
+                continue
+            fundida = rotas[ri] + rotas[rj]
+            novo_custo = instancia.avaliar(inicio, fundida)[0]
+            if novo_custo >= custo[ri] + custo[rj] - _EPS:
+                continue
+            rotas[ri], custo[ri], carga[ri] = fundida, novo_custo, carga[ri] + carga[rj]
+            for no in rotas.pop(rj):
+                rota_de[no] = ri
+            del custo[rj], carga[rj]
+        return list(rotas.values())
+
+    def _busca_local(self, instancia: _Instancia, plano: PlanoDistribuicao, fixos: list[int], prazo: float) -> None:
+        custos, atrasos = [], []
+        for saida, nos in zip(plano.saidas, plano.rotas):
+            custo, atraso = instancia.avaliar(saida, nos)
+            custos.append(custo)
+            atrasos.append(atraso)
+
+        melhorou = True
+        while melhorou and time.perf_counter() < prazo:
+            melhorou = self._dois_opt(instancia, plano, fixos, custos, atrasos, prazo)
+            melhorou = self._or_opt(instancia, plano, fixos, custos, atrasos, prazo) or melhorou
+
+        vazias = [r for r, nos in enumerate(plano.rotas)
+                  if not any(not instancia.deposito[no] for no in nos)]
+        for r in reversed(vazias):
+            del plano.rotas[r], plano.saidas[r], fixos[r]
+
+    @staticmethod
+    def _dois_opt(instancia: _Instancia, plano: PlanoDistribuicao, fixos: list[int], custos: list[float],
+                  atrasos: list[float], prazo: float) -> bool:
+        """Inversão de trechos dentro de cada rota (primeira melhoria)"""
+        t = instancia.t
+        melhorou = False
+        for r in range(len(plano.rotas)):
+            mudou = True
+            while mudou:
+                mudou = False
+                nos = plano.rotas[r]
+                for i in range(fixos[r], len(nos) - 1):
+                    if time.perf_counter() > prazo:
+                        return melhorou
+                    a, b = (nos[i - 1] if i > 0 else 0), nos[i]
+                    for j in range(i + 1, len(nos)):
+                        c, d = nos[j], (nos[j + 1] if j + 1 < len(nos) else 0)
+                        if t[a][c] + t[b][d] - t[a][b] - t[c][d] >= -_EPS and atrasos[r] <= 0:
+                            continue
+                        candidata = nos[:i] + nos[i:j + 1][::-1] + nos[j + 1:]
+                        custo, atraso = instancia.avaliar(plano.saidas[r], candidata)
+                        if custo < custos[r] - _EPS:
+                            plano.rotas[r], custos[r], atrasos[r] = candidata, custo, atraso
+                            mudou = melhorou = True
+                            break
+                    if mudou:
+                        break
+        return melhorou
+
+    @staticmethod
+    def _or_opt(instancia: _Instancia, plano: PlanoDistribuicao, fixos: list[int], custos: list[float],
+                atrasos: list[float], prazo: float) -> bool:
+        """Realocação de trechos de 1 a 3 entregas para outra posição (na mesma rota ou em outra)"""
+        t, deposito = instancia.t, instancia.deposito
+        rotas, saidas = plano.rotas, plano.saidas
+        melhorou = False
+        for r in range(len(rotas)):
+            for tamanho in (1, 2, 3):
+                i = fixos[r]
+                while i + tamanho <= len(rotas[r]):
+                    if time.perf_counter() > prazo:
+                        return melhorou
+                    nos = rotas[r]
+                    trecho = nos[i:i + tamanho]
+                    if any(deposito[no] for no in trecho):
+                        i += 1
+                        continue
+                    a, b = (nos[i - 1] if i > 0 else 0), (nos[i + tamanho] if i + tamanho < len(nos) else 0)
+                    ganho_remocao = t[a][trecho[0]] + t[trecho[-1]][b] - t[a][b]
+                    restante = nos[:i] + nos[i + tamanho:]
+                    custo_restante = None
+                    aplicado = False
+                    for r2 in range(len(rotas)):
+                        alvo = restante if r2 == r else rotas[r2]
+                        for p in range(fixos[r2], len(alvo) + 1):
+                            if r2 == r and p == i:
+                                continue
+                            c, d = (alvo[p - 1] if p > 0 else 0), (alvo[p] if p < len(alvo) else 0)
+                            delta = t[c][trecho[0]] + t[trecho[-1]][d] - t[c][d] - ganho_remocao
+                            if delta >= -_EPS and atrasos[r] <= 0 and atrasos[r2] <= 0:
+                                continue
+                            candidata = alvo[:p] + trecho + alvo[p:]
+                            if r2 == r:
+                                custo, atraso = instancia.avaliar(saidas[r], candidata)
+                                if custo < custos[r] - _EPS:
+                                    rotas[r], custos[r], atrasos[r] = candidata, custo, atraso
+                                    aplicado = True
+                            else:
+                                if custo_restante is None:
+                                    custo_restante = instancia.avaliar(saidas[r], restante)
+                                custo2, atraso2 = instancia.avaliar(saidas[r2], candidata)
+                                if custo_restante[0] + custo2 < custos[r] + custos[r2] - _EPS:
+                                    rotas[r], (custos[r], atrasos[r]) = restante, custo_restante
+                                    rotas[r2], custos[r2], atrasos[r2] = candidata, custo2, atraso2
+                                    aplicado = True
+                            if aplicado:
+                                break
+                        if aplicado:
+                            break
+                    if aplicado:
+                        melhorou = True
+                    else:
+                        i += 1
+        return melhorou
+
+    @staticmethod
+    def _inicios_servico(instancia: _Instancia, saida: float, nos: list[int]) -> list[float]:
+        instantes, instante, anterior = [], saida, 0
+        for no in nos:
+            instante = max(instante + instancia.t[anterior][no], instancia.inicio[no])
+            instantes.append(instante)
+            instante += instancia.servico[no]
+            anterior = no
+        return instantes
+
+    def detalhar(self, plano: PlanoDistribuicao) -> list[dict[str, Any]]:
+        """Rotas com horários de chegada, atrasos, tempo e distância totais"""
+        instancia = _Instancia(self.matriz, plano, self.capacidade)
+        distancias = self.matriz.distancias
+        rotas = []
+        for k, (saida, nos) in enumerate(zip(plano.saidas, plano.rotas)):
+            inicios = self._inicios_servico(instancia, saida, nos)
+            paradas, anterior, distancia = [], 0, 0.0
+            for no, inicio in zip(nos, inicios):
+                if distancias is not None:
+                    distancia += distancias[instancia.locais[anterior], instancia.locais[no]]
+                anterior = no
+                if instancia.deposito[no]:
+                    paradas.append({'recarga': True, 'unidade': DEPOSITO, 'inicio_servico': inicio})
+                    continue
+                entrega = plano.entregas[no - 1]
+                paradas.append({
+                    'entrega': entrega.id,
+                    'unidade': entrega.unidade,
+                    'inicio_servico': inicio,
+                    'atraso': max(0.0, inicio - entrega.janela_fim),
+                    'dados': entrega.dados
+                })
+            retorno = (inicios[-1] + instancia.servico[nos[-1]] + instancia.t[nos[-1]][0]) if nos else saida
+            if distancias is not None and nos:
+                distancia += distancias[instancia.locais[nos[-1]], 0]
+            entregas = [parada for parada in paradas if not parada.get('recarga')]
+            rotas.append({
+                'id_rota': f"rota_{k + 1:02d}",
+                'saida': saida,
+                'retorno': retorno,
+                'paradas': paradas,
+                'unidades': [parada['unidade'] for parada in entregas],
+                'tempo_estimado': round(retorno - saida, 1),
+                'distancia_total': round(distancia, 1) if distancias is not None else None,
+                'atraso_total': round(sum(parada['atraso'] for parada in entregas), 1)
+            })
+        return rotas
+
+
+def carregar_layout(caminho: str = "") -> dict[str, tuple[float, float, int]]:
+    """Layout padrão, ampliado ou corrigido pelo JSON ``{"unidade": [x, y, andar]}`` em ``caminho``"""
+    layout = dict(LAYOUT_HOSPITAL)
+    if caminho:
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                layout.update({unidade: (float(x), float(y), int(andar))
+                               for unidade, (x, y, andar) in json.load(arquivo).items()})
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Layout do hospital inválido em {caminho}; usando o layout padrão: {e}")
+            layout = dict(LAYOUT_HOSPITAL)
+    pontos = np.array(list(layout.values()), dtype=float)
+    x, y, andar = pontos.max(axis=0)
+    layout.setdefault(UNIDADE_NAO_MAPEADA, (float(x), float(y), int(andar)))
+    return layout
+
+
+def _criar_matriz_hospital() -> MatrizDistancias:
+    from app.core.config import settings
+    return MatrizDistancias.de_coordenadas(carregar_layout(settings.FARMACIA_LAYOUT_HOSPITAL),
+                                           padrao=UNIDADE_NAO_MAPEADA)
+
+
+_matriz_hospital = ServicoProcesso('matriz_hospital', _criar_matriz_hospital)
+
+
+def obter_matriz_hospital() -> MatrizDistancias:
+    """Matriz de tempos do layout do hospital, montada uma única vez por processo"""
+    return _matriz_hospital.obter()
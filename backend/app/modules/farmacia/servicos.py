@@ -0,0 +1,71 @@
+"""
+Serviços compartilhados da farmácia
+
+Serviços com estado (ledger, inventário, KPIs, antibiograma...) existem uma
+vez por processo. Cada módulo declara o seu com ``ServicoProcesso`` e uma
+fábrica que lê as settings (caminho do banco, parâmetros); a instância é
+criada no primeiro uso ou no startup da aplicação (``iniciar_servicos``) e
+fechada no shutdown (``encerrar_servicos``). Testes e integrações podem
+injetar outra instância com ``definir``.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+logger = logging.getLogger('MedAI.Farmacia.Servicos')
+
+T = TypeVar('T')
+
+_registrados: list['ServicoProcesso'] = []
+
+
+class ServicoProcesso(Generic[T]):
+    """Instância única e preguiçosa de um serviço, com ciclo de vida explícito"""
+
+    def __init__(self, nome: str, fabrica: Callable[[], T], iniciar_no_startup: bool = False):
+        self.nome = nome
+        self.fabrica = fabrica
+        self.iniciar_no_startup = iniciar_no_startup
+        self._instancia: T | None = None
+        self._lock = threading.Lock()
+        _registrados.append(self)
+
+    def obter(self) -> T:
+        instancia = self._instancia
+        if instancia is None:
+            with self._lock:
+                if self._instancia is None:
+                    self._instancia = self.fabrica()
+                instancia = self._instancia
+        return instancia
+
+    def definir(self, instancia: T | None) -> None:
+        """Substitui a instância do processo (None volta a criar pela fábrica no próximo uso)"""
+        with self._lock:
+            self._instancia = instancia
+
+    def encerrar(self) -> None:
+        with self._lock:
+            instancia, self._instancia = self._instancia, None
+        fechar = getattr(instancia, 'fechar', None)
+        if fechar is not None:
+            fechar()
+
+
+def iniciar_servicos() -> None:
+    """Cria no startup os serviços que carregam estado persistido"""
+    for servico in list(_registrados):
+        if servico.iniciar_no_startup:
+            servico.obter()
+            logger.info(f"Serviço da farmácia iniciado: {servico.nome}")
+
+
+def encerrar_servicos() -> None:
+    """Fecha os serviços criados (conexões, pools) no shutdown"""
+    for servico in reversed(_registrados):
+        try:
+            servico.encerrar()
+        except Exception as e:
+            logger.error(f"Erro ao encerrar serviço {servico.nome}: {e}")
@@ -0,0 +1,589 @@
+"""
+Telemetria de cadeia fria por lote
+
+Armazena séries de temperatura/umidade em colunas (numpy) e mantém, para
+cada lote, agregados pré-calculados atualizados a cada ingestão: tempo acima
+e abaixo da faixa, exposição acumulada (grau-hora), número de excursões e a
+soma de Arrhenius da temperatura cinética média (MKT). Consultas e relatórios
+leem os agregados; a série bruta só é percorrida uma vez, na ingestão.
+
+Cada intervalo entre duas leituras do mesmo lote é atribuído à leitura
+anterior (valor mantido até a próxima leitura), limitado a
+``intervalo_maximo``; o excedente conta como tempo sem dados.
+
+Os agregados de cada lote (com faixa e remessa) são regravados no SQLite a
+cada ingestão e recarregados ao abrir; a série é guardada reduzida a
+médias, mínimas e máximas por ``resolucao_serie`` segundos. A série bruta
+fica só em memória, pela janela de ``retencao``.
+"""
+
+import logging
+from collections import deque
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import numpy as np
+
+from .armazem_sqlite import INTERVALO_SINCRONIZACAO_PADRAO, ArmazemSQLite
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.TelemetriaCadeiaFria')
+
+# ΔH/R da USP <1160> (ΔH = 83,144 kJ/mol, R = 8,3144 J/mol·K)
+DELTA_H_SOBRE_R = 10000.0
+KELVIN = 273.15
+FAIXA_PADRAO = (15.0, 30.0, 80.0)  # temperatura mínima, máxima (°C) e umidade máxima (%)
+INTERVALO_MAXIMO_PADRAO = 900.0  # segundos
+RETENCAO_PADRAO = 3600.0  # segundos de série bruta em memória (~15 MB a 10 mil lotes, 1 leitura/min)
+CELULAS_POR_BLOCO = 2_000_000
+RESOLUCAO_SERIE_PADRAO = 900.0  # segundos por ponto da série gravada
+RETENCAO_SERIE_GRAVADA_PADRAO = 90 * 86400.0  # segundos
+
+_ACUMULADORES = (
+    "amostras", "tempo_monitorado", "soma_arrhenius", "tempo_acima", "tempo_abaixo",
+    "grau_hora_acima", "grau_hora_abaixo", "tempo_umidade_acima", "tempo_sem_dados", "excursoes"
+)
+# Colunas por lote gravadas em ``agregados`` (a remessa vai pelo nome)
+_PERSISTIDAS = (
+    "temp_min", "temp_max", "umidade_max", "minima", "maxima", "primeira_leitura",
+    "ultimo_ts", "ultima_temp", "ultima_umidade", *_ACUMULADORES
+)
+
+_SCHEMA = (
+    # INSERT OR REPLACE dá ao lote um seq novo: a sincronização lê só os lotes regravados
+    "CREATE TABLE IF NOT EXISTS agregados ("
+    " seq INTEGER PRIMARY KEY, lote TEXT NOT NULL UNIQUE, remessa TEXT, "
+    + ", ".join(f"{nome} REAL" for nome in _PERSISTIDAS) + ")",
+    "CREATE TABLE IF NOT EXISTS serie ("
+    " lote TEXT NOT NULL, inicio REAL NOT NULL, amostras INTEGER NOT NULL, soma_temperatura REAL NOT NULL,"
+    " minima REAL, maxima REAL, amostras_umidade INTEGER NOT NULL, soma_umidade REAL NOT NULL,"
+    " PRIMARY KEY (lote, inicio))",
+    "CREATE INDEX IF NOT EXISTS serie_por_inicio ON serie (inicio)",
+)
+_INSERIR_AGREGADOS = (
+    f"INSERT OR REPLACE INTO agregados (lote, remessa, {', '.join(_PERSISTIDAS)})"
+    f" VALUES ({', '.join('?' * (len(_PERSISTIDAS) + 2))})"
+)
+_SOMAR_SERIE = (
+    "INSERT INTO serie (lote, inicio, amostras, soma_temperatura, minima, maxima, amostras_umidade, soma_umidade)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (lote, inicio) DO UPDATE SET"
+    " amostras = amostras + excluded.amostras,"
+    " soma_temperatura = soma_temperatura + excluded.soma_temperatura,"
+    " minima = COALESCE(MIN(minima, excluded.minima), minima, excluded.minima),"
+    " maxima = COALESCE(MAX(maxima, excluded.maxima), maxima, excluded.maxima),"
+    " amostras_umidade = amostras_umidade + excluded.amostras_umidade,"
+    " soma_umidade = soma_umidade + excluded.soma_umidade"
+)
+
+
+class TelemetriaCadeiaFria(ArmazemSQLite):
+    """Séries de sensores por lote com agregados de excursão incrementais, persistidos em SQLite"""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, intervalo_maximo: float = INTERVALO_MAXIMO_PADRAO,
+                 retencao: float | None = RETENCAO_PADRAO, caminho: str = ":memory:",
+                 intervalo_sincronizacao: float = INTERVALO_SINCRONIZACAO_PADRAO,
+                 resolucao_serie: float = RESOLUCAO_SERIE_PADRAO,
+                 retencao_serie_gravada: float | None = RETENCAO_SERIE_GRAVADA_PADRAO):
+        """
+        ``retencao`` limita a série bruta em memória (0 desliga; None guarda
+        tudo); ``retencao_serie_gravada`` faz o mesmo com a série reduzida no
+        banco
+        """
+        super().__init__(caminho, intervalo_sincronizacao)
+        self.intervalo_maximo = intervalo_maximo
+        self.retencao = retencao
+        self.resolucao_serie = resolucao_serie
+        self.retencao_serie_gravada = retencao_serie_gravada
+        self._indices: dict[str, int] = {}
+        self._nomes: list[str] = []
+        self._remessas: dict[str, int] = {}
+        self._capacidade = 0
+        self._colunas: dict[str, np.ndarray] = {}
+        # (maior timestamp do bloco, ids, ts, temperatura, umidade), na ordem de ingestão
+        self._blocos_serie: deque[tuple[float, np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = deque()
+        self._ts_maximo = -np.inf
+        self._aplicado = 0  # maior seq de ``agregados`` já carregado
+        self._garantir_capacidade(64)
+        self._abrir()
+        if self._nomes:
+            logger.info(f"Telemetria carregada: {len(self._nomes)} lotes")
+
+    # === Persistência ===
+
+    def _sincronizar(self) -> None:
+        """Carrega (com o lock) os agregados regravados desde a última sincronização"""
+        linhas = self._conn.execute(
+            f"SELECT seq, lote, remessa, {', '.join(_PERSISTIDAS)} FROM agregados WHERE seq > ? ORDER BY seq",
+            (self._aplicado,)
+        ).fetchall()
+        if not linhas:
+            return
+        self._aplicado = linhas[-1][0]
+        _, lotes, remessas, *valores = zip(*linhas)
+        ids = self._ids(lotes)
+        for nome, coluna in zip(_PERSISTIDAS, valores):
+            self._colunas[nome][ids] = np.array(coluna, dtype=np.float64)  # NULL volta como NaN
+        self._colunas["remessa"][ids] = [
+            -1 if remessa is None else self._remessas.setdefault(remessa, len(self._remessas))
+            for remessa in remessas
+        ]
+
+    def _gravar(self, ids: np.ndarray, serie: list[tuple] | None = None, ts_maximo: float | None = None) -> None:
+        """Regrava os agregados dos lotes e soma a série reduzida (na transação, com o lock)"""
+        ids = np.unique(ids)
+        nomes_remessas = {codigo: nome for nome, codigo in self._remessas.items()}
+        self._conn.executemany(_INSERIR_AGREGADOS, zip(
+            [self._nomes[i] for i in ids.tolist()],
+            [nomes_remessas.get(codigo) for codigo in self._colunas["remessa"][ids].tolist()],
+            *(self._colunas[nome][ids].tolist() for nome in _PERSISTIDAS)
+        ))
+        if serie:
+            self._conn.executemany(_SOMAR_SERIE, serie)
+            if self.retencao_serie_gravada is not None and ts_maximo is not None:
+                self._conn.execute("DELETE FROM serie WHERE inicio < ?", (ts_maximo - self.retencao_serie_gravada,))
+        self._aplicado = self._conn.execute("SELECT MAX(seq) FROM agregados").fetchone()[0]
+
+    def _reduzir(self, ids: np.ndarray, ts: np.ndarray, temp: np.ndarray, umid: np.ndarray) -> list[tuple]:
+        """Linhas da série gravada: contagens, somas, mínima e máxima por lote e intervalo de ``resolucao_serie``"""
+        if ts.size == 0:
+            return []
+        inicio = np.floor(ts / self.resolucao_serie) * self.resolucao_serie
+        ordem = np.lexsort((inicio, ids))
+        ids, inicio = ids[ordem], inicio[ordem]
+        temp, umid = temp[ordem].astype(np.float64), umid[ordem].astype(np.float64)
+        grupos = np.flatnonzero(np.concatenate([[True], (ids[1:] != ids[:-1]) | (inicio[1:] != inicio[:-1])]))
+
+        temp_valida, umid_valida = ~np.isnan(temp), ~np.isnan(umid)
+        colunas = (
+            inicio[grupos],
+            np.add.reduceat(temp_valida.astype(np.int64), grupos),
+            np.add.reduceat(np.where(temp_valida, temp, 0.0), grupos),
+            np.fmin.reduceat(temp, grupos),
+            np.fmax.reduceat(temp, grupos),
+            np.add.reduceat(umid_valida.astype(np.int64), grupos),
+            np.add.reduceat(np.where(umid_valida, umid, 0.0), grupos)
+        )
+        manter = (colunas[1] > 0) | (colunas[5] > 0)
+        return list(zip([self._nomes[i] for i in ids[grupos][manter].tolist()],
+                        *(coluna[manter].tolist() for coluna in colunas)))
+
+    # === Cadastro de lotes ===
+
+    def _garantir_capacidade(self, total: int) -> None:
+        if total <= self._capacidade:
+            return
+        nova = max(total, 2 * self._capacidade)
+        iniciais = {
+            "temp_min": FAIXA_PADRAO[0], "temp_max": FAIXA_PADRAO[1], "umidade_max": FAIXA_PADRAO[2],
+            "minima": np.nan, "maxima": np.nan, "primeira_leitura": np.nan,
+            "ultimo_ts": np.nan, "ultima_temp": np.nan, "ultima_umidade": np.nan, "remessa": -1,
+            **{nome: 0.0 for nome in _ACUMULADORES}
+        }
+        for nome, inicial in iniciais.items():
+            dtype = np.int64 if nome == "remessa" else np.float64
+            coluna = np.full(nova, inicial, dtype=dtype)
+            if nome in self._colunas:
+                coluna[:self._capacidade] = self._colunas[nome]
+            self._colunas[nome] = coluna
+        self._capacidade = nova
+
+    def _ids(self, lotes: Iterable[Any]) -> np.ndarray:
+        """Índices internos dos lotes, cadastrando os novos"""
+        unicos, inverso = np.unique(np.asarray(lotes, dtype=str), return_inverse=True)
+        mapa = np.empty(len(unicos), dtype=np.int64)
+        for i, nome in enumerate(unicos.tolist()):
+            indice = self._indices.get(nome)
+            if indice is None:
+                indice = self._indices[nome] = len(self._nomes)
+                self._nomes.append(nome)
+            mapa[i] = indice
+        self._garantir_capacidade(len(self._nomes))
+        return mapa[inverso]
+
+    def definir_faixa(self, lote: str, temp_min: float, temp_max: float,
+                      umidade_max: float = FAIXA_PADRAO[2]) -> None:
+        """Faixa aceitável do lote (ex.: 2-8 °C para refrigerados); vale para leituras futuras"""
+        with self._lock, self._transacao():
+            self._sincronizar()
+            indice = self._ids([lote])[0]
+            self._colunas["temp_min"][indice] = temp_min
+            self._colunas["temp_max"][indice] = temp_max
+            self._colunas["umidade_max"][indice] = umidade_max
+            self._gravar(np.array([indice]))
+
+    def associar_remessa(self, lotes: Iterable[str], remessa: str) -> None:
+        """Agrupa lotes numa remessa para os agregados por remessa"""
+        with self._lock, self._transacao():
+            self._sincronizar()
+            codigo = self._remessas.setdefault(remessa, len(self._remessas))
+            ids = self._ids(list(lotes))
+            self._colunas["remessa"][ids] = codigo
+            self._gravar(ids)
+
+    # === Ingestão ===
+
+    def registrar_leituras(self, lotes: Sequence[str], timestamps: Any, temperaturas: Any,
+                           umidades: Any = None) -> int:
+        """
+        Ingere leituras avulsas (qualquer ordem entre lotes)
+
+        Leituras anteriores ou iguais à última já ingerida do mesmo lote são
+        descartadas. Retorna o número de leituras aceitas.
+        """
+        ts = np.asarray(timestamps, dtype=np.float64)
+        temp = np.asarray(temperaturas, dtype=np.float64)
+        umid = np.full(ts.shape, np.nan) if umidades is None else np.asarray(umidades, dtype=np.float64)
+        if ts.size == 0:
+            return 0
+
+        with self._lock, self._transacao():
+            self._sincronizar()
+            ids = self._ids(lotes)
+            aceitas = ~(ts <= self._colunas["ultimo_ts"][ids])  # NaN (lote sem histórico) aceita
+            ids, ts, temp, umid = ids[aceitas], ts[aceitas], temp[aceitas], umid[aceitas]
+
+            presentes = np.unique(ids)
+            anteriores = presentes[~np.isnan(self._colunas["ultimo_ts"][presentes])]
+            todos_ids = np.concatenate([anteriores, ids])
+            todos_ts = np.concatenate([self._colunas["ultimo_ts"][anteriores], ts])
+            ordem = np.lexsort((todos_ts, todos_ids))
+            eh_anterior = np.zeros(todos_ids.size, dtype=bool)
+            eh_anterior[:anteriores.size] = True
+
+            self._acumular(
+                todos_ids[ordem], todos_ts[ordem],
+                np.concatenate([self._colunas["ultima_temp"][anteriores], temp])[ordem],
+                np.concatenate([self._colunas["ultima_umidade"][anteriores], umid])[ordem],
+                eh_anterior[ordem]
+            )
+            self._reter(ids, ts, temp, umid)
+            if ts.size:
+                self._gravar(ids, self._reduzir(ids, ts, temp, umid), float(np.nanmax(ts)))
+        return int(ts.size)
+
+    def registrar_serie_densa(self, lotes: Sequence[str], inicio: float, intervalo: float,
+                              temperaturas: Any, umidades: Any = None) -> int:
+        """
+        Ingere uma matriz (lotes x amostras) amostrada a intervalo fixo
+
+        Lotes são linhas e o tempo corre nas colunas, a partir de ``inicio``;
+        NaN marca leitura ausente. Processa em blocos de colunas, sem ordenar.
+        """
+        # Convertida para float64 por bloco, não a matriz inteira
+        temp = np.asarray(temperaturas)
+        if temp.ndim != 2 or temp.shape[0] != len(lotes):
+            raise ValueError("temperaturas deve ter uma linha por lote")
+        umid = None if umidades is None else np.asarray(umidades)
+
+        with self._lock, self._transacao():
+            self._sincronizar()
+            ids = self._ids(lotes)
+            if len(np.unique(ids)) != len(ids):
+                raise ValueError("lotes repetidos na série densa")
+            # Cada bloco termina antes do seguinte: basta conferir o início da série
+            if np.any(self._colunas["ultimo_ts"][ids] >= inicio):
+                raise ValueError("série densa anterior a leituras já registradas")
+            colunas = max(1, CELULAS_POR_BLOCO // max(1, len(ids)))
+            total = temp.shape[1]
+            serie = []
+            for inicio_bloco in range(0, total, colunas):
+                fim = min(total, inicio_bloco + colunas)
+                t0 = inicio + inicio_bloco * intervalo
+                bloco_temp = temp[:, inicio_bloco:fim]
+                bloco_umid = None if umid is None else umid[:, inicio_bloco:fim]
+                self._acumular_denso(ids, t0, intervalo, bloco_temp, bloco_umid)
+
+                # Mesmas leituras em formato longo, para a série bruta e a gravada
+                leituras = (
+                    np.repeat(ids, fim - inicio_bloco),
+                    np.tile(t0 + intervalo * np.arange(fim - inicio_bloco), len(ids)),
+                    bloco_temp.ravel(),
+                    np.full(bloco_temp.size, np.nan) if bloco_umid is None else bloco_umid.ravel()
+                )
+                self._reter(*leituras)
+                serie.extend(self._reduzir(*leituras))
+            if total:
+                self._gravar(ids, serie, inicio + intervalo * (total - 1))
+        return int(temp.size)
+
+    def _acumular_denso(self, ids: np.ndarray, t0: float, intervalo: float,
+                        temp: np.ndarray, umid: np.ndarray | None) -> None:
+        """
+        Atualiza os agregados com um bloco denso, operando direto na matriz
+
+        Como o intervalo é fixo, cada soma por lote é ``intervalo`` vezes a
+        soma da linha; só o intervalo entre a última leitura anterior e a
+        primeira coluna do bloco tem peso próprio.
+        """
+        col = self._colunas
+        lotes, amostras = temp.shape
+        if not np.issubdtype(temp.dtype, np.floating):
+            temp = temp.astype(np.float64)
+        passo = min(intervalo, self.intervalo_maximo)
+        temp_min = col["temp_min"][ids].astype(temp.dtype)[:, None]
+        temp_max = col["temp_max"][ids].astype(temp.dtype)[:, None]
+
+        # Intervalo entre a última leitura já ingerida e o início do bloco
+        anterior_temp = col["ultima_temp"][ids]
+        lacuna = np.nan_to_num(t0 - col["ultimo_ts"][ids], nan=0.0)
+        peso_anterior = np.where(np.isnan(anterior_temp), 0.0, np.minimum(lacuna, self.intervalo_maximo))
+
+        valida = ~np.isnan(temp)
+        # A última coluna tem peso zero aqui: vira a leitura anterior do próximo bloco
+        validas_pesadas = np.count_nonzero(valida[:, :-1], axis=1)
+        with np.errstate(invalid="ignore"):
+            acima = temp > temp_max
+            abaixo = temp < temp_min
+            anterior_acima = anterior_temp > col["temp_max"][ids]
+            anterior_abaixo = anterior_temp < col["temp_min"][ids]
+        # exp(-ΔH/RT) calculado no mesmo buffer, na precisão da matriz
+        arrhenius = np.add(temp[:, :-1], temp.dtype.type(KELVIN))
+        np.divide(temp.dtype.type(-DELTA_H_SOBRE_R), arrhenius, out=arrhenius)
+        np.exp(arrhenius, out=arrhenius)
+        soma_arrhenius = (arrhenius.sum(axis=1) if valida.all() else np.nansum(arrhenius, axis=1)).astype(np.float64)
+        del arrhenius
+
+        def contar(mascara: np.ndarray) -> np.ndarray:
+            return np.count_nonzero(mascara[:, :-1], axis=1)
+
+        def exposicao(excesso: np.ndarray, linhas: np.ndarray) -> np.ndarray:
+            """Soma do excesso positivo só nas linhas com leitura fora da faixa"""
+            total = np.zeros(lotes)
+            if linhas.size:
+                total[linhas] = np.fmax(excesso, 0)[:, :-1].sum(axis=1, dtype=np.float64)
+            return total
+
+        amostras_acima = contar(acima)
+        amostras_abaixo = contar(abaixo)
+        linhas_acima = np.flatnonzero(amostras_acima)
+        linhas_abaixo = np.flatnonzero(amostras_abaixo)
+
+        col["amostras"][ids] += np.count_nonzero(valida, axis=1)
+        col["tempo_monitorado"][ids] += passo * validas_pesadas + peso_anterior
+        col["tempo_sem_dados"][ids] += (
+            (intervalo - passo) * validas_pesadas + intervalo * (amostras - 1 - validas_pesadas)
+            + lacuna - peso_anterior
+        )
+        col["soma_arrhenius"][ids] += (
+            passo * soma_arrhenius
+            + np.nan_to_num(np.exp(-DELTA_H_SOBRE_R / (anterior_temp + KELVIN))) * peso_anterior
+        )
+        col["tempo_acima"][ids] += passo * amostras_acima + anterior_acima * peso_anterior
+        col["tempo_abaixo"][ids] += passo * amostras_abaixo + anterior_abaixo * peso_anterior
+        col["grau_hora_acima"][ids] += (
+            passo * exposicao(temp[linhas_acima] - temp_max[linhas_acima], linhas_acima)
+            + np.fmax(anterior_temp - col["temp_max"][ids], 0) * peso_anterior
+        ) / 3600.0
+        col["grau_hora_abaixo"][ids] += (
+            passo * exposicao(temp_min[linhas_abaixo] - temp[linhas_abaixo], linhas_abaixo)
+            + np.fmax(col["temp_min"][ids] - anterior_temp, 0) * peso_anterior
+        ) / 3600.0
+        if umid is not None:
+            umidade_max = col["umidade_max"][ids].astype(umid.dtype)[:, None]
+            with np.errstate(invalid="ignore"):
+                umidade_acima = (umid > umidade_max) & valida
+                anterior_umidade = col["ultima_umidade"][ids] > col["umidade_max"][ids]
+            col["tempo_umidade_acima"][ids] += passo * contar(umidade_acima) + anterior_umidade * peso_anterior
+
+        fora = acima | abaixo
+        inicio_excursao = np.count_nonzero(fora[:, 1:] & ~fora[:, :-1], axis=1)
+        col["excursoes"][ids] += inicio_excursao + (fora[:, 0] & ~(anterior_acima | anterior_abaixo))
+
+        with np.errstate(invalid="ignore"):
+            col["minima"][ids] = np.fmin(col["minima"][ids], np.fmin.reduce(temp, axis=1))
+            col["maxima"][ids] = np.fmax(col["maxima"][ids], np.fmax.reduce(temp, axis=1))
+        tem_leitura = valida.any(axis=1)
+        primeira = np.where(tem_leitura, t0 + intervalo * np.argmax(valida, axis=1), np.nan)
+        col["primeira_leitura"][ids] = np.fmin(col["primeira_leitura"][ids], primeira)
+
+        col["ultimo_ts"][ids] = t0 + intervalo * (amostras - 1)
+        col["ultima_temp"][ids] = temp[:, -1]
+        col["ultima_umidade"][ids] = np.nan if umid is None else umid[:, -1]
+
+    def _reter(self, ids: np.ndarray, ts: np.ndarray, temp: np.ndarray, umid: np.ndarray) -> None:
+        """
+        Guarda o bloco da série bruta e descarta, do início da fila, os blocos
+        cuja leitura mais recente saiu da janela de retenção
+        """
+        if self.retencao == 0 or ts.size == 0:
+            return
+        maximo = float(np.nanmax(ts))
+        self._blocos_serie.append((maximo, ids, ts, temp.astype(np.float32), umid.astype(np.float32)))
+        self._ts_maximo = max(self._ts_maximo, maximo)
+        if self.retencao is not None:
+            limite = self._ts_maximo - self.retencao
+            while self._blocos_serie and self._blocos_serie[0][0] < limite:
+                self._blocos_serie.popleft()
+
+    def _acumular(self, ids: np.ndarray, ts: np.ndarray, temp: np.ndarray, umid: np.ndarray,
+                  eh_anterior: np.ndarray) -> None:
+        """
+        Atualiza os agregados com leituras ordenadas por (lote, tempo)
+
+        Linhas ``eh_anterior`` são a última leitura já ingerida de cada lote:
+        fecham o intervalo até a primeira leitura nova, mas não são recontadas.
+        """
+        n = ids.size
+        if n == 0:
+            return
+        col = self._colunas
+        inicios = np.flatnonzero(np.concatenate([[True], ids[1:] != ids[:-1]]))
+        lotes = ids[inicios]
+
+        dt = np.zeros(n)
+        mesmo_lote = ids[1:] == ids[:-1]
+        dt[:-1] = np.where(mesmo_lote, ts[1:] - ts[:-1], 0.0)
+        dt = np.nan_to_num(dt, nan=0.0)
+        valida = ~np.isnan(temp)
+        efetivo = np.where(valida, np.minimum(dt, self.intervalo_maximo), 0.0)
+        sem_dados = dt - efetivo
+
+        temp_min = col["temp_min"][ids]
+        temp_max = col["temp_max"][ids]
+        with np.errstate(invalid="ignore"):
+            acima = temp > temp_max
+            abaixo = temp < temp_min
+            umidade_acima = umid > col["umidade_max"][ids]
+        fora = acima | abaixo
+        anterior_fora = np.concatenate([[False], fora[:-1]])
+        anterior_fora[inicios] = False
+        nova = ~eh_anterior & valida
+
+        def somar(valores: np.ndarray) -> np.ndarray:
+            return np.add.reduceat(valores, inicios)
+
+        kelvin = np.where(valida, temp, 0.0) + KELVIN
+        col["amostras"][lotes] += somar(nova.astype(np.float64))
+        col["tempo_monitorado"][lotes] += somar(efetivo)
+        col["soma_arrhenius"][lotes] += somar(np.exp(-DELTA_H_SOBRE_R / kelvin) * efetivo)
+        col["tempo_acima"][lotes] += somar(acima * efetivo)
+        col["tempo_abaixo"][lotes] += somar(abaixo * efetivo)
+        col["grau_hora_acima"][lotes] += somar(np.where(acima, temp - temp_max, 0.0) * efetivo) / 3600.0
+        col["grau_hora_abaixo"][lotes] += somar(np.where(abaixo, temp_min - temp, 0.0) * efetivo) / 3600.0
+        col["tempo_umidade_acima"][lotes] += somar(umidade_acima * efetivo)
+        col["tempo_sem_dados"][lotes] += somar(sem_dados)
+        col["excursoes"][lotes] += somar((fora & ~anterior_fora & nova).astype(np.float64))
+
+        temp_nova = np.where(nova, temp, np.nan)
+        with np.errstate(invalid="ignore"):
+            col["minima"][lotes] = np.fmin(col["minima"][lotes], np.fmin.reduceat(temp_nova, inicios))
+            col["maxima"][lotes] = np.fmax(col["maxima"][lotes], np.fmax.reduceat(temp_nova, inicios))
+            primeira = np.fmin.reduceat(np.where(nova, ts, np.nan), inicios)
+        col["primeira_leitura"][lotes] = np.fmin(col["primeira_leitura"][lotes], primeira)
+
+        finais = np.concatenate([inicios[1:] - 1, [n - 1]])
+        col["ultimo_ts"][lotes] = ts[finais]
+        col["ultima_temp"][lotes] = temp[finais]
+        col["ultima_umidade"][lotes] = umid[finais]
+
+    # === Consultas ===
+
+    def rollups(self) -> dict[str, np.ndarray]:
+        """Agregados de todos os lotes em colunas (inclui MKT e score de qualidade)"""
+        with self._lock:
+            total = len(self._nomes)
+            dados = {nome: self._colunas[nome][:total].copy() for nome in (
+                *_ACUMULADORES, "temp_min", "temp_max", "umidade_max", "minima", "maxima",
+                "primeira_leitura", "ultimo_ts"
+            )}
+        dados["lote"] = np.array(self._nomes[:total], dtype=object)
+        return _derivar(dados)
+
+    def rollups_remessas(self) -> dict[str, np.ndarray]:
+        """Agregados somados por remessa (MKT recalculado sobre a remessa inteira)"""
+        with self._lock:
+            total = len(self._nomes)
+            remessa = self._colunas["remessa"][:total]
+            associados = remessa >= 0
+            grupos = remessa[associados]
+            quantidade = len(self._remessas)
+            dados = {
+                nome: np.bincount(grupos, weights=self._colunas[nome][:total][associados], minlength=quantidade)
+                for nome in _ACUMULADORES
+            }
+            for nome, reducao in (("minima", np.fmin), ("maxima", np.fmax)):
+                valores = np.full(quantidade, np.nan)
+                reducao.at(valores, grupos, self._colunas[nome][:total][associados])
+                dados[nome] = valores
+            dados["lotes"] = np.bincount(grupos, minlength=quantidade)
+            dados["remessa"] = np.array(sorted(self._remessas, key=self._remessas.get), dtype=object)
+        return _derivar(dados)
+
+    def resumo_lote(self, lote: str) -> dict[str, Any] | None:
+        """Agregados de um lote como dicionário (None se não há telemetria)"""
+        with self._lock:
+            indice = self._indices.get(lote)
+            if indice is None or self._colunas["amostras"][indice] == 0:
+                return None
+            dados = {nome: self._colunas[nome][indice:indice + 1].copy() for nome in (
+                *_ACUMULADORES, "temp_min", "temp_max", "umidade_max", "minima", "maxima",
+                "primeira_leitura", "ultimo_ts"
+            )}
+        resumo = {nome: valores[0].item() for nome, valores in _derivar(dados).items()}
+        resumo["lote"] = lote
+        return resumo
+
+    def serie(self, lote: str) -> dict[str, np.ndarray]:
+        """Série bruta ainda retida de um lote, ordenada no tempo"""
+        if self.retencao == 0:
+            raise RuntimeError("Telemetria configurada sem retenção de séries")
+        with self._lock:
+            indice = self._indices.get(lote)
+            blocos = list(self._blocos_serie)
+        if indice is None or not blocos:  # blocos vazios: nada retido desde que o processo abriu
+            vazio = np.array([])
+            return {"timestamp": vazio, "temperatura": vazio, "umidade": vazio}
+        partes = [(ts[ids == indice], temp[ids == indice], umid[ids == indice]) for _, ids, ts, temp, umid in blocos]
+        ts, temp, umid = (np.concatenate([parte[i] for parte in partes]) for i in range(3))
+        ordem = np.argsort(ts, kind="stable")
+        return {"timestamp": ts[ordem], "temperatura": temp[ordem], "umidade": umid[ordem]}
+
+    def serie_gravada(self, lote: str, desde: float | None = None) -> dict[str, np.ndarray]:
+        """Série reduzida gravada de um lote: um ponto por intervalo de ``resolucao_serie``"""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT inicio, amostras, soma_temperatura, minima, maxima, amostras_umidade, soma_umidade"
+                " FROM serie WHERE lote = ? AND inicio >= ? ORDER BY inicio",
+                (lote, -np.inf if desde is None else desde)
+            ).fetchall()
+        inicio, amostras, soma, minima, maxima, amostras_umidade, soma_umidade = (
+            np.array(coluna, dtype=np.float64) for coluna in (zip(*linhas) if linhas else ((),) * 7)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "inicio": inicio,
+                "amostras": amostras.astype(np.int64),
+                "temperatura_media": np.where(amostras > 0, soma / amostras, np.nan),
+                "minima": minima,
+                "maxima": maxima,
+                "umidade_media": np.where(amostras_umidade > 0, soma_umidade / amostras_umidade, np.nan)
+            }
+
+
+def _derivar(dados: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """MKT, frações de tempo fora da faixa e score de qualidade a partir das somas"""
+    tempo = dados["tempo_monitorado"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media_arrhenius = dados["soma_arrhenius"] / tempo
+        dados["mkt"] = np.where(tempo > 0, DELTA_H_SOBRE_R / -np.log(media_arrhenius) - KELVIN, np.nan)
+        dados["fracao_fora_faixa"] = np.where(
+            tempo > 0, (dados["tempo_acima"] + dados["tempo_abaixo"]) / tempo, 0.0
+        )
+        dados["fracao_umidade_acima"] = np.where(tempo > 0, dados["tempo_umidade_acima"] / tempo, 0.0)
+    dados["score_qualidade"] = np.clip(0.95 - 0.1 * dados["excursoes"], 0.0, None)
+    return dados
+
+
+def _criar_telemetria() -> TelemetriaCadeiaFria:
+    from app.core.config import settings
+    return TelemetriaCadeiaFria(caminho=settings.FARMACIA_TELEMETRIA_DB)
+
+
+_telemetria = ServicoProcesso('telemetria_cadeia_fria', _criar_telemetria, iniciar_no_startup=True)
+
+
+def obter_telemetria_cadeia_fria() -> TelemetriaCadeiaFria:
+    """Telemetria compartilhada pelo processo, no arquivo configurado"""
+    return _telemetria.obter()
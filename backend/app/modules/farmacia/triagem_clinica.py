@@ -0,0 +1,528 @@
+"""
+Triagem de farmácia clínica sobre o censo de pacientes internados
+
+As listas de medicamentos (domicílio e hospital) de todos os pacientes
+ativos são carregadas de uma vez em colunas: cada nome distinto é
+normalizado uma única vez e vira um código inteiro. Sobre essas colunas:
+- discrepâncias de conciliação saem de diferenças de conjuntos de chaves
+  (paciente, medicamento) do censo inteiro;
+- PRMs (problemas relacionados a medicamentos) saem de regras vetorizadas:
+  ajuste renal, critérios de Beers, hipercalemia, alergia por classe,
+  duplicidade terapêutica, interações, controle glicêmico e adesão.
+
+O censo é dividido em blocos de pacientes, opcionalmente processados num
+pool de processos. O resultado é uma fila de intervenções ordenada por
+gravidade e pelo risco acumulado do paciente.
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .servicos import ServicoProcesso
+
+logger = logging.getLogger('MedAI.Farmacia.TriagemClinica')
+
+TAMANHO_BLOCO_PADRAO = 200  # pacientes
+MIN_PACIENTES_PARALELO = 2000
+MAX_WORKERS_PADRAO = 8
+
+GRAVIDADES = {'muito_alta': 4, 'alta': 3, 'moderada': 2, 'baixa': 1}
+
+SINONIMOS = {
+    'aas': 'acido_acetilsalicilico',
+    'acido_acetil_salicilico': 'acido_acetilsalicilico',
+    'losec': 'omeprazol',
+    'glifage': 'metformina',
+    'marevan': 'varfarina',
+    'warfarina': 'varfarina',
+    'clexane': 'enoxaparina',
+    'bactrim': 'sulfametoxazol_trimetoprima',
+    'smx_tmp': 'sulfametoxazol_trimetoprima',
+    'novalgina': 'dipirona',
+    'metamizol': 'dipirona',
+    'kcl': 'cloreto_potassio',
+    'aldactone': 'espironolactona',
+    'insulina_humana_regular': 'insulina_regular',
+    'tazocin': 'piperacilina_tazobactam',
+    'rivotril': 'clonazepam',
+    'lipitor': 'atorvastatina'
+}
+
+CLASSES = {
+    'amoxicilina': 'penicilinas', 'ampicilina': 'penicilinas', 'oxacilina': 'penicilinas',
+    'penicilina': 'penicilinas', 'piperacilina_tazobactam': 'penicilinas',
+    'cefalexina': 'cefalosporinas', 'ceftriaxona': 'cefalosporinas', 'cefepime': 'cefalosporinas',
+    'sulfametoxazol_trimetoprima': 'sulfonamidas',
+    'dipirona': 'pirazolonas',
+    'ibuprofeno': 'aine', 'diclofenaco': 'aine', 'cetoprofeno': 'aine', 'acido_acetilsalicilico': 'aine',
+    'omeprazol': 'ibp', 'pantoprazol': 'ibp', 'esomeprazol': 'ibp',
+    'enalapril': 'ieca', 'captopril': 'ieca',
+    'losartana': 'bra', 'valsartana': 'bra',
+    'diazepam': 'benzodiazepinicos', 'clonazepam': 'benzodiazepinicos', 'midazolam': 'benzodiazepinicos',
+    'enoxaparina': 'heparinas', 'heparina': 'heparinas',
+    'sinvastatina': 'estatinas', 'atorvastatina': 'estatinas'
+}
+# Termos de alergia que designam uma classe; todo termo também vale como nome de medicamento
+ALERGIAS_CLASSE = {
+    'penicilina': 'penicilinas', 'penicilinas': 'penicilinas', 'betalactamicos': 'penicilinas',
+    'cefalosporina': 'cefalosporinas', 'cefalosporinas': 'cefalosporinas',
+    'sulfa': 'sulfonamidas', 'sulfas': 'sulfonamidas',
+    'aine': 'aine', 'aines': 'aine', 'dipirona': 'pirazolonas'
+}
+# Classes em que dois medicamentos simultâneos configuram duplicidade terapêutica
+CLASSES_DUPLICIDADE = {'ibp', 'ieca', 'bra', 'aine', 'benzodiazepinicos', 'heparinas', 'estatinas'}
+
+AJUSTE_RENAL = {  # clearance de creatinina (mL/min) abaixo do qual o uso/dose deve ser revisto
+    'metformina': 30, 'enoxaparina': 30, 'espironolactona': 30, 'dabigatrana': 30,
+    'tramadol': 30, 'nitrofurantoina': 45
+}
+BEERS = {'diazepam', 'clonazepam', 'amitriptilina', 'prometazina', 'difenidramina', 'glibenclamida',
+         'ciclobenzaprina', 'hidroxizina'}
+ELEVAM_POTASSIO = {'enalapril', 'captopril', 'losartana', 'valsartana', 'espironolactona', 'cloreto_potassio',
+                   'sulfametoxazol_trimetoprima', 'heparina'}
+ANTIDIABETICOS = {'metformina', 'glibenclamida', 'gliclazida', 'insulina_regular', 'insulina_nph',
+                  'insulina_glargina', 'empagliflozina', 'sitagliptina'}
+
+INTERACOES = (
+    ('enalapril', 'espironolactona', 'alta', 'Risco de hipercalemia (IECA + antagonista da aldosterona)',
+     'Monitorar potássio sérico; considerar suspender um dos agentes'),
+    ('losartana', 'espironolactona', 'alta', 'Risco de hipercalemia (BRA + antagonista da aldosterona)',
+     'Monitorar potássio sérico; considerar suspender um dos agentes'),
+    ('enalapril', 'losartana', 'alta', 'Duplo bloqueio do sistema renina-angiotensina',
+     'Manter apenas um bloqueador do SRAA'),
+    ('varfarina', 'acido_acetilsalicilico', 'alta', 'Risco aumentado de sangramento',
+     'Reavaliar indicação do antiagregante e monitorar INR'),
+    ('varfarina', 'amiodarona', 'alta', 'Amiodarona potencializa o efeito da varfarina',
+     'Reduzir dose de varfarina e monitorar INR'),
+    ('sinvastatina', 'claritromicina', 'muito_alta', 'Risco de rabdomiólise (inibição do CYP3A4)',
+     'Suspender a sinvastatina durante o macrolídeo'),
+    ('clopidogrel', 'omeprazol', 'moderada', 'Omeprazol reduz a ativação do clopidogrel',
+     'Substituir por pantoprazol'),
+    ('tramadol', 'sertralina', 'alta', 'Risco de síndrome serotoninérgica',
+     'Preferir outro analgésico ou monitorar sinais serotoninérgicos'),
+    ('haloperidol', 'metoclopramida', 'moderada', 'Somação de efeitos extrapiramidais',
+     'Preferir antiemético sem ação dopaminérgica central')
+)
+
+LIMIAR_POTASSIO = 5.5  # mEq/L
+LIMIAR_HBA1C = 7.0  # %
+LIMIAR_ADESAO = 0.8
+IDADE_BEERS = 65
+
+_DOSE = re.compile(r'\b\d+([.,]\d+)?\s*(mg|mcg|g|ml|ui|%|meq)(?!\w)')
+_FORMAS = re.compile(r'\b(comprimidos?|cp|caps?|capsulas?|ampolas?|amp|frascos?|injetavel|solucao|sol|'
+                     r'oral|ev|iv|im|sc|vo|xarope|gotas)\b')
+_PARENTESES = re.compile(r'\(.*?\)')
+
+
+def normalizar_medicamento(nome: str) -> str:
+    """Nome canônico: sem acentos, dose, forma farmacêutica nem marca conhecida"""
+    texto = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode().lower()
+    texto = _FORMAS.sub(' ', _DOSE.sub(' ', _PARENTESES.sub(' ', texto)))
+    texto = '_'.join(re.findall(r'[a-z0-9]+', texto))
+    return SINONIMOS.get(texto, texto)
+
+
+def normalizar_dose(dose: Any) -> str:
+    return re.sub(r'\s+', '', str(dose or '').lower()).replace(',', '.')
+
+
+@dataclass(frozen=True)
+class RegraPRM:
+    """Regra de PRM: achados guardam o índice da regra e os códigos envolvidos"""
+    nome: str
+    categoria: str
+    gravidade: str
+    descricao: str
+    sugestao: str
+
+
+REGRAS = [
+    RegraPRM('ajuste_renal', 'dose_excessiva', 'alta',
+             '{a} com clearance de creatinina de {valor:.0f} mL/min',
+             'Ajustar dose ou substituir conforme função renal'),
+    RegraPRM('beers', 'medicamento_inadequado', 'moderada',
+             '{a} é potencialmente inapropriado para idosos (critérios de Beers)',
+             'Considerar alternativa mais segura para idosos'),
+    RegraPRM('hipercalemia', 'reacao_adversa', 'alta',
+             'Potássio sérico de {valor:.1f} mEq/L em uso de {a}',
+             'Suspender ou reduzir medicamentos que elevam o potássio'),
+    RegraPRM('alergia', 'medicamento_inadequado', 'muito_alta',
+             '{a} prescrito a paciente com alergia registrada ao medicamento ou à sua classe',
+             'Suspender imediatamente e substituir por classe alternativa'),
+    RegraPRM('duplicidade', 'medicamento_desnecessario', 'moderada',
+             'Duplicidade terapêutica: {a} e {b} da mesma classe',
+             'Manter apenas um medicamento da classe'),
+    RegraPRM('controle_glicemico', 'dose_subterapeutica', 'moderada',
+             'HbA1c de {valor:.1f}% acima da meta em uso de {a}',
+             'Considerar aumento da dose ou associação de outro antidiabético'),
+    RegraPRM('sem_antidiabetico', 'necessidade_nao_tratada', 'moderada',
+             'HbA1c de {valor:.1f}% sem antidiabético prescrito',
+             'Avaliar início de tratamento antidiabético'),
+    RegraPRM('nao_adesao', 'nao_adesao', 'alta',
+             'Adesão estimada baixa ({valor:.0%})',
+             'Implementar estratégias para melhorar adesão')
+]
+_INDICE_REGRA = {regra.nome: i for i, regra in enumerate(REGRAS)}
+_PRIMEIRA_INTERACAO = len(REGRAS)
+REGRAS.extend(RegraPRM(f'interacao_{a}_{b}', 'interacao_medicamentosa', gravidade,
+                       f'{{a}} + {{b}}: {descricao}', sugestao)
+              for a, b, gravidade, descricao, sugestao in INTERACOES)
+
+DISCREPANCIAS = {  # tipo: (gravidade, descrição, ação)
+    'descontinuacao': ('moderada', '{a} usado em casa não foi prescrito no hospital',
+                       'Verificar motivo da descontinuação'),
+    'adicao': ('baixa', 'Novo medicamento {a} prescrito no hospital', 'Orientar paciente sobre o novo medicamento'),
+    'alteracao_dose': ('alta', 'Dose de {a} alterada de {dose_domicilio} para {dose_hospital}',
+                       'Confirmar a alteração de dose com o prescritor')
+}
+_TIPOS_DISCREPANCIA = list(DISCREPANCIAS)
+
+
+def triar_bloco(bloco: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Aplica discrepâncias e regras de PRM a um bloco de pacientes
+
+    Recebe colunas com índices locais de paciente; devolve os achados como
+    colunas (paciente, regra ou tipo, códigos de medicamento, valor).
+    """
+    paciente, codigo, origem = bloco['paciente'], bloco['codigo'], bloco['origem']
+    total_codigos = bloco['classe'].size
+    achados_paciente, achados_regra, achados_a, achados_b, achados_valor = [], [], [], [], []
+
+    def achar(regra: int | np.ndarray, pacientes: np.ndarray, a: np.ndarray, b: np.ndarray | None = None,
+              valor: np.ndarray | None = None) -> None:
+        achados_paciente.append(pacientes)
+        achados_regra.append(np.broadcast_to(regra, pacientes.shape))
+        achados_a.append(a)
+        achados_b.append(np.full(pacientes.size, -1) if b is None else b)
+        achados_valor.append(np.full(pacientes.size, np.nan) if valor is None else valor)
+
+    # === Conciliação: diferenças de conjuntos de chaves paciente × medicamento ===
+    chaves = paciente.astype(np.int64) * total_codigos + codigo
+    domicilio = origem == 0
+    doses_domicilio = dict(zip(chaves[domicilio].tolist(), bloco['dose'][domicilio].tolist()))
+    doses_hospital = dict(zip(chaves[~domicilio].tolist(), bloco['dose'][~domicilio].tolist()))
+    descontinuados = doses_domicilio.keys() - doses_hospital.keys()
+    # Sem lista domiciliar não há o que conciliar: a prescrição inteira seria "adição"
+    com_lista = set(np.unique(paciente[domicilio]).tolist())
+    adicionados = [chave for chave in doses_hospital.keys() - doses_domicilio.keys()
+                   if chave // total_codigos in com_lista]
+    alterados = [chave for chave in doses_domicilio.keys() & doses_hospital.keys()
+                 if doses_domicilio[chave] != doses_hospital[chave]]
+    discrepancias = [(_TIPOS_DISCREPANCIA.index(tipo), chave) for tipo, grupo in
+                     (('descontinuacao', descontinuados), ('adicao', adicionados), ('alteracao_dose', alterados))
+                     for chave in grupo]
+    tipos_discrepancia = np.array([tipo for tipo, _ in discrepancias], dtype=np.int64)
+    chaves_discrepancia = np.array([chave for _, chave in discrepancias], dtype=np.int64)
+
+    # === PRMs sobre a prescrição hospitalar ===
+    hospital = ~domicilio
+    pac, cod = paciente[hospital], codigo[hospital]
+    # Cada medicamento uma vez por paciente
+    unicos = np.unique(pac.astype(np.int64) * total_codigos + cod)
+    pac, cod = unicos // total_codigos, unicos % total_codigos
+    clearance, potassio, hba1c = bloco['clearance'], bloco['potassio'], bloco['hba1c']
+
+    renal = clearance[pac] < bloco['limite_renal'][cod]
+    achar(_INDICE_REGRA['ajuste_renal'], pac[renal], cod[renal], valor=clearance[pac[renal]])
+
+    beers = (bloco['idade'][pac] >= IDADE_BEERS) & bloco['beers'][cod]
+    achar(_INDICE_REGRA['beers'], pac[beers], cod[beers])
+
+    hipercalemia = (potassio[pac] > LIMIAR_POTASSIO) & bloco['eleva_potassio'][cod]
+    achar(_INDICE_REGRA['hipercalemia'], pac[hipercalemia], cod[hipercalemia], valor=potassio[pac[hipercalemia]])
+
+    classe = bloco['classe'][cod]
+    total_classes = int(bloco['total_classes'])
+    com_classe = classe >= 0
+    alergico = np.zeros(pac.size, dtype=bool)
+    alergico[com_classe] = np.isin(pac[com_classe] * total_classes + classe[com_classe], bloco['alergias'])
+    alergico |= np.isin(pac * total_codigos + cod, bloco['alergias_medicamento'])
+    achar(_INDICE_REGRA['alergia'], pac[alergico], cod[alergico])
+
+    duplicavel = com_classe & bloco['classe_duplicidade'][np.maximum(classe, 0)]
+    chave_classe = pac[duplicavel] * total_classes + classe[duplicavel]
+    ordem = np.argsort(chave_classe, kind='stable')
+    chave_classe, cod_duplicavel = chave_classe[ordem], cod[duplicavel][ordem]
+    repetida = np.flatnonzero(chave_classe[1:] == chave_classe[:-1]) + 1
+    achar(_INDICE_REGRA['duplicidade'], chave_classe[repetida] // total_classes,
+          cod_duplicavel[repetida - 1], cod_duplicavel[repetida])
+
+    total_pacientes = bloco['idade'].size
+    antidiabetico = bloco['antidiabetico'][cod]
+    tratados = np.bincount(pac[antidiabetico], minlength=total_pacientes) > 0
+    descontrolado = hba1c > LIMIAR_HBA1C
+    linhas = antidiabetico & descontrolado[pac]
+    achar(_INDICE_REGRA['controle_glicemico'], pac[linhas], cod[linhas], valor=hba1c[pac[linhas]])
+    sem_tratamento = np.flatnonzero(descontrolado & ~tratados)
+    achar(_INDICE_REGRA['sem_antidiabetico'], sem_tratamento, np.full(sem_tratamento.size, -1),
+          valor=hba1c[sem_tratamento])
+
+    adesao = bloco['adesao']
+    baixa_adesao = np.flatnonzero(adesao < LIMIAR_ADESAO)
+    achar(_INDICE_REGRA['nao_adesao'], baixa_adesao, np.full(baixa_adesao.size, -1), valor=adesao[baixa_adesao])
+
+    # Interações: cada linha com o primeiro medicamento de um par procura o segundo no paciente
+    pares = bloco['interacoes']
+    if pares.size:
+        linha, par = np.nonzero(cod[:, None] == pares[None, :, 0])
+        procurada = pac[linha] * total_codigos + pares[par, 1]
+        presente = np.isin(procurada, unicos)
+        achar(_PRIMEIRA_INTERACAO + bloco['regra_interacao'][par[presente]], pac[linha[presente]],
+              cod[linha[presente]], pares[par[presente], 1])
+
+    return {
+        'paciente': np.concatenate(achados_paciente).astype(np.int64),
+        'regra': np.concatenate(achados_regra).astype(np.int64),
+        'a': np.concatenate(achados_a).astype(np.int64),
+        'b': np.concatenate(achados_b).astype(np.int64),
+        'valor': np.concatenate(achados_valor).astype(float),
+        'discrepancia_tipo': tipos_discrepancia,
+        'discrepancia_paciente': chaves_discrepancia // total_codigos,
+        'discrepancia_codigo': chaves_discrepancia % total_codigos
+    }
+
+
+class TriagemCensoClinico:
+    """Carga em lote do censo, triagem vetorizada e fila priorizada de intervenções"""
+
+    def __init__(self, workers: int | None = None, tamanho_bloco: int = TAMANHO_BLOCO_PADRAO):
+        self.workers = workers
+        self.tamanho_bloco = tamanho_bloco
+        self._lock = threading.Lock()
+        # Vocabulário persistente: cada grafia é normalizada uma vez por processo
+        self._normalizados: dict[str, int] = {}
+        self._nomes: list[str] = []
+        self._codigos_nome: dict[str, int] = {}
+        self._classes = sorted(set(CLASSES.values()))
+        self._indice_classe = {classe: i for i, classe in enumerate(self._classes)}
+
+    def _codigo(self, nome: str) -> int:
+        codigo = self._normalizados.get(nome)
+        if codigo is None:
+            canonico = normalizar_medicamento(nome)
+            codigo = self._codigos_nome.get(canonico)
+            if codigo is None:
+                codigo = self._codigos_nome[canonico] = len(self._nomes)
+                self._nomes.append(canonico)
+            self._normalizados[nome] = codigo
+        return codigo
+
+    def _resolver_workers(self, total: int) -> int:
+        if self.workers is not None:
+            return self.workers
+        if total >= MIN_PACIENTES_PARALELO:
+            return min(os.cpu_count() or 1, MAX_WORKERS_PADRAO)
+        return 0
+
+    def carregar(self, pacientes: Sequence[Mapping[str, Any]]) -> dict[str, np.ndarray]:
+        """Colunas do censo: linhas de prescrição, dados por paciente e atributos por código"""
+        linhas_paciente, linhas_codigo, linhas_origem, linhas_dose = [], [], [], []
+        alergias_paciente, alergias_classe = [], []
+        alergias_medicamento_paciente, alergias_medicamento = [], []
+        total = len(pacientes)
+        idade, clearance, potassio, hba1c, adesao = (np.full(total, np.nan) for _ in range(5))
+
+        with self._lock:
+            doses: dict[str, int] = {}
+            for i, paciente in enumerate(pacientes):
+                for origem, campo in ((0, 'medicamentos_domicilio'), (1, 'medicamentos_hospital')):
+                    lista = paciente.get(campo)
+                    if lista is None and origem == 1:
+                        lista = paciente.get('medicamentos_atuais', [])
+                    for medicamento in lista or []:
+                        linhas_paciente.append(i)
+                        linhas_codigo.append(self._codigo(medicamento['nome']))
+                        linhas_origem.append(origem)
+                        linhas_dose.append(doses.setdefault(normalizar_dose(medicamento.get('dose')), len(doses)))
+                for alergia in paciente.get('alergias', []):
+                    codigo = self._codigo(alergia)
+                    alergias_medicamento_paciente.append(i)
+                    alergias_medicamento.append(codigo)
+                    termo = self._nomes[codigo]
+                    classe = ALERGIAS_CLASSE.get(termo) or CLASSES.get(termo)
+                    if classe is not None:
+                        alergias_paciente.append(i)
+                        alergias_classe.append(self._indice_classe[classe])
+
+                exames = paciente.get('exames_laboratoriais', {})
+                idade[i] = paciente.get('dados_demograficos', {}).get('idade', paciente.get('idade', np.nan))
+                clearance[i] = exames.get('clearance_creatinina', np.nan)
+                potassio[i] = exames.get('potassio', np.nan)
+                hba1c[i] = exames.get('hba1c', np.nan)
+                adesao[i] = paciente.get('adesao_estimada', np.nan)
+            nomes = list(self._nomes)
+
+        indices_interacao = [(k, a, b) for k, (a, b, *_) in enumerate(INTERACOES)
+                             if a in self._codigos_nome and b in self._codigos_nome]
+        classe_codigo = np.array([self._indice_classe.get(CLASSES.get(nome), -1) for nome in nomes], dtype=np.int64)
+        return {
+            'paciente': np.array(linhas_paciente, dtype=np.int64),
+            'codigo': np.array(linhas_codigo, dtype=np.int64),
+            'origem': np.array(linhas_origem, dtype=np.int8),
+            'dose': np.array(linhas_dose, dtype=np.int64),
+            'idade': idade,
+            'clearance': clearance,
+            'potassio': potassio,
+            'hba1c': hba1c,
+            'adesao': adesao,
+            'alergia_paciente': np.array(alergias_paciente, dtype=np.int64),
+            'alergia_classe': np.array(alergias_classe, dtype=np.int64),
+            'alergia_medicamento_paciente': np.array(alergias_medicamento_paciente, dtype=np.int64),
+            'alergia_medicamento': np.array(alergias_medicamento, dtype=np.int64),
+            'classe': classe_codigo,
+            'total_classes': np.int64(len(self._classes)),
+            'classe_duplicidade': np.array([classe in CLASSES_DUPLICIDADE for classe in self._classes]),
+            'limite_renal': np.array([AJUSTE_RENAL.get(nome, np.nan) for nome in nomes]),
+            'beers': np.array([nome in BEERS for nome in nomes], dtype=bool),
+            'eleva_potassio': np.array([nome in ELEVAM_POTASSIO for nome in nomes], dtype=bool),
+            'antidiabetico': np.array([nome in ANTIDIABETICOS for nome in nomes], dtype=bool),
+            'interacoes': np.array([(self._codigos_nome[a], self._codigos_nome[b]) for _, a, b in indices_interacao],
+                                   dtype=np.int64).reshape(-1, 2),
+            'regra_interacao': np.array([k for k, _, _ in indices_interacao], dtype=np.int64),
+            'dose_texto': np.array(list(doses), dtype=object),
+            'nomes': np.array(nomes, dtype=object)
+        }
+
+    def _blocos(self, censo: dict[str, np.ndarray], total: int) -> list[tuple[int, dict[str, np.ndarray]]]:
+        compartilhados = {campo: censo[campo] for campo in (
+            'classe', 'total_classes', 'classe_duplicidade', 'limite_renal', 'beers', 'eleva_potassio',
+            'antidiabetico', 'interacoes', 'regra_interacao')}
+        # Linhas e alergias já chegam em ordem de paciente (carga sequencial)
+        fronteiras = np.arange(0, total + self.tamanho_bloco, self.tamanho_bloco)
+        limites_linhas = np.searchsorted(censo['paciente'], fronteiras)
+        limites_alergias = np.searchsorted(censo['alergia_paciente'], fronteiras)
+        limites_alergias_medicamento = np.searchsorted(censo['alergia_medicamento_paciente'], fronteiras)
+        total_codigos = censo['classe'].size
+        blocos = []
+        for k, inicio in enumerate(range(0, total, self.tamanho_bloco)):
+            fim = min(inicio + self.tamanho_bloco, total)
+            linhas = slice(limites_linhas[k], limites_linhas[k + 1])
+            alergias = slice(limites_alergias[k], limites_alergias[k + 1])
+            alergias_medicamento = slice(limites_alergias_medicamento[k], limites_alergias_medicamento[k + 1])
+            bloco = {
+                'paciente': censo['paciente'][linhas] - inicio,
+                'codigo': censo['codigo'][linhas],
+                'origem': censo['origem'][linhas],
+                'dose': censo['dose'][linhas],
+                'alergias': ((censo['alergia_paciente'][alergias] - inicio) * censo['total_classes']
+                             + censo['alergia_classe'][alergias]),
+                'alergias_medicamento': ((censo['alergia_medicamento_paciente'][alergias_medicamento] - inicio)
+                                         * total_codigos + censo['alergia_medicamento'][alergias_medicamento]),
+                **{campo: censo[campo][inicio:fim] for campo in ('idade', 'clearance', 'potassio', 'hba1c', 'adesao')},
+                **compartilhados
+            }
+            blocos.append((inicio, bloco))
+        return blocos
+
+    def triar(self, pacientes: Sequence[Mapping[str, Any]]) -> dict[str, Any]:
+        """Triagem do censo: fila de intervenções priorizada e resumo"""
+        inicio_triagem = time.perf_counter()
+        censo = self.carregar(pacientes)
+        blocos = self._blocos(censo, len(pacientes))
+        workers = self._resolver_workers(len(pacientes))
+        if workers > 1 and len(blocos) > 1:
+            # spawn: os workers não herdam o event loop nem os locks do processo da API
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                resultados = list(pool.map(triar_bloco, [bloco for _, bloco in blocos]))
+        else:
+            resultados = [triar_bloco(bloco) for _, bloco in blocos]
+
+        fila = self._montar_fila(pacientes, censo, blocos, resultados)
+        por_categoria: dict[str, int] = {}
+        for item in fila:
+            por_categoria[item['categoria']] = por_categoria.get(item['categoria'], 0) + 1
+        tempo_ms = (time.perf_counter() - inicio_triagem) * 1000
+        logger.info(f"Triagem clínica: {len(pacientes)} pacientes, {len(fila)} intervenções em {tempo_ms:.0f} ms")
+        return {
+            'fila_intervencoes': fila,
+            'resumo': {
+                'pacientes_triados': len(pacientes),
+                'linhas_prescricao': int(censo['paciente'].size),
+                'medicamentos_distintos': int(censo['nomes'].size),
+                'pacientes_com_intervencao': len({item['paciente_id'] for item in fila}),
+                'intervencoes_por_categoria': por_categoria,
+                'tempo_ms': tempo_ms
+            }
+        }
+
+    def _montar_fila(self, pacientes: Sequence[Mapping[str, Any]], censo: dict[str, np.ndarray],
+                     blocos: list[tuple[int, dict[str, np.ndarray]]],
+                     resultados: list[dict[str, np.ndarray]]) -> list[dict[str, Any]]:
+        nomes, doses = censo['nomes'], censo['dose_texto']
+        itens = []
+        for (inicio, bloco), resultado in zip(blocos, resultados):
+            for i, r, a, b, valor in zip((resultado['paciente'] + inicio).tolist(), resultado['regra'].tolist(),
+                                         resultado['a'].tolist(), resultado['b'].tolist(),
+                                         resultado['valor'].tolist()):
+                regra = REGRAS[r]
+                medicamentos = [nomes[c] for c in (a, b) if c >= 0]
+                itens.append((i, {
+                    'tipo': 'prm',
+                    'categoria': regra.categoria,
+                    'regra': regra.nome,
+                    'gravidade': regra.gravidade,
+                    'medicamentos': medicamentos,
+                    'descricao': regra.descricao.format(a=medicamentos[0] if medicamentos else '',
+                                                        b=medicamentos[-1] if medicamentos else '', valor=valor),
+                    'acao': regra.sugestao
+                }))
+
+            # Doses por (paciente, código) do bloco para descrever alterações
+            chaves = bloco['paciente'] * nomes.size + bloco['codigo']
+            dose_por_origem = [dict(zip(chaves[bloco['origem'] == origem].tolist(),
+                                        bloco['dose'][bloco['origem'] == origem].tolist())) for origem in (0, 1)]
+            for t, i, c in zip(resultado['discrepancia_tipo'].tolist(), resultado['discrepancia_paciente'].tolist(),
+                               resultado['discrepancia_codigo'].tolist()):
+                tipo = _TIPOS_DISCREPANCIA[t]
+                gravidade, descricao, acao = DISCREPANCIAS[tipo]
+                chave = i * nomes.size + c
+                itens.append((i + inicio, {
+                    'tipo': 'discrepancia',
+                    'categoria': tipo,
+                    'regra': tipo,
+                    'gravidade': gravidade,
+                    'medicamentos': [nomes[c]],
+                    'descricao': descricao.format(a=nomes[c],
+                                                  dose_domicilio=doses[dose_por_origem[0].get(chave, 0)],
+                                                  dose_hospital=doses[dose_por_origem[1].get(chave, 0)]),
+                    'acao': acao
+                }))
+
+        risco = np.zeros(len(pacientes))
+        for i, item in itens:
+            risco[i] += GRAVIDADES[item['gravidade']]
+        fila = []
+        for i, item in itens:
+            paciente = pacientes[i]
+            fila.append({
+                'paciente_id': paciente.get('paciente_id', paciente.get('id')),
+                'leito': paciente.get('leito'),
+                'unidade': paciente.get('unidade'),
+                **item,
+                'risco_paciente': float(risco[i])
+            })
+        fila.sort(key=lambda item: (-GRAVIDADES[item['gravidade']], -item['risco_paciente'], str(item['leito'])))
+        for posicao, item in enumerate(fila, 1):
+            item['prioridade'] = posicao
+        return fila
+
+
+_triagem = ServicoProcesso('triagem_clinica', TriagemCensoClinico)
+
+
+def obter_triagem_clinica() -> TriagemCensoClinico:
+    """Triagem compartilhada do processo (mantém o vocabulário normalizado)"""
+    return _triagem.obter()
@@ -2,9 +2,13 @@
 Sistema de dose unitária com IA
 """
 
+import itertools
 import logging
+import zlib
 from datetime import datetime
 
+from .pipeline_unit_dose import AgrupadorIncremental, PipelineUnitDose
+
 logger = logging.getLogger('MedAI.Farmacia.UnitDose')
 
 class UnitDoseInteligente:
@@ -14,45 +18,30 @@ class UnitDoseInteligente:
         self.preparador_doses = PreparadorDosesAutomatico()
         self.verificador_qualidade = VerificadorQualidadeIA()
         self.etiquetador = EtiquetadorInteligente()
+        self.pipeline: PipelineUnitDose | None = None
+
+    def criar_pipeline(self, **configuracao) -> PipelineUnitDose:
+        """Pipeline agrupamento → preparo → qualidade → etiquetagem com os componentes deste sistema"""
+
+        capacidade_ciclo = configuracao.pop('capacidade_ciclo', None)
+        agrupador = AgrupadorIncremental(
+            priorizar=self.calcular_prioridade_grupo,
+            economia_tempo=self.calcular_economia_tempo,
+            **({'capacidade_ciclo': capacidade_ciclo} if capacidade_ciclo else {})
+        )
+
+        return PipelineUnitDose(
+            self.preparador_doses, self.verificador_qualidade, self.etiquetador, agrupador, **configuracao
+        )
 
     async def preparar_doses_unitarias(self, prescricoes: list[dict]) -> dict:
         """Preparação automatizada de doses unitárias"""
 
         try:
-            agrupamentos = self.agrupar_prescricoes_similares(prescricoes)
-
-            doses_preparadas = []
-            for grupo in agrupamentos:
-                preparacao = await self.preparador_doses.preparar_lote(
-                    medicamentos=grupo['medicamentos'],
-                    quantidade=grupo['quantidade'],
-                    validacao_dupla=True
-                )
-
-                qualidade = await self.verificador_qualidade.verificar_preparacao(
-                    preparacao,
-                    usar_visao_computacional=True,
-                    verificar_peso=True
-                )
-
-                etiquetas = await self.etiquetador.gerar_etiquetas(
-                    preparacao,
-                    incluir_qr_code=True,
-                    informacoes_personalizadas=True
-                )
-
-                doses_preparadas.append({
-                    'lote': preparacao,
-                    'qualidade': qualidade,
-                    'etiquetas': etiquetas
-                })
+            pipeline = await self.criar_pipeline().iniciar()
+            await pipeline.enviar(prescricoes)
 
-            return {
-                'doses_preparadas': doses_preparadas,
-                'estatisticas': self.calcular_estatisticas_producao(doses_preparadas),
-                'rastreabilidade': self.gerar_rastreabilidade_completa(doses_preparadas),
-                'timestamp': datetime.now().isoformat()
-            }
+            return self.consolidar_producao(await pipeline.encerrar(), pipeline)
 
         except Exception as e:
             logger.error(f"Erro na preparação de doses unitárias: {e}")
@@ -62,6 +51,53 @@ class UnitDoseInteligente:
                 'estatisticas': {}
             }
 
+    async def iniciar_turno(self, **configuracao) -> PipelineUnitDose:
+        """Abre o pipeline do turno; prescrições chegam depois por ``receber_prescricoes``"""
+
+        if self.pipeline is not None:
+            raise RuntimeError("Turno de dose unitária já iniciado")
+
+        self.pipeline = await self.criar_pipeline(**configuracao).iniciar()
+
+        return self.pipeline
+
+    async def receber_prescricoes(self, prescricoes: list[dict]) -> dict:
+        """Inclui prescrições no turno em andamento e devolve as métricas do pipeline"""
+
+        if self.pipeline is None:
+            raise RuntimeError("Nenhum turno de dose unitária em andamento")
+
+        await self.pipeline.enviar(prescricoes)
+
+        return self.pipeline.metricas()
+
+    async def encerrar_turno(self) -> dict:
+        """Libera os grupos pendentes, aguarda o pipeline esvaziar e consolida a produção do turno"""
+
+        if self.pipeline is None:
+            raise RuntimeError("Nenhum turno de dose unitária em andamento")
+
+        pipeline, self.pipeline = self.pipeline, None
+
+        return self.consolidar_producao(await pipeline.encerrar(), pipeline)
+
+    def consolidar_producao(self, resultados: list[dict], pipeline: PipelineUnitDose) -> dict:
+        """Doses preparadas, estatísticas, rastreabilidade e métricas do pipeline"""
+
+        doses_preparadas = [
+            {'lote': r['lote'], 'qualidade': r['qualidade'], 'etiquetas': r['etiquetas'], 'ciclo': r['ciclo']}
+            for r in resultados if not r['erro']
+        ]
+
+        return {
+            'doses_preparadas': doses_preparadas,
+            'falhas': [{'grupo': r['grupo']['id_agrupamento'], 'erro': r['erro']} for r in resultados if r['erro']],
+            'estatisticas': self.calcular_estatisticas_producao(doses_preparadas),
+            'rastreabilidade': self.gerar_rastreabilidade_completa(doses_preparadas),
+            'pipeline': pipeline.metricas(),
+            'timestamp': datetime.now().isoformat()
+        }
+
     def agrupar_prescricoes_similares(self, prescricoes: list[dict]) -> list[dict]:
         """Agrupa prescrições similares para otimizar preparação"""
 
@@ -289,11 +325,14 @@ class UnitDoseInteligente:
         }
 
 class PreparadorDosesAutomatico:
+    def __init__(self):
+        self._sequencia = itertools.count(1)
+
     async def preparar_lote(self, medicamentos: list[dict], quantidade: int, validacao_dupla: bool) -> dict:
         """Prepara lote de medicamentos"""
 
         return {
-            'id_lote': f"LOTE_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'id_lote': f"LOTE_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(self._sequencia):04d}",
             'medicamento': medicamentos[0].get('nome') if medicamentos else 'Medicamento',
             'quantidade_produzida': quantidade,
             'tempo_preparacao': quantidade * 2 + 10,  # 2 min por dose + 10 min setup
@@ -338,24 +377,42 @@ class EtiquetadorInteligente:
     async def gerar_etiquetas(self, preparacao: dict, incluir_qr_code: bool, informacoes_personalizadas: bool) -> dict:
         """Gera etiquetas inteligentes"""
 
-        etiqueta = {
-            'id_etiqueta': f"ETQ_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            'medicamento': preparacao.get('medicamento'),
-            'lote': preparacao.get('id_lote'),
-            'validade': preparacao.get('validade'),
-            'quantidade': preparacao.get('quantidade_produzida'),
-            'codigo_barras': f"789{hash(preparacao.get('id_lote', '')) % 1000000:06d}",
-            'timestamp_geracao': datetime.now().isoformat()
-        }
+        etiquetas = await self.gerar_etiquetas_lote([preparacao], incluir_qr_code, informacoes_personalizadas)
+
+        return etiquetas[0]
+
+    async def gerar_etiquetas_lote(self, preparacoes: list[dict], incluir_qr_code: bool,
+                                   informacoes_personalizadas: bool) -> list[dict]:
+        """Gera as etiquetas de várias preparações numa única chamada"""
+
+        agora = datetime.now()
+        carimbo = agora.strftime('%Y%m%d_%H%M%S')
+        timestamp = agora.isoformat()
+        informacoes = [
+            'Armazenar em temperatura ambiente',
+            'Manter longe da luz',
+            'Uso hospitalar'
+        ]
+
+        etiquetas = []
+        for preparacao in preparacoes:
+            lote = preparacao.get('id_lote', '')
+            etiqueta = {
+                'id_etiqueta': f"ETQ_{lote or carimbo}",
+                'medicamento': preparacao.get('medicamento'),
+                'lote': preparacao.get('id_lote'),
+                'validade': preparacao.get('validade'),
+                'quantidade': preparacao.get('quantidade_produzida'),
+                'codigo_barras': f"789{zlib.crc32(lote.encode()) % 1000000:06d}",
+                'timestamp_geracao': timestamp
+            }
 
-        if incluir_qr_code:
-            etiqueta['qr_code'] = f"QR_{etiqueta['codigo_barras']}"
+            if incluir_qr_code:
+                etiqueta['qr_code'] = f"QR_{etiqueta['codigo_barras']}"
 
-        if informacoes_personalizadas:
-            etiqueta['informacoes_adicionais'] = [
-                'Armazenar em temperatura ambiente',
-                'Manter longe da luz',
-                'Uso hospitalar'
-            ]
+            if informacoes_personalizadas:
+                etiqueta['informacoes_adicionais'] = list(informacoes)
+
+            etiquetas.append(etiqueta)
 
-        return etiqueta
+        return etiquetas
@@ -4,13 +4,58 @@ Implements safe augmentations that preserve anatomical validity
 """
 
 import logging
-from typing import Tuple, Dict, Any, Optional
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Tuple, Dict, Any, Optional, Iterator, List
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
 import random
 
+try:
+    from scipy.ndimage import gaussian_filter, map_coordinates
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=32)
+def _coordinate_grid(shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pixel coordinate grid (rows, cols) for an image shape, built once per shape.
+    The arrays are shared between callers, so they are returned read-only.
+    """
+    rows, cols = np.meshgrid(
+        np.arange(shape[0], dtype=np.float32),
+        np.arange(shape[1], dtype=np.float32),
+        indexing='ij'
+    )
+    rows.flags.writeable = False
+    cols.flags.writeable = False
+    return rows, cols
+
+
+def _rotation_coordinates(shape: Tuple[int, int], angle: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Source coordinates for a counter-clockwise rotation about the image centre
+    (same convention as PIL ``Image.rotate``), computed from the cached grid.
+    """
+    rows, cols = _coordinate_grid(shape)
+    theta = np.deg2rad(angle)
+    cos_t, sin_t = np.float32(np.cos(theta)), np.float32(np.sin(theta))
+    center_row = np.float32((shape[0] - 1) / 2.0)
+    center_col = np.float32((shape[1] - 1) / 2.0)
+
+    d_row = rows - center_row
+    d_col = cols - center_col
+    src_col = d_col * cos_t - d_row * sin_t + center_col
+    src_row = d_col * sin_t + d_row * cos_t + center_row
+    return src_row, src_col
+
 class MedicalDataAugmentation:
     """
     Medical imaging-specific data augmentation that preserves anatomical validity
@@ -107,10 +152,15 @@ class MedicalDataAugmentation:
         min_angle, max_angle = rotation_range
         angle = random.uniform(min_angle * severity, max_angle * severity)
         
-        pil_image = Image.fromarray((image * 255).astype(np.uint8))
-        rotated = pil_image.rotate(angle, fillcolor=0, expand=False)
+        image = np.asarray(image, dtype=np.float32)
+        if SCIPY_AVAILABLE:
+            src_row, src_col = _rotation_coordinates(image.shape, angle)
+            return map_coordinates(image, (src_row, src_col), order=1,
+                                   mode='constant', cval=0.0, output=np.float32)
         
-        return np.array(rotated).astype(np.float32) / 255.0
+        # Float ('F' mode) PIL images keep full precision, unlike a uint8 round-trip
+        rotated = Image.fromarray(image, mode='F').rotate(angle, fillcolor=0, expand=False)
+        return np.asarray(rotated, dtype=np.float32)
     
     def _adjust_brightness(self, image: np.ndarray, brightness_range: Tuple[float, float],
                           severity: float) -> np.ndarray:
@@ -150,25 +200,23 @@ class MedicalDataAugmentation:
     def _elastic_deformation(self, image: np.ndarray, alpha: float, sigma: float,
                            severity: float) -> np.ndarray:
         """Apply mild elastic deformation for soft tissue simulation"""
+        if not SCIPY_AVAILABLE:
+            logger.warning("SciPy not available, skipping elastic deformation")
+            return image
+        
         try:
-            from scipy.ndimage import gaussian_filter, map_coordinates
-            
             alpha = alpha * severity
             
+            image = np.asarray(image, dtype=np.float32)
             shape = image.shape
             
-            dx = gaussian_filter(np.random.randn(*shape), sigma) * alpha
-            dy = gaussian_filter(np.random.randn(*shape), sigma) * alpha
-            
-            x, y = np.meshgrid(np.arange(shape[1]), np.arange(shape[0]))
-            indices = np.reshape(y + dy, (-1, 1)), np.reshape(x + dx, (-1, 1))
+            dx = gaussian_filter(np.random.randn(*shape).astype(np.float32), sigma) * alpha
+            dy = gaussian_filter(np.random.randn(*shape).astype(np.float32), sigma) * alpha
             
-            deformed = map_coordinates(image, indices, order=1, mode='reflect')
-            return deformed.reshape(shape)
+            rows, cols = _coordinate_grid(shape)
+            return map_coordinates(image, (rows + dy, cols + dx), order=1,
+                                   mode='reflect', output=np.float32)
             
-        except ImportError:
-            logger.warning("SciPy not available, skipping elastic deformation")
-            return image
         except Exception as e:
             logger.error(f"Elastic deformation failed: {e}")
             return image
@@ -298,3 +346,243 @@ class MedicalAugmentationValidator:
         correlation_flipped = np.corrcoef(original.flatten(), np.fliplr(augmented).flatten())[0, 1]
         
         return correlation_normal > correlation_flipped
+
+class BatchMedicalAugmentation:
+    """
+    Batch augmentation engine for (N, H, W) image stacks.
+    
+    Applies the same medical-safe augmentations as MedicalDataAugmentation, but
+    composes rotation and elastic deformation into a single float32
+    ``map_coordinates`` call per image, reuses cached coordinate grids per shape
+    and splits each batch across a worker pool. Every worker chunk draws from
+    its own seeded generator, so a given (seed, num_workers) always yields the
+    same sequence of batches.
+    """
+    
+    def __init__(self, modality: str = 'CR', severity: float = 0.5,
+                 num_workers: Optional[int] = None, seed: Optional[int] = None,
+                 modality_params: Optional[Dict[str, Dict[str, Any]]] = None):
+        if modality_params is None:
+            modality_params = MedicalDataAugmentation().modality_params
+        self.modality_params = modality_params
+        self.modality = modality
+        self.severity = severity
+        self.num_workers = max(1, num_workers or min(4, os.cpu_count() or 1))
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self._batch_counter = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
+        logger.info(f"Batch Medical Augmentation initialized with {self.num_workers} workers")
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.num_workers,
+                thread_name_prefix='medical-augmentation'
+            )
+        return self._executor
+    
+    def _resolve_params(self, modality: str) -> Dict[str, Any]:
+        if modality not in self.modality_params:
+            logger.warning(f"Unknown modality {modality}, using default parameters")
+            modality = 'CR'
+        return self.modality_params[modality]
+    
+    def augment_batch(self, images: np.ndarray, modality: Optional[str] = None,
+                      severity: Optional[float] = None) -> np.ndarray:
+        """
+        Augment a stack of 2D grayscale images
+        
+        Args:
+            images: Input images with shape (N, H, W), intensities in [0, 1]
+            modality: Medical imaging modality (defaults to the engine modality)
+            severity: Augmentation severity (defaults to the engine severity)
+            
+        Returns:
+            Augmented float32 array with the same shape as the input
+        """
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim != 3:
+            raise ValueError(f"Expected an (N, H, W) array, got shape {images.shape}")
+        
+        params = self._resolve_params(modality or self.modality)
+        severity = self.severity if severity is None else severity
+        output = np.empty_like(images)
+        
+        # One child seed sequence per batch, one generator per worker chunk
+        batch_sequence = np.random.SeedSequence(
+            self.seed_sequence.entropy,
+            spawn_key=self.seed_sequence.spawn_key + (self._batch_counter,)
+        )
+        self._batch_counter += 1
+        
+        chunks = [c for c in np.array_split(np.arange(len(images)), self.num_workers) if len(c)]
+        generators = [np.random.default_rng(s) for s in batch_sequence.spawn(len(chunks))]
+        
+        if len(chunks) <= 1:
+            for indices, rng in zip(chunks, generators):
+                self._augment_chunk(images, output, indices, params, severity, rng)
+            return output
+        
+        futures = [
+            self._get_executor().submit(
+                self._augment_chunk, images, output, indices, params, severity, rng
+            )
+            for indices, rng in zip(chunks, generators)
+        ]
+        for future in futures:
+            future.result()
+        
+        return output
+    
+    def _augment_chunk(self, images: np.ndarray, output: np.ndarray, indices: np.ndarray,
+                       params: Dict[str, Any], severity: float,
+                       rng: np.random.Generator) -> None:
+        for index in indices:
+            output[index] = self._augment_single(images[index], params, severity, rng)
+    
+    def _augment_single(self, image: np.ndarray, params: Dict[str, Any], severity: float,
+                        rng: np.random.Generator) -> np.ndarray:
+        """Augment one image; geometric transforms share one resampling pass"""
+        shape = image.shape
+        augmented = image
+        
+        rotate = rng.random() < 0.7
+        elastic = params.get('allow_elastic_deform', False) and rng.random() < 0.3
+        
+        if (rotate or elastic) and SCIPY_AVAILABLE:
+            if rotate:
+                min_angle, max_angle = params['rotation_range']
+                angle = rng.uniform(min_angle * severity, max_angle * severity)
+                src_row, src_col = _rotation_coordinates(shape, angle)
+            else:
+                src_row, src_col = _coordinate_grid(shape)
+            
+            if elastic:
+                alpha = params.get('elastic_alpha', 50) * severity
+                sigma = params.get('elastic_sigma', 5)
+                d_row = gaussian_filter(rng.standard_normal(shape, dtype=np.float32), sigma) * alpha
+                d_col = gaussian_filter(rng.standard_normal(shape, dtype=np.float32), sigma) * alpha
+                src_row = src_row + d_row
+                src_col = src_col + d_col
+            
+            augmented = map_coordinates(
+                image, (src_row, src_col), order=1,
+                mode='constant' if rotate else 'reflect', cval=0.0,
+                output=np.float32
+            )
+        
+        if rng.random() < 0.8:
+            min_bright, max_bright = params['brightness_range']
+            factor = rng.uniform(1 - (1 - min_bright) * severity, 1 + (max_bright - 1) * severity)
+            augmented = np.clip(augmented * np.float32(factor), 0.0, 1.0)
+        
+        if rng.random() < 0.8:
+            min_contrast, max_contrast = params['contrast_range']
+            factor = rng.uniform(1 - (1 - min_contrast) * severity, 1 + (max_contrast - 1) * severity)
+            mean = augmented.mean(dtype=np.float32)
+            augmented = np.clip((augmented - mean) * np.float32(factor) + mean, 0.0, 1.0)
+        
+        if rng.random() < 0.5:
+            noise = rng.standard_normal(shape, dtype=np.float32) * np.float32(params['noise_std'] * severity)
+            augmented = np.clip(augmented + noise, 0.0, 1.0)
+        
+        return augmented
+    
+    def close(self):
+        """Shut down the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AugmentationDataLoader:
+    """
+    Prefetching training iterator over an (N, H, W) dataset
+    
+    A background thread shuffles, slices and augments upcoming batches while the
+    training loop consumes the current one; at most ``prefetch_batches`` batches
+    are held in memory at a time.
+    """
+    
+    _END = object()
+    
+    def __init__(self, images: np.ndarray, labels: Optional[np.ndarray] = None,
+                 batch_size: int = 32, modality: str = 'CR', severity: float = 0.5,
+                 shuffle: bool = True, drop_last: bool = False, prefetch_batches: int = 2,
+                 num_workers: Optional[int] = None, seed: Optional[int] = None,
+                 engine: Optional[BatchMedicalAugmentation] = None):
+        if labels is not None and len(labels) != len(images):
+            raise ValueError("images and labels must have the same length")
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        
+        self.images = images
+        self.labels = labels
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.prefetch_batches = max(1, prefetch_batches)
+        self.engine = engine or BatchMedicalAugmentation(
+            modality=modality, severity=severity, num_workers=num_workers, seed=seed
+        )
+        self._shuffle_rng = np.random.default_rng(seed)
+    
+    def __len__(self) -> int:
+        if self.drop_last:
+            return len(self.images) // self.batch_size
+        return -(-len(self.images) // self.batch_size)
+    
+    def _batch_indices(self) -> List[np.ndarray]:
+        order = np.arange(len(self.images))
+        if self.shuffle:
+            self._shuffle_rng.shuffle(order)
+        return [order[start:start + self.batch_size]
+                for start in range(0, len(self) * self.batch_size, self.batch_size)]
+    
+    def __iter__(self) -> Iterator[Any]:
+        buffer: "queue.Queue[Any]" = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+        batches = self._batch_indices()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def producer():
+            try:
+                for indices in batches:
+                    augmented = self.engine.augment_batch(self.images[indices])
+                    item = augmented if self.labels is None else (augmented, self.labels[indices])
+                    if not put(item):
+                        return
+            except Exception as e:
+                logger.error(f"Augmentation prefetch failed: {e}")
+                put(e)
+                return
+            put(self._END)
+        
+        worker = threading.Thread(target=producer, name='augmentation-prefetch', daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is self._END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.join()
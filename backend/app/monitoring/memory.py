@@ -0,0 +1,502 @@
+"""
+Memory monitoring utilities.
+
+Besides point-in-time readings, MemoryMonitor runs a background sampler that keeps
+RSS and tracemalloc readings in a ring buffer, estimates the growth rate by linear
+regression over the window and diffs tracemalloc snapshots to name the allocation
+sites that keep growing. Tracing is costly, so unless it is always on the sampler
+starts it once RSS shows a sustained leak, to name the sources from then on. When
+a memory budget is configured, registered eviction callbacks (e.g. unloading ML
+models) run whenever RSS exceeds it.
+"""
+
+import gc
+import logging
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_MB = 1024 * 1024
+
+# Minimum samples and fit quality before growth is reported as a leak
+MIN_LEAK_SAMPLES = 5
+MIN_LEAK_R_SQUARED = 0.8
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+@dataclass(frozen=True)
+class MemorySample:
+    """One reading of the sampler; timestamps come from time.monotonic()."""
+    timestamp: float
+    rss_bytes: int
+    traced_bytes: int
+
+
+def _is_leak(samples: list[MemorySample], threshold_mb: float,
+             window_seconds: float) -> tuple[bool, float, float, float]:
+    """Leak verdict, growth over the window in MB, slope (bytes/s) and R² of the fit."""
+    slope, r_squared = linear_growth(samples)
+    growth_mb = slope * window_seconds / BYTES_PER_MB
+    has_leak = (
+        len(samples) >= MIN_LEAK_SAMPLES
+        and growth_mb > threshold_mb
+        and r_squared >= MIN_LEAK_R_SQUARED
+    )
+    return has_leak, growth_mb, slope, r_squared
+
+
+def linear_growth(samples: list[MemorySample]) -> tuple[float, float]:
+    """Least-squares RSS slope in bytes/second and the R² of the fit."""
+    n = len(samples)
+    if n < 2:
+        return 0.0, 0.0
+
+    origin = samples[0].timestamp
+    xs = [s.timestamp - origin for s in samples]
+    ys = [float(s.rss_bytes) for s in samples]
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return 0.0, 0.0
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+
+    slope = sxy / sxx
+    r_squared = (sxy * sxy) / (sxx * syy) if syy else 0.0
+    return slope, r_squared
+
+
+class MemoryMonitor:
+    """Monitor memory usage for ML models and processing."""
+
+    def __init__(
+        self,
+        sample_interval_seconds: float = 30.0,
+        window_size: int = 240,
+        snapshot_every: int = 10,
+        snapshot_history: int = 4,
+        trace_allocations: bool = True,
+        trace_frames: int = 1,
+        top_n: int = 10,
+        memory_budget_mb: float | None = None,
+        leak_threshold_mb: float | None = None,
+        leak_window_seconds: float = 3600.0,
+    ) -> None:
+        self.sample_interval_seconds = sample_interval_seconds
+        self.snapshot_every = max(1, snapshot_every)
+        self.trace_allocations = trace_allocations
+        self.trace_frames = trace_frames
+        self.top_n = top_n
+        self.memory_budget_mb = memory_budget_mb
+        # With tracing off, start it when RSS grows by more than this over the window
+        self.leak_threshold_mb = leak_threshold_mb
+        self.leak_window_seconds = leak_window_seconds
+
+        self._samples: deque[MemorySample] = deque(maxlen=window_size)
+        self._snapshots: deque[tuple[float, tracemalloc.Snapshot]] = deque(maxlen=max(2, snapshot_history))
+        self._lock = threading.Lock()
+        self._sample_count = 0
+        self._process = psutil.Process()
+
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self._owns_tracemalloc = False
+        self._session_id: str | None = None
+
+        self._eviction_callbacks: list[Callable[[], Callable[[], bool] | None]] = []
+        self._evictions = 0
+
+    # ------------------------------------------------------------------
+    # Point-in-time readings
+    # ------------------------------------------------------------------
+
+    def get_memory_usage(self) -> dict[str, Any]:
+        """Get current memory usage statistics."""
+        try:
+            process = psutil.Process()
+            memory_info = process.memory_info()
+
+            system_memory = psutil.virtual_memory()
+
+            return {
+                "process_memory_mb": memory_info.rss / 1024 / 1024,
+                "process_memory_percent": process.memory_percent(),
+                "system_memory_total_gb": system_memory.total / 1024 / 1024 / 1024,
+                "system_memory_available_gb": system_memory.available / 1024 / 1024 / 1024,
+                "system_memory_percent": system_memory.percent,
+            }
+
+        except Exception as e:
+            logger.error("Failed to get memory usage: %s", str(e))
+            return {
+                "process_memory_mb": 0,
+                "process_memory_percent": 0,
+                "system_memory_total_gb": 0,
+                "system_memory_available_gb": 0,
+                "system_memory_percent": 0,
+            }
+
+    def check_memory_threshold(self, threshold_percent: float = 80.0) -> bool:
+        """Check if memory usage exceeds threshold."""
+        try:
+            memory_info = self.get_memory_usage()
+            system_percent = memory_info["system_memory_percent"]
+            if isinstance(system_percent, int | float):
+                return system_percent > threshold_percent
+            return False
+        except Exception:
+            return False
+
+    def log_memory_usage(self, context: str = "") -> None:
+        """Log current memory usage."""
+        try:
+            memory_info = self.get_memory_usage()
+            logger.info(
+                "Memory usage %s - Process: %.1f MB, System: %.1f%%",
+                context,
+                memory_info["process_memory_mb"],
+                memory_info["system_memory_percent"])
+        except Exception as e:
+            logger.error("Failed to log memory usage: %s", str(e))
+
+    # ------------------------------------------------------------------
+    # Background sampler
+    # ------------------------------------------------------------------
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background sampler (no-op if already running)."""
+        with self._lock:
+            if self.is_running:
+                return
+            if self.trace_allocations and not tracemalloc.is_tracing():
+                tracemalloc.start(self.trace_frames)
+                self._owns_tracemalloc = True
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+            self._thread.start()
+        logger.info("Memory monitor started (interval=%.1fs)", self.sample_interval_seconds)
+
+    def stop(self) -> None:
+        """Stop the background sampler; samples collected so far are kept."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+
+        self._stop_event.set()
+        thread.join(timeout=self.sample_interval_seconds + 5)
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        logger.info("Memory monitor stopped")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error("Memory sampling failed: %s", str(e))
+            if self._stop_event.wait(self.sample_interval_seconds):
+                break
+
+    def sample(self) -> MemorySample:
+        """Record one RSS reading, plus a tracemalloc snapshot every ``snapshot_every`` samples."""
+        tracing = tracemalloc.is_tracing()
+        reading = MemorySample(
+            timestamp=time.monotonic(),
+            rss_bytes=self._process.memory_info().rss,
+            traced_bytes=tracemalloc.get_traced_memory()[0] if tracing else 0,
+        )
+
+        with self._lock:
+            checkpoint = self._sample_count % self.snapshot_every == 0
+            self._samples.append(reading)
+            self._sample_count += 1
+
+        # The first snapshot after tracing starts is the baseline for the diff
+        take_snapshot = checkpoint and (tracing or self._start_tracing_on_leak())
+
+        if take_snapshot:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            with self._lock:
+                self._snapshots.append((reading.timestamp, snapshot))
+
+        self._enforce_budget(reading.rss_bytes)
+        return reading
+
+    def _start_tracing_on_leak(self) -> bool:
+        """Start tracemalloc when the sampled RSS shows a sustained leak."""
+        if self.leak_threshold_mb is None or not self.is_running:
+            return False
+        has_leak, growth_mb, _, _ = _is_leak(
+            self.samples(self.leak_window_seconds), self.leak_threshold_mb, self.leak_window_seconds)
+        if not has_leak:
+            return False
+
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return True
+            tracemalloc.start(self.trace_frames)
+            self._owns_tracemalloc = True
+        logger.warning(
+            "RSS grew %.1f MB over %.0fs; tracing allocations to find the source",
+            growth_mb, self.leak_window_seconds)
+        return True
+
+    def samples(self, window_seconds: float | None = None) -> list[MemorySample]:
+        """Samples currently in the ring buffer, optionally limited to the last ``window_seconds``."""
+        with self._lock:
+            samples = list(self._samples)
+        if window_seconds is not None and samples:
+            since = samples[-1].timestamp - window_seconds
+            samples = [s for s in samples if s.timestamp >= since]
+        return samples
+
+    def growth_rate_mb_per_hour(self, window_seconds: float | None = None) -> float:
+        """RSS growth rate from the linear fit over the window, in MB/hour."""
+        slope, _ = linear_growth(self.samples(window_seconds))
+        return slope * 3600 / BYTES_PER_MB
+
+    def top_allocation_growth(self, limit: int | None = None) -> list[dict[str, Any]]:
+        """Allocation sites that grew the most between the oldest and newest snapshots."""
+        with self._lock:
+            if len(self._snapshots) < 2:
+                return []
+            oldest = self._snapshots[0][1]
+            newest = self._snapshots[-1][1]
+
+        stats = newest.compare_to(oldest, "lineno")
+        growing = [stat for stat in stats if stat.size_diff > 0]
+        growing.sort(key=lambda stat: stat.size_diff, reverse=True)
+
+        return [
+            {
+                "source": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_mb": stat.size_diff / BYTES_PER_MB,
+                "size_mb": stat.size / BYTES_PER_MB,
+                "count_diff": stat.count_diff,
+            }
+            for stat in growing[:limit or self.top_n]
+        ]
+
+    # ------------------------------------------------------------------
+    # Budget enforcement
+    # ------------------------------------------------------------------
+
+    def register_eviction_callback(self, callback: Callable[[], bool]) -> None:
+        """
+        Register a callback run when RSS exceeds the memory budget.
+
+        Callbacks return True when they released something. Bound methods are held
+        weakly so registering does not keep their owner alive.
+        """
+        if hasattr(callback, "__self__") and hasattr(callback, "__func__"):
+            ref: Callable[[], Callable[[], bool] | None] = weakref.WeakMethod(callback)
+        else:
+            ref = lambda: callback
+        with self._lock:
+            self._eviction_callbacks.append(ref)
+
+    def _enforce_budget(self, rss_bytes: int) -> None:
+        if not self.memory_budget_mb or rss_bytes <= self.memory_budget_mb * BYTES_PER_MB:
+            return
+
+        with self._lock:
+            self._eviction_callbacks = [ref for ref in self._eviction_callbacks if ref() is not None]
+            callbacks = [ref() for ref in self._eviction_callbacks]
+
+        logger.warning(
+            "Process memory %.1f MB exceeds budget of %.1f MB; running %d eviction callback(s)",
+            rss_bytes / BYTES_PER_MB, self.memory_budget_mb, len(callbacks))
+
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                released = callback()
+            except Exception as e:
+                logger.error("Memory eviction callback failed: %s", str(e))
+                continue
+            if not released:
+                continue
+
+            self._evictions += 1
+            gc.collect()
+            if self._process.memory_info().rss <= self.memory_budget_mb * BYTES_PER_MB:
+                break
+
+    # ------------------------------------------------------------------
+    # Profiling and leak detection
+    # ------------------------------------------------------------------
+
+    def start_profiling(self) -> dict[str, Any]:
+        """Start memory profiling session."""
+        try:
+            initial_memory = self.get_memory_usage()
+            self.start()
+            self._session_id = f"profiling_{uuid.uuid4().hex[:12]}"
+            logger.info("Started memory profiling session %s", self._session_id)
+            return {
+                "status": "started",
+                "initial_memory": initial_memory,
+                "session_id": self._session_id
+            }
+        except Exception as e:
+            logger.error(f"Failed to start profiling: {e}")
+            return {
+                "status": "error",
+                "error": str(e),
+                "initial_memory": {}
+            }
+
+    def get_profile(self) -> dict[str, Any]:
+        """
+        Get current memory profile from the sampled window.
+
+        ``memory_growth_rate`` is the fitted RSS growth in MB/hour.
+        """
+        try:
+            current_memory = self.get_memory_usage()
+            samples = self.samples() or [self.sample()]
+            rss_mb = [s.rss_bytes / BYTES_PER_MB for s in samples]
+
+            return {
+                "status": "success",
+                "current_memory": current_memory,
+                "peak_memory_mb": max(rss_mb),
+                "current_memory_mb": rss_mb[-1],
+                "average_memory_mb": sum(rss_mb) / len(rss_mb),
+                "memory_growth_rate": self.growth_rate_mb_per_hour(),
+                "traced_memory_mb": samples[-1].traced_bytes / BYTES_PER_MB,
+                "samples": len(samples),
+                "window_seconds": samples[-1].timestamp - samples[0].timestamp,
+                "memory_budget_mb": self.memory_budget_mb,
+                "evictions": self._evictions,
+                "sampler_running": self.is_running,
+                "top_allocations": self.top_allocation_growth()
+            }
+        except Exception as e:
+            logger.error(f"Failed to get profile: {e}")
+            return {
+                "status": "error",
+                "error": str(e),
+                "current_memory": {},
+                "peak_memory_mb": 0,
+                "current_memory_mb": 0,
+                "average_memory_mb": 0,
+                "memory_growth_rate": 0
+            }
+
+    def stop_profiling(self) -> dict[str, Any]:
+        """Stop memory profiling session."""
+        try:
+            self.stop()
+            final_memory = self.get_memory_usage()
+            session_id, self._session_id = self._session_id, None
+            logger.info("Stopped memory profiling session %s", session_id)
+            return {
+                "status": "stopped",
+                "final_memory": final_memory,
+                "session_id": session_id
+            }
+        except Exception as e:
+            logger.error(f"Failed to stop profiling: {e}")
+            return {
+                "status": "error",
+                "error": str(e),
+                "final_memory": {}
+            }
+
+    def detect_memory_leaks(self, threshold_mb: float = 10.0, time_window_seconds: int = 60) -> dict[str, Any]:
+        """
+        Detect sustained memory growth over the time window.
+
+        A leak is reported when the fitted RSS growth across the window exceeds
+        ``threshold_mb`` and the fit is steady (R² >= MIN_LEAK_R_SQUARED), so
+        one-off spikes and allocator noise are not flagged.
+        """
+        try:
+            samples = self.samples(time_window_seconds)
+            if not samples:
+                samples = [self.sample()]
+            current_mb = samples[-1].rss_bytes / BYTES_PER_MB
+
+            has_leak, growth_mb, slope, r_squared = _is_leak(samples, threshold_mb, time_window_seconds)
+            top_allocations = self.top_allocation_growth() if has_leak else []
+
+            logger.info(
+                f"Memory leak detection: threshold={threshold_mb}MB, growth={growth_mb:.1f}MB "
+                f"over {time_window_seconds}s (r2={r_squared:.2f}), has_leak={has_leak}")
+
+            return {
+                "has_leak": has_leak,
+                "current_memory_mb": current_mb,
+                "threshold_mb": threshold_mb,
+                "time_window_seconds": time_window_seconds,
+                "leak_details": {
+                    "growth_rate": slope * 3600 / BYTES_PER_MB,
+                    "growth_mb": growth_mb,
+                    "r_squared": r_squared,
+                    "samples": len(samples),
+                    "suspected_sources": [site["source"] for site in top_allocations],
+                    "top_allocations": top_allocations
+                }
+            }
+        except Exception as e:
+            logger.error(f"Failed to detect memory leaks: {e}")
+            return {
+                "has_leak": False,
+                "current_memory_mb": 0,
+                "threshold_mb": threshold_mb,
+                "time_window_seconds": time_window_seconds,
+                "leak_details": {
+                    "growth_rate": 0.0,
+                    "suspected_sources": []
+                }
+            }
+
+
+_monitor: MemoryMonitor | None = None
+_monitor_lock = threading.Lock()
+
+
+def get_memory_monitor() -> MemoryMonitor:
+    """Process-wide monitor configured from settings."""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                from app.core.config import settings
+
+                _monitor = MemoryMonitor(
+                    sample_interval_seconds=settings.MEMORY_SAMPLE_INTERVAL,
+                    trace_allocations=settings.MEMORY_TRACE_ALLOCATIONS,
+                    memory_budget_mb=settings.MEMORY_BUDGET_MB,
+                    leak_threshold_mb=settings.MEMORY_LEAK_THRESHOLD_MB if settings.MEMORY_TRACE_ON_LEAK else None,
+                    leak_window_seconds=settings.MEMORY_LEAK_WINDOW
+                )
+    return _monitor
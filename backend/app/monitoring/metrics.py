@@ -0,0 +1,456 @@
+"""
+Registro de métricas em processo para o sistema MedAI
+Contadores, gauges e histogramas de latência no estilo HDR, com exportação
+em formato texto do Prometheus e em JSON
+"""
+import math
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Histogramas: 2^SUB_BUCKET_BITS sub-buckets lineares por potência de dois,
+# o que limita o erro relativo de cada valor registrado a ~0.8%
+SUB_BUCKET_BITS = 7
+_SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+_SUB_BUCKET_HALF_BITS = SUB_BUCKET_BITS - 1
+
+# Resolução de registro dos histogramas de latência (valores em segundos)
+HISTOGRAM_UNIT = 1e-6
+
+# Limites "le" exportados para o Prometheus (segundos)
+DEFAULT_PROMETHEUS_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99, 0.999)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _bucket_index(value: int) -> int:
+    """Índice do bucket log-linear para um valor inteiro não negativo"""
+    if value < _SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << _SUB_BUCKET_HALF_BITS) + (value >> shift)
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """Limites [inferior, superior) do bucket em unidades inteiras"""
+    if index < _SUB_BUCKET_COUNT:
+        return index, index + 1
+    shift = (index >> _SUB_BUCKET_HALF_BITS) - 1
+    mantissa = index - (shift << _SUB_BUCKET_HALF_BITS)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class _Shard:
+    """Acumulador de uma thread; só a thread dona escreve nele"""
+    __slots__ = ("value", "count", "sum", "min", "max", "buckets")
+
+    def __init__(self):
+        self.value = 0.0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+
+    def merged(self, other: "_Shard") -> "_Shard":
+        """Novo shard com a soma deste e de ``other``"""
+        result = _Shard()
+        result.value = self.value + other.value
+        result.count = self.count + other.count
+        result.sum = self.sum + other.sum
+        result.min = min(self.min, other.min)
+        result.max = max(self.max, other.max)
+        result.buckets = dict(self.buckets)
+        for index, bucket_count in other.buckets.items():
+            result.buckets[index] = result.buckets.get(index, 0) + bucket_count
+        return result
+
+
+class _ThreadSlot:
+    """Guarda o shard no ``threading.local``; é coletado quando a thread termina"""
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard: _Shard):
+        self.shard = shard
+
+
+def _retire_shard(metric_ref: "weakref.ref[_ShardedMetric]", shard: _Shard) -> None:
+    metric = metric_ref()
+    if metric is not None:
+        metric._retire(shard)
+
+
+class _ShardedMetric:
+    """
+    Base das métricas particionadas por thread.
+
+    Cada thread escreve apenas no próprio shard, então o caminho de atualização
+    não usa lock; a leitura soma os shards na coleta. Quando a thread termina,
+    seu shard é somado a um acumulador único e sai da lista, então threads de
+    vida curta não fazem a coleta crescer.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        # Soma dos shards de threads encerradas; substituído (nunca alterado) a cada baixa
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.slot.shard
+        except AttributeError:
+            shard = _Shard()
+            slot = _ThreadSlot(shard)
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(slot, _retire_shard, weakref.ref(self), shard)
+            self._local.slot = slot
+            return shard
+
+    def _retire(self, shard: _Shard) -> None:
+        with self._shards_lock:
+            self._shards.remove(shard)
+            self._retired = self._retired.merged(shard)
+
+    def _snapshot_shards(self) -> List[_Shard]:
+        with self._shards_lock:
+            return [self._retired, *self._shards]
+
+
+class Counter(_ShardedMetric):
+    """Contador monotônico"""
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counter só pode ser incrementado com valores não negativos")
+        self._shard().value += amount
+
+    @property
+    def value(self) -> float:
+        return sum(shard.value for shard in self._snapshot_shards())
+
+
+class Gauge:
+    """Valor instantâneo que pode subir e descer"""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram(_ShardedMetric):
+    """
+    Histograma de latência com buckets log-lineares (estilo HDR)
+
+    Valores são registrados em segundos e armazenados com resolução de
+    ``HISTOGRAM_UNIT``; quantis têm erro relativo de até ~0.8%.
+    """
+
+    def observe(self, seconds: float) -> None:
+        shard = self._shard()
+        shard.count += 1
+        shard.sum += seconds
+        if seconds < shard.min:
+            shard.min = seconds
+        if seconds > shard.max:
+            shard.max = seconds
+        index = _bucket_index(int(seconds / HISTOGRAM_UNIT) if seconds > 0 else 0)
+        buckets = shard.buckets
+        buckets[index] = buckets.get(index, 0) + 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Context manager que registra a duração do bloco"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Agrega os shards em contagem, soma, extremos e buckets ordenados"""
+        count = 0
+        total = 0.0
+        minimum = math.inf
+        maximum = 0.0
+        merged: Dict[int, int] = {}
+        for shard in self._snapshot_shards():
+            count += shard.count
+            total += shard.sum
+            minimum = min(minimum, shard.min)
+            maximum = max(maximum, shard.max)
+            for index, bucket_count in list(shard.buckets.items()):
+                merged[index] = merged.get(index, 0) + bucket_count
+        return {
+            "count": count,
+            "sum": total,
+            "min": minimum if count else 0.0,
+            "max": maximum,
+            "buckets": sorted(merged.items())
+        }
+
+    @staticmethod
+    def quantile_from_snapshot(snapshot: Dict[str, Any], quantile: float) -> float:
+        """Quantil aproximado (ponto médio do bucket que contém o rank)"""
+        count = sum(c for _, c in snapshot["buckets"])
+        if count == 0:
+            return 0.0
+        rank = max(1, math.ceil(quantile * count))
+        seen = 0
+        for index, bucket_count in snapshot["buckets"]:
+            seen += bucket_count
+            if seen >= rank:
+                lower, upper = _bucket_bounds(index)
+                value = (lower + upper - 1) / 2 * HISTOGRAM_UNIT
+                return min(max(value, snapshot["min"]), snapshot["max"])
+        return snapshot["max"]
+
+    def quantile(self, quantile: float) -> float:
+        return self.quantile_from_snapshot(self.snapshot(), quantile)
+
+    @staticmethod
+    def cumulative_buckets(snapshot: Dict[str, Any],
+                           bounds: Tuple[float, ...] = DEFAULT_PROMETHEUS_BUCKETS) -> List[Tuple[float, int]]:
+        """Contagens acumuladas por limite superior (formato ``le`` do Prometheus)"""
+        result = []
+        buckets = snapshot["buckets"]
+        position = 0
+        cumulative = 0
+        for bound in bounds:
+            limit = int(round(bound / HISTOGRAM_UNIT))
+            while position < len(buckets) and _bucket_bounds(buckets[position][0])[1] <= limit + 1:
+                cumulative += buckets[position][1]
+                position += 1
+            result.append((bound, cumulative))
+        return result
+
+
+class MetricFamily:
+    """Métrica com nome, descrição e rótulos; cada combinação de rótulos é um filho"""
+
+    _types = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+    def __init__(self, name: str, metric_type: str, description: str = "",
+                 labelnames: Tuple[str, ...] = ()):
+        if metric_type not in self._types:
+            raise ValueError(f"Tipo de métrica desconhecido: {metric_type}")
+        self.name = name
+        self.type = metric_type
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any, **labels: Any) -> Any:
+        """Retorna (criando se necessário) a métrica para os valores de rótulo"""
+        if labels:
+            key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        else:
+            key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera rótulos {self.labelnames}")
+
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._types[self.type]()
+                    self._children[key] = child
+        return child
+
+    def children(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in items]
+
+    # Atalhos para métricas sem rótulos
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, seconds: float) -> None:
+        self.labels().observe(seconds)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    items = {**labels, **(extra or {})}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in items.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Registro central das métricas do processo"""
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name: str, metric_type: str, description: str,
+                  labelnames: Tuple[str, ...]) -> MetricFamily:
+        family = self._families.get(name)
+        if family is None:
+            with self._lock:
+                family = self._families.get(name)
+                if family is None:
+                    family = MetricFamily(name, metric_type, description, labelnames)
+                    self._families[name] = family
+        if family.type != metric_type or family.labelnames != tuple(labelnames):
+            raise ValueError(f"Métrica {name} já registrada com tipo/rótulos diferentes")
+        return family
+
+    def counter(self, name: str, description: str = "", labelnames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(name, "counter", description, labelnames)
+
+    def gauge(self, name: str, description: str = "", labelnames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(name, "gauge", description, labelnames)
+
+    def histogram(self, name: str, description: str = "", labelnames: Tuple[str, ...] = ()) -> MetricFamily:
+        return self._register(name, "histogram", description, labelnames)
+
+    def families(self) -> List[MetricFamily]:
+        with self._lock:
+            return list(self._families.values())
+
+    def clear(self) -> None:
+        """Remove todas as métricas (uso em testes)"""
+        with self._lock:
+            self._families.clear()
+
+    def to_prometheus(self) -> str:
+        """Exporta no formato texto de exposição do Prometheus (0.0.4)"""
+        lines: List[str] = []
+        for family in self.families():
+            if family.description:
+                lines.append(f"# HELP {family.name} {family.description}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for labels, child in family.children():
+                if family.type == "histogram":
+                    snapshot = child.snapshot()
+                    for bound, cumulative in Histogram.cumulative_buckets(snapshot):
+                        lines.append(
+                            f"{family.name}_bucket{_format_labels(labels, {'le': _format_value(bound)})} {cumulative}"
+                        )
+                    lines.append(f"{family.name}_bucket{_format_labels(labels, {'le': '+Inf'})} {snapshot['count']}")
+                    lines.append(f"{family.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+                    lines.append(f"{family.name}_count{_format_labels(labels)} {snapshot['count']}")
+                else:
+                    lines.append(f"{family.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self, quantiles: Tuple[float, ...] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        """Exporta como dicionário serializável em JSON"""
+        metrics: Dict[str, Any] = {}
+        for family in self.families():
+            series = []
+            for labels, child in family.children():
+                if family.type == "histogram":
+                    snapshot = child.snapshot()
+                    count = snapshot["count"]
+                    series.append({
+                        "labels": labels,
+                        "count": count,
+                        "sum": snapshot["sum"],
+                        "mean": snapshot["sum"] / count if count else 0.0,
+                        "min": snapshot["min"],
+                        "max": snapshot["max"],
+                        "quantiles": {
+                            f"p{q * 100:g}": Histogram.quantile_from_snapshot(snapshot, q)
+                            for q in quantiles
+                        }
+                    })
+                else:
+                    series.append({"labels": labels, "value": child.value})
+            metrics[family.name] = {
+                "type": family.type,
+                "description": family.description,
+                "series": series
+            }
+        return {"generated_at": datetime.utcnow().isoformat(), "metrics": metrics}
+
+
+# Registro global do processo
+metrics_registry = MetricsRegistry()
+
+AI_OPERATIONS_TOTAL = metrics_registry.counter(
+    "medai_ai_operations_total", "Operações de IA executadas", ("operation", "model", "status")
+)
+AI_OPERATION_DURATION = metrics_registry.histogram(
+    "medai_ai_operation_duration_seconds", "Duração das operações de IA", ("operation", "model")
+)
+OPERATION_DURATION = metrics_registry.histogram(
+    "medai_operation_duration_seconds", "Duração de operações instrumentadas", ("operation", "status")
+)
+PIPELINE_STAGE_DURATION = metrics_registry.histogram(
+    "medai_pipeline_stage_duration_seconds",
+    "Duração por etapa do pipeline de IA (preprocess, inference, postprocess, db_write)",
+    ("stage", "model")
+)
+PIPELINE_STAGE_ERRORS = metrics_registry.counter(
+    "medai_pipeline_stage_errors_total", "Falhas por etapa do pipeline de IA", ("stage", "model")
+)
+
+
+@contextmanager
+def pipeline_stage(stage: str, model: str = "") -> Iterator[None]:
+    """
+    Mede a duração de uma etapa do pipeline de IA
+
+    Args:
+        stage: Etapa (preprocess, inference, postprocess, db_write)
+        model: Nome do modelo ou componente
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PIPELINE_STAGE_ERRORS.labels(stage, model).inc()
+        raise
+    finally:
+        PIPELINE_STAGE_DURATION.labels(stage, model).observe(time.perf_counter() - start)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Retorna o registro global de métricas"""
+    return metrics_registry
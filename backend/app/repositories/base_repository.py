@@ -15,7 +15,7 @@ from app.core.exceptions import (
     NotFoundError, DatabaseError, ValidationError, 
     DuplicateError, DatabaseIntegrityError
 )
-from app.utils.logging_config import get_logger
+from app.monitoring.logging_config import get_logger
 
 # Type variable para o modelo
 ModelType = TypeVar("ModelType", bound=BaseModel)
@@ -0,0 +1,620 @@
+"""
+Validação em lote do MedAI
+Valida grandes volumes (importações e migrações de prontuário) em blocos
+colunares: cada coluna é fatorada em valores distintos, as regras rodam uma
+vez por valor distinto (CPF e datas verificados em numpy) e os
+resultados voltam às linhas por indexação. Os blocos podem ser distribuídos
+entre processos, com modo fail-fast e agregação de erros limitada.
+"""
+
+import multiprocessing
+import os
+import re
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+from app.core.constants import VALIDATION_RULES
+from app.core.identifiers import cpf_valid
+from app.repositories.validation_service import (
+    BIRTH_DATE_MIN, EMAIL_RE, PATIENT_MEASUREMENT_RANGES,
+    PATIENT_REQUIRED_FIELDS, PHONE_CLEAN_RE, PHONE_RE, ValidationResult, ValidationService
+)
+from app.monitoring.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_MAX_ERRORS = 1000
+PARALLEL_MIN_ROWS = 200_000
+MAX_DEFAULT_WORKERS = 8
+
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}', re.ASCII)
+EMAIL_MAX_LENGTH = VALIDATION_RULES["email"]["max_length"]
+PHONE_MAX_LENGTH = VALIDATION_RULES["phone"]["max_length"]
+
+
+class _Missing:
+    """Marca um campo ausente no registro (diferente de presente com valor vazio)"""
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "<ausente>"
+
+
+MISSING = _Missing()
+
+
+@dataclass(frozen=True)
+class BatchOptions:
+    """Opções de uma validação em lote"""
+    fail_fast: bool = False
+    max_errors: int = DEFAULT_MAX_ERRORS
+    include_valid: bool = False
+
+
+@dataclass
+class ChunkReport:
+    """Resultado de um bloco; ``details`` contém apenas linhas com erro ou aviso"""
+    start: int
+    processed: int
+    invalid: int
+    first_invalid: Optional[int]
+    error_counts: Counter
+    warning_counts: Counter
+    details: List[Dict[str, Any]] = field(default_factory=list)
+    summary_errors: List[str] = field(default_factory=list)
+    summary_warnings: List[str] = field(default_factory=list)
+
+
+# === KERNELS VETORIZADOS ===
+
+# Resultado válido compartilhado (somente leitura) dos caminhos vetorizados
+_VALID = ValidationResult(True, [], [], {})
+
+
+def _accept_or_explain(values: Sequence[Any], accepted: Sequence[bool],
+                       explain: Callable[[Any], ValidationResult]) -> List[ValidationResult]:
+    """
+    Valores aceitos pelo kernel recebem o resultado válido; os demais passam
+    pelo validador escalar, que produz exatamente as mensagens de erro usuais
+    """
+    return [_VALID if ok else explain(value) for value, ok in zip(values, accepted)]
+
+
+def _ascii_matrix(strings: Sequence[str], width: int) -> np.ndarray:
+    """Strings ASCII de dígitos de mesmo comprimento como matriz (n, width) de inteiros"""
+    joined = "".join(strings).encode("ascii")
+    return np.frombuffer(joined, dtype=np.uint8).reshape(-1, width).astype(np.int64) - ord("0")
+
+
+def validate_cpf_bulk(service: ValidationService, values: Sequence[Any]) -> List[ValidationResult]:
+    """Equivalente a ``validate_cpf`` para vários valores, com o kernel de identificadores"""
+    return _accept_or_explain(values, cpf_valid(values), service.validate_cpf)
+
+
+def _days_in_month(year: np.ndarray, month: np.ndarray) -> np.ndarray:
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return DAYS_IN_MONTH[np.clip(month, 1, 12) - 1] + (leap & (month == 2))
+
+
+def validate_birth_date_bulk(service: ValidationService, values: Sequence[Any]) -> List[ValidationResult]:
+    """
+    Equivalente a ``validate_birth_date`` para vários valores
+
+    Datas ``AAAA-MM-DD`` (o formato das exportações) são decompostas e
+    verificadas em numpy; outros formatos e tipos seguem o caminho escalar.
+    """
+    candidates = [i for i, value in enumerate(values) if isinstance(value, str) and ISO_DATE_RE.fullmatch(value)]
+
+    accepted = np.zeros(len(values), dtype=bool)
+    if candidates:
+        raw = _ascii_matrix([values[i].replace("-", "") for i in candidates], 8)
+        year = raw[:, :4] @ np.array([1000, 100, 10, 1])
+        month = raw[:, 4] * 10 + raw[:, 5]
+        day = raw[:, 6] * 10 + raw[:, 7]
+        well_formed = (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= _days_in_month(year, month))
+
+        dates = np.full(len(candidates), np.datetime64("NaT"), dtype="datetime64[D]")
+        ok_year, ok_month, ok_day = year[well_formed], month[well_formed], day[well_formed]
+        dates[well_formed] = (
+            (ok_year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+            + (ok_month - 1).astype("timedelta64[M]")
+        ).astype("datetime64[D]") + (ok_day - 1).astype("timedelta64[D]")
+
+        in_range = well_formed & (dates >= np.datetime64(BIRTH_DATE_MIN)) & (dates <= np.datetime64(date.today()))
+        accepted[candidates] = in_range
+    return _accept_or_explain(values, accepted, service.validate_birth_date)
+
+
+def validate_email_bulk(service: ValidationService, values: Sequence[Any]) -> List[ValidationResult]:
+    """Equivalente a ``validate_email`` (sem avisos de domínio) com a expressão pré-compilada"""
+    accepted = [isinstance(value, str) and len(value) <= EMAIL_MAX_LENGTH and EMAIL_RE.match(value) is not None
+                for value in values]
+    return _accept_or_explain(values, accepted, service.validate_email)
+
+
+def validate_phone_bulk(service: ValidationService, values: Sequence[Any]) -> List[ValidationResult]:
+    """Equivalente a ``validate_phone`` com as expressões pré-compiladas"""
+    accepted = []
+    for value in values:
+        clean = PHONE_CLEAN_RE.sub('', value) if isinstance(value, str) else None
+        accepted.append(clean is not None and len(clean) <= PHONE_MAX_LENGTH and PHONE_RE.match(clean) is not None)
+    return _accept_or_explain(values, accepted, service.validate_phone)
+
+
+# === REGRAS COLUNARES ===
+
+@dataclass(frozen=True)
+class _Outcome:
+    """Contribuição de uma regra para uma linha"""
+    errors: Tuple[str, ...]
+    field_errors: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    warnings: Tuple[str, ...] = ()
+    replace: bool = False  # subvalidação: substitui a lista do campo (``field_errors.update``)
+
+    @classmethod
+    def error(cls, message: str, field_name: str) -> "_Outcome":
+        return cls((message,), ((field_name, (message,)),))
+
+    @classmethod
+    def from_result(cls, result: ValidationResult, keep_warnings: bool) -> Optional["_Outcome"]:
+        invalid = not result.is_valid
+        warnings = tuple(result.warnings) if keep_warnings else ()
+        if not invalid and not warnings:
+            return None
+        return cls(
+            tuple(result.errors) if invalid else (),
+            tuple((name, tuple(messages)) for name, messages in result.field_errors.items()) if invalid else (),
+            warnings,
+            replace=True
+        )
+
+    def apply(self, errors: List[str], field_errors: Dict[str, List[str]], warnings: List[str]) -> None:
+        errors.extend(self.errors)
+        for name, messages in self.field_errors:
+            if self.replace:
+                field_errors[name] = list(messages)
+            else:
+                field_errors.setdefault(name, []).extend(messages)
+        warnings.extend(self.warnings)
+
+
+def _factorize(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Códigos por linha e valores distintos, na ordem de aparição"""
+    index: Dict[Any, int] = {}
+    try:
+        codes = [index.setdefault(value, len(index)) for value in values]
+    except TypeError:
+        # Valores não hasheáveis: cada linha é avaliada individualmente
+        return np.arange(len(values), dtype=np.intp), list(values)
+    return np.fromiter(codes, dtype=np.intp, count=len(codes)), list(index)
+
+
+class _RequiredRule:
+    def __init__(self, field_name: str):
+        self.field = field_name
+        self._outcomes = [None, _Outcome.error(f"Campo obrigatório: {field_name}", field_name)]
+
+    def evaluate(self, service: ValidationService, values: List[Any]) -> Tuple[np.ndarray, list]:
+        codes = np.fromiter((0 if value else 1 for value in values), dtype=np.intp, count=len(values))
+        return codes, self._outcomes
+
+
+class _SubValidatorRule:
+    """Aplica a versão em lote de um validador do serviço a cada valor distinto da coluna"""
+
+    def __init__(self, field_name: str,
+                 bulk: Callable[[ValidationService, Sequence[Any]], List[ValidationResult]],
+                 when_present: bool = False, keep_warnings: bool = False):
+        self.field = field_name
+        self.bulk = bulk
+        self.when_present = when_present
+        self.keep_warnings = keep_warnings
+
+    def evaluate(self, service: ValidationService, values: List[Any]) -> Tuple[np.ndarray, list]:
+        codes, uniques = _factorize(values)
+        applies = [i for i, value in enumerate(uniques)
+                   if (value is not MISSING if self.when_present else bool(value))]
+        targets = [uniques[i] for i in applies]
+        results = self.bulk(service, targets)
+
+        outcomes: List[Optional[_Outcome]] = [None] * len(uniques)
+        for i, result in zip(applies, results):
+            outcomes[i] = _Outcome.from_result(result, self.keep_warnings)
+        return codes, outcomes
+
+
+class _RangeRule:
+    def __init__(self, field_name: str, minimum: float, maximum: float, message: str):
+        self.field = field_name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.message = message
+
+    def evaluate(self, service: ValidationService, values: List[Any]) -> Tuple[np.ndarray, list]:
+        codes, uniques = _factorize(values)
+        outcomes: List[Optional[_Outcome]] = [None] * len(uniques)
+        numbers = np.full(len(uniques), np.nan)
+        for i, value in enumerate(uniques):
+            if not value:
+                continue
+            try:
+                numbers[i] = float(value)
+            except (TypeError, ValueError):
+                outcomes[i] = _Outcome.error(f"Valor numérico inválido em {self.field}", self.field)
+
+        out_of_range = _Outcome.error(self.message, self.field)
+        with np.errstate(invalid="ignore"):
+            mask = (numbers < self.minimum) | (numbers > self.maximum)
+        for i in np.flatnonzero(mask):
+            outcomes[i] = out_of_range
+        return codes, outcomes
+
+
+PATIENT_RULES = (
+    *(_RequiredRule(name) for name in PATIENT_REQUIRED_FIELDS),
+    _SubValidatorRule("email", validate_email_bulk),
+    _SubValidatorRule("phone_primary", validate_phone_bulk),
+    _SubValidatorRule("cpf", validate_cpf_bulk),
+    _SubValidatorRule("birth_date", validate_birth_date_bulk, when_present=True, keep_warnings=True),
+    *(_RangeRule(name, minimum, maximum, message)
+      for name, (minimum, maximum, message) in PATIENT_MEASUREMENT_RANGES.items()),
+)
+
+# Tipo de validação -> regras colunares, ou nome do método aplicado linha a linha
+COLUMNAR_RULES = {"patient": PATIENT_RULES}
+ROW_VALIDATORS = {"exam": "validate_exam_data", "diagnostic": "validate_diagnostic_data"}
+VALIDATION_TYPES = (*COLUMNAR_RULES, *ROW_VALIDATORS)
+
+
+# === BLOCOS ===
+
+def _is_dataframe(data: Any) -> bool:
+    return PANDAS_AVAILABLE and isinstance(data, pd.DataFrame)
+
+
+def _column(chunk: Any, name: str) -> List[Any]:
+    if _is_dataframe(chunk):
+        if name not in chunk.columns:
+            return [MISSING] * len(chunk)
+        column = chunk[name].astype(object)
+        return column.where(column.notna(), None).tolist()
+    return [row.get(name, MISSING) for row in chunk]
+
+
+def _records(chunk: Any) -> List[Dict[str, Any]]:
+    if _is_dataframe(chunk):
+        frame = chunk.astype(object)
+        return frame.where(frame.notna(), None).to_dict("records")
+    return chunk
+
+
+def _detail(index: int, is_valid: bool, errors: List[str], warnings: List[str],
+            field_errors: Dict[str, List[str]]) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "is_valid": is_valid,
+        "errors": errors,
+        "warnings": warnings,
+        "field_errors": field_errors
+    }
+
+
+class _Collector:
+    """Acumula detalhes e resumos de um bloco respeitando o limite de erros"""
+
+    def __init__(self, report: ChunkReport, options: BatchOptions):
+        self.report = report
+        self.options = options
+
+    @property
+    def errors_full(self) -> bool:
+        cap = self.options.max_errors
+        report = self.report
+        return (not self.options.include_valid and len(report.details) >= cap
+                and len(report.summary_errors) >= cap)
+
+    @property
+    def full(self) -> bool:
+        return self.errors_full and len(self.report.summary_warnings) >= self.options.max_errors
+
+    def add(self, index: int, errors: List[str], warnings: List[str],
+            field_errors: Dict[str, List[str]]) -> None:
+        cap = self.options.max_errors
+        report = self.report
+        is_valid = not errors
+        if self.options.include_valid or (not is_valid and len(report.details) < cap):
+            report.details.append(_detail(index, is_valid, errors, warnings, field_errors))
+        if errors and len(report.summary_errors) < cap:
+            report.summary_errors.extend(errors[:cap - len(report.summary_errors)])
+        if warnings and len(report.summary_warnings) < cap:
+            report.summary_warnings.extend(warnings[:cap - len(report.summary_warnings)])
+
+
+def _validate_columnar(rules: Sequence[Any], service: ValidationService, chunk: Any,
+                       start: int, options: BatchOptions) -> ChunkReport:
+    size = len(chunk)
+    columns: Dict[str, List[Any]] = {}
+    evaluated = []
+    row_invalid = np.zeros(size, dtype=bool)
+    row_warned = np.zeros(size, dtype=bool)
+
+    for rule in rules:
+        if rule.field not in columns:
+            columns[rule.field] = _column(chunk, rule.field)
+        codes, outcomes = rule.evaluate(service, columns[rule.field])
+        invalid = np.fromiter((o is not None and bool(o.errors) for o in outcomes), dtype=bool, count=len(outcomes))
+        warned = np.fromiter((o is not None and bool(o.warnings) for o in outcomes), dtype=bool, count=len(outcomes))
+        row_invalid |= invalid[codes]
+        row_warned |= warned[codes]
+        evaluated.append((codes, outcomes, invalid, warned))
+
+    processed = size
+    if options.fail_fast and row_invalid.any():
+        processed = int(np.argmax(row_invalid)) + 1
+        row_invalid = row_invalid[:processed]
+        row_warned = row_warned[:processed]
+
+    report = ChunkReport(
+        start=start,
+        processed=processed,
+        invalid=int(row_invalid.sum()),
+        first_invalid=start + int(np.argmax(row_invalid)) if row_invalid.any() else None,
+        error_counts=Counter(),
+        warning_counts=Counter()
+    )
+
+    # Contagens por mensagem: uma contagem por valor distinto, sem percorrer as linhas
+    for codes, outcomes, invalid, warned in evaluated:
+        if not (invalid.any() or warned.any()):
+            continue
+        hits = np.bincount(codes[:processed], minlength=len(outcomes))
+        for i in np.flatnonzero((invalid | warned) & (hits > 0)):
+            count = int(hits[i])
+            for message in outcomes[i].errors:
+                report.error_counts[message] += count
+            for message in outcomes[i].warnings:
+                report.warning_counts[message] += count
+
+    # Montagem linha a linha apenas das linhas com erro ou aviso
+    collector = _Collector(report, options)
+    for i in np.flatnonzero(row_invalid | row_warned):
+        if collector.full:
+            break
+        if collector.errors_full and not row_warned[i]:
+            continue
+        errors: List[str] = []
+        field_errors: Dict[str, List[str]] = {}
+        warnings: List[str] = []
+        for codes, outcomes, _, _ in evaluated:
+            outcome = outcomes[codes[i]]
+            if outcome is not None:
+                outcome.apply(errors, field_errors, warnings)
+        collector.add(start + int(i), errors, warnings, field_errors)
+
+    return report
+
+
+def _validate_rows(method: Callable[[Dict[str, Any]], ValidationResult], chunk: Any,
+                   start: int, options: BatchOptions) -> ChunkReport:
+    report = ChunkReport(start=start, processed=0, invalid=0, first_invalid=None,
+                         error_counts=Counter(), warning_counts=Counter())
+    collector = _Collector(report, options)
+
+    for offset, row in enumerate(_records(chunk)):
+        result = method(row)
+        report.processed = offset + 1
+        report.warning_counts.update(result.warnings)
+        if not result.is_valid:
+            report.invalid += 1
+            report.error_counts.update(result.errors)
+            if report.first_invalid is None:
+                report.first_invalid = start + offset
+        if (not result.is_valid or result.warnings) and not collector.full:
+            collector.add(start + offset, result.errors, result.warnings, result.field_errors)
+        if options.fail_fast and not result.is_valid:
+            break
+
+    return report
+
+
+_worker_service: Optional[ValidationService] = None
+
+
+def validate_chunk(validation_type: str, chunk: Any, start: int, options: BatchOptions,
+                   service: Optional[ValidationService] = None) -> ChunkReport:
+    """
+    Valida um bloco de registros (lista de dicionários ou DataFrame)
+
+    Executado no processo chamador ou em um worker; sem ``service`` usa uma
+    instância própria do processo.
+    """
+    global _worker_service
+    if service is None:
+        if _worker_service is None:
+            _worker_service = ValidationService()
+        service = _worker_service
+
+    if validation_type in COLUMNAR_RULES:
+        return _validate_columnar(COLUMNAR_RULES[validation_type], service, chunk, start, options)
+    return _validate_rows(getattr(service, ROW_VALIDATORS[validation_type]), chunk, start, options)
+
+
+def iter_chunks(data: Any, chunk_size: int) -> Iterator[Tuple[int, Any]]:
+    """Divide a entrada em blocos ``(índice inicial, bloco)`` sem copiar a lista inteira"""
+    if _is_dataframe(data):
+        for start in range(0, len(data), chunk_size):
+            yield start, data.iloc[start:start + chunk_size]
+    elif isinstance(data, Sequence):
+        for start in range(0, len(data), chunk_size):
+            yield start, data[start:start + chunk_size]
+    else:
+        iterator = iter(data)
+        start = 0
+        while chunk := list(islice(iterator, chunk_size)):
+            yield start, chunk
+            start += len(chunk)
+
+
+class BatchValidator:
+    """
+    Validação em lote com blocos colunares e execução paralela opcional
+
+    Com ``workers=None`` o paralelismo é ativado automaticamente para lotes de
+    pelo menos ``PARALLEL_MIN_ROWS`` registros; ``workers=0`` força execução no
+    processo. Os blocos são consumidos em ordem e no máximo ``2 * workers``
+    ficam pendentes, então a memória não cresce com o tamanho da entrada.
+    Por isso ``details`` traz por padrão apenas até ``max_errors`` registros
+    inválidos; ``include_valid=True`` guarda uma entrada por registro.
+    """
+
+    def __init__(self, validation_type: str, service: Optional[ValidationService] = None,
+                 fail_fast: bool = False, max_errors: int = DEFAULT_MAX_ERRORS,
+                 include_valid: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: Optional[int] = None):
+        if validation_type not in VALIDATION_TYPES:
+            raise ValueError(f"Tipo de validação não suportado: {validation_type}")
+        self.validation_type = validation_type
+        self.service = service or ValidationService()
+        self.options = BatchOptions(fail_fast=fail_fast, max_errors=max_errors, include_valid=include_valid)
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def _resolve_workers(self, total: Optional[int]) -> int:
+        if self.workers is not None:
+            return self.workers
+        if total is not None and total >= PARALLEL_MIN_ROWS:
+            return min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)
+        return 0
+
+    def _reports_local(self, data: Any) -> Iterator[ChunkReport]:
+        for start, chunk in iter_chunks(data, self.chunk_size):
+            yield validate_chunk(self.validation_type, chunk, start, self.options, self.service)
+
+    def _reports_parallel(self, data: Any, executor: Executor, window: int) -> Iterator[ChunkReport]:
+        pending = deque()
+        try:
+            for start, chunk in iter_chunks(data, self.chunk_size):
+                pending.append(executor.submit(validate_chunk, self.validation_type, chunk, start, self.options))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Parada antecipada (fail-fast): descarta blocos ainda não iniciados
+            for future in pending:
+                future.cancel()
+
+    def validate(self, data: Any, executor: Optional[Executor] = None) -> Dict[str, Any]:
+        """
+        Valida os registros
+
+        Args:
+            data: Lista (ou iterável) de dicionários ou DataFrame
+            executor: Executor externo para os blocos (por padrão um pool de processos)
+
+        Returns:
+            Resultado no formato de ``ValidationService.validate_batch_data``
+        """
+        total = len(data) if _is_dataframe(data) or isinstance(data, Sequence) else None
+        workers = self._resolve_workers(total)
+        owned = None
+        if executor is None and workers > 0 and (total is None or total > self.chunk_size):
+            # spawn: o processo chamador pode ter event loop e threads ativos
+            owned = executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        try:
+            if executor is None:
+                reports = self._reports_local(data)
+            else:
+                reports = self._reports_parallel(data, executor, 2 * max(workers, 1))
+            results = self._merge(reports, total)
+        finally:
+            if owned is not None:
+                owned.shutdown(wait=True, cancel_futures=True)
+
+        logger.info(
+            f"Validação em lote ({self.validation_type}): {results['processed']} registros, "
+            f"{results['invalid']} inválidos"
+        )
+        return results
+
+    def _merge(self, reports: Iterable[ChunkReport], total: Optional[int]) -> Dict[str, Any]:
+        options = self.options
+        cap = options.max_errors
+        results = {
+            "total": total,
+            "processed": 0,
+            "valid": 0,
+            "invalid": 0,
+            "details": [],
+            "summary_errors": [],
+            "summary_warnings": [],
+            "error_counts": Counter(),
+            "warning_counts": Counter(),
+            "first_invalid_index": None,
+            "stopped_early": False
+        }
+        details = results["details"]
+
+        for report in reports:
+            results["processed"] += report.processed
+            results["invalid"] += report.invalid
+            results["valid"] += report.processed - report.invalid
+            results["error_counts"].update(report.error_counts)
+            results["warning_counts"].update(report.warning_counts)
+            if results["first_invalid_index"] is None:
+                results["first_invalid_index"] = report.first_invalid
+
+            if options.include_valid:
+                notable = iter(report.details)
+                pending = next(notable, None)
+                for index in range(report.start, report.start + report.processed):
+                    if pending is not None and pending["index"] == index:
+                        details.append(pending)
+                        pending = next(notable, None)
+                    else:
+                        details.append(_detail(index, True, [], [], {}))
+            else:
+                details.extend(report.details[:max(cap - len(details), 0)])
+
+            for key in ("summary_errors", "summary_warnings"):
+                room = cap - len(results[key])
+                if room > 0:
+                    results[key].extend(getattr(report, key)[:room])
+
+            if options.fail_fast and report.invalid:
+                results["stopped_early"] = True
+                break
+
+        processed = results["processed"]
+        if results["total"] is None:
+            results["total"] = processed
+        results["error_counts"] = dict(results["error_counts"])
+        results["warning_counts"] = dict(results["warning_counts"])
+        results["success_rate"] = results["valid"] / processed if processed > 0 else 0
+        results["unique_errors"] = list(results["error_counts"])
+        results["unique_warnings"] = list(results["warning_counts"])
+        results["truncated"] = (
+            sum(results["error_counts"].values()) > len(results["summary_errors"])
+            or sum(results["warning_counts"].values()) > len(results["summary_warnings"])
+        )
+        return results
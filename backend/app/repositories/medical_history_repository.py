@@ -0,0 +1,245 @@
+"""
+Medical History Repository - Paged, projected access to a patient's timeline.
+
+The timeline is a UNION over the clinical tables that reference a patient
+(appointments, exams, prescriptions, diagnostics). Pages use keyset cursors
+on (occurred_at, record_type, record_id), so the cost of a page does not
+depend on how deep into the history it is, and the summary is computed by a
+single GROUP BY instead of materializing records.
+"""
+
+import base64
+import json
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, String, and_, case, cast, column, func, literal, or_, table, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Columns a caller may project; the key columns are always selected because
+# the cursor is built from them
+RECORD_FIELDS = ("record_id", "record_type", "occurred_at", "title", "status", "summary", "source")
+KEY_FIELDS = ("occurred_at", "record_type", "record_id")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+IMAGING_EXAM_TYPES = ("xray", "ct_scan", "mri", "ultrasound", "mammography", "bone_density")
+LAB_EXAM_TYPES = ("blood_test", "urine_test", "biopsy", "pathology")
+
+
+def _source_table(name: str, timestamps: tuple[str, ...], *columns: str):
+    """Lightweight table clause with only the columns the timeline reads"""
+    return table(
+        name, column("id"), column("patient_id"), column("is_deleted"),
+        *(column(timestamp, DateTime) for timestamp in ("created_at",) + timestamps),
+        *(column(name_) for name_ in columns)
+    )
+
+
+_appointments = _source_table("appointments", ("scheduled_datetime",), "title", "appointment_status",
+                              "chief_complaint")
+_exams = _source_table("exams", ("performed_date", "scheduled_date"), "exam_type", "title",
+                       "exam_status", "description")
+_prescriptions = _source_table("prescriptions", ("prescribed_date",), "title", "prescription_status", "diagnosis")
+_diagnostics = _source_table("diagnostics", ("approved_at",), "title", "diagnostic_status", "summary")
+
+
+def _exam_record_type():
+    return case(
+        (_exams.c.exam_type.in_(IMAGING_EXAM_TYPES), literal("imaging")),
+        (_exams.c.exam_type.in_(LAB_EXAM_TYPES), literal("lab_result")),
+        else_=literal("diagnostic")
+    )
+
+
+# source -> (table, record types it can produce, column expressions per field)
+_SOURCES: dict[str, tuple[Any, frozenset[str], dict[str, Any]]] = {
+    "appointments": (_appointments, frozenset({"consultation"}), {
+        "record_type": literal("consultation"),
+        "occurred_at": _appointments.c.scheduled_datetime,
+        "title": _appointments.c.title,
+        "status": _appointments.c.appointment_status,
+        "summary": _appointments.c.chief_complaint,
+    }),
+    "exams": (_exams, frozenset({"imaging", "lab_result", "diagnostic"}), {
+        "record_type": _exam_record_type(),
+        "occurred_at": func.coalesce(_exams.c.performed_date, _exams.c.scheduled_date, _exams.c.created_at),
+        "title": _exams.c.title,
+        "status": _exams.c.exam_status,
+        "summary": _exams.c.description,
+    }),
+    "prescriptions": (_prescriptions, frozenset({"prescription"}), {
+        "record_type": literal("prescription"),
+        "occurred_at": func.coalesce(_prescriptions.c.prescribed_date, _prescriptions.c.created_at),
+        "title": _prescriptions.c.title,
+        "status": _prescriptions.c.prescription_status,
+        "summary": _prescriptions.c.diagnosis,
+    }),
+    "diagnostics": (_diagnostics, frozenset({"diagnostic"}), {
+        "record_type": literal("diagnostic"),
+        "occurred_at": func.coalesce(_diagnostics.c.approved_at, _diagnostics.c.created_at),
+        "title": _diagnostics.c.title,
+        "status": _diagnostics.c.diagnostic_status,
+        "summary": _diagnostics.c.summary,
+    }),
+}
+
+
+def encode_cursor(occurred_at: Any, record_type: str, record_id: Any) -> str:
+    """Opaque cursor for the record after which the next page starts"""
+    if isinstance(occurred_at, datetime):
+        occurred_at = occurred_at.isoformat()
+    payload = json.dumps([occurred_at, record_type, str(record_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, str, str]:
+    """Inverse of :func:`encode_cursor`; raises ValueError on malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        occurred_at, record_type, record_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(occurred_at) if occurred_at else None), str(record_type), str(record_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+class MedicalHistoryRepository:
+    """Repository for a patient's chronological medical history."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    @staticmethod
+    def _branches(patient_pk: Any, record_types: Iterable[str] | None, fields: Iterable[str]) -> list:
+        """One SELECT per source, with projection and type filter pushed into it
+
+        ``fields`` must already be normalized (see ``_normalize_fields``) so
+        every branch has the same columns in the same order.
+        """
+        wanted = set(record_types) if record_types else None
+        branches = []
+        for source, (source_table, produces, expressions) in _SOURCES.items():
+            if wanted is not None and not (produces & wanted):
+                continue  # the table cannot contribute, so it is not queried at all
+
+            columns = [cast(source_table.c.id, String).label("record_id")]
+            for field in fields:
+                if field == "source":
+                    columns.append(literal(source).label("source"))
+                elif field != "record_id":
+                    columns.append(expressions[field].label(field))
+
+            stmt = select(*columns).where(
+                source_table.c.patient_id == patient_pk,
+                or_(source_table.c.is_deleted.is_(None), source_table.c.is_deleted.is_(False))
+            )
+            if wanted is not None and not produces <= wanted:
+                stmt = stmt.where(expressions["record_type"].in_(sorted(wanted)))
+            branches.append(stmt)
+        return branches
+
+    @staticmethod
+    def _normalize_fields(fields: Iterable[str] | None) -> tuple[str, ...]:
+        if fields is None:
+            return RECORD_FIELDS
+        unknown = set(fields) - set(RECORD_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown history fields: {', '.join(sorted(unknown))}")
+        return tuple(field for field in RECORD_FIELDS if field in fields or field in KEY_FIELDS)
+
+    async def get_page(
+        self,
+        patient_pk: Any,
+        record_types: Iterable[str] | None = None,
+        fields: Iterable[str] | None = None,
+        cursor: str | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        newest_first: bool = True
+    ) -> dict[str, Any]:
+        """One page of the timeline and the cursor for the next one (None at the end)"""
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        fields = self._normalize_fields(fields)
+        branches = self._branches(patient_pk, record_types, fields)
+        if not branches:
+            return {"records": [], "next_cursor": None}
+
+        after = decode_cursor(cursor) if cursor else None
+        limit = page_size + 1
+        # Each branch is cut to the page with its own keyset predicate and
+        # LIMIT before the merge, so the database never sorts the full history
+        pages = [
+            select(*self._keyset(branch.subquery(), after, newest_first, limit).subquery().c)
+            for branch in branches
+        ]
+        timeline = (union_all(*pages) if len(pages) > 1 else pages[0]).subquery("timeline")
+        stmt = self._keyset(timeline, None, newest_first, limit)
+        result = await self.db.execute(stmt)
+        rows = [dict(row) for row in result.mappings().all()]
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(last["occurred_at"], last["record_type"], last["record_id"])
+        return {"records": rows, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _keyset(source: Any, after: tuple | None, newest_first: bool, limit: int):
+        """Ordered, limited SELECT over ``source`` starting after the cursor key"""
+        keys = (source.c.occurred_at, source.c.record_type, source.c.record_id)
+        stmt = select(*source.c).order_by(*(key.desc() if newest_first else key.asc() for key in keys))
+        if after is not None:
+            compare = (lambda a, b: a < b) if newest_first else (lambda a, b: a > b)
+            stmt = stmt.where(or_(
+                compare(keys[0], after[0]),
+                and_(keys[0] == after[0], compare(keys[1], after[1])),
+                and_(keys[0] == after[0], keys[1] == after[1], compare(keys[2], after[2]))
+            ))
+        return stmt.limit(limit)
+
+    async def iter_pages(self, patient_pk: Any, **kwargs: Any) -> AsyncIterator[list[dict[str, Any]]]:
+        """Walk the whole timeline page by page (exports, streaming responses)"""
+        cursor = kwargs.pop("cursor", None)
+        while True:
+            page = await self.get_page(patient_pk, cursor=cursor, **kwargs)
+            if page["records"]:
+                yield page["records"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    async def get_summary(self, patient_pk: Any, record_types: Iterable[str] | None = None) -> dict[str, Any]:
+        """Counts by type and date range from one aggregate query"""
+        branches = self._branches(patient_pk, record_types, KEY_FIELDS)
+        summary: dict[str, Any] = {
+            "total_records": 0,
+            "by_type": {},
+            "date_range": {"earliest": None, "latest": None}
+        }
+        if not branches:
+            return summary
+
+        timeline = union_all(*branches).subquery("timeline")
+        stmt = select(
+            timeline.c.record_type,
+            func.count().label("count"),
+            func.min(timeline.c.occurred_at).label("earliest"),
+            func.max(timeline.c.occurred_at).label("latest")
+        ).group_by(timeline.c.record_type)
+
+        result = await self.db.execute(stmt)
+        earliest = latest = None
+        for record_type, count, first, last in result.all():
+            summary["by_type"][record_type] = count
+            summary["total_records"] += count
+            if first is not None and (earliest is None or first < earliest):
+                earliest = first
+            if last is not None and (latest is None or last > latest):
+                latest = last
+        summary["date_range"] = {"earliest": _isoformat(earliest), "latest": _isoformat(latest)}
+        return summary
+
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
@@ -13,7 +13,7 @@ from app.repositories.base_repository import BaseRepository
 from app.core.constants import UserRole
 from app.core.exceptions import NotFoundError, DuplicateError
 from app.core.security import password_manager
-from app.utils.logging_config import get_security_logger
+from app.monitoring.logging_config import get_security_logger
 
 
 class UserRepository(BaseRepository[User]):
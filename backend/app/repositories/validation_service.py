@@ -15,10 +15,29 @@ from app.core.constants import (
     EXAM_VALIDATION_RULES, FILE_EXTENSIONS
 )
 from app.core.exceptions import ValidationError, InvalidInputError, InvalidFileTypeError
-from app.utils.logging_config import get_logger
+from app.core.identifiers import is_valid_cpf
+from app.monitoring.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Expressões compiladas uma única vez (também usadas pela validação em lote)
+EMAIL_RE = re.compile(VALIDATION_RULES["email"]["pattern"])
+PHONE_RE = re.compile(VALIDATION_RULES["phone"]["pattern"])
+PHONE_CLEAN_RE = re.compile(r'[^\d+]')
+NON_DIGITS_RE = re.compile(r'[^\d]')
+MANY_DIGITS_RE = re.compile(r'\d{3,}')
+ICD10_RE = re.compile(r'^[A-Z]\d{2,3}(\.\d{1,2})?$')
+
+BIRTH_DATE_MIN = date(1900, 1, 1)  # Idade máxima razoável
+
+PATIENT_REQUIRED_FIELDS = ("first_name", "last_name", "birth_date", "gender")
+
+# Campo -> (mínimo, máximo, mensagem de erro)
+PATIENT_MEASUREMENT_RANGES = {
+    "height": (0.3, 3.0, "Altura deve estar entre 30cm e 3m"),
+    "weight": (0.5, 500, "Peso deve estar entre 0.5kg e 500kg")
+}
+
 
 @dataclass
 class ValidationResult:
@@ -77,8 +96,7 @@ class ValidationService:
             return result
         
         # Validar formato
-        pattern = VALIDATION_RULES["email"]["pattern"]
-        if not re.match(pattern, email):
+        if not EMAIL_RE.match(email):
             result.add_error("Formato de email inválido", "email")
         
         # Validar comprimento
@@ -110,11 +128,10 @@ class ValidationService:
             return result  # Telefone é opcional em muitos casos
         
         # Limpar formatação
-        clean_phone = re.sub(r'[^\d+]', '', phone)
+        clean_phone = PHONE_CLEAN_RE.sub('', phone)
         
         # Validar formato
-        pattern = VALIDATION_RULES["phone"]["pattern"]
-        if not re.match(pattern, clean_phone):
+        if not PHONE_RE.match(clean_phone):
             result.add_error("Formato de telefone inválido", "phone")
         
         # Validar comprimento
@@ -167,7 +184,7 @@ class ValidationService:
                 break
         
         # Verificar padrões suspeitos
-        if re.search(r'\d{3,}', name):  # 3 ou mais números seguidos
+        if MANY_DIGITS_RE.search(name):  # 3 ou mais números seguidos
             result.add_warning(f"{field_name.title()} contém muitos números")
         
         return result
@@ -188,41 +205,16 @@ class ValidationService:
             return result  # CPF pode ser opcional
         
         # Limpar formatação
-        clean_cpf = re.sub(r'[^\d]', '', cpf)
+        clean_cpf = NON_DIGITS_RE.sub('', cpf)
         
         # Verificar comprimento
         if len(clean_cpf) != 11:
             result.add_error("CPF deve ter 11 dígitos", "cpf")
             return result
         
-        # Verificar sequências inválidas
-        invalid_sequences = [
-            "00000000000", "11111111111", "22222222222", "33333333333",
-            "44444444444", "55555555555", "66666666666", "77777777777",
-            "88888888888", "99999999999"
-        ]
-        
-        if clean_cpf in invalid_sequences:
+        # Sequências repetidas e dígitos verificadores
+        if not is_valid_cpf(clean_cpf):
             result.add_error("CPF inválido", "cpf")
-            return result
-        
-        # Validar dígitos verificadores
-        def calculate_digit(cpf_digits: str, weights: List[int]) -> int:
-            total = sum(int(digit) * weight for digit, weight in zip(cpf_digits, weights))
-            remainder = total % 11
-            return 0 if remainder < 2 else 11 - remainder
-        
-        # Primeiro dígito verificador
-        first_digit = calculate_digit(clean_cpf[:9], list(range(10, 1, -1)))
-        if int(clean_cpf[9]) != first_digit:
-            result.add_error("CPF inválido", "cpf")
-            return result
-        
-        # Segundo dígito verificador
-        second_digit = calculate_digit(clean_cpf[:10], list(range(11, 1, -1)))
-        if int(clean_cpf[10]) != second_digit:
-            result.add_error("CPF inválido", "cpf")
-            return result
         
         return result
     
@@ -300,9 +292,7 @@ class ValidationService:
             Resultado da validação
         """
         today = date.today()
-        min_date = date(1900, 1, 1)  # Idade máxima razoável
-        
-        result = self.validate_date(birth_date, "birth_date", min_date, today)
+        result = self.validate_date(birth_date, "birth_date", BIRTH_DATE_MIN, today)
         
         # Validações específicas de nascimento
         if result.is_valid and isinstance(birth_date, (date, datetime)):
@@ -335,8 +325,7 @@ class ValidationService:
         result = ValidationResult(True, [], [], {})
         
         # Campos obrigatórios
-        required_fields = ["first_name", "last_name", "birth_date", "gender"]
-        for field in required_fields:
+        for field in PATIENT_REQUIRED_FIELDS:
             if not patient_data.get(field):
                 result.add_error(f"Campo obrigatório: {field}", field)
         
@@ -371,15 +360,11 @@ class ValidationService:
             result.warnings.extend(birth_result.warnings)
         
         # Validar medidas físicas
-        if "height" in patient_data and patient_data["height"]:
-            height = float(patient_data["height"])
-            if height < 0.3 or height > 3.0:
-                result.add_error("Altura deve estar entre 30cm e 3m", "height")
-        
-        if "weight" in patient_data and patient_data["weight"]:
-            weight = float(patient_data["weight"])
-            if weight < 0.5 or weight > 500:
-                result.add_error("Peso deve estar entre 0.5kg e 500kg", "weight")
+        for field, (minimum, maximum, message) in PATIENT_MEASUREMENT_RANGES.items():
+            if field in patient_data and patient_data[field]:
+                value = float(patient_data[field])
+                if value < minimum or value > maximum:
+                    result.add_error(message, field)
         
         return result
     
@@ -496,8 +481,7 @@ class ValidationService:
             True se válido
         """
         # Formato básico: letra + 2-3 dígitos + opcional ponto + 1-2 dígitos
-        pattern = r'^[A-Z]\d{2,3}(\.\d{1,2})?$'
-        return bool(re.match(pattern, code.upper()))
+        return bool(ICD10_RE.match(code.upper()))
     
     # === VALIDAÇÕES DE ARQUIVO ===
     
@@ -648,63 +632,42 @@ class ValidationService:
     
     def validate_batch_data(
         self, 
-        data_list: List[Dict[str, Any]], 
-        validation_type: str
+        data_list: Any, 
+        validation_type: str,
+        fail_fast: bool = False,
+        max_errors: int = 1000,
+        include_valid: bool = False,
+        workers: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Valida lote de dados
         
+        Os registros são validados em blocos colunares (ver
+        ``app.repositories.batch_validation``); lotes grandes são distribuídos
+        entre processos.
+        
         Args:
-            data_list: Lista de dados para validar
+            data_list: Lista de dados (ou DataFrame) para validar
             validation_type: Tipo de validação (patient, exam, diagnostic)
+            fail_fast: Interrompe no primeiro registro inválido
+            max_errors: Limite de mensagens em summary_errors/summary_warnings
+                (error_counts mantém a contagem completa por mensagem)
+            include_valid: Se True, details traz uma entrada por registro
+                processado (cresce com o lote); por padrão traz até max_errors
+                registros inválidos
+            workers: Processos paralelos (None = automático, 0 = sem paralelismo)
             
         Returns:
             Resultado da validação em lote
         """
-        validation_methods = {
-            "patient": self.validate_patient_data,
-            "exam": self.validate_exam_data,
-            "diagnostic": self.validate_diagnostic_data
-        }
-        
-        if validation_type not in validation_methods:
-            raise ValueError(f"Tipo de validação não suportado: {validation_type}")
-        
-        validation_method = validation_methods[validation_type]
-        
-        results = {
-            "total": len(data_list),
-            "valid": 0,
-            "invalid": 0,
-            "details": [],
-            "summary_errors": [],
-            "summary_warnings": []
-        }
-        
-        for i, data_item in enumerate(data_list):
-            result = validation_method(data_item)
-            
-            item_result = {
-                "index": i,
-                "is_valid": result.is_valid,
-                "errors": result.errors,
-                "warnings": result.warnings,
-                "field_errors": result.field_errors
-            }
-            
-            results["details"].append(item_result)
-            
-            if result.is_valid:
-                results["valid"] += 1
-            else:
-                results["invalid"] += 1
-                results["summary_errors"].extend(result.errors)
-            
-            results["summary_warnings"].extend(result.warnings)
-        
-        # Estatísticas
-        results["success_rate"] = results["valid"] / results["total"] if results["total"] > 0 else 0
-        results["unique_errors"] = list(set(results["summary_errors"]))
-        results["unique_warnings"] = list(set(results["summary_warnings"]))
-        
-        return results
\ No newline at end of file
+        from app.repositories.batch_validation import BatchValidator
+        
+        validator = BatchValidator(
+            validation_type,
+            service=self,
+            fail_fast=fail_fast,
+            max_errors=max_errors,
+            include_valid=include_valid,
+            workers=workers
+        )
+        return validator.validate(data_list)
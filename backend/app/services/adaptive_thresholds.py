@@ -0,0 +1,686 @@
+"""
+Adaptive Thresholds Manager
+Provides dynamic threshold management for ECG parameters
+
+Thresholds are kept in a (parameters x 4) NumPy array; contextual rules and
+population adjustments are compiled once into additive and multiplicative
+arrays, and the adjusted table for each context signature is cached.
+Learning is incremental (online statistics per parameter and stratum) and
+every change is appended to a history store that also keeps snapshots.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from enum import Enum
+from typing import Any
+
+import numpy as np
+
+from app.services.threshold_store import OnlineStats, ThresholdHistoryStore
+
+class ThresholdType(Enum):
+    HEART_RATE = "heart_rate"
+    PR_INTERVAL = "pr_interval"
+    QRS_DURATION = "qrs_duration"
+    QT_INTERVAL = "qt_interval"
+    ST_ELEVATION = "st_elevation"
+
+THRESHOLD_FIELDS = ("lower", "upper", "critical_lower", "critical_upper")
+LOWER, UPPER, CRITICAL_LOWER, CRITICAL_UPPER = range(len(THRESHOLD_FIELDS))
+DEFAULT_CRITICAL_MARGIN = 100.0
+CONTEXT_CACHE_SIZE = 1024
+GENERAL_STRATUM = "general"
+DEFAULT_SNAPSHOT_EVERY = 100
+
+def _confidence(value: float, lower: float, upper: float,
+                critical_lower: float, critical_upper: float) -> float:
+    """Confidence that a single value is normal (NaN criticals fall back to +/-100)"""
+    if lower <= value <= upper:
+        center = (lower + upper) / 2
+        range_size = upper - lower
+        distance_from_center = abs(value - center)
+        confidence = 1.0 - (distance_from_center / (range_size / 2))
+        return max(0.5, confidence)  # Minimum 50% confidence for normal values
+
+    if value < lower:
+        distance = lower - value
+        if critical_lower != critical_lower:
+            critical_lower = lower - DEFAULT_CRITICAL_MARGIN
+        max_distance = lower - critical_lower
+    else:
+        distance = value - upper
+        if critical_upper != critical_upper:
+            critical_upper = upper + DEFAULT_CRITICAL_MARGIN
+        max_distance = critical_upper - upper
+
+    if max_distance <= 0:
+        return 0.0  # contextual adjustment moved the normal limit onto the critical one
+    confidence = max(0.0, 1.0 - (distance / max_distance))
+    return confidence * 0.5  # Scale down confidence for abnormal values
+
+def _confidence_matrix(values: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """Vectorized ``_confidence`` over values (...) and bounds (..., 4)"""
+    lower = bounds[..., LOWER]
+    upper = bounds[..., UPPER]
+    critical_lower = np.where(np.isnan(bounds[..., CRITICAL_LOWER]),
+                              lower - DEFAULT_CRITICAL_MARGIN, bounds[..., CRITICAL_LOWER])
+    critical_upper = np.where(np.isnan(bounds[..., CRITICAL_UPPER]),
+                              upper + DEFAULT_CRITICAL_MARGIN, bounds[..., CRITICAL_UPPER])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        half_range = (upper - lower) / 2
+        inside = np.maximum(0.5, 1.0 - np.abs(values - (lower + upper) / 2) / half_range)
+        below = np.maximum(0.0, 1.0 - (lower - values) / np.maximum(lower - critical_lower, 0.0)) * 0.5
+        above = np.maximum(0.0, 1.0 - (values - upper) / np.maximum(critical_upper - upper, 0.0)) * 0.5
+
+    confidence = np.where(values < lower, below, np.where(values > upper, above, inside))
+    return np.where(np.isnan(values), np.nan, confidence)
+
+def _iter_chunks(data: Any) -> Iterator[Any]:
+    """Yield an array as a single chunk, or each chunk of an iterable of arrays"""
+    if isinstance(data, np.ndarray) or np.isscalar(data):
+        yield data
+    elif isinstance(data, (list, tuple)) and (not data or np.isscalar(data[0])):
+        yield data
+    else:
+        yield from data
+
+def _as_list(value: Any) -> list:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+class AdaptiveThresholdManager:
+    """Manages adaptive thresholds for ECG parameters"""
+
+    def __init__(self, history_store: ThresholdHistoryStore | None = None,
+                 snapshot_every: int = DEFAULT_SNAPSHOT_EVERY):
+        self.learning_rate = 0.01
+        self.confidence_threshold = 0.8
+        self.population_adjustments = self._load_population_adjustments()
+        self.contextual_rules = self._load_contextual_rules()
+        if history_store is None:
+            from app.core.config import settings
+            history_store = ThresholdHistoryStore(settings.ADAPTIVE_THRESHOLDS_DB)
+        self.history_store = history_store
+        self.snapshot_every = snapshot_every
+        self._updates_since_snapshot = 0
+        self._stats: dict[tuple[str, str], OnlineStats] = {}
+        # adjusted tables per context signature, shared by concurrent requests
+        self._context_cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.thresholds = self._initialize_default_thresholds()
+
+        snapshot = self.history_store.latest_snapshot()
+        if snapshot:
+            self._restore_snapshot(snapshot)
+        self._replay_history(snapshot.get("history_id", 0) if snapshot else 0)
+
+    def _initialize_default_thresholds(self) -> dict[str, dict[str, float]]:
+        """Initialize default threshold values"""
+        return {
+            "heart_rate": {
+                "lower": 60.0,
+                "upper": 100.0,
+                "critical_lower": 40.0,
+                "critical_upper": 150.0,
+            },
+            "pr_interval": {
+                "lower": 120.0,
+                "upper": 200.0,
+                "critical_lower": 80.0,
+                "critical_upper": 300.0,
+            },
+            "qrs_duration": {
+                "lower": 80.0,
+                "upper": 120.0,
+                "critical_lower": 60.0,
+                "critical_upper": 180.0,
+            },
+            "qt_interval": {
+                "lower": 350.0,
+                "upper": 450.0,
+                "critical_lower": 300.0,
+                "critical_upper": 500.0,
+            },
+            "st_elevation": {
+                "lower": -0.5,
+                "upper": 0.5,
+                "critical_lower": -2.0,
+                "critical_upper": 2.0,
+            },
+        }
+
+    def _load_population_adjustments(self) -> dict[str, dict[str, float]]:
+        """Load population-specific threshold adjustments"""
+        return {
+            "pediatric": {
+                "heart_rate_multiplier": 1.5,
+                "pr_interval_multiplier": 0.8,
+                "qrs_duration_multiplier": 0.9,
+            },
+            "geriatric": {
+                "heart_rate_multiplier": 0.9,
+                "pr_interval_multiplier": 1.1,
+                "qrs_duration_multiplier": 1.1,
+            },
+            "athlete": {
+                "heart_rate_multiplier": 0.7,
+                "pr_interval_multiplier": 1.0,
+                "qrs_duration_multiplier": 1.0,
+            },
+        }
+
+    def _load_contextual_rules(self) -> dict[str, dict[str, Any]]:
+        """Load contextual adjustment rules"""
+        return {
+            "medications": {
+                "beta_blockers": {"heart_rate": {"upper_adjustment": -20}},
+                "amiodarone": {"qt_interval": {"upper_adjustment": 50}},
+                "digoxin": {"pr_interval": {"upper_adjustment": 20}},
+            },
+            "conditions": {
+                "hypertension": {"heart_rate": {"upper_adjustment": 10}},
+                "diabetes": {"qt_interval": {"upper_adjustment": 20}},
+            },
+        }
+
+    # === ARRAY STORAGE ===
+
+    @property
+    def thresholds(self) -> dict[str, dict[str, float]]:
+        """
+        Threshold table as a dict
+
+        Returns a copy built from the array storage, so editing it changes
+        nothing. Assign a full table (or call ``import_thresholds``) to
+        replace the thresholds; the learning methods update them in place.
+        """
+        return self._bounds_to_dict(self._bounds)
+
+    @thresholds.setter
+    def thresholds(self, table: dict[str, dict[str, float]]) -> None:
+        self.parameters: tuple[str, ...] = tuple(table)
+        self._index = {parameter: i for i, parameter in enumerate(self.parameters)}
+        bounds = np.full((len(self.parameters), len(THRESHOLD_FIELDS)), np.nan)
+        for i, parameter in enumerate(self.parameters):
+            for j, field in enumerate(THRESHOLD_FIELDS):
+                if field in table[parameter]:
+                    bounds[i, j] = float(table[parameter][field])
+        self._bounds = bounds
+        # learned tables per population stratum (replace base x multiplier once trained)
+        self._stratum_bounds: dict[str, np.ndarray] = {}
+        self.compile_adjustments()
+
+    def _dict_to_bounds(self, table: dict[str, dict[str, float]]) -> np.ndarray:
+        bounds = self._bounds.copy()
+        for parameter, values in table.items():
+            if parameter in self._index:
+                for j, field in enumerate(THRESHOLD_FIELDS):
+                    if field in values:
+                        bounds[self._index[parameter], j] = float(values[field])
+        return bounds
+
+    def _bounds_to_dict(self, bounds: np.ndarray) -> dict[str, dict[str, float]]:
+        rows = bounds.tolist()
+        return {
+            parameter: {
+                field: value for field, value in zip(THRESHOLD_FIELDS, rows[i]) if value == value
+            }
+            for i, parameter in enumerate(self.parameters)
+        }
+
+    def _thresholds_changed(self) -> None:
+        """Invalidate adjusted tables after any change to the base thresholds"""
+        with self._cache_lock:
+            self._context_cache.clear()
+
+    def compile_adjustments(self) -> None:
+        """
+        Compile contextual rules and population adjustments into arrays
+
+        Call again after changing ``contextual_rules`` or ``population_adjustments``.
+        """
+        self._rule_offsets: dict[tuple[str, str], np.ndarray] = {}
+        for kind in ("medications", "conditions"):
+            for name, rules in self.contextual_rules.get(kind, {}).items():
+                offset = np.zeros_like(self._bounds)
+                for parameter, adjustments in rules.items():
+                    if parameter not in self._index:
+                        continue
+                    row = self._index[parameter]
+                    offset[row, UPPER] += adjustments.get("upper_adjustment", 0.0)
+                    offset[row, LOWER] += adjustments.get("lower_adjustment", 0.0)
+                self._rule_offsets[(kind, name)] = offset
+
+        self._population_scales: dict[str, np.ndarray] = {}
+        for population, adjustments in self.population_adjustments.items():
+            scale = np.ones_like(self._bounds)
+            for parameter, row in self._index.items():
+                multiplier = adjustments.get(f"{parameter}_multiplier")
+                if multiplier is not None:
+                    scale[row, [LOWER, UPPER]] = multiplier
+            self._population_scales[population] = scale
+
+        self._thresholds_changed()
+
+    def context_signature(self, context: dict[str, Any] | None) -> tuple:
+        """
+        Hashable signature of the parts of a context that change thresholds
+
+        Unknown medications, conditions and populations are dropped, so the
+        number of distinct signatures stays bounded by the rule set.
+        """
+        if not context:
+            return ((), (), None)
+        medications = tuple(sorted({
+            m for m in _as_list(context.get("medications")) if ("medications", m) in self._rule_offsets
+        }))
+        conditions = tuple(sorted({
+            c for c in _as_list(context.get("conditions")) if ("conditions", c) in self._rule_offsets
+        }))
+        population = context.get("population")
+        if population not in self._population_scales:
+            population = None
+        return medications, conditions, population
+
+    def _bounds_for(self, signature: tuple) -> tuple[np.ndarray, list[list[float]]]:
+        """Adjusted (parameters x 4) table for a signature, as an array and as lists"""
+        with self._cache_lock:
+            cached = self._context_cache.get(signature)
+            if cached is not None:
+                self._context_cache.move_to_end(signature)
+                return cached
+
+        medications, conditions, population = signature
+        if population in self._stratum_bounds:
+            bounds = self._stratum_bounds[population].copy()
+        else:
+            bounds = self._bounds.copy()
+            if population is not None:
+                bounds *= self._population_scales[population]
+        for medication in medications:
+            bounds += self._rule_offsets[("medications", medication)]
+        for condition in conditions:
+            bounds += self._rule_offsets[("conditions", condition)]
+        bounds.setflags(write=False)
+
+        cached = (bounds, bounds.tolist())
+        with self._cache_lock:
+            self._context_cache[signature] = cached
+            if len(self._context_cache) > CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+        return cached
+
+    def _population_for(self, patient_demographics: dict[str, Any]) -> str | None:
+        age = patient_demographics.get("age", 50)
+        population = None
+
+        if age < 18:
+            population = "pediatric"
+        elif age > 65:
+            population = "geriatric"
+
+        activity_level = patient_demographics.get("activity_level", "normal")
+        if activity_level == "high":
+            population = "athlete"
+
+        return population if population in self._population_scales else None
+
+    # === THRESHOLDS ===
+
+    def get_current_thresholds(self) -> dict[str, dict[str, float]]:
+        """Get current threshold values"""
+        return self.thresholds
+
+    def update_thresholds(self, historical_data: dict[str, Any],
+                          stratum: str = GENERAL_STRATUM) -> None:
+        """
+        Update thresholds based on historical data
+
+        Each value may be an array or an iterable of array chunks (e.g. read
+        from a database cursor), so retraining over years of vitals never holds
+        them in memory. The normal range moves towards mean +/- 2 std of the
+        data by ``learning_rate``; the data also feeds the running statistics
+        of the parameter and stratum. Strata other than "general" train their
+        own table, used for that population instead of the multipliers.
+        """
+        records = []
+        now = time.time()
+        for parameter, data in historical_data.items():
+            if parameter not in self._index:
+                continue
+
+            batch = OnlineStats()
+            running = self._statistics(parameter, stratum)
+            for chunk in _iter_chunks(data):
+                batch.update(chunk)
+                running.update(chunk)
+            if batch.count == 0:
+                continue
+
+            row = self._stratum_table(stratum)[self._index[parameter]]
+            row[LOWER] = (1 - self.learning_rate) * row[LOWER] + self.learning_rate * (batch.mean - 2 * batch.std)
+            row[UPPER] = (1 - self.learning_rate) * row[UPPER] + self.learning_rate * (batch.mean + 2 * batch.std)
+            records.append((now, parameter, stratum, float(row[LOWER]), float(row[UPPER]), batch.count, "historical"))
+
+        if records:
+            self._thresholds_changed()
+            self._record(records)
+
+    def _statistics(self, parameter: str, stratum: str) -> OnlineStats:
+        key = (parameter, stratum)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = OnlineStats()
+        return stats
+
+    def _stratum_table(self, stratum: str) -> np.ndarray:
+        """Writable table for a stratum, seeded from base x multiplier on first use"""
+        if stratum == GENERAL_STRATUM:
+            return self._bounds
+        table = self._stratum_bounds.get(stratum)
+        if table is None:
+            table = self._bounds.copy()
+            if stratum in self._population_scales:
+                table *= self._population_scales[stratum]
+            self._stratum_bounds[stratum] = table
+        return table
+
+    def get_learned_statistics(self, parameter: str, stratum: str = GENERAL_STRATUM) -> dict[str, float]:
+        """Running statistics of everything learned for a parameter and stratum"""
+        stats = self._stats.get((parameter, stratum), OnlineStats())
+        return {
+            "count": stats.count,
+            "mean": stats.mean,
+            "std": stats.std,
+            "ewma_mean": stats.ewma_mean,
+            "ewma_std": stats.ewma_std,
+        }
+
+    # === HISTORY AND SNAPSHOTS ===
+
+    def _record(self, records: list[tuple]) -> None:
+        """Append threshold changes to the history; snapshot every ``snapshot_every`` changes"""
+        self.history_store.append(records)
+        self._updates_since_snapshot += 1
+        if self._updates_since_snapshot >= self.snapshot_every:
+            self.save_snapshot()
+
+    def save_snapshot(self) -> None:
+        """Persist the complete learner state so the next start does not replay history"""
+        self.history_store.save_snapshot({
+            "version": 1,
+            "learning_rate": self.learning_rate,
+            "thresholds": self.thresholds,
+            "strata": {name: self._bounds_to_dict(table) for name, table in self._stratum_bounds.items()},
+            "statistics": [
+                {"parameter": parameter, "stratum": stratum, **stats.to_dict()}
+                for (parameter, stratum), stats in self._stats.items()
+            ],
+        })
+        self._updates_since_snapshot = 0
+
+    def _restore_snapshot(self, snapshot: dict[str, Any]) -> None:
+        self.learning_rate = snapshot.get("learning_rate", self.learning_rate)
+        self.thresholds = snapshot["thresholds"]
+        self._stratum_bounds = {
+            name: self._dict_to_bounds(table) for name, table in snapshot.get("strata", {}).items()
+        }
+        self._stats = {}
+        for entry in snapshot.get("statistics", []):
+            entry = dict(entry)
+            key = (entry.pop("parameter"), entry.pop("stratum"))
+            self._stats[key] = OnlineStats.from_dict(entry)
+        self._thresholds_changed()
+
+    def _replay_history(self, history_id: int) -> None:
+        """
+        Apply the threshold changes recorded after the snapshot
+
+        History rows hold the thresholds after each change, so replaying them
+        in order restores the tables exactly. Running statistics are only in
+        the snapshot and may lag by up to ``snapshot_every`` updates.
+        """
+        rows = self.history_store.history_since(history_id)
+        for parameter, stratum, lower, upper in rows:
+            if parameter not in self._index:
+                continue
+            row = self._stratum_table(stratum)[self._index[parameter]]
+            if lower is not None:
+                row[LOWER] = lower
+            if upper is not None:
+                row[UPPER] = upper
+        if rows:
+            self._thresholds_changed()
+            # the next snapshot (at the latest on shutdown) compacts the replayed rows
+            self._updates_since_snapshot = len(rows)
+
+    def get_adjusted_thresholds(
+        self, patient_demographics: dict[str, Any]
+    ) -> dict[str, dict[str, float]]:
+        """Get thresholds adjusted for patient demographics"""
+        population = self._population_for(patient_demographics)
+        bounds, _ = self._bounds_for(((), (), population))
+        return self._bounds_to_dict(bounds)
+
+    def learn_from_feedback(self, feedback: dict[str, Any]) -> None:
+        """Learn from clinician feedback"""
+        parameter = feedback.get("parameter")
+        value = feedback.get("value")
+        clinical_judgment = feedback.get("clinical_judgment")  # 'normal', 'abnormal'
+        patient_context = feedback.get("patient_context", {})
+
+        if parameter not in self._index:
+            return
+
+        if clinical_judgment == "normal":
+            self._widen_towards(parameter, value, source="feedback")
+
+        self._update_contextual_rules(
+            parameter, value, clinical_judgment, patient_context
+        )
+
+    def _widen_towards(self, parameter: str, value: float, source: str) -> None:
+        """Move the normal range towards a value observed outside it"""
+        row = self._bounds[self._index[parameter]]
+        if value < row[LOWER]:
+            row[LOWER] = (1 - self.learning_rate) * row[LOWER] + self.learning_rate * value
+        elif value > row[UPPER]:
+            row[UPPER] = (1 - self.learning_rate) * row[UPPER] + self.learning_rate * value
+        else:
+            return
+        self._thresholds_changed()
+        self._record([(time.time(), parameter, GENERAL_STRATUM, float(row[LOWER]), float(row[UPPER]), 1, source)])
+
+    def _update_contextual_rules(
+        self, parameter: str, value: float, judgment: str, context: dict[str, Any]
+    ) -> None:
+        """Update contextual adjustment rules"""
+        pass
+
+    def get_contextual_thresholds(
+        self, context: dict[str, Any]
+    ) -> dict[str, dict[str, float]]:
+        """Get thresholds adjusted for specific context"""
+        bounds, _ = self._bounds_for(self.context_signature(context))
+        return self._bounds_to_dict(bounds)
+
+    def detect_anomalies(
+        self, measurements: dict[str, float], context: dict[str, Any] = None
+    ) -> list[str]:
+        """Detect anomalies based on current thresholds"""
+        _, rows = self._bounds_for(self.context_signature(context))
+        index = self._index
+
+        anomalies = []
+        for parameter, value in measurements.items():
+            i = index.get(parameter)
+            if i is not None and (value < rows[i][LOWER] or value > rows[i][UPPER]):
+                anomalies.append(parameter)
+
+        return anomalies
+
+    def calculate_confidence(
+        self, parameter: str, value: float, context: dict[str, Any] = None
+    ) -> float:
+        """Calculate confidence that a value is normal"""
+        i = self._index.get(parameter)
+        if i is None:
+            return 0.5  # Neutral confidence
+
+        _, rows = self._bounds_for(self.context_signature(context))
+        return _confidence(value, *rows[i])
+
+    def score_matrix(
+        self,
+        values: np.ndarray,
+        parameters: Sequence[str] | None = None,
+        contexts: dict[str, Any] | Sequence[dict[str, Any] | None] | None = None
+    ) -> dict[str, Any]:
+        """
+        Score a patients x measurements matrix in one call
+
+        Args:
+            values: Array (patients x parameters); NaN marks a missing measurement
+            parameters: Column names (defaults to all known parameters, in order)
+            contexts: One context for every row, or one context per row
+
+        Returns:
+            Dictionary with ``parameters``, ``anomalies`` (bool matrix) and
+            ``confidence`` (matrix; NaN where the value is missing)
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        parameters = tuple(parameters) if parameters is not None else self.parameters
+        unknown = [p for p in parameters if p not in self._index]
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(unknown)}")
+        if values.shape[1] != len(parameters):
+            raise ValueError(f"Expected {len(parameters)} columns, got {values.shape[1]}")
+        columns = [self._index[p] for p in parameters]
+
+        if contexts is None or isinstance(contexts, dict):
+            bounds = self._bounds_for(self.context_signature(contexts))[0][columns]
+        else:
+            if len(contexts) != values.shape[0]:
+                raise ValueError(f"Expected {values.shape[0]} contexts, got {len(contexts)}")
+            signature_ids: dict[tuple, int] = {}
+            rows = np.fromiter(
+                (signature_ids.setdefault(self.context_signature(c), len(signature_ids)) for c in contexts),
+                dtype=np.intp, count=len(contexts)
+            )
+            tables = np.stack([self._bounds_for(signature)[0] for signature in signature_ids])
+            bounds = tables[:, columns][rows]
+
+        with np.errstate(invalid="ignore"):
+            anomalies = (values < bounds[..., LOWER]) | (values > bounds[..., UPPER])
+
+        return {
+            "parameters": list(parameters),
+            "anomalies": anomalies,
+            "confidence": _confidence_matrix(values, bounds)
+        }
+
+    def export_thresholds(self) -> dict[str, Any]:
+        """Export current thresholds for persistence"""
+        return {
+            "thresholds": self.thresholds,
+            "learning_rate": self.learning_rate,
+            "timestamp": datetime.now().isoformat(),
+            "version": "1.0",
+        }
+
+    def import_thresholds(self, threshold_data: dict[str, Any]) -> None:
+        """Import thresholds from saved data"""
+        if "thresholds" in threshold_data:
+            self.thresholds = threshold_data["thresholds"]
+        if "learning_rate" in threshold_data:
+            self.learning_rate = threshold_data["learning_rate"]
+
+    def get_threshold_history(
+        self, parameter: str, days: int = 30, stratum: str = GENERAL_STRATUM
+    ) -> list[dict[str, Any]]:
+        """Get recorded threshold changes for a parameter over the last ``days``, newest first"""
+        entries = self.history_store.query(parameter, time.time() - days * 86400, stratum=stratum)
+        return [
+            {
+                "date": datetime.fromtimestamp(entry["timestamp"]).isoformat(),
+                "lower": entry["lower"],
+                "upper": entry["upper"],
+                "samples": entry["samples"],
+                "source": entry["source"],
+            }
+            for entry in entries
+        ]
+
+    def validate_thresholds(self) -> dict[str, list[str]]:
+        """Validate current thresholds for consistency"""
+        issues = {}
+
+        for parameter, thresholds in self.thresholds.items():
+            param_issues = []
+
+            if thresholds["lower"] >= thresholds["upper"]:
+                param_issues.append("Lower threshold >= upper threshold")
+
+            if "critical_lower" in thresholds and "critical_upper" in thresholds:
+                if thresholds["critical_lower"] >= thresholds["lower"]:
+                    param_issues.append("Critical lower >= normal lower")
+                if thresholds["critical_upper"] <= thresholds["upper"]:
+                    param_issues.append("Critical upper <= normal upper")
+
+            if param_issues:
+                issues[parameter] = param_issues
+
+        return issues
+
+    def get_threshold(self, threshold_type: ThresholdType, age: int = None, gender: str = None) -> dict:
+        """Get threshold for specific type with demographic adjustments"""
+        param_name = threshold_type.value
+
+        if param_name not in self._index:
+            return {"lower": 0.0, "upper": 100.0}
+
+        if age is not None:
+            demographics = {"age": age}
+            if gender:
+                demographics["gender"] = gender
+            return self.get_adjusted_thresholds(demographics)[param_name]
+
+        return self.thresholds[param_name]
+
+    def update_threshold(self, threshold_type: ThresholdType, age: int, gender: str, value: float) -> None:
+        """Update threshold based on new data point"""
+        param_name = threshold_type.value
+
+        if param_name in self._index:
+            self._widen_towards(param_name, value, source="observation")
+
+_manager: AdaptiveThresholdManager | None = None
+_manager_lock = threading.Lock()
+
+def get_adaptive_threshold_manager() -> AdaptiveThresholdManager:
+    """Process-wide manager backed by the configured history database"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = AdaptiveThresholdManager()
+    return _manager
+
+
+def close_adaptive_threshold_manager() -> None:
+    """Snapshot pending changes and close the history database (application shutdown)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            return
+        if _manager._updates_since_snapshot:
+            _manager.save_snapshot()
+        _manager.history_store.close()
+        _manager = None
@@ -17,6 +17,7 @@ from app.models.exam import Exam
 from app.models.diagnostic import Diagnostic
 from app.models.patient import Patient
 from app.repositories.base_repository import BaseRepository
+from app.monitoring.metrics import pipeline_stage
 from app.services.ml_model_service import MLModelService
 from app.services.validation_service import ValidationService
 from app.core.constants import (
@@ -27,7 +28,7 @@ from app.core.exceptions import (
     AIError, ModelNotFoundError, InferenceError, InsufficientDataError,
     LowConfidenceError, ValidationError
 )
-from app.utils.logging_config import get_ai_logger, log_ai_operation
+from app.monitoring.logging_config import get_ai_logger, log_ai_operation
 from app.core.config import ML_CONFIG
 
 logger = get_ai_logger()
@@ -755,7 +756,8 @@ class AIDiagnosticService:
             diagnostic.start_ai_analysis("multi_model", "ensemble")
             self.db.add(diagnostic)
         
-        self.db.commit()
+        with pipeline_stage("db_write", "diagnostic"):
+            self.db.commit()
         return diagnostic
     
     def _get_existing_diagnostic(self, exam_id: uuid.UUID) -> Optional[Diagnostic]:
@@ -786,7 +788,8 @@ class AIDiagnosticService:
         diagnostic.quality_score = results.quality_score
         
         self.db.add(diagnostic)
-        self.db.commit()
+        with pipeline_stage("db_write", "diagnostic"):
+            self.db.commit()
     
     def _determine_category(self, diagnosis: str) -> str:
         """Determina categoria do diagnóstico"""
@@ -0,0 +1,330 @@
+"""
+Varreduras de lembretes e confirmações de consultas do MedAI
+Percorre as consultas devidas em lotes ordenados por chave (keyset), reserva
+cada lote com um lease no banco para que vários workers dividam a varredura
+sem envios duplicados e marca o lote inteiro com um único UPDATE
+"""
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.constants import AppointmentStatus, NotificationPriority, NotificationType
+from app.models.appointment import Appointment
+from app.models.notification import Notification
+from app.models.patient import Patient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_SWEEP_INTERVAL_SECONDS = 60.0
+REMINDER_WINDOW = timedelta(hours=24)
+
+
+@dataclass(frozen=True)
+class AppointmentRecipient:
+    """Dados mínimos de uma consulta para notificação (sem carregar o objeto ORM)"""
+    appointment_id: uuid.UUID
+    appointment_code: str
+    patient_id: uuid.UUID
+    patient_user_id: Optional[uuid.UUID]
+    physician_id: uuid.UUID
+    title: str
+    scheduled_datetime: datetime
+    location_type: Optional[str]
+    room_number: Optional[str]
+    building: Optional[str]
+    virtual_meeting_url: Optional[str]
+
+
+@dataclass(frozen=True)
+class SweepDefinition:
+    """Critério de seleção e marcação de uma varredura"""
+    name: str
+    due: Callable[[datetime], List[Any]]
+    mark: Callable[[datetime], Dict[str, Any]]
+
+
+def _reminder_due(now: datetime) -> List[Any]:
+    return [
+        Appointment.appointment_status == AppointmentStatus.SCHEDULED.value,
+        Appointment.reminder_sent.is_(False),
+        Appointment.scheduled_datetime <= now + REMINDER_WINDOW,
+        Appointment.scheduled_datetime > now,
+        Appointment.is_deleted.is_(False)
+    ]
+
+
+def _confirmation_due(now: datetime) -> List[Any]:
+    return [
+        Appointment.appointment_status == AppointmentStatus.SCHEDULED.value,
+        Appointment.confirmation_required.is_(True),
+        Appointment.confirmed_at.is_(None),
+        Appointment.confirmation_requested_at.is_(None),
+        Appointment.scheduled_datetime > now,
+        Appointment.is_deleted.is_(False)
+    ]
+
+
+REMINDER_SWEEP = SweepDefinition(
+    name="reminder",
+    due=_reminder_due,
+    mark=lambda now: {"reminder_sent": True, "reminder_sent_at": now}
+)
+
+CONFIRMATION_SWEEP = SweepDefinition(
+    name="confirmation",
+    due=_confirmation_due,
+    mark=lambda now: {"confirmation_requested_at": now}
+)
+
+_RECIPIENT_COLUMNS = (
+    Appointment.id,
+    Appointment.appointment_code,
+    Appointment.patient_id,
+    Patient.user_id,
+    Appointment.physician_id,
+    Appointment.title,
+    Appointment.scheduled_datetime,
+    Appointment.location_type,
+    Appointment.room_number,
+    Appointment.building,
+    Appointment.virtual_meeting_url
+)
+
+
+def create_appointment_notifications(db: Session, sweep: str,
+                                     recipients: Sequence[AppointmentRecipient]) -> int:
+    """
+    Cria as notificações de um lote na mesma transação que marca as consultas
+
+    As notificações ficam pendentes de envio (``sent_at`` nulo) e são entregues
+    pelo fluxo normal de notificações. Pacientes sem usuário vinculado não
+    recebem notificação no sistema.
+
+    Returns:
+        Quantidade de notificações criadas
+    """
+    is_confirmation = sweep == CONFIRMATION_SWEEP.name
+    notifications = []
+    for recipient in recipients:
+        if recipient.patient_user_id is None:
+            continue
+
+        when = recipient.scheduled_datetime.strftime("%d/%m/%Y %H:%M")
+        if is_confirmation:
+            title = "Confirme sua consulta"
+            message = f"Confirme sua consulta '{recipient.title}' agendada para {when}."
+        else:
+            title = "Lembrete de Consulta"
+            message = f"Sua consulta '{recipient.title}' está agendada para {when}."
+
+        notifications.append(Notification(
+            user_id=recipient.patient_user_id,
+            patient_id=recipient.patient_id,
+            appointment_id=recipient.appointment_id,
+            title=title,
+            message=message,
+            notification_type=NotificationType.APPOINTMENT_REMINDER.value,
+            category=sweep,
+            priority=NotificationPriority.NORMAL.value,
+            channels=["email", "sms"],
+            action_required=is_confirmation,
+            expires_at=recipient.scheduled_datetime
+        ))
+
+    db.add_all(notifications)
+    return len(notifications)
+
+
+class AppointmentSweeper:
+    """
+    Executa as varreduras em lotes
+
+    Cada lote é processado em três passos:
+    1. seleção keyset (scheduled_datetime, id) apenas de colunas, sem objetos ORM;
+    2. reserva com lease (UPDATE condicionado a lease livre ou expirado), de modo
+       que outro worker que selecionou as mesmas linhas não as receba;
+    3. entrega ao notificador e marcação do lote com um UPDATE, na mesma
+       transação. Se o worker cair, o lease expira e o lote volta a ficar devido.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session],
+                 notifier: Callable[[Session, str, Sequence[AppointmentRecipient]], int] = create_appointment_notifications,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                 worker_id: Optional[str] = None):
+        self.session_factory = session_factory
+        self.notifier = notifier
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def sweep(self, definition: SweepDefinition, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Percorre todas as consultas devidas de uma varredura"""
+        now = now or datetime.utcnow()
+        stats = {"batches": 0, "claimed": 0, "notified": 0}
+        cursor = None
+
+        while True:
+            db = self.session_factory()
+            try:
+                candidates = self._select_batch(db, definition, now, cursor)
+                if not candidates:
+                    break
+                cursor = (candidates[-1].scheduled_datetime, candidates[-1].id)
+
+                claimed = self._claim(db, definition, now, [row.id for row in candidates])
+                if claimed:
+                    stats["notified"] += self._deliver(db, definition, now, claimed)
+                    stats["claimed"] += len(claimed)
+                stats["batches"] += 1
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            if len(candidates) < self.batch_size:
+                break
+
+        logger.info(
+            f"Varredura de {definition.name}: {stats['claimed']} consultas em {stats['batches']} lotes, "
+            f"{stats['notified']} notificações (worker {self.worker_id})"
+        )
+        return stats
+
+    def sweep_reminders(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        return self.sweep(REMINDER_SWEEP, now)
+
+    def sweep_pending_confirmations(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        return self.sweep(CONFIRMATION_SWEEP, now)
+
+    def _lease_free(self, now: datetime) -> Any:
+        return or_(
+            Appointment.sweep_lease_until.is_(None),
+            Appointment.sweep_lease_until < now
+        )
+
+    def _select_batch(self, db: Session, definition: SweepDefinition, now: datetime,
+                      cursor: Optional[tuple]) -> List[Any]:
+        query = db.query(Appointment.id, Appointment.scheduled_datetime).filter(
+            *definition.due(now), self._lease_free(now)
+        )
+        if cursor is not None:
+            last_datetime, last_id = cursor
+            query = query.filter(or_(
+                Appointment.scheduled_datetime > last_datetime,
+                and_(Appointment.scheduled_datetime == last_datetime, Appointment.id > last_id)
+            ))
+        return query.order_by(
+            Appointment.scheduled_datetime.asc(), Appointment.id.asc()
+        ).limit(self.batch_size).all()
+
+    def _claim(self, db: Session, definition: SweepDefinition, now: datetime,
+               ids: List[uuid.UUID]) -> List[AppointmentRecipient]:
+        """Reserva o lote; retorna apenas as consultas cujo lease este worker obteve"""
+        db.execute(
+            update(Appointment)
+            .where(Appointment.id.in_(ids), *definition.due(now), self._lease_free(now))
+            .values(sweep_lease_owner=self.worker_id, sweep_lease_until=now + self.lease)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        rows = db.query(*_RECIPIENT_COLUMNS).outerjoin(
+            Patient, Patient.id == Appointment.patient_id
+        ).filter(
+            Appointment.id.in_(ids),
+            Appointment.sweep_lease_owner == self.worker_id
+        ).order_by(Appointment.scheduled_datetime.asc(), Appointment.id.asc()).all()
+
+        return [AppointmentRecipient(*row) for row in rows]
+
+    def _deliver(self, db: Session, definition: SweepDefinition, now: datetime,
+                 recipients: List[AppointmentRecipient]) -> int:
+        """Entrega o lote ao notificador e marca as consultas com um único UPDATE"""
+        notified = self.notifier(db, definition.name, recipients)
+        db.execute(
+            update(Appointment)
+            .where(
+                Appointment.id.in_([r.appointment_id for r in recipients]),
+                Appointment.sweep_lease_owner == self.worker_id
+            )
+            .values(sweep_lease_owner=None, sweep_lease_until=None, **definition.mark(now))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return notified
+
+
+class AppointmentSweepScheduler:
+    """Executa as varreduras periodicamente em uma thread de fundo"""
+
+    def __init__(self, sweeper: AppointmentSweeper,
+                 interval_seconds: float = DEFAULT_SWEEP_INTERVAL_SECONDS):
+        self.sweeper = sweeper
+        self.interval_seconds = interval_seconds
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="appointment-sweeper", daemon=True)
+        self._thread.start()
+        logger.info(f"Varredura de consultas iniciada (intervalo {self.interval_seconds}s)")
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join()
+
+    def run_once(self) -> Dict[str, Dict[str, int]]:
+        """Executa uma rodada de todas as varreduras"""
+        results = {}
+        for definition in (REMINDER_SWEEP, CONFIRMATION_SWEEP):
+            try:
+                results[definition.name] = self.sweeper.sweep(definition)
+            except Exception as e:
+                logger.error(f"Falha na varredura de {definition.name}: {e}")
+        return results
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval_seconds)
+
+
+_scheduler: Optional[AppointmentSweepScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_appointment_sweep_scheduler() -> AppointmentSweepScheduler:
+    """Retorna o agendador de varreduras do processo, configurado pelas settings"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from app.core.config import settings
+                from app.core.database import SessionLocal
+
+                sweeper = AppointmentSweeper(SessionLocal, batch_size=settings.APPOINTMENT_SWEEP_BATCH_SIZE)
+                _scheduler = AppointmentSweepScheduler(sweeper, settings.APPOINTMENT_SWEEP_INTERVAL)
+    return _scheduler
@@ -8,9 +8,10 @@ from pathlib import Path
 from typing import Any
 
 from fastapi import HTTPException, UploadFile
-from PIL import Image, ImageOps
+from PIL import Image
 
 from app.core.config import settings
+from app.services.image_variants import AVATAR_VARIANTS, get_image_variant_service, resize_to_variant
 
 class AvatarService:
     """Service for handling avatar uploads and multi-resolution processing."""
@@ -18,12 +19,7 @@ class AvatarService:
     SUPPORTED_FORMATS = {"JPEG", "PNG", "WEBP"}
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
-    RESOLUTIONS = [
-        (100, 100),      # Thumbnail
-        (400, 400),      # Profile card
-        (1920, 1080),    # Full HD
-        (7680, 4320),    # 8K
-    ]
+    RESOLUTIONS = [(spec.width, spec.height) for spec in AVATAR_VARIANTS]
 
     def __init__(self) -> None:
         try:
@@ -58,52 +54,23 @@ class AvatarService:
         user_dir.mkdir(exist_ok=True)
 
         await file.seek(0)
+        source = await file.read()
 
         try:
-            with Image.open(file.file) as img:
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-
-                img = ImageOps.exif_transpose(img)
-
-                generated_files = []
-                total_size = 0
-
-                for width, height in self.RESOLUTIONS:
-                    if img is not None:
-                        processed_img = self._resize_and_optimize(img.copy(), width, height)
-                    else:
-                        continue
-                    filename = f"avatar_{width}x{height}.jpg"
-                    file_path = user_dir / filename
-
-                    processed_img.save(
-                        file_path,
-                        "JPEG",
-                        quality=95,
-                        optimize=True,
-                        progressive=True
-                    )
-
-                    file_size = file_path.stat().st_size
-                    total_size += file_size
-                    generated_files.append(f"{width}x{height}")
-
-                base_url = f"/uploads/avatars/{user_id}/avatar_400x400.jpg"
-
-                return {
-                    "avatar_url": base_url,
-                    "resolutions": generated_files,
-                    "file_size": total_size,
-                    "upload_timestamp": datetime.utcnow()
-                }
-
+            variants = await get_image_variant_service().derive(source, AVATAR_VARIANTS, user_dir)
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to process image: {str(e)}"
             ) from e
 
+        return {
+            "avatar_url": f"/uploads/avatars/{user_id}/avatar_400x400.jpg",
+            "resolutions": [variant.name for variant in variants],
+            "file_size": sum(variant.file_size for variant in variants),
+            "upload_timestamp": datetime.utcnow()
+        }
+
     async def delete_avatar(self, user_id: int) -> bool:
         """
         Delete all avatar files for a user.
@@ -223,24 +190,7 @@ class AvatarService:
         Returns:
             Resized and optimized image
         """
-        source_ratio = img.width / img.height
-        target_ratio = target_width / target_height
-
-        if source_ratio > target_ratio:
-            new_width = int(img.height * target_ratio)
-            left = (img.width - new_width) // 2
-            img = img.crop((left, 0, left + new_width, img.height))
-        elif source_ratio < target_ratio:
-            new_height = int(img.width / target_ratio)
-            top = (img.height - new_height) // 2
-            img = img.crop((0, top, img.width, top + new_height))
-
-        img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-
-        from PIL import ImageFilter
-        img = img.filter(ImageFilter.UnsharpMask(radius=1, percent=150, threshold=3))
-
-        return img
+        return resize_to_variant(img, target_width, target_height)
 
     async def process_avatar(self, user_id: int, file: UploadFile) -> dict[str, Any]:
         """Process avatar - alias for upload_avatar method expected by tests"""
@@ -3,13 +3,18 @@ Clinical Protocols Service - AI-powered clinical protocol detection and assessme
 Optimized version based on MedIA Pro clinical protocols module.
 """
 
+import asyncio
 import logging
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from typing import Any
 
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.services.protocol_rule_engine import CompiledProtocol, PatientTable, compile_protocols
+
 logger = logging.getLogger(__name__)
 
 class ProtocolType(str, Enum):
@@ -30,51 +35,191 @@ class RiskLevel(str, Enum):
     HIGH = "high"
     CRITICAL = "critical"
 
+PROTOCOL_DEFINITIONS: dict[str, dict[str, Any]] = {
+    ProtocolType.SEPSIS: {
+        "name": "Sepsis Detection Protocol",
+        "criteria": {
+            "vital_signs": ["temperature", "heart_rate", "respiratory_rate", "blood_pressure"],
+            "lab_values": ["white_blood_cell_count", "lactate", "procalcitonin"],
+            "clinical_signs": ["altered_mental_status", "hypotension", "organ_dysfunction"]
+        },
+        "scoring_system": "qSOFA",
+        "time_sensitive": True,
+        "max_response_time_minutes": 60,
+        "rules": {
+            "criteria": [
+                {"source": "clinical.vital_signs.systolic_blood_pressure", "name": "hypotension", "op": "<=", "threshold": 100, "points": 1},
+                {"source": "clinical.vital_signs.respiratory_rate", "name": "tachypnea", "op": ">=", "threshold": 22, "points": 1},
+                {"source": "clinical.glasgow_coma_scale", "name": "altered_mental_status", "op": "<", "threshold": 15, "points": 1},
+                {"source": "clinical.vital_signs.temperature", "name": "fever_hypothermia", "op": "outside", "threshold": [36.0, 38.3]},
+                {"source": "clinical.vital_signs.heart_rate", "name": "tachycardia", "op": ">", "threshold": 90},
+                {"source": "clinical.lab_values.white_blood_cell_count", "name": "abnormal_wbc", "op": "outside", "threshold": [4000, 12000]},
+                {"source": "clinical.lab_values.lactate", "name": "elevated_lactate", "op": ">", "threshold": 2.0}
+            ],
+            "risk_levels": [
+                {
+                    "risk_level": RiskLevel.HIGH,
+                    "min_score": 2,
+                    "recommendations": [
+                        "Immediate sepsis bundle initiation",
+                        "Blood cultures before antibiotics",
+                        "Broad-spectrum antibiotics within 1 hour",
+                        "Fluid resuscitation",
+                        "Serial lactate monitoring"
+                    ]
+                },
+                {
+                    "risk_level": RiskLevel.MODERATE,
+                    "min_criteria": 3,
+                    "recommendations": [
+                        "Close monitoring for sepsis progression",
+                        "Consider blood cultures",
+                        "Monitor vital signs every 15 minutes"
+                    ]
+                }
+            ]
+        }
+    },
+    ProtocolType.CHEST_PAIN: {
+        "name": "Chest Pain Assessment Protocol",
+        "criteria": {
+            "symptoms": ["chest_pain_character", "radiation", "duration"],
+            "risk_factors": ["age", "gender", "diabetes", "hypertension", "smoking"],
+            "ecg_findings": ["st_elevation", "st_depression", "t_wave_changes"],
+            "biomarkers": ["troponin", "ck_mb"]
+        },
+        "scoring_system": "HEART",
+        "time_sensitive": True,
+        "max_response_time_minutes": 30,
+        "rules": {
+            "criteria": [
+                {
+                    "source": "patient.age",
+                    "tiers": [
+                        {"name": "high_risk_age", "op": ">=", "threshold": 65, "points": 2},
+                        {"name": "moderate_risk_age", "op": ">=", "threshold": 45, "points": 1}
+                    ]
+                },
+                {
+                    "source": "patient.risk_factors",
+                    "count_in": ["diabetes", "hypertension", "smoking", "hyperlipidemia"],
+                    "tiers": [
+                        {"name": "multiple_risk_factors", "op": ">=", "threshold": 3, "points": 2},
+                        {"name": "some_risk_factors", "op": ">=", "threshold": 1, "points": 1}
+                    ]
+                },
+                {
+                    "tiers": [
+                        {"source": "clinical.ecg_findings.st_elevation", "name": "st_elevation", "op": "truthy", "points": 2},
+                        {"source": "clinical.ecg_findings.st_depression", "name": "ecg_changes", "op": "truthy", "points": 1},
+                        {"source": "clinical.ecg_findings.t_wave_changes", "name": "ecg_changes", "op": "truthy", "points": 1}
+                    ]
+                }
+            ],
+            "risk_levels": [
+                {
+                    "risk_level": RiskLevel.HIGH,
+                    "min_score": 7,
+                    "recommendations": [
+                        "Immediate cardiology consultation",
+                        "Serial troponins",
+                        "Consider cardiac catheterization"
+                    ]
+                },
+                {
+                    "risk_level": RiskLevel.MODERATE,
+                    "min_score": 4,
+                    "recommendations": [
+                        "Observation and serial ECGs",
+                        "Troponin monitoring",
+                        "Stress testing if stable"
+                    ]
+                }
+            ]
+        }
+    },
+    ProtocolType.STROKE: {
+        "name": "Stroke Assessment Protocol",
+        "criteria": {
+            "neurological": ["facial_droop", "arm_weakness", "speech_difficulty"],
+            "timing": ["symptom_onset", "last_known_well"],
+            "imaging": ["ct_scan", "mri"],
+            "contraindications": ["bleeding_risk", "recent_surgery"]
+        },
+        "scoring_system": "NIHSS",
+        "time_sensitive": True,
+        "max_response_time_minutes": 15,
+        "rules": {
+            "criteria": [
+                {"source": "clinical.neurological.facial_droop", "name": "facial_droop", "op": "truthy", "points": 2},
+                {"source": "clinical.neurological.arm_weakness", "name": "arm_weakness", "op": "truthy", "points": 2},
+                {"source": "clinical.neurological.speech_difficulty", "name": "speech_difficulty", "op": "truthy", "points": 2},
+                {"source": "clinical.timing.symptom_onset", "name": "within_window", "op": "<=", "threshold": 4.5}
+            ],
+            "risk_levels": [
+                {
+                    "risk_level": RiskLevel.HIGH,
+                    "min_score": 4,
+                    "requires": ["within_window"],
+                    "recommendations": [
+                        "Immediate stroke team activation",
+                        "CT/MRI imaging",
+                        "Consider thrombolytic therapy"
+                    ]
+                },
+                {
+                    "risk_level": RiskLevel.MODERATE,
+                    "min_score": 2,
+                    "recommendations": [
+                        "Neurological monitoring",
+                        "Imaging studies",
+                        "Stroke workup"
+                    ]
+                }
+            ]
+        }
+    }
+}
+
+_RISK_ORDER = {RiskLevel.CRITICAL: 4, RiskLevel.HIGH: 3, RiskLevel.MODERATE: 2, RiskLevel.LOW: 1}
+
+@lru_cache(maxsize=1)
+def get_compiled_protocols() -> dict[str, CompiledProtocol]:
+    """Compile protocol rules once per process."""
+    return compile_protocols(PROTOCOL_DEFINITIONS)
+
+def _sort_by_priority(assessments: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    assessments.sort(
+        key=lambda x: (_RISK_ORDER.get(x.get("risk_level", RiskLevel.LOW), 0), x.get("time_sensitive", False)),
+        reverse=True
+    )
+    return assessments
+
 class ClinicalProtocolsService:
     """Service for clinical protocol detection and assessment."""
 
     def __init__(self, db: AsyncSession) -> None:
         self.db = db
         self.protocol_definitions = self._initialize_protocols()
+        self.compiled_protocols = get_compiled_protocols()
 
     def _initialize_protocols(self) -> dict[str, dict[str, Any]]:
         """Initialize clinical protocol definitions."""
+        return PROTOCOL_DEFINITIONS
+
+    def _base_assessment(self, protocol_type: ProtocolType, protocol_def: dict[str, Any]) -> dict[str, Any]:
         return {
-            ProtocolType.SEPSIS: {
-                "name": "Sepsis Detection Protocol",
-                "criteria": {
-                    "vital_signs": ["temperature", "heart_rate", "respiratory_rate", "blood_pressure"],
-                    "lab_values": ["white_blood_cell_count", "lactate", "procalcitonin"],
-                    "clinical_signs": ["altered_mental_status", "hypotension", "organ_dysfunction"]
-                },
-                "scoring_system": "qSOFA",
-                "time_sensitive": True,
-                "max_response_time_minutes": 60
-            },
-            ProtocolType.CHEST_PAIN: {
-                "name": "Chest Pain Assessment Protocol",
-                "criteria": {
-                    "symptoms": ["chest_pain_character", "radiation", "duration"],
-                    "risk_factors": ["age", "gender", "diabetes", "hypertension", "smoking"],
-                    "ecg_findings": ["st_elevation", "st_depression", "t_wave_changes"],
-                    "biomarkers": ["troponin", "ck_mb"]
-                },
-                "scoring_system": "HEART",
-                "time_sensitive": True,
-                "max_response_time_minutes": 30
-            },
-            ProtocolType.STROKE: {
-                "name": "Stroke Assessment Protocol",
-                "criteria": {
-                    "neurological": ["facial_droop", "arm_weakness", "speech_difficulty"],
-                    "timing": ["symptom_onset", "last_known_well"],
-                    "imaging": ["ct_scan", "mri"],
-                    "contraindications": ["bleeding_risk", "recent_surgery"]
-                },
-                "scoring_system": "NIHSS",
-                "time_sensitive": True,
-                "max_response_time_minutes": 15
-            }
+            "protocol_type": protocol_type,
+            "protocol_name": protocol_def["name"],
+            "assessment_timestamp": datetime.utcnow().isoformat(),
+            "applicable": False,
+            "risk_level": RiskLevel.LOW,
+            "score": 0,
+            "recommendations": [],
+            "time_sensitive": protocol_def.get("time_sensitive", False),
+            "max_response_time_minutes": protocol_def.get("max_response_time_minutes"),
+            "criteria_met": {},
+            "next_steps": []
         }
 
     async def assess_protocol(
@@ -89,26 +234,11 @@ class ClinicalProtocolsService:
             if not protocol_def:
                 raise ValueError(f"Unknown protocol type: {protocol_type}")
 
-            assessment = {
-                "protocol_type": protocol_type,
-                "protocol_name": protocol_def["name"],
-                "assessment_timestamp": datetime.utcnow().isoformat(),
-                "applicable": False,
-                "risk_level": RiskLevel.LOW,
-                "score": 0,
-                "recommendations": [],
-                "time_sensitive": protocol_def.get("time_sensitive", False),
-                "max_response_time_minutes": protocol_def.get("max_response_time_minutes"),
-                "criteria_met": {},
-                "next_steps": []
-            }
+            assessment = self._base_assessment(protocol_type, protocol_def)
 
-            if protocol_type == ProtocolType.SEPSIS:
-                assessment = await self._assess_sepsis_protocol(patient_data, clinical_data, assessment)
-            elif protocol_type == ProtocolType.CHEST_PAIN:
-                assessment = await self._assess_chest_pain_protocol(patient_data, clinical_data, assessment)
-            elif protocol_type == ProtocolType.STROKE:
-                assessment = await self._assess_stroke_protocol(patient_data, clinical_data, assessment)
+            compiled = self.compiled_protocols.get(protocol_type)
+            if compiled is not None:
+                assessment.update(compiled.evaluate(patient_data, clinical_data))
 
             return assessment
 
@@ -120,198 +250,86 @@ class ClinicalProtocolsService:
                 "assessment_timestamp": datetime.utcnow().isoformat()
             }
 
-    async def _assess_sepsis_protocol(
-        self,
-        patient_data: dict[str, Any],
-        clinical_data: dict[str, Any],
-        assessment: dict[str, Any]
-    ) -> dict[str, Any]:
-        """Assess sepsis protocol using qSOFA criteria."""
-        qsofa_score = 0
-        criteria_met = {}
-
-        vital_signs = clinical_data.get("vital_signs", {})
-        lab_values = clinical_data.get("lab_values", {})
-
-        systolic_bp = vital_signs.get("systolic_blood_pressure")
-        if systolic_bp and systolic_bp <= 100:
-            qsofa_score += 1
-            criteria_met["hypotension"] = True
-
-        respiratory_rate = vital_signs.get("respiratory_rate")
-        if respiratory_rate and respiratory_rate >= 22:
-            qsofa_score += 1
-            criteria_met["tachypnea"] = True
-
-        gcs = clinical_data.get("glasgow_coma_scale")
-        if gcs and gcs < 15:
-            qsofa_score += 1
-            criteria_met["altered_mental_status"] = True
-
-        temperature = vital_signs.get("temperature")
-        if temperature and (temperature > 38.3 or temperature < 36.0):
-            criteria_met["fever_hypothermia"] = True
-
-        heart_rate = vital_signs.get("heart_rate")
-        if heart_rate and heart_rate > 90:
-            criteria_met["tachycardia"] = True
-
-        wbc = lab_values.get("white_blood_cell_count")
-        if wbc and (wbc > 12000 or wbc < 4000):
-            criteria_met["abnormal_wbc"] = True
-
-        lactate = lab_values.get("lactate")
-        if lactate and lactate > 2.0:
-            criteria_met["elevated_lactate"] = True
-
-        assessment["score"] = qsofa_score
-        assessment["criteria_met"] = criteria_met
-        assessment["applicable"] = qsofa_score >= 2 or len(criteria_met) >= 3
-
-        if qsofa_score >= 2:
-            assessment["risk_level"] = RiskLevel.HIGH
-            assessment["recommendations"].extend([
-                "Immediate sepsis bundle initiation",
-                "Blood cultures before antibiotics",
-                "Broad-spectrum antibiotics within 1 hour",
-                "Fluid resuscitation",
-                "Serial lactate monitoring"
-            ])
-        elif len(criteria_met) >= 3:
-            assessment["risk_level"] = RiskLevel.MODERATE
-            assessment["recommendations"].extend([
-                "Close monitoring for sepsis progression",
-                "Consider blood cultures",
-                "Monitor vital signs every 15 minutes"
-            ])
-
-        return assessment
-
-    async def _assess_chest_pain_protocol(
-        self,
-        patient_data: dict[str, Any],
-        clinical_data: dict[str, Any],
-        assessment: dict[str, Any]
-    ) -> dict[str, Any]:
-        """Assess chest pain protocol using HEART score."""
-        heart_score = 0
-        criteria_met = {}
-
-        age = patient_data.get("age", 0)
-        if age >= 65:
-            heart_score += 2
-            criteria_met["high_risk_age"] = True
-        elif age >= 45:
-            heart_score += 1
-            criteria_met["moderate_risk_age"] = True
-
-        risk_factors = patient_data.get("risk_factors", [])
-        risk_factor_count = len([rf for rf in risk_factors if rf in ["diabetes", "hypertension", "smoking", "hyperlipidemia"]])
-        if risk_factor_count >= 3:
-            heart_score += 2
-            criteria_met["multiple_risk_factors"] = True
-        elif risk_factor_count >= 1:
-            heart_score += 1
-            criteria_met["some_risk_factors"] = True
-
-        if ecg_findings.get("st_elevation"):
-            heart_score += 2
-            criteria_met["st_elevation"] = True
-        elif ecg_findings.get("st_depression") or ecg_findings.get("t_wave_changes"):
-            heart_score += 1
-            criteria_met["ecg_changes"] = True
-
-        assessment["score"] = heart_score
-        assessment["criteria_met"] = criteria_met
-        assessment["applicable"] = heart_score >= 4
-
-        if heart_score >= 7:
-            assessment["risk_level"] = RiskLevel.HIGH
-            assessment["recommendations"].extend([
-                "Immediate cardiology consultation",
-                "Serial troponins",
-                "Consider cardiac catheterization"
-            ])
-        elif heart_score >= 4:
-            assessment["risk_level"] = RiskLevel.MODERATE
-            assessment["recommendations"].extend([
-                "Observation and serial ECGs",
-                "Troponin monitoring",
-                "Stress testing if stable"
-            ])
-
-        return assessment
-
-    async def _assess_stroke_protocol(
-        self,
-        patient_data: dict[str, Any],
-        clinical_data: dict[str, Any],
-        assessment: dict[str, Any]
-    ) -> dict[str, Any]:
-        """Assess stroke protocol using NIHSS criteria."""
-        nihss_score = 0
-        criteria_met = {}
-
-        neurological = clinical_data.get("neurological", {})
-
-        if neurological.get("facial_droop"):
-            nihss_score += 2
-            criteria_met["facial_droop"] = True
-
-        if neurological.get("arm_weakness"):
-            nihss_score += 2
-            criteria_met["arm_weakness"] = True
-
-        if neurological.get("speech_difficulty"):
-            nihss_score += 2
-            criteria_met["speech_difficulty"] = True
-
-        timing = clinical_data.get("timing", {})
-        symptom_onset = timing.get("symptom_onset")
-        if symptom_onset and symptom_onset <= 4.5:
-            criteria_met["within_window"] = True
-
-        assessment["score"] = nihss_score
-        assessment["criteria_met"] = criteria_met
-        assessment["applicable"] = nihss_score >= 2
-
-        if nihss_score >= 4 and criteria_met.get("within_window"):
-            assessment["risk_level"] = RiskLevel.HIGH
-            assessment["recommendations"].extend([
-                "Immediate stroke team activation",
-                "CT/MRI imaging",
-                "Consider thrombolytic therapy"
-            ])
-        elif nihss_score >= 2:
-            assessment["risk_level"] = RiskLevel.MODERATE
-            assessment["recommendations"].extend([
-                "Neurological monitoring",
-                "Imaging studies",
-                "Stroke workup"
-            ])
-
-        return assessment
-
     async def get_applicable_protocols(
         self,
         patient_data: dict[str, Any],
         clinical_data: dict[str, Any]
     ) -> list[dict[str, Any]]:
-        """Get all applicable protocols for a patient."""
+        """
+        Get all applicable protocols for a patient.
+
+        Compiled rules are pure CPU work with no awaits, so protocols are
+        assessed one after another; errors are logged by ``assess_protocol``.
+        """
         applicable_protocols = []
+        for protocol_type in self.compiled_protocols:
+            assessment = await self.assess_protocol(protocol_type, patient_data, clinical_data)
+            if assessment.get("applicable", False):
+                applicable_protocols.append(assessment)
 
-        for protocol_type in ProtocolType:
-            try:
-                assessment = await self.assess_protocol(protocol_type, patient_data, clinical_data)
-                if assessment.get("applicable", False):
-                    applicable_protocols.append(assessment)
-            except Exception as e:
-                logger.error(f"Error assessing protocol {protocol_type}: {str(e)}")
+        return _sort_by_priority(applicable_protocols)
 
-        risk_order = {RiskLevel.CRITICAL: 4, RiskLevel.HIGH: 3, RiskLevel.MODERATE: 2, RiskLevel.LOW: 1}
-        applicable_protocols.sort(
-            key=lambda x: (risk_order.get(x.get("risk_level", RiskLevel.LOW), 0), x.get("time_sensitive", False)),
-            reverse=True
+    async def screen_ward(
+        self,
+        patients: list[dict[str, Any]],
+        protocol_types: list[ProtocolType] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Screen many patients at once.
+
+        Each entry of ``patients`` holds ``patient_id``, ``patient_data`` and
+        ``clinical_data``. All vitals are loaded into one columnar table and every
+        protocol scores the whole table in a single vectorized pass; protocols run
+        concurrently in worker threads. Returns, per patient, the applicable
+        assessments sorted by priority.
+        """
+        if not patients:
+            return []
+
+        selected = [
+            protocol_type for protocol_type in (protocol_types or self.compiled_protocols)
+            if protocol_type in self.compiled_protocols
+        ]
+        table = PatientTable([(p.get("patient_data"), p.get("clinical_data")) for p in patients])
+        # Build shared columns up front so worker threads only read the table
+        for protocol_type in selected:
+            for criterion in self.compiled_protocols[protocol_type].criteria:
+                for tier in criterion.tiers:
+                    table.column(tier)
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.compiled_protocols[protocol_type].evaluate_table, table)
+              for protocol_type in selected)
         )
 
-        return applicable_protocols
+        timestamp = datetime.utcnow().isoformat()
+        screening = [
+            {"patient_id": patient.get("patient_id"), "applicable_protocols": []}
+            for patient in patients
+        ]
+        for protocol_type, result in zip(selected, results):
+            compiled = self.compiled_protocols[protocol_type]
+            protocol_def = self.protocol_definitions[protocol_type]
+            criteria_names = list(result["criteria"])
+            criteria_matrix = np.column_stack([result["criteria"][name] for name in criteria_names]) \
+                if criteria_names else np.zeros((len(patients), 0), dtype=bool)
+
+            for row in np.flatnonzero(result["applicable"]):
+                rule = compiled.risk_rules[result["rule_index"][row]]
+                assessment = self._base_assessment(protocol_type, protocol_def)
+                assessment.update({
+                    "assessment_timestamp": timestamp,
+                    "applicable": True,
+                    "risk_level": rule.risk_level,
+                    "score": int(result["score"][row]),
+                    "recommendations": list(rule.recommendations),
+                    "criteria_met": {
+                        name: True for name, met in zip(criteria_names, criteria_matrix[row]) if met
+                    }
+                })
+                screening[row]["applicable_protocols"].append(assessment)
+
+        for entry in screening:
+            _sort_by_priority(entry["applicable_protocols"])
+
+        return screening
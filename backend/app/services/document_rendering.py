@@ -0,0 +1,142 @@
+"""
+Renderização de documentos médicos
+Templates pré-compilados, saída em streaming (texto, HTML e PDF) e geração de
+identificadores de documento sem colisão
+"""
+
+import html
+import io
+import itertools
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from datetime import datetime
+from string import Formatter
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_formatter = Formatter()
+
+
+class CompiledTemplate:
+    """
+    Template de texto analisado uma única vez
+
+    Usa a sintaxe de ``str.format`` restrita a nomes simples (``{campo}``); a
+    renderização apenas intercala os trechos literais com os valores.
+    """
+
+    __slots__ = ("source", "fields", "_parts")
+
+    def __init__(self, source: str):
+        parts = []
+        fields = []
+        for literal, field_name, format_spec, conversion in _formatter.parse(source):
+            if format_spec or conversion:
+                raise ValueError(f"Template não suporta formatação em '{{{field_name}}}'")
+            if field_name is not None and not field_name.isidentifier():
+                raise ValueError(f"Campo de template inválido: '{field_name}'")
+            parts.append((literal, field_name))
+            if field_name is not None:
+                fields.append(field_name)
+        self.source = source
+        self.fields = tuple(fields)
+        self._parts = tuple(parts)
+
+    def iter_render(self, values: Mapping[str, object],
+                    escape: Callable[[str], str] | None = None) -> Iterator[str]:
+        """Produz os trechos do documento; campos ausentes viram texto vazio"""
+        for literal, field_name in self._parts:
+            if literal:
+                yield literal
+            if field_name is not None:
+                text = str(values.get(field_name, ""))
+                yield escape(text) if escape else text
+
+    def render(self, values: Mapping[str, object],
+               escape: Callable[[str], str] | None = None) -> str:
+        return "".join(self.iter_render(values, escape))
+
+
+class DocumentIdGenerator:
+    """
+    Identificadores de documento únicos mesmo em geração em lote
+
+    Formato: ``PREFIXO_AAAAMMDD_HHMMSS_NNNNNN_SEQ``, onde ``NNNNNN`` identifica o
+    processo e ``SEQ`` é um contador monotônico do processo. Documentos gerados
+    no mesmo segundo, em threads ou processos distintos, não colidem.
+    """
+
+    def __init__(self, node: str | None = None):
+        self.node = node or os.urandom(3).hex()
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self, prefix: str, now: datetime | None = None) -> str:
+        now = now or datetime.utcnow()
+        with self._lock:
+            sequence = next(self._counter)
+        return f"{prefix}_{now.strftime('%Y%m%d_%H%M%S')}_{self.node}_{sequence:06d}"
+
+
+_id_generator = DocumentIdGenerator()
+
+
+def new_document_id(prefix: str, now: datetime | None = None) -> str:
+    """Gera um identificador de documento com o gerador do processo"""
+    return _id_generator.next_id(prefix, now)
+
+
+def iter_html(chunks: Iterable[str], title: str) -> Iterator[str]:
+    """
+    Envolve trechos de texto já escapados em um documento HTML
+
+    Os trechos devem ter sido renderizados com ``escape=html.escape``.
+    """
+    yield (
+        "<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title></head><body>"
+        "<pre class=\"medical-document\">"
+    )
+    yield from chunks
+    yield "</pre></body></html>"
+
+
+def render_pdf(chunks: Iterable[str], title: str, font: str = "Helvetica", font_size: int = 11) -> bytes:
+    """Desenha o texto do documento em páginas A4 e retorna o PDF"""
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError("reportlab não está instalado; renderização em PDF indisponível")
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(title)
+    _, height = A4
+    margin = 2 * cm
+
+    text = pdf.beginText(margin, height - margin)
+    text.setFont(font, font_size, leading=font_size * 1.4)
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if text.getY() < margin:
+                pdf.drawText(text)
+                pdf.showPage()
+                text = pdf.beginText(margin, height - margin)
+                text.setFont(font, font_size, leading=font_size * 1.4)
+            text.textLine(line)
+    if pending:
+        text.textLine(pending)
+    pdf.drawText(text)
+    pdf.save()
+    return buffer.getvalue()
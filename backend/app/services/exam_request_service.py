@@ -10,7 +10,7 @@ from typing import Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.medical_guidelines_engine import SolicitacaoExamesBaseadaDiretrizes
+from app.services.medical_guidelines_engine import get_solicitacao_exames
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +34,7 @@ class ExamRequestService:
 
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.guidelines_engine = SolicitacaoExamesBaseadaDiretrizes()
+        self.guidelines_engine = get_solicitacao_exames()
 
     async def create_exam_request(
         self,
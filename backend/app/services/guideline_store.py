@@ -0,0 +1,297 @@
+"""
+Repositório indexado de diretrizes médicas
+Carrega diretrizes versionadas (JSON/YAML) uma vez por processo em um índice imutável,
+com recarga automática quando os arquivos mudam
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from app.core.config import settings
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GUIDELINES_DIR = Path(__file__).parent / "guidelines"
+SUPPORTED_SCHEMA_VERSIONS = {1}
+RELOAD_CHECK_INTERVAL_SECONDS = 5.0
+
+_CID10_PATTERN = re.compile(r"^[A-Z]\d{2}(\.?[0-9A-Z]{1,4})?$")
+
+
+def normalizar_termo(termo: str) -> str:
+    """Normaliza condição/medicamento: minúsculas, sem acentos, espaços viram '_'"""
+    sem_acentos = unicodedata.normalize("NFKD", termo).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[\s\-]+", "_", sem_acentos.strip().lower())
+
+
+def normalizar_cid10(codigo: str) -> str:
+    """Normaliza código CID-10 para o formato sem ponto (ex.: 'e11.9' -> 'E119')"""
+    return codigo.strip().upper().replace(".", "")
+
+
+def _eh_cid10(termo: str) -> bool:
+    return bool(_CID10_PATTERN.match(termo.strip().upper()))
+
+
+@dataclass(frozen=True)
+class GuidelineIndex:
+    """Índice imutável de diretrizes; todas as consultas são O(1) em dicionários"""
+    versao: str
+    diretrizes: Mapping[str, Any]
+    por_condicao: Mapping[str, tuple[str, ...]]
+    por_cid10: Mapping[str, tuple[str, ...]]
+    linhas_por_medicamento: Mapping[str, Mapping[str, str]]
+    padroes_medicamentos: Mapping[str, re.Pattern]
+    protocolos_exames: Mapping[str, Mapping[str, Any]]
+    carregado_em: datetime = field(default_factory=datetime.utcnow)
+
+    def resolver(self, consulta: str) -> tuple[str, ...]:
+        """
+        Resolve condição, sinônimo ou código CID-10 para IDs de diretrizes.
+        Códigos CID-10 são buscados do mais específico ao mais genérico
+        (E11.65 -> E116 -> E11), o que mantém a busca por prefixo O(1).
+        """
+        if not consulta:
+            return ()
+
+        ids = self.por_condicao.get(normalizar_termo(consulta))
+        if ids:
+            return ids
+
+        if _eh_cid10(consulta):
+            codigo = normalizar_cid10(consulta)
+            while len(codigo) >= 3:
+                ids = self.por_cid10.get(codigo)
+                if ids:
+                    return ids
+                codigo = codigo[:-1]
+
+        return ()
+
+    def linha_do_medicamento(self, diretriz_id: str, medicamento: str) -> str | None:
+        """Retorna a linha terapêutica ('primeira_linha', ...) do medicamento na diretriz"""
+        linhas = self.linhas_por_medicamento.get(diretriz_id)
+        if not linhas:
+            return None
+
+        nome = normalizar_termo(medicamento)
+        if not nome:
+            return None
+
+        linha = linhas.get(nome)
+        if linha:
+            return linha
+
+        padrao = self.padroes_medicamentos.get(diretriz_id)
+        if padrao is not None:
+            encontrado = padrao.search(nome)
+            if encontrado:
+                return linhas[encontrado.group(0)]
+
+        # Nome prescrito abreviado contido no nome da diretriz
+        for nome_diretriz, linha in linhas.items():
+            if nome in nome_diretriz:
+                return linha
+
+        return None
+
+
+def _ler_arquivo(caminho: Path) -> dict[str, Any]:
+    with caminho.open("r", encoding="utf-8") as arquivo:
+        if caminho.suffix == ".json":
+            return json.load(arquivo)
+        return yaml.safe_load(arquivo) or {}
+
+
+def _listar_arquivos(diretorio: Path) -> list[Path]:
+    extensoes = {".json"}
+    if YAML_AVAILABLE:
+        extensoes |= {".yaml", ".yml"}
+    if not diretorio.is_dir():
+        return []
+    return sorted(p for p in diretorio.iterdir() if p.is_file() and p.suffix in extensoes)
+
+
+def _impressao_digital(arquivos: list[Path]) -> tuple:
+    impressao = []
+    for caminho in arquivos:
+        try:
+            info = caminho.stat()
+        except OSError:
+            continue
+        impressao.append((caminho.name, info.st_mtime_ns, info.st_size))
+    return tuple(impressao)
+
+
+def _construir_diretriz(dados: dict[str, Any]):
+    from app.services.medical_guidelines_engine import DiretrizMedica, GuidelineSource
+
+    fonte = dados["fonte"]
+    return DiretrizMedica(
+        id=dados["id"],
+        titulo=dados["titulo"],
+        especialidade=dados["especialidade"],
+        fonte=GuidelineSource[fonte] if fonte in GuidelineSource.__members__ else GuidelineSource(fonte),
+        versao=str(dados["versao"]),
+        data_atualizacao=datetime.fromisoformat(str(dados["data_atualizacao"])),
+        nivel_evidencia=dados["nivel_evidencia"],
+        grau_recomendacao=dados["grau_recomendacao"],
+        conteudo=dados.get("conteudo", {}),
+        referencias=list(dados.get("referencias", [])),
+        conflitos_interesse=dados.get("conflitos_interesse")
+    )
+
+
+def _linhas_terapeuticas(conteudo: dict[str, Any]) -> dict[str, str]:
+    """Mapeia medicamento normalizado -> linha, preservando a primeira linha em que aparece"""
+    linhas: dict[str, str] = {}
+    for chave in sorted(k for k in conteudo if k.endswith("_linha")):
+        bloco = conteudo[chave]
+        if not isinstance(bloco, dict):
+            continue
+        for medicamento in bloco.get("medicamentos", []) + bloco.get("opcoes", []):
+            linhas.setdefault(normalizar_termo(medicamento), chave)
+    return linhas
+
+
+def construir_indice(arquivos: list[Path]) -> GuidelineIndex:
+    """Constrói o índice a partir dos arquivos de diretrizes"""
+    diretrizes: dict[str, Any] = {}
+    por_condicao: dict[str, list[str]] = {}
+    por_cid10: dict[str, list[str]] = {}
+    linhas_por_medicamento: dict[str, Mapping[str, str]] = {}
+    padroes_medicamentos: dict[str, re.Pattern] = {}
+    protocolos_exames: dict[str, Mapping[str, Any]] = {}
+    hash_versao = hashlib.sha256()
+
+    for caminho in arquivos:
+        conteudo_arquivo = caminho.read_bytes()
+        hash_versao.update(caminho.name.encode("utf-8"))
+        hash_versao.update(conteudo_arquivo)
+
+        dados = _ler_arquivo(caminho)
+        schema = dados.get("schema_version", 1)
+        if schema not in SUPPORTED_SCHEMA_VERSIONS:
+            raise ValueError(f"Versão de schema não suportada em {caminho.name}: {schema}")
+
+        for item in dados.get("diretrizes", []):
+            diretriz = _construir_diretriz(item)
+            if diretriz.id in diretrizes:
+                logger.warning(f"Diretriz duplicada {diretriz.id} em {caminho.name}; mantendo a mais recente")
+                if diretrizes[diretriz.id].data_atualizacao >= diretriz.data_atualizacao:
+                    continue
+            diretrizes[diretriz.id] = diretriz
+
+            condicoes = [normalizar_termo(c) for c in item.get("condicoes", [])]
+            for condicao in condicoes:
+                ids = por_condicao.setdefault(condicao, [])
+                if diretriz.id not in ids:
+                    ids.append(diretriz.id)
+            for codigo in item.get("cid10", []):
+                ids = por_cid10.setdefault(normalizar_cid10(codigo), [])
+                if diretriz.id not in ids:
+                    ids.append(diretriz.id)
+
+            linhas = _linhas_terapeuticas(diretriz.conteudo)
+            linhas_por_medicamento[diretriz.id] = MappingProxyType(linhas)
+            if linhas:
+                # Nomes mais longos primeiro para preferir a correspondência mais específica
+                alternativas = sorted(linhas, key=len, reverse=True)
+                padroes_medicamentos[diretriz.id] = re.compile("|".join(map(re.escape, alternativas)))
+
+            if item.get("protocolo_exames") and condicoes:
+                protocolos_exames[diretriz.id] = MappingProxyType(
+                    {"condicao": condicoes[0], **item["protocolo_exames"]}
+                )
+
+    return GuidelineIndex(
+        versao=hash_versao.hexdigest()[:12],
+        diretrizes=MappingProxyType(diretrizes),
+        por_condicao=MappingProxyType({k: tuple(v) for k, v in por_condicao.items()}),
+        por_cid10=MappingProxyType({k: tuple(v) for k, v in por_cid10.items()}),
+        linhas_por_medicamento=MappingProxyType(linhas_por_medicamento),
+        padroes_medicamentos=MappingProxyType(padroes_medicamentos),
+        protocolos_exames=MappingProxyType(protocolos_exames)
+    )
+
+
+class GuidelineStore:
+    """
+    Mantém o índice de diretrizes atual do processo.
+
+    O índice é substituído atomicamente quando os arquivos mudam; leitores que já
+    obtiveram uma referência continuam usando a versão anterior sem bloqueio.
+    """
+
+    def __init__(self, diretorio: str | Path | None = None,
+                 intervalo_verificacao: float = RELOAD_CHECK_INTERVAL_SECONDS):
+        self.diretorio = Path(diretorio or settings.GUIDELINES_PATH or DEFAULT_GUIDELINES_DIR)
+        self.intervalo_verificacao = intervalo_verificacao
+        self._lock = threading.Lock()
+        self._indice: GuidelineIndex | None = None
+        self._impressao: tuple = ()
+        self._ultima_verificacao = 0.0
+
+    @property
+    def indice(self) -> GuidelineIndex:
+        """Índice atual; verifica alterações nos arquivos no máximo a cada intervalo"""
+        agora = time.monotonic()
+        if self._indice is None or agora - self._ultima_verificacao >= self.intervalo_verificacao:
+            self.recarregar_se_alterado()
+        return self._indice
+
+    def recarregar_se_alterado(self, forcar: bool = False) -> bool:
+        """Recarrega o índice se algum arquivo de diretriz mudou. Retorna True se recarregou."""
+        with self._lock:
+            self._ultima_verificacao = time.monotonic()
+            arquivos = _listar_arquivos(self.diretorio)
+            impressao = _impressao_digital(arquivos)
+
+            if not forcar and self._indice is not None and impressao == self._impressao:
+                return False
+
+            try:
+                indice = construir_indice(arquivos)
+            except Exception as e:
+                if self._indice is None:
+                    raise
+                logger.error(f"Falha ao recarregar diretrizes de {self.diretorio}; mantendo versão {self._indice.versao}: {e}")
+                return False
+
+            self._indice = indice
+            self._impressao = impressao
+            logger.info(
+                f"Diretrizes carregadas de {self.diretorio}: {len(indice.diretrizes)} diretrizes "
+                f"(versão {indice.versao})"
+            )
+            return True
+
+
+_store: GuidelineStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_guideline_store() -> GuidelineStore:
+    """Retorna o repositório de diretrizes compartilhado pelo processo"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GuidelineStore()
+    return _store
@@ -0,0 +1,223 @@
+"""
+Image variant derivation service.
+Decodes an image once and derives resized variants (avatars, exam thumbnails)
+in a process pool, off the event loop, writing each variant atomically.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+# LANCZOS on top of an integer box reduction; near-identical output, much faster for large sources
+RESIZE_REDUCING_GAP = 3.0
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    """A derived image: target box, output file and encoding."""
+    name: str
+    width: int
+    height: int
+    filename: str
+    crop: bool = True  # crop to the exact box; otherwise fit inside it keeping the aspect ratio
+    sharpen: bool = True
+    format: str = "JPEG"
+    quality: int = 95
+
+
+@dataclass(frozen=True)
+class VariantResult:
+    """A variant written to disk."""
+    name: str
+    path: str
+    width: int
+    height: int
+    file_size: int
+
+
+AVATAR_VARIANTS: tuple[VariantSpec, ...] = tuple(
+    VariantSpec(name=f"{width}x{height}", width=width, height=height, filename=f"avatar_{width}x{height}.jpg")
+    for width, height in (
+        (100, 100),      # Thumbnail
+        (400, 400),      # Profile card
+        (1920, 1080),    # Full HD
+        (7680, 4320),    # 8K
+    )
+)
+
+EXAM_THUMBNAIL_VARIANTS: tuple[VariantSpec, ...] = (
+    VariantSpec(name="thumbnail", width=256, height=256, filename="thumbnail.jpg", crop=False, quality=85),
+    VariantSpec(name="preview", width=1024, height=1024, filename="preview.jpg", crop=False, quality=90),
+)
+
+
+def _target_size(spec: VariantSpec, width: int, height: int) -> tuple[int, int]:
+    if spec.crop:
+        return spec.width, spec.height
+    scale = min(spec.width / width, spec.height / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _center_crop(img: Image.Image, ratio: float) -> Image.Image:
+    source_ratio = img.width / img.height
+    if source_ratio > ratio:
+        new_width = int(img.height * ratio)
+        left = (img.width - new_width) // 2
+        return img.crop((left, 0, left + new_width, img.height))
+    if source_ratio < ratio:
+        new_height = int(img.width / ratio)
+        top = (img.height - new_height) // 2
+        return img.crop((0, top, img.width, top + new_height))
+    return img
+
+
+def _sharpen(img: Image.Image) -> Image.Image:
+    return img.filter(ImageFilter.UnsharpMask(radius=1, percent=150, threshold=3))
+
+
+def resize_to_variant(img: Image.Image, width: int, height: int, sharpen: bool = True) -> Image.Image:
+    """Center-crop to the target aspect ratio, LANCZOS-resize and optionally sharpen."""
+    img = _center_crop(img, width / height)
+    img = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+    return _sharpen(img) if sharpen else img
+
+
+def decode_image(source: bytes, specs: Sequence[VariantSpec]) -> Image.Image:
+    """
+    Decode an image, letting the JPEG decoder downscale when every variant is much smaller.
+
+    ``draft`` picks a 1/2, 1/4 or 1/8 DCT scale that still covers the largest
+    variant on the image's shorter side, so rotation by EXIF orientation is safe.
+    """
+    img = Image.open(io.BytesIO(source))
+    if img.format == "JPEG":
+        needed = max(max(spec.width, spec.height) for spec in specs)
+        scale = needed / min(img.width, img.height)
+        if scale < 1:
+            img.draft("RGB", (int(img.width * scale) + 1, int(img.height * scale) + 1))
+
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return img
+
+
+def _write_atomic(img: Image.Image, path: Path, spec: VariantSpec) -> int:
+    """Encode into a temporary file next to the target and rename it over the target."""
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            img.save(handle, spec.format, quality=spec.quality, optimize=True, progressive=True)
+        os.chmod(tmp_name, 0o644)  # mkstemp creates 0600; variants are served as static files
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return path.stat().st_size
+
+
+def derive_variants(source: bytes, specs: Sequence[VariantSpec], output_dir: str) -> list[VariantResult]:
+    """
+    Derive every variant of an image and write it to ``output_dir``.
+
+    Variants sharing an aspect ratio are cropped once and resized progressively
+    from the largest down, each one from the previous (unsharpened) result,
+    instead of from the full original. Upscaled variants never feed smaller ones.
+    Runs in a worker process; results are returned in the order of ``specs``.
+    """
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    with decode_image(source, specs) as img:
+        groups: dict[float | None, list[VariantSpec]] = {}
+        for spec in specs:
+            groups.setdefault(round(spec.width / spec.height, 6) if spec.crop else None, []).append(spec)
+
+        results: dict[VariantSpec, VariantResult] = {}
+        for ratio, group in groups.items():
+            base = _center_crop(img, ratio) if ratio is not None else img
+            source_width, source_height = base.size
+            for spec in sorted(group, key=lambda s: s.width * s.height, reverse=True):
+                width, height = _target_size(spec, source_width, source_height)
+                resized = base.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+                if width <= source_width and height <= source_height:
+                    base = resized
+
+                final = _sharpen(resized) if spec.sharpen else resized
+                file_size = _write_atomic(final, out / spec.filename, spec)
+                results[spec] = VariantResult(spec.name, str(out / spec.filename), width, height, file_size)
+
+    return [results[spec] for spec in specs]
+
+
+class ImageVariantService:
+    """
+    Runs variant derivation in a process pool so image work never blocks the event loop.
+
+    With ``max_workers=0`` the work runs in a thread instead (useful for tests and
+    environments that cannot start worker processes).
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor | None:
+        if self.max_workers <= 0:
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: forking a process that runs an event loop and threads is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    async def derive(self, source: bytes, specs: Sequence[VariantSpec],
+                     output_dir: str | Path) -> list[VariantResult]:
+        """Derive ``specs`` from ``source`` into ``output_dir`` without blocking the loop."""
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(derive_variants, source, tuple(specs), str(output_dir))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, derive_variants, source, tuple(specs), str(output_dir))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_service: ImageVariantService | None = None
+_service_lock = threading.Lock()
+
+
+def get_image_variant_service() -> ImageVariantService:
+    """Return the process-wide image variant service."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from app.core.config import settings
+                _service = ImageVariantService(settings.IMAGE_VARIANT_WORKERS)
+    return _service
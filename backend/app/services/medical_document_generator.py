@@ -3,17 +3,25 @@ Medical Document Generator - Gerador de documentos médicos baseado em diretrize
 Sistema completo para geração de receitas, atestados, relatórios e outros documentos médicos
 """
 
+import asyncio
+import copy
+import html
 import logging
-from dataclasses import dataclass
+import threading
+from collections import ChainMap, OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from typing import Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.services.document_rendering import CompiledTemplate, iter_html, new_document_id, render_pdf
 from app.services.medical_guidelines_engine import (
-    MotorDiretrizesMedicasIA,
-    ValidadorConformidadeDiretrizes)
+    get_motor_diretrizes,
+    get_validador_conformidade)
 
 logger = logging.getLogger(__name__)
 
@@ -36,90 +44,373 @@ class DocumentTemplate:
     optional_fields: list[str]
     validation_rules: dict[str, Any]
     formatting_rules: dict[str, Any]
+    title: str = ""
+    sections: dict[str, str] = field(default_factory=dict)
+    compiled: dict[str, CompiledTemplate] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.compiled = {name: CompiledTemplate(source) for name, source in self.sections.items()}
+
+
+VALIDATION_CACHE_SIZE = 1024
+BATCH_RENDER_CHUNK_SIZE = 50
+
+_HEADER = "{clinic_name}\nDr(a). {physician_name} - CRM: {physician_crm}\n{physician_specialty}\n"
+_SIGNATURE = "\n\n_________________________________\nDr(a). {physician_name}\nCRM: {physician_crm}\n"
+
+@lru_cache(maxsize=1)
+def _default_templates() -> dict[str, DocumentTemplate]:
+    """Templates padrão, construídos e compilados uma vez por processo"""
+    templates = {}
+
+    prescription_template = DocumentTemplate(
+        document_type=DocumentType.PRESCRIPTION,
+        template_name="receita_medica_padrao",
+        required_fields=[
+            "patient_name", "patient_id", "physician_name", "physician_crm",
+            "medications", "date", "diagnosis"
+        ],
+        optional_fields=[
+            "patient_age", "patient_address", "instructions", "return_date"
+        ],
+        validation_rules={
+            "medications": "must_have_name_dose_frequency",
+            "physician_crm": "must_be_valid_crm",
+            "date": "must_be_current_or_future"
+        },
+        formatting_rules={
+            "header": "clinic_letterhead",
+            "font": "Arial 12pt",
+            "margins": "2cm_all_sides",
+            "signature_space": "3cm_bottom"
+        },
+        title="Receita Médica",
+        sections={
+            "header": "\nRECEITA MÉDICA\n\n" + _HEADER,
+            "body": (
+                "\nData: {date}\n\n"
+                "Paciente: {patient_name}\n"
+                "Idade: {patient_age} anos\n"
+                "Endereço: {patient_address}\n\n"
+                "Diagnóstico: {diagnosis}\n\n"
+                "PRESCRIÇÃO:\n"
+            ),
+            "medication": (
+                "\n{index}. {name}\n"
+                "   Dose: {dosage}\n"
+                "   Frequência: {frequency}\n"
+                "   Duração: {duration}\n"
+            ),
+            "instructions": "\nInstruções: {instructions}",
+            "return_date": "\nRetorno: {return_date}",
+            "signature": _SIGNATURE
+        }
+    )
+
+    certificate_template = DocumentTemplate(
+        document_type=DocumentType.MEDICAL_CERTIFICATE,
+        template_name="atestado_medico_padrao",
+        required_fields=[
+            "patient_name", "patient_id", "physician_name", "physician_crm",
+            "condition", "rest_period", "date"
+        ],
+        optional_fields=[
+            "cid_code", "restrictions", "observations"
+        ],
+        validation_rules={
+            "rest_period": "must_be_reasonable_duration",
+            "condition": "must_justify_rest_period"
+        },
+        formatting_rules={
+            "header": "clinic_letterhead",
+            "font": "Arial 12pt",
+            "margins": "2cm_all_sides"
+        },
+        title="Atestado Médico",
+        sections={
+            "header": "\nATESTADO MÉDICO\n\n" + _HEADER,
+            "body": (
+                "\nAtesto para os devidos fins que o(a) paciente {patient_name},\n"
+                "portador(a) do documento de identidade nº {patient_id},\n"
+                "encontra-se sob meus cuidados médicos.\n\n"
+                "Diagnóstico: {condition}\n"
+                "{cid_line}\n\n"
+                "Necessita de afastamento de suas atividades por {rest_period} dias,\n"
+                "a partir de {date}.\n\n"
+                "{restrictions_line}\n"
+                "{observations_line}\n\n"
+                "Data: {date}"
+            ),
+            "signature": _SIGNATURE
+        }
+    )
+
+    exam_request_template = DocumentTemplate(
+        document_type=DocumentType.EXAM_REQUEST,
+        template_name="solicitacao_exames_padrao",
+        required_fields=[
+            "patient_name", "patient_id", "physician_name", "physician_crm",
+            "exams_requested", "clinical_indication", "date"
+        ],
+        optional_fields=[
+            "urgency", "clinical_history", "medications_in_use"
+        ],
+        validation_rules={
+            "exams_requested": "must_be_appropriate_for_indication",
+            "clinical_indication": "must_justify_exams"
+        },
+        formatting_rules={
+            "header": "clinic_letterhead",
+            "font": "Arial 11pt",
+            "margins": "2cm_all_sides"
+        },
+        title="Solicitação de Exames",
+        sections={
+            "header": "\nSOLICITAÇÃO DE EXAMES\n\n" + _HEADER,
+            "body": (
+                "\nData: {date}\n\n"
+                "Paciente: {patient_name}\n"
+                "Idade: {patient_age} anos\n"
+                "Documento: {patient_id}\n\n"
+                "Indicação Clínica: {clinical_indication}\n"
+                "{diagnosis_line}\n\n"
+                "EXAMES SOLICITADOS:\n"
+            ),
+            "exam": "{index}. {name}\n",
+            "justification": "   Justificativa: {justification}\n",
+            "urgency": "\nUrgência: {urgency}",
+            "clinical_history": "\nHistória Clínica: {clinical_history}",
+            "signature": _SIGNATURE
+        }
+    )
+
+    templates["receita_medica"] = prescription_template
+    templates["atestado_medico"] = certificate_template
+    templates["solicitacao_exames"] = exam_request_template
+
+    return templates
+
+def _physician_values(physician_data: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    """Campos do médico usados nos blocos estáticos (chave do cache)"""
+    return (
+        ("clinic_name", str(physician_data.get("clinic_name", "CLÍNICA MÉDICA"))),
+        ("physician_name", str(physician_data.get("name", ""))),
+        ("physician_crm", str(physician_data.get("crm", ""))),
+        ("physician_specialty", str(physician_data.get("specialty", "")))
+    )
+
+@lru_cache(maxsize=512)
+def _static_block(template_key: str, section: str, escaped: bool,
+                  physician_values: tuple[tuple[str, str], ...]) -> str:
+    """Cabeçalho e assinatura do médico, renderizados uma vez por médico e formato"""
+    template = _default_templates()[template_key]
+    return template.compiled[section].render(dict(physician_values), html.escape if escaped else None)
+
+def _optional_line(label: str, value: Any) -> str:
+    return f"{label}: {value}" if value else ""
+
+_validation_cache: OrderedDict = OrderedDict()
+_validation_cache_lock = threading.Lock()
 
 class MedicalDocumentGenerator:
     """Gerador de documentos médicos seguindo diretrizes atualizadas"""
 
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.guidelines_engine = MotorDiretrizesMedicasIA()
-        self.validator = ValidadorConformidadeDiretrizes()
+        self.guidelines_engine = get_motor_diretrizes()
+        self.validator = get_validador_conformidade()
         self.templates = self._initialize_templates()
+        self._composers = {
+            "receita_medica": self._iter_prescription,
+            "atestado_medico": self._iter_certificate,
+            "solicitacao_exames": self._iter_exam_request
+        }
 
     def _initialize_templates(self) -> dict[str, DocumentTemplate]:
-        """Inicializa templates de documentos médicos"""
-        templates = {}
-
-        prescription_template = DocumentTemplate(
-            document_type=DocumentType.PRESCRIPTION,
-            template_name="receita_medica_padrao",
-            required_fields=[
-                "patient_name", "patient_id", "physician_name", "physician_crm",
-                "medications", "date", "diagnosis"
-            ],
-            optional_fields=[
-                "patient_age", "patient_address", "instructions", "return_date"
-            ],
-            validation_rules={
-                "medications": "must_have_name_dose_frequency",
-                "physician_crm": "must_be_valid_crm",
-                "date": "must_be_current_or_future"
-            },
-            formatting_rules={
-                "header": "clinic_letterhead",
-                "font": "Arial 12pt",
-                "margins": "2cm_all_sides",
-                "signature_space": "3cm_bottom"
-            }
-        )
+        """Inicializa templates de documentos médicos (compilados uma vez por processo)"""
+        return dict(_default_templates())
+
+    # === RENDERIZAÇÃO ===
+
+    def iter_render(self, template_key: str, context: dict[str, Any],
+                    output_format: str = "text") -> Iterator[str]:
+        """
+        Renderiza um documento em trechos, sem montar o texto inteiro
+
+        Args:
+            template_key: Chave do template ("receita_medica", "atestado_medico", "solicitacao_exames")
+            context: Dados do documento (patient_data, physician_data e os dados específicos)
+            output_format: "text" ou "html"
+        """
+        if output_format not in ("text", "html"):
+            raise ValueError(f"Formato de streaming não suportado: {output_format}")
+
+        escaped = output_format == "html"
+        chunks = self._composers[template_key](self.templates[template_key], context, escaped)
+        if escaped:
+            return iter_html(chunks, self.templates[template_key].title)
+        return chunks
+
+    def render(self, template_key: str, context: dict[str, Any], output_format: str = "text") -> str | bytes:
+        """Renderiza um documento completo em texto, HTML ou PDF"""
+        if output_format == "pdf":
+            return render_pdf(self.iter_render(template_key, context), self.templates[template_key].title)
+        return "".join(self.iter_render(template_key, context, output_format))
+
+    def _iter_prescription(self, template: DocumentTemplate, context: dict[str, Any],
+                           escaped: bool) -> Iterator[str]:
+        escape = html.escape if escaped else None
+        patient_data = context.get("patient_data", {})
+        physician_data = context.get("physician_data", {})
+        prescription_data = context.get("prescription_data", {})
+        sections = template.compiled
+
+        yield _static_block("receita_medica", "header", escaped, _physician_values(physician_data))
+        yield from sections["body"].iter_render({
+            "date": context.get("date") or datetime.utcnow().strftime('%d/%m/%Y'),
+            "patient_name": patient_data.get("name", ""),
+            "patient_age": patient_data.get("age", ""),
+            "patient_address": patient_data.get("address", ""),
+            "diagnosis": context.get("diagnosis", "")
+        }, escape)
+
+        for index, medication in enumerate(prescription_data.get("medications", []), 1):
+            yield from sections["medication"].iter_render(ChainMap({"index": index}, medication), escape)
 
-        certificate_template = DocumentTemplate(
-            document_type=DocumentType.MEDICAL_CERTIFICATE,
-            template_name="atestado_medico_padrao",
-            required_fields=[
-                "patient_name", "patient_id", "physician_name", "physician_crm",
-                "condition", "rest_period", "date"
-            ],
-            optional_fields=[
-                "cid_code", "restrictions", "observations"
-            ],
-            validation_rules={
-                "rest_period": "must_be_reasonable_duration",
-                "condition": "must_justify_rest_period"
-            },
-            formatting_rules={
-                "header": "clinic_letterhead",
-                "font": "Arial 12pt",
-                "margins": "2cm_all_sides"
-            }
+        if prescription_data.get("instructions"):
+            yield from sections["instructions"].iter_render(prescription_data, escape)
+        if prescription_data.get("return_date"):
+            yield from sections["return_date"].iter_render(prescription_data, escape)
+
+        yield _static_block("receita_medica", "signature", escaped, _physician_values(physician_data))
+
+    def _iter_certificate(self, template: DocumentTemplate, context: dict[str, Any],
+                          escaped: bool) -> Iterator[str]:
+        escape = html.escape if escaped else None
+        patient_data = context.get("patient_data", {})
+        physician_data = context.get("physician_data", {})
+        certificate_data = context.get("certificate_data", {})
+
+        yield _static_block("atestado_medico", "header", escaped, _physician_values(physician_data))
+        yield from template.compiled["body"].iter_render({
+            "date": context.get("date") or datetime.utcnow().strftime('%d/%m/%Y'),
+            "patient_name": patient_data.get("name", ""),
+            "patient_id": patient_data.get("patient_id", ""),
+            "condition": certificate_data.get("condition", ""),
+            "cid_line": _optional_line("CID", certificate_data.get("cid_code")),
+            "rest_period": certificate_data.get("rest_period", ""),
+            "restrictions_line": _optional_line("Restrições", certificate_data.get("restrictions")),
+            "observations_line": _optional_line("Observações", certificate_data.get("observations"))
+        }, escape)
+        yield _static_block("atestado_medico", "signature", escaped, _physician_values(physician_data))
+
+    def _iter_exam_request(self, template: DocumentTemplate, context: dict[str, Any],
+                           escaped: bool) -> Iterator[str]:
+        escape = html.escape if escaped else None
+        patient_data = context.get("patient_data", {})
+        physician_data = context.get("physician_data", {})
+        exam_request_data = context.get("exam_request_data", {})
+        sections = template.compiled
+
+        yield _static_block("solicitacao_exames", "header", escaped, _physician_values(physician_data))
+        yield from sections["body"].iter_render({
+            "date": context.get("date") or datetime.utcnow().strftime('%d/%m/%Y'),
+            "patient_name": patient_data.get("name", ""),
+            "patient_age": patient_data.get("age", ""),
+            "patient_id": patient_data.get("patient_id", ""),
+            "clinical_indication": exam_request_data.get("clinical_indication", ""),
+            "diagnosis_line": _optional_line("Diagnóstico", context.get("diagnosis"))
+        }, escape)
+
+        for index, exam in enumerate(exam_request_data.get("exams", []), 1):
+            yield from sections["exam"].iter_render(ChainMap({"index": index}, exam), escape)
+            if exam.get("justification"):
+                yield from sections["justification"].iter_render(exam, escape)
+
+        urgency = exam_request_data.get("urgency")
+        if urgency and urgency != "routine":
+            yield from sections["urgency"].iter_render({"urgency": str(urgency).upper()}, escape)
+        if exam_request_data.get("clinical_history"):
+            yield from sections["clinical_history"].iter_render(exam_request_data, escape)
+
+        yield _static_block("solicitacao_exames", "signature", escaped, _physician_values(physician_data))
+
+    # === VALIDAÇÃO ===
+
+    async def _validate_prescription(self, prescription_data: dict[str, Any], diagnosis: str) -> dict[str, Any]:
+        """
+        Valida a prescrição contra as diretrizes, com cache por versão das diretrizes
+
+        O resultado depende apenas do diagnóstico e dos nomes dos medicamentos;
+        recarregar as diretrizes muda a versão e invalida o cache.
+        """
+        key = self._validation_key(prescription_data, diagnosis)
+        with _validation_cache_lock:
+            cached = _validation_cache.get(key)
+            if cached is not None:
+                _validation_cache.move_to_end(key)
+                return copy.deepcopy(cached)
+
+        result = await self.validator.validar_acao_medica(
+            acao=prescription_data,
+            tipo_acao="prescricao",
+            diagnostico=diagnosis
         )
 
-        exam_request_template = DocumentTemplate(
-            document_type=DocumentType.EXAM_REQUEST,
-            template_name="solicitacao_exames_padrao",
-            required_fields=[
-                "patient_name", "patient_id", "physician_name", "physician_crm",
-                "exams_requested", "clinical_indication", "date"
-            ],
-            optional_fields=[
-                "urgency", "clinical_history", "medications_in_use"
-            ],
-            validation_rules={
-                "exams_requested": "must_be_appropriate_for_indication",
-                "clinical_indication": "must_justify_exams"
-            },
-            formatting_rules={
-                "header": "clinic_letterhead",
-                "font": "Arial 11pt",
-                "margins": "2cm_all_sides"
-            }
+        if result.get("status") != "erro":
+            with _validation_cache_lock:
+                _validation_cache[key] = copy.deepcopy(result)
+                _validation_cache.move_to_end(key)
+                while len(_validation_cache) > VALIDATION_CACHE_SIZE:
+                    _validation_cache.popitem(last=False)
+        return result
+
+    def _validation_key(self, prescription_data: dict[str, Any], diagnosis: str) -> tuple:
+        versao = self.validator.motor_diretrizes.store.indice.versao
+        medications = tuple(
+            str(med.get("name", "")).lower() for med in prescription_data.get("medications", [])
         )
+        return versao, diagnosis, medications
 
-        templates["receita_medica"] = prescription_template
-        templates["atestado_medico"] = certificate_template
-        templates["solicitacao_exames"] = exam_request_template
+    # === DOCUMENTOS ===
 
-        return templates
+    def _build_prescription_document(
+        self,
+        patient_data: dict[str, Any],
+        physician_data: dict[str, Any],
+        prescription_data: dict[str, Any],
+        diagnosis: str,
+        guidelines_validation: dict[str, Any]
+    ) -> dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "document_type": DocumentType.PRESCRIPTION,
+            "document_id": new_document_id("RX", now),
+            "generated_at": now.isoformat(),
+            "patient_info": {
+                "name": patient_data.get("name", ""),
+                "patient_id": patient_data.get("patient_id", ""),
+                "age": patient_data.get("age", ""),
+                "address": patient_data.get("address", "")
+            },
+            "physician_info": {
+                "name": physician_data.get("name", ""),
+                "crm": physician_data.get("crm", ""),
+                "specialty": physician_data.get("specialty", ""),
+                "clinic_name": physician_data.get("clinic_name", "")
+            },
+            "prescription_content": {
+                "diagnosis": diagnosis,
+                "medications": prescription_data.get("medications", []),
+                "instructions": prescription_data.get("instructions", ""),
+                "return_date": prescription_data.get("return_date", "")
+            },
+            "guidelines_compliance": guidelines_validation,
+            "formatted_content": self._format_prescription_content(
+                patient_data, physician_data, prescription_data, diagnosis
+            ),
+            "validation_status": "approved" if guidelines_validation.get("conformidade", 0) >= 70 else "review_required"
+        }
 
     async def generate_prescription_document(
         self,
@@ -130,41 +421,11 @@ class MedicalDocumentGenerator:
     ) -> dict[str, Any]:
         """Gera receita médica formatada seguindo diretrizes"""
         try:
-            guidelines_validation = await self.validator.validar_acao_medica(
-                acao=prescription_data,
-                tipo_acao="prescricao",
-                diagnostico=diagnosis
+            guidelines_validation = await self._validate_prescription(prescription_data, diagnosis)
+            document = self._build_prescription_document(
+                patient_data, physician_data, prescription_data, diagnosis, guidelines_validation
             )
 
-            document = {
-                "document_type": DocumentType.PRESCRIPTION,
-                "document_id": f"RX_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
-                "generated_at": datetime.utcnow().isoformat(),
-                "patient_info": {
-                    "name": patient_data.get("name", ""),
-                    "patient_id": patient_data.get("patient_id", ""),
-                    "age": patient_data.get("age", ""),
-                    "address": patient_data.get("address", "")
-                },
-                "physician_info": {
-                    "name": physician_data.get("name", ""),
-                    "crm": physician_data.get("crm", ""),
-                    "specialty": physician_data.get("specialty", ""),
-                    "clinic_name": physician_data.get("clinic_name", "")
-                },
-                "prescription_content": {
-                    "diagnosis": diagnosis,
-                    "medications": prescription_data.get("medications", []),
-                    "instructions": prescription_data.get("instructions", ""),
-                    "return_date": prescription_data.get("return_date", "")
-                },
-                "guidelines_compliance": guidelines_validation,
-                "formatted_content": self._format_prescription_content(
-                    patient_data, physician_data, prescription_data, diagnosis
-                ),
-                "validation_status": "approved" if guidelines_validation.get("conformidade", 0) >= 70 else "review_required"
-            }
-
             logger.info(f"Generated prescription document: {document['document_id']}")
             return document
 
@@ -172,6 +433,60 @@ class MedicalDocumentGenerator:
             logger.error(f"Error generating prescription document: {str(e)}")
             raise
 
+    async def generate_prescription_batch(
+        self,
+        prescriptions: list[dict[str, Any]],
+        chunk_size: int = BATCH_RENDER_CHUNK_SIZE
+    ) -> list[dict[str, Any]]:
+        """
+        Gera receitas em lote (ex.: todas as receitas de alta de uma enfermaria)
+
+        Cada item tem ``patient_data``, ``physician_data``, ``prescription_data`` e
+        opcionalmente ``diagnosis``. Cada combinação distinta de diagnóstico e
+        medicamentos é validada uma única vez.
+
+        A renderização é Python puro e segura o GIL, então threads paralelas não
+        a aceleram: os blocos de ``chunk_size`` rodam um após o outro em uma
+        thread de trabalho apenas para não bloquear o event loop (e permitir
+        cancelar o lote entre blocos).
+
+        Returns:
+            Documentos na mesma ordem da entrada
+        """
+        keys = [
+            self._validation_key(item.get("prescription_data", {}), item.get("diagnosis", ""))
+            for item in prescriptions
+        ]
+        unique = {}
+        for key, item in zip(keys, prescriptions):
+            unique.setdefault(key, item)
+
+        results = await asyncio.gather(*(
+            self._validate_prescription(item.get("prescription_data", {}), item.get("diagnosis", ""))
+            for item in unique.values()
+        ))
+        validations = dict(zip(unique, results))
+
+        def build(chunk: list[tuple[tuple, dict[str, Any]]]) -> list[dict[str, Any]]:
+            return [
+                self._build_prescription_document(
+                    item.get("patient_data", {}),
+                    item.get("physician_data", {}),
+                    item.get("prescription_data", {}),
+                    item.get("diagnosis", ""),
+                    copy.deepcopy(validations[key])
+                )
+                for key, item in chunk
+            ]
+
+        pairs = list(zip(keys, prescriptions))
+        documents = []
+        for start in range(0, len(pairs), chunk_size):
+            documents.extend(await asyncio.to_thread(build, pairs[start:start + chunk_size]))
+
+        logger.info(f"Generated {len(documents)} prescription documents ({len(unique)} distinct validations)")
+        return documents
+
     def _format_prescription_content(
         self,
         patient_data: dict[str, Any],
@@ -180,48 +495,12 @@ class MedicalDocumentGenerator:
         diagnosis: str
     ) -> str:
         """Formata conteúdo da receita médica"""
-
-        content = f"""
-RECEITA MÉDICA
-
-{physician_data.get('clinic_name', 'CLÍNICA MÉDICA')}
-Dr(a). {physician_data.get('name', '')} - CRM: {physician_data.get('crm', '')}
-{physician_data.get('specialty', '')}
-
-Data: {datetime.utcnow().strftime('%d/%m/%Y')}
-
-Paciente: {patient_data.get('name', '')}
-Idade: {patient_data.get('age', '')} anos
-Endereço: {patient_data.get('address', '')}
-
-Diagnóstico: {diagnosis}
-
-PRESCRIÇÃO:
-"""
-
-        medications = prescription_data.get("medications", [])
-        for i, med in enumerate(medications, 1):
-            content += f"""
-{i}. {med.get('name', '')}
-   Dose: {med.get('dosage', '')}
-   Frequência: {med.get('frequency', '')}
-   Duração: {med.get('duration', '')}
-"""
-
-        if prescription_data.get("instructions"):
-            content += f"\nInstruções: {prescription_data.get('instructions')}"
-
-        if prescription_data.get("return_date"):
-            content += f"\nRetorno: {prescription_data.get('return_date')}"
-
-        content += f"""
-
-_________________________________
-Dr(a). {physician_data.get('name', '')}
-CRM: {physician_data.get('crm', '')}
-"""
-
-        return content
+        return self.render("receita_medica", {
+            "patient_data": patient_data,
+            "physician_data": physician_data,
+            "prescription_data": prescription_data,
+            "diagnosis": diagnosis
+        })
 
     async def generate_medical_certificate(
         self,
@@ -231,10 +510,11 @@ CRM: {physician_data.get('crm', '')}
     ) -> dict[str, Any]:
         """Gera atestado médico"""
         try:
+            now = datetime.utcnow()
             document = {
                 "document_type": DocumentType.MEDICAL_CERTIFICATE,
-                "document_id": f"AT_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
-                "generated_at": datetime.utcnow().isoformat(),
+                "document_id": new_document_id("AT", now),
+                "generated_at": now.isoformat(),
                 "patient_info": {
                     "name": patient_data.get("name", ""),
                     "patient_id": patient_data.get("patient_id", ""),
@@ -271,35 +551,11 @@ CRM: {physician_data.get('crm', '')}
         certificate_data: dict[str, Any]
     ) -> str:
         """Formata conteúdo do atestado médico"""
-
-        content = f"""
-ATESTADO MÉDICO
-
-{physician_data.get('clinic_name', 'CLÍNICA MÉDICA')}
-Dr(a). {physician_data.get('name', '')} - CRM: {physician_data.get('crm', '')}
-{physician_data.get('specialty', '')}
-
-Atesto para os devidos fins que o(a) paciente {patient_data.get('name', '')},
-portador(a) do documento de identidade nº {patient_data.get('patient_id', '')},
-encontra-se sob meus cuidados médicos.
-
-Diagnóstico: {certificate_data.get('condition', '')}
-{f"CID: {certificate_data.get('cid_code', '')}" if certificate_data.get('cid_code') else ""}
-
-Necessita de afastamento de suas atividades por {certificate_data.get('rest_period', '')} dias,
-a partir de {datetime.utcnow().strftime('%d/%m/%Y')}.
-
-{f"Restrições: {certificate_data.get('restrictions', '')}" if certificate_data.get('restrictions') else ""}
-{f"Observações: {certificate_data.get('observations', '')}" if certificate_data.get('observations') else ""}
-
-Data: {datetime.utcnow().strftime('%d/%m/%Y')}
-
-_________________________________
-Dr(a). {physician_data.get('name', '')}
-CRM: {physician_data.get('crm', '')}
-"""
-
-        return content
+        return self.render("atestado_medico", {
+            "patient_data": patient_data,
+            "physician_data": physician_data,
+            "certificate_data": certificate_data
+        })
 
     async def generate_exam_request_document(
         self,
@@ -317,10 +573,11 @@ CRM: {physician_data.get('crm', '')}
                 )
                 exams_validation.append(validation)
 
+            now = datetime.utcnow()
             document = {
                 "document_type": DocumentType.EXAM_REQUEST,
-                "document_id": f"EX_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
-                "generated_at": datetime.utcnow().isoformat(),
+                "document_id": new_document_id("EX", now),
+                "generated_at": now.isoformat(),
                 "patient_info": {
                     "name": patient_data.get("name", ""),
                     "patient_id": patient_data.get("patient_id", ""),
@@ -371,44 +628,9 @@ CRM: {physician_data.get('crm', '')}
         diagnosis: str
     ) -> str:
         """Formata conteúdo da solicitação de exames"""
-
-        content = f"""
-SOLICITAÇÃO DE EXAMES
-
-{physician_data.get('clinic_name', 'CLÍNICA MÉDICA')}
-Dr(a). {physician_data.get('name', '')} - CRM: {physician_data.get('crm', '')}
-{physician_data.get('specialty', '')}
-
-Data: {datetime.utcnow().strftime('%d/%m/%Y')}
-
-Paciente: {patient_data.get('name', '')}
-Idade: {patient_data.get('age', '')} anos
-Documento: {patient_data.get('patient_id', '')}
-
-Indicação Clínica: {exam_request_data.get('clinical_indication', '')}
-{f"Diagnóstico: {diagnosis}" if diagnosis else ""}
-
-EXAMES SOLICITADOS:
-"""
-
-        exams = exam_request_data.get("exams", [])
-        for i, exam in enumerate(exams, 1):
-            content += f"{i}. {exam.get('name', '')}\n"
-            if exam.get('justification'):
-                content += f"   Justificativa: {exam.get('justification')}\n"
-
-        urgency = exam_request_data.get("urgency")
-        if urgency and urgency != "routine":
-            content += f"\nUrgência: {str(urgency).upper()}"
-
-        if exam_request_data.get("clinical_history"):
-            content += f"\nHistória Clínica: {exam_request_data.get('clinical_history')}"
-
-        content += f"""
-
-_________________________________
-Dr(a). {physician_data.get('name', '')}
-CRM: {physician_data.get('crm', '')}
-"""
-
-        return content
+        return self.render("solicitacao_exames", {
+            "patient_data": patient_data,
+            "physician_data": physician_data,
+            "exam_request_data": exam_request_data,
+            "diagnosis": diagnosis
+        })
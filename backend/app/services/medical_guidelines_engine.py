@@ -4,11 +4,15 @@ Integração otimizada para o sistema medai seguindo as diretrizes médicas mais
 """
 
 import logging
+from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from typing import Any
 
+from app.services.guideline_store import GuidelineStore, get_guideline_store
+
 logger = logging.getLogger(__name__)
 
 class GuidelineSource(Enum):
@@ -49,110 +53,29 @@ class DiretrizMedica:
 class MotorDiretrizesMedicasIA:
     """Motor principal de diretrizes médicas com IA para medai"""
 
-    def __init__(self):
-        self.diretrizes_cache: dict[str, DiretrizMedica] = {}
-        self.diretrizes_por_condicao: dict[str, list[str]] = {}
-        self._inicializar_diretrizes_basicas()
-
-    def _inicializar_diretrizes_basicas(self):
-        """Inicializa diretrizes básicas para condições comuns"""
-
-        diabetes_diretriz = DiretrizMedica(
-            id="DM2_SBD_2023",
-            titulo="Diretrizes da Sociedade Brasileira de Diabetes 2023-2024",
-            especialidade="endocrinologia",
-            fonte=GuidelineSource.SBD,
-            versao="2023-2024",
-            data_atualizacao=datetime(2023, 12, 1),
-            nivel_evidencia="A",
-            grau_recomendacao="I",
-            conteudo={
-                "primeira_linha": {
-                    "medicamentos": ["metformina"],
-                    "dose_inicial": "500mg 2x/dia",
-                    "titulacao": "Aumentar 500mg/semana até 2000mg/dia",
-                    "meta_hba1c": "<7%",
-                    "contraindicacoes": ["TFG <30 mL/min/1.73m²", "acidose metabólica"]
-                },
-                "segunda_linha": {
-                    "opcoes": ["sulfoniluréia", "iDPP4", "iSGLT2", "agonista_GLP1"],
-                    "criterios_escolha": {
-                        "cardiovascular_alto_risco": "iSGLT2 ou agonista_GLP1",
-                        "insuficiencia_cardiaca": "iSGLT2",
-                        "doenca_renal_cronica": "iSGLT2 ou agonista_GLP1"
-                    }
-                },
-                "monitoramento": {
-                    "hba1c": "3-6 meses",
-                    "funcao_renal": "anual ou conforme indicação",
-                    "lipidograma": "anual",
-                    "microalbuminuria": "anual"
-                }
-            },
-            referencias=[
-                "Diretrizes da Sociedade Brasileira de Diabetes 2023-2024",
-                "Posicionamento Oficial SBD nº 01/2023"
-            ]
-        )
-
-        has_diretriz = DiretrizMedica(
-            id="HAS_SBC_2020",
-            titulo="7ª Diretriz Brasileira de Hipertensão Arterial",
-            especialidade="cardiologia",
-            fonte=GuidelineSource.SBC,
-            versao="2020",
-            data_atualizacao=datetime(2020, 9, 1),
-            nivel_evidencia="A",
-            grau_recomendacao="I",
-            conteudo={
-                "primeira_linha": {
-                    "medicamentos": ["IECA", "BRA", "diurético_tiazídico", "bloqueador_canal_cálcio"],
-                    "monoterapia": "PA <150/90 mmHg em idosos, <140/90 em adultos",
-                    "terapia_combinada": "PA ≥160/100 ou PA ≥140/90 com risco cardiovascular alto"
-                },
-                "combinacoes_preferenciais": [
-                    "IECA + diurético",
-                    "BRA + diurético",
-                    "IECA + bloqueador_canal_cálcio",
-                    "BRA + bloqueador_canal_cálcio"
-                ],
-                "metas": {
-                    "adultos": "<140/90 mmHg",
-                    "idosos": "<150/90 mmHg",
-                    "diabetes": "<130/80 mmHg",
-                    "doenca_renal": "<130/80 mmHg"
-                }
-            },
-            referencias=[
-                "Arq Bras Cardiol. 2021; 116(4):635-659",
-                "7ª Diretriz Brasileira de Hipertensão Arterial"
-            ]
-        )
+    def __init__(self, store: GuidelineStore | None = None):
+        self.store = store or get_guideline_store()
 
-        self.diretrizes_cache["DM2_SBD_2023"] = diabetes_diretriz
-        self.diretrizes_cache["HAS_SBC_2020"] = has_diretriz
+    @property
+    def diretrizes_cache(self) -> Mapping[str, DiretrizMedica]:
+        """Diretrizes indexadas por ID (somente leitura)"""
+        return self.store.indice.diretrizes
 
-        self.diretrizes_por_condicao = {
-            "diabetes_mellitus_tipo_2": ["DM2_SBD_2023"],
-            "diabetes_tipo_2": ["DM2_SBD_2023"],
-            "dm2": ["DM2_SBD_2023"],
-            "hipertensao_arterial": ["HAS_SBC_2020"],
-            "hipertensao": ["HAS_SBC_2020"],
-            "has": ["HAS_SBC_2020"]
-        }
+    @property
+    def diretrizes_por_condicao(self) -> Mapping[str, tuple[str, ...]]:
+        """Condições e sinônimos normalizados mapeados para IDs de diretrizes"""
+        return self.store.indice.por_condicao
 
     async def obter_diretriz_para_condicao(self,
                                           condicao: str,
                                           contexto_paciente: dict[str, Any]) -> DiretrizMedica | None:
-        """Obtém a melhor diretriz para uma condição específica"""
+        """Obtém a melhor diretriz para uma condição, sinônimo ou código CID-10"""
         try:
-            condicao_normalizada = condicao.lower().replace(" ", "_")
-
-            if condicao_normalizada in self.diretrizes_por_condicao:
-                diretriz_ids = self.diretrizes_por_condicao[condicao_normalizada]
+            indice = self.store.indice
+            diretriz_ids = indice.resolver(condicao)
 
-                if diretriz_ids:
-                    return self.diretrizes_cache.get(diretriz_ids[0])
+            if diretriz_ids:
+                return indice.diretrizes.get(diretriz_ids[0])
 
             logger.warning(f"Nenhuma diretriz encontrada para condição: {condicao}")
             return None
@@ -185,12 +108,11 @@ class MotorDiretrizesMedicasIA:
             alertas = []
             recomendacoes = []
 
-            medicamentos_conformes = []
-            for med_prescrito in medicamentos_prescritos:
-                for med_diretriz in medicamentos_primeira_linha:
-                    if med_diretriz.lower() in med_prescrito or med_prescrito in med_diretriz.lower():
-                        medicamentos_conformes.append(med_prescrito)
-                        break
+            indice = self.store.indice
+            medicamentos_conformes = [
+                med_prescrito for med_prescrito in medicamentos_prescritos
+                if indice.linha_do_medicamento(diretriz.id, med_prescrito) == "primeira_linha"
+            ]
 
             if medicamentos_conformes:
                 conformidade_score = len(medicamentos_conformes) / len(medicamentos_prescritos)
@@ -231,90 +153,28 @@ class MotorDiretrizesMedicasIA:
 class SolicitacaoExamesBaseadaDiretrizes:
     """Sistema para solicitar exames seguindo protocolos atualizados"""
 
-    def __init__(self):
-        self.protocolos_exames = self._inicializar_protocolos()
-
-    def _inicializar_protocolos(self) -> dict[str, dict[str, Any]]:
-        """Inicializa protocolos de exames por condição"""
-        return {
-            "diabetes_mellitus_tipo_2": {
-                "exames_iniciais": [
-                    {
-                        "nome": "Hemoglobina Glicada (HbA1c)",
-                        "justificativa": "Avaliação do controle glicêmico nos últimos 2-3 meses",
-                        "periodicidade": "3-6 meses",
-                        "meta": "<7% para maioria dos adultos"
-                    },
-                    {
-                        "nome": "Glicemia de Jejum",
-                        "justificativa": "Avaliação complementar do controle glicêmico",
-                        "periodicidade": "Conforme indicação clínica"
-                    },
-                    {
-                        "nome": "Creatinina e TFG",
-                        "justificativa": "Avaliação da função renal",
-                        "periodicidade": "Anual ou conforme indicação"
-                    },
-                    {
-                        "nome": "Microalbuminúria",
-                        "justificativa": "Rastreamento de nefropatia diabética",
-                        "periodicidade": "Anual"
-                    }
-                ],
-                "exames_complementares": [
-                    {
-                        "nome": "Lipidograma",
-                        "justificativa": "Avaliação do risco cardiovascular",
-                        "periodicidade": "Anual"
-                    },
-                    {
-                        "nome": "Fundoscopia",
-                        "justificativa": "Rastreamento de retinopatia diabética",
-                        "periodicidade": "Anual"
-                    }
-                ]
-            },
-            "hipertensao_arterial": {
-                "exames_iniciais": [
-                    {
-                        "nome": "ECG de Repouso",
-                        "justificativa": "Avaliação de lesão de órgão-alvo cardíaco",
-                        "periodicidade": "Inicial e conforme indicação"
-                    },
-                    {
-                        "nome": "Creatinina e TFG",
-                        "justificativa": "Avaliação da função renal",
-                        "periodicidade": "Anual"
-                    },
-                    {
-                        "nome": "Potássio sérico",
-                        "justificativa": "Avaliação eletrolítica, especialmente com diuréticos",
-                        "periodicidade": "Conforme medicação"
-                    }
-                ],
-                "exames_complementares": [
-                    {
-                        "nome": "Ecocardiograma",
-                        "justificativa": "Avaliação de hipertrofia ventricular esquerda",
-                        "periodicidade": "Conforme indicação clínica"
-                    },
-                    {
-                        "nome": "Microalbuminúria",
-                        "justificativa": "Avaliação de lesão renal precoce",
-                        "periodicidade": "Anual em casos selecionados"
-                    }
-                ]
-            }
-        }
+    def __init__(self, store: GuidelineStore | None = None):
+        self.store = store or get_guideline_store()
+
+    @property
+    def protocolos_exames(self) -> Mapping[str, Mapping[str, Any]]:
+        """Protocolos de exames indexados pelo ID da diretriz de origem"""
+        return self.store.indice.protocolos_exames
 
     async def sugerir_exames(self,
                             diagnostico: str,
                             contexto_clinico: dict[str, Any]) -> dict[str, Any]:
         """Sugere exames baseados em protocolos atualizados"""
         try:
-            diagnostico_normalizado = diagnostico.lower().replace(" ", "_")
-
-            if diagnostico_normalizado not in self.protocolos_exames:
+            indice = self.store.indice
+            protocolo = next(
+                (indice.protocolos_exames[diretriz_id]
+                 for diretriz_id in indice.resolver(diagnostico)
+                 if diretriz_id in indice.protocolos_exames),
+                None
+            )
+
+            if protocolo is None:
                 return {
                     "exames_essenciais": [],
                     "exames_complementares": [],
@@ -322,14 +182,12 @@ class SolicitacaoExamesBaseadaDiretrizes:
                     "alertas": [f"Protocolo não encontrado para {diagnostico}"]
                 }
 
-            protocolo = self.protocolos_exames[diagnostico_normalizado]
-
             return {
-                "exames_essenciais": protocolo.get("exames_iniciais", []),
-                "exames_complementares": protocolo.get("exames_complementares", []),
+                "exames_essenciais": list(protocolo.get("exames_iniciais", [])),
+                "exames_complementares": list(protocolo.get("exames_complementares", [])),
                 "justificativas": self._gerar_justificativas_baseadas_evidencia(protocolo),
                 "alertas": [],
-                "protocolo_aplicado": diagnostico_normalizado
+                "protocolo_aplicado": protocolo["condicao"]
             }
 
         except Exception as e:
@@ -341,7 +199,7 @@ class SolicitacaoExamesBaseadaDiretrizes:
                 "alertas": [f"Erro ao processar sugestão: {str(e)}"]
             }
 
-    def _gerar_justificativas_baseadas_evidencia(self, protocolo: dict[str, Any]) -> list[str]:
+    def _gerar_justificativas_baseadas_evidencia(self, protocolo: Mapping[str, Any]) -> list[str]:
         """Gera justificativas baseadas em evidências"""
         justificativas = []
 
@@ -353,8 +211,8 @@ class SolicitacaoExamesBaseadaDiretrizes:
 class ValidadorConformidadeDiretrizes:
     """Valida se as ações médicas seguem diretrizes atualizadas"""
 
-    def __init__(self):
-        self.motor_diretrizes = MotorDiretrizesMedicasIA()
+    def __init__(self, motor_diretrizes: MotorDiretrizesMedicasIA | None = None):
+        self.motor_diretrizes = motor_diretrizes or get_motor_diretrizes()
 
     async def validar_acao_medica(self,
                                   acao: dict[str, Any],
@@ -383,4 +241,19 @@ class ValidadorConformidadeDiretrizes:
                 "recomendacoes": []
             }
 
+@lru_cache(maxsize=1)
+def get_motor_diretrizes() -> MotorDiretrizesMedicasIA:
+    """Motor de diretrizes compartilhado pelo processo (sem estado além do repositório)"""
+    return MotorDiretrizesMedicasIA()
+
+@lru_cache(maxsize=1)
+def get_validador_conformidade() -> ValidadorConformidadeDiretrizes:
+    """Validador de conformidade compartilhado pelo processo"""
+    return ValidadorConformidadeDiretrizes()
+
+@lru_cache(maxsize=1)
+def get_solicitacao_exames() -> SolicitacaoExamesBaseadaDiretrizes:
+    """Sugestor de exames compartilhado pelo processo"""
+    return SolicitacaoExamesBaseadaDiretrizes()
+
 MedicalGuidelinesEngine = MotorDiretrizesMedicasIA
@@ -5,17 +5,19 @@ Integrado com sistema de diretrizes médicas e validação de conformidade.
 """
 
 import logging
+from collections.abc import AsyncIterator
 from datetime import datetime
 from enum import Enum
 from typing import Any, cast
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.repositories.medical_history_repository import DEFAULT_PAGE_SIZE, MedicalHistoryRepository
 from app.repositories.patient_repository import PatientRepository
 from app.services.medical_document_generator import MedicalDocumentGenerator
 from app.services.medical_guidelines_engine import (
-    MotorDiretrizesMedicasIA,
-    ValidadorConformidadeDiretrizes)
+    get_motor_diretrizes,
+    get_validador_conformidade)
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +46,9 @@ class MedicalRecordService:
     def __init__(self, db: AsyncSession) -> None:
         self.db = db
         self.patient_repository = PatientRepository(db)
-        self.guidelines_engine = MotorDiretrizesMedicasIA()
-        self.validator = ValidadorConformidadeDiretrizes()
+        self.history_repository = MedicalHistoryRepository(db)
+        self.guidelines_engine = get_motor_diretrizes()
+        self.validator = get_validador_conformidade()
         self.document_generator = MedicalDocumentGenerator(db)
 
     async def create_medical_record(
@@ -193,36 +196,72 @@ class MedicalRecordService:
         self,
         patient_id: str,
         record_types: list[RecordType] | None = None,
-        limit: int = 100
+        limit: int = 100,
+        cursor: str | None = None,
+        fields: list[str] | None = None,
+        include_summary: bool | None = None
     ) -> dict[str, Any]:
-        """Get comprehensive medical history for a patient."""
+        """
+        Get one chronological page (newest first) of a patient's medical history.
+
+        ``limit`` is the page size; pass the returned ``next_cursor`` back as
+        ``cursor`` for the following page. ``records_summary`` is computed by
+        an aggregate query and, unless requested, only on the first page.
+        """
         try:
             patient = await self.patient_repository.get_patient_by_patient_id(patient_id)
             if not patient:
                 raise ValueError(f"Patient {patient_id} not found")
 
+            types = [RecordType(record_type).value for record_type in record_types] if record_types else None
+            if include_summary is None:
+                include_summary = cursor is None
+
+            page = await self.history_repository.get_page(
+                patient.id, record_types=types, fields=fields, cursor=cursor, page_size=limit
+            )
+            records = page["records"]
+            for record in records:
+                if isinstance(record.get("occurred_at"), datetime):
+                    record["occurred_at"] = record["occurred_at"].isoformat()
+
             medical_history = {
                 "patient_id": patient_id,
                 "patient_name": f"{patient.first_name} {patient.last_name}",
                 "generated_at": datetime.utcnow().isoformat(),
-                "records_summary": {
-                    "total_records": 0,
-                    "by_type": {},
-                    "date_range": {
-                        "earliest": None,
-                        "latest": None
-                    }
-                },
-                "records": []
+                "records": records,
+                "next_cursor": page["next_cursor"]
             }
+            if include_summary:
+                medical_history["records_summary"] = await self.history_repository.get_summary(
+                    patient.id, record_types=types
+                )
 
-            logger.info(f"Retrieved medical history for patient {patient_id}")
+            logger.info(f"Retrieved medical history page for patient {patient_id} ({len(records)} records)")
             return medical_history
 
         except Exception as e:
             logger.error(f"Error retrieving medical history: {str(e)}")
             raise
 
+    async def stream_patient_medical_history(
+        self,
+        patient_id: str,
+        record_types: list[RecordType] | None = None,
+        fields: list[str] | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Yield the whole medical history page by page, newest first."""
+        patient = await self.patient_repository.get_patient_by_patient_id(patient_id)
+        if not patient:
+            raise ValueError(f"Patient {patient_id} not found")
+
+        types = [RecordType(record_type).value for record_type in record_types] if record_types else None
+        async for records in self.history_repository.iter_pages(
+            patient.id, record_types=types, fields=fields, page_size=page_size
+        ):
+            yield records
+
     async def _validate_against_guidelines(
         self,
         record: dict[str, Any],
@@ -6,6 +6,8 @@ import pickle
 import joblib
 import numpy as np
 import asyncio
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Union, Tuple
 from pathlib import Path
@@ -20,7 +22,9 @@ from app.core.exceptions import (
     ModelNotFoundError, ModelLoadError, InferenceError,
     ConfigurationError
 )
-from app.utils.logging_config import get_ai_logger, log_ai_operation
+from app.monitoring.metrics import pipeline_stage
+from app.monitoring.logging_config import get_ai_logger, log_ai_operation
+from app.monitoring.memory import get_memory_monitor
 from app.services.validation_service import ValidationService
 
 logger = get_ai_logger()
@@ -59,7 +63,11 @@ class BaseMLModel(ABC):
         self.model = None
         self.is_loaded = False
         self.load_time = None
+        self.last_used = None
         self.usage_count = 0
+        # Predições em andamento: o monitor de memória só descarrega modelos ociosos
+        self._users = 0
+        self._users_lock = threading.Lock()
     
     @abstractmethod
     async def load(self) -> None:
@@ -86,6 +94,25 @@ class BaseMLModel(ABC):
         self.model = None
         self.is_loaded = False
     
+    @contextmanager
+    def in_use(self):
+        """Marca o modelo como em uso durante uma predição"""
+        with self._users_lock:
+            self._users += 1
+        try:
+            yield self
+        finally:
+            with self._users_lock:
+                self._users -= 1
+    
+    def unload_if_idle(self) -> bool:
+        """Descarrega o modelo se nenhuma predição o estiver usando"""
+        with self._users_lock:
+            if self._users:
+                return False
+            self.unload()
+            return True
+    
     def get_info(self) -> ModelInfo:
         """Retorna informações do modelo"""
         model_path = Path(self.config.get("path", ""))
@@ -98,7 +125,7 @@ class BaseMLModel(ABC):
             path=str(model_path),
             size_mb=round(size_mb, 2),
             loaded_at=self.load_time,
-            last_used=None,  # Seria rastreado em produção
+            last_used=self.last_used,
             usage_count=self.usage_count,
             performance_metrics=self.config.get("performance_metrics", {})
         )
@@ -162,17 +189,20 @@ class DiagnosticModel(BaseMLModel):
         
         try:
             # Pré-processar dados
-            processed_input = self.preprocess(input_data)
+            with pipeline_stage("preprocess", self.name):
+                processed_input = self.preprocess(input_data)
             
             # Executar inferência
-            if isinstance(self.model, dict) and self.model.get("type") == "mock_diagnostic":
-                raw_output = self._mock_predict(processed_input, input_data)
-            else:
-                # Inferência real do modelo
-                raw_output = self.model.predict(processed_input)
+            with pipeline_stage("inference", self.name):
+                if isinstance(self.model, dict) and self.model.get("type") == "mock_diagnostic":
+                    raw_output = self._mock_predict(processed_input, input_data)
+                else:
+                    # Inferência real do modelo
+                    raw_output = self.model.predict(processed_input)
             
             # Pós-processar resultado
-            result = self.postprocess(raw_output, input_data)
+            with pipeline_stage("postprocess", self.name):
+                result = self.postprocess(raw_output, input_data)
             
             return result
             
@@ -319,14 +349,17 @@ class MultiPathologyModel(BaseMLModel):
         self.usage_count += 1
         
         try:
-            processed_input = self.preprocess(input_data)
+            with pipeline_stage("preprocess", self.name):
+                processed_input = self.preprocess(input_data)
             
-            if isinstance(self.model, dict) and self.model.get("type") == "mock_multi_pathology":
-                raw_output = self._mock_predict_multi(processed_input, input_data)
-            else:
-                raw_output = self.model.predict(processed_input)
+            with pipeline_stage("inference", self.name):
+                if isinstance(self.model, dict) and self.model.get("type") == "mock_multi_pathology":
+                    raw_output = self._mock_predict_multi(processed_input, input_data)
+                else:
+                    raw_output = self.model.predict(processed_input)
             
-            result = self.postprocess(raw_output, input_data)
+            with pipeline_stage("postprocess", self.name):
+                result = self.postprocess(raw_output, input_data)
             return result
             
         except Exception as e:
@@ -468,9 +501,12 @@ class ValidationModel(BaseMLModel):
         self.usage_count += 1
         
         try:
-            processed_input = self.preprocess(input_data)
-            quality_assessment = self._assess_quality(processed_input, input_data)
-            result = self.postprocess(quality_assessment, input_data)
+            with pipeline_stage("preprocess", self.name):
+                processed_input = self.preprocess(input_data)
+            with pipeline_stage("inference", self.name):
+                quality_assessment = self._assess_quality(processed_input, input_data)
+            with pipeline_stage("postprocess", self.name):
+                result = self.postprocess(quality_assessment, input_data)
             
             return result
             
@@ -607,6 +643,8 @@ class MLModelService:
     
     def __init__(self):
         self.models: Dict[str, BaseMLModel] = {}
+        # O monitor de memória descarrega modelos a partir da thread de amostragem
+        self._models_lock = threading.Lock()
         self.validation_service = ValidationService()
         self.logger = logger
         
@@ -614,6 +652,9 @@ class MLModelService:
         self.max_models_in_memory = 3
         self.model_timeout = timedelta(hours=2)
         
+        # Descarregar modelos quando o processo exceder o orçamento de memória
+        get_memory_monitor().register_eviction_callback(self.evict_least_recently_used)
+        
         # Mapeamento de tipos para classes
         self.model_classes = {
             "diagnostic": DiagnosticModel,
@@ -657,7 +698,8 @@ class MLModelService:
         # Gerenciar memória
         await self._manage_memory()
         
-        self.models[model_name] = model
+        with self._models_lock:
+            self.models[model_name] = model
         
         self.logger.info(f"Successfully loaded model: {model_name}")
         return model
@@ -680,9 +722,11 @@ class MLModelService:
         
         # Carregar modelo se necessário
         model = await self.load_model(model_name)
+        model.last_used = datetime.utcnow()
         
         # Executar predição
-        result = await model.predict(input_data)
+        with model.in_use():
+            result = await model.predict(input_data)
         
         # Converter resultado para dicionário compatível
         prediction_dict = {
@@ -780,22 +824,50 @@ class MLModelService:
         Returns:
             True se descarregado com sucesso
         """
-        if model_name in self.models:
-            self.models[model_name].unload()
-            del self.models[model_name]
-            self.logger.info(f"Unloaded model: {model_name}")
-            return True
+        with self._models_lock:
+            model = self.models.pop(model_name, None)
+        if model is None:
+            return False
+        
+        model.unload()
+        self.logger.info(f"Unloaded model: {model_name}")
+        return True
+    
+    def evict_least_recently_used(self) -> bool:
+        """
+        Descarrega o modelo usado há mais tempo
+        
+        Chamado pelo monitor de memória (na thread de amostragem) quando o
+        orçamento é excedido. Modelos com predições em andamento são pulados.
+        
+        Returns:
+            True se algum modelo foi descarregado
+        """
+        with self._models_lock:
+            candidates = sorted(
+                self.models,
+                key=lambda n: self.models[n].last_used or self.models[n].load_time or datetime.min
+            )
+            for name in candidates:
+                if self.models[name].unload_if_idle():
+                    del self.models[name]
+                    break
+            else:
+                return False
         
-        return False
+        self.logger.warning(f"Evicted model {name} due to memory pressure")
+        return True
     
     async def _manage_memory(self) -> None:
         """Gerencia memória descarregando modelos antigos"""
-        if len(self.models) >= self.max_models_in_memory:
+        with self._models_lock:
+            models = list(self.models.items())
+        if len(models) >= self.max_models_in_memory:
             # Encontrar modelo mais antigo para descarregar
             oldest_model = None
             oldest_time = datetime.utcnow()
             
-            for name, model in self.models.items():
+            for name, model in models:
                 if model.load_time and model.load_time < oldest_time:
                     oldest_time = model.load_time
                     oldest_model = name
@@ -12,8 +12,8 @@ from typing import Any, cast
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.medical_guidelines_engine import (
-    MotorDiretrizesMedicasIA,
-    ValidadorConformidadeDiretrizes)
+    get_motor_diretrizes,
+    get_validador_conformidade)
 
 logger = logging.getLogger(__name__)
 
@@ -41,8 +41,8 @@ class PrescriptionService:
         self.db = db
         self.drug_database = self._initialize_drug_database()
         self.interaction_rules = self._initialize_interaction_rules()
-        self.motor_diretrizes = MotorDiretrizesMedicasIA()
-        self.validador_conformidade = ValidadorConformidadeDiretrizes()
+        self.motor_diretrizes = get_motor_diretrizes()
+        self.validador_conformidade = get_validador_conformidade()
 
     def _initialize_drug_database(self) -> dict[str, dict[str, Any]]:
         """Initialize drug database with common medications."""
@@ -0,0 +1,279 @@
+"""
+Protocol Rule Engine - compiles declarative clinical protocol criteria into predicates.
+
+Protocol specs describe scoring criteria (qSOFA, HEART, NIHSS, ...) as data. They are
+compiled once into scalar predicate functions for single-patient assessment and into
+vectorized NumPy evaluators for scoring a whole ward in one pass.
+"""
+
+import operator
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+_SCALAR_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "outside": lambda value, bounds: value < bounds[0] or value > bounds[1],
+}
+
+_VECTOR_OPERATORS: dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "outside": lambda values, bounds: (values < bounds[0]) | (values > bounds[1]),
+    "truthy": lambda values, _: values.astype(bool),
+}
+
+
+@dataclass(frozen=True)
+class Tier:
+    """One scoring band of a criterion; the first matching tier of a criterion wins."""
+    name: str
+    op: str
+    source: str
+    threshold: Any = None
+    points: int = 0
+    count_in: frozenset[str] | None = None
+
+
+@dataclass(frozen=True)
+class Criterion:
+    """
+    A criterion made of mutually exclusive tiers.
+
+    Tiers read the criterion ``source`` from the patient/clinical context unless they
+    declare their own, so a criterion can also pick the first positive of several
+    findings (e.g. ST elevation, else ST depression or T-wave changes).
+    """
+    tiers: tuple[Tier, ...]
+
+
+@dataclass(frozen=True)
+class RiskRule:
+    """Risk band reached when every configured condition holds."""
+    risk_level: str
+    recommendations: tuple[str, ...] = ()
+    min_score: int | None = None
+    min_criteria: int | None = None
+    requires: tuple[str, ...] = ()
+
+
+def _parse_criterion(spec: dict[str, Any]) -> Criterion:
+    tiers = spec.get("tiers") or [spec]
+    count_in = frozenset(spec["count_in"]) if "count_in" in spec else None
+    return Criterion(
+        tiers=tuple(
+            Tier(
+                name=tier["name"],
+                op=tier["op"],
+                source=tier.get("source", spec.get("source")),
+                threshold=tuple(tier["threshold"]) if isinstance(tier.get("threshold"), list) else tier.get("threshold"),
+                points=tier.get("points", 0),
+                count_in=count_in
+            )
+            for tier in tiers
+        )
+    )
+
+
+def _parse_risk_rule(spec: dict[str, Any]) -> RiskRule:
+    return RiskRule(
+        risk_level=spec["risk_level"],
+        recommendations=tuple(spec.get("recommendations", ())),
+        min_score=spec.get("min_score"),
+        min_criteria=spec.get("min_criteria"),
+        requires=tuple(spec.get("requires", ()))
+    )
+
+
+def _compile_getter(source: str) -> Callable[[dict[str, Any]], Any]:
+    """Compile a dotted path ('clinical.vital_signs.heart_rate') into a lookup function."""
+    keys = tuple(source.split("."))
+
+    def getter(context: dict[str, Any]) -> Any:
+        value: Any = context
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+            if value is None:
+                return None
+        return value
+
+    return getter
+
+
+def _compile_value(tier: Tier) -> Callable[[dict[str, Any]], Any]:
+    """Compile the value extraction for a tier, reducing list sources to counts."""
+    getter = _compile_getter(tier.source)
+    if tier.count_in is None:
+        return getter
+
+    members = tier.count_in
+
+    def count(context: dict[str, Any]) -> int:
+        return sum(1 for item in (getter(context) or ()) if item in members)
+
+    return count
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compile_tier(tier: Tier) -> Callable[[dict[str, Any]], bool]:
+    """Compile a tier into a predicate over the patient/clinical context."""
+    extract = _compile_value(tier)
+
+    if tier.op == "truthy":
+        return lambda context: bool(extract(context))
+
+    compare = _SCALAR_OPERATORS[tier.op]
+    threshold = tier.threshold
+
+    def predicate(context: dict[str, Any]) -> bool:
+        value = extract(context)
+        return _is_number(value) and compare(value, threshold)
+
+    return predicate
+
+
+class CompiledProtocol:
+    """A protocol spec compiled into scalar and vectorized evaluators."""
+
+    def __init__(self, spec: dict[str, Any]) -> None:
+        self.criteria = tuple(_parse_criterion(c) for c in spec.get("criteria", ()))
+        self.risk_rules = tuple(_parse_risk_rule(r) for r in spec.get("risk_levels", ()))
+        self.default_risk_level = spec.get("default_risk_level", "low")
+
+        self._scalar = tuple(
+            tuple((tier.name, tier.points, _compile_tier(tier)) for tier in criterion.tiers)
+            for criterion in self.criteria
+        )
+
+    def _resolve_risk(self, score: int, criteria_met: dict[str, bool]) -> RiskRule | None:
+        for rule in self.risk_rules:
+            if rule.min_score is not None and score < rule.min_score:
+                continue
+            if rule.min_criteria is not None and len(criteria_met) < rule.min_criteria:
+                continue
+            if any(not criteria_met.get(name) for name in rule.requires):
+                continue
+            return rule
+        return None
+
+    def evaluate(self, patient_data: dict[str, Any], clinical_data: dict[str, Any]) -> dict[str, Any]:
+        """Score one patient; returns score, criteria met, risk level, recommendations and applicability."""
+        context = {"patient": patient_data or {}, "clinical": clinical_data or {}}
+        score = 0
+        criteria_met: dict[str, bool] = {}
+
+        for tiers in self._scalar:
+            for name, points, predicate in tiers:
+                if predicate(context):
+                    score += points
+                    criteria_met[name] = True
+                    break
+
+        rule = self._resolve_risk(score, criteria_met)
+        return {
+            "score": score,
+            "criteria_met": criteria_met,
+            "applicable": rule is not None,
+            "risk_level": rule.risk_level if rule else self.default_risk_level,
+            "recommendations": list(rule.recommendations) if rule else []
+        }
+
+    def evaluate_table(self, table: "PatientTable") -> dict[str, Any]:
+        """
+        Score every row of a patient table at once.
+
+        Returns arrays: ``score`` (int), ``criteria`` (name -> bool mask),
+        ``criteria_count`` (int), ``rule_index`` (index into ``risk_rules``, -1 if none)
+        and ``applicable`` (bool).
+        """
+        n = len(table)
+        score = np.zeros(n, dtype=np.int64)
+        criteria: dict[str, np.ndarray] = {}
+
+        for criterion in self.criteria:
+            taken = np.zeros(n, dtype=bool)
+            with np.errstate(invalid="ignore"):
+                for tier in criterion.tiers:
+                    column = table.column(tier)
+                    matched = _VECTOR_OPERATORS[tier.op](column, tier.threshold) & ~taken
+                    score += matched * tier.points
+                    criteria[tier.name] = criteria.get(tier.name, np.zeros(n, dtype=bool)) | matched
+                    taken |= matched
+
+        criteria_count = np.sum(list(criteria.values()), axis=0, dtype=np.int64) if criteria else np.zeros(n, dtype=np.int64)
+        rule_index = np.full(n, -1, dtype=np.int64)
+        for index, rule in enumerate(self.risk_rules):
+            mask = rule_index == -1
+            if rule.min_score is not None:
+                mask &= score >= rule.min_score
+            if rule.min_criteria is not None:
+                mask &= criteria_count >= rule.min_criteria
+            for name in rule.requires:
+                mask &= criteria.get(name, np.zeros(n, dtype=bool))
+            rule_index[mask] = index
+
+        return {
+            "score": score,
+            "criteria": criteria,
+            "criteria_count": criteria_count,
+            "rule_index": rule_index,
+            "applicable": rule_index >= 0
+        }
+
+
+class PatientTable:
+    """
+    Columnar view of many patients' data, built lazily per tier source.
+
+    Numeric sources become float64 columns with NaN for missing values, flag sources
+    become bool columns and list sources are reduced to membership counts. Columns
+    are cached so protocols sharing a source read the patient dicts only once.
+    """
+
+    def __init__(self, rows: Sequence[tuple[dict[str, Any], dict[str, Any]]]) -> None:
+        self._contexts = [{"patient": p or {}, "clinical": c or {}} for p, c in rows]
+        self._columns: dict[tuple, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def column(self, tier: Tier) -> np.ndarray:
+        is_flag = tier.op == "truthy"
+        key = (tier.source, is_flag, tier.count_in)
+        cached = self._columns.get(key)
+        if cached is not None:
+            return cached
+
+        extract = _compile_value(tier)
+        values = [extract(ctx) for ctx in self._contexts]
+        if is_flag:
+            column = np.fromiter((bool(v) for v in values), dtype=bool, count=len(values))
+        else:
+            column = np.fromiter(
+                (v if _is_number(v) else np.nan for v in values),
+                dtype=np.float64, count=len(values)
+            )
+
+        self._columns[key] = column
+        return column
+
+
+def compile_protocols(definitions: dict[Any, dict[str, Any]]) -> dict[Any, CompiledProtocol]:
+    """Compile every protocol definition that declares rules."""
+    return {
+        protocol: CompiledProtocol(definition["rules"])
+        for protocol, definition in definitions.items()
+        if "rules" in definition
+    }
@@ -0,0 +1,419 @@
+"""
+Índice de agendas para consultas do MedAI
+Carrega os horários ocupados de médicos, salas e equipamentos em uma única
+consulta por intervalo de datas e responde em memória a verificações de
+disponibilidade e a buscas de horários livres em um ou vários recursos
+"""
+
+import heapq
+import logging
+import threading
+import time as time_module
+import uuid
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.constants import AppointmentStatus
+
+logger = logging.getLogger(__name__)
+
+# Status que ocupam a agenda
+BLOCKING_STATUSES = (
+    AppointmentStatus.SCHEDULED.value,
+    AppointmentStatus.CONFIRMED.value,
+    AppointmentStatus.IN_PROGRESS.value
+)
+
+# Consultas que começam até este tempo antes da janela ainda podem invadi-la
+MAX_APPOINTMENT_DURATION = timedelta(hours=12)
+
+DEFAULT_WORKING_HOURS = (time(8, 0), time(18, 0))
+DEFAULT_WORKING_DAYS = frozenset(range(5))  # segunda a sexta
+
+# Chave de recurso: ("physician", id), ("room", prédio, sala) ou ("equipment", id)
+ResourceKey = Tuple[Any, ...]
+
+
+def physician_key(physician_id: uuid.UUID) -> ResourceKey:
+    return ("physician", physician_id)
+
+
+def room_key(room_number: str, building: Optional[str] = None) -> ResourceKey:
+    return ("room", building or "", room_number)
+
+
+def equipment_key(equipment_id: str) -> ResourceKey:
+    return ("equipment", equipment_id)
+
+
+@dataclass(frozen=True)
+class BusyInterval:
+    """Horário ocupado por uma consulta e os recursos que ela usa"""
+    appointment_id: Any
+    start: datetime
+    end: datetime
+    physician_id: Any = None
+    room_number: Optional[str] = None
+    building: Optional[str] = None
+    equipment: Tuple[str, ...] = ()
+
+    def resource_keys(self) -> List[ResourceKey]:
+        keys = []
+        if self.physician_id is not None:
+            keys.append(physician_key(self.physician_id))
+        if self.room_number:
+            keys.append(room_key(self.room_number, self.building))
+        keys.extend(equipment_key(e) for e in self.equipment)
+        return keys
+
+
+def merge_intervals(intervals: Iterable[Tuple[datetime, datetime]]) -> Tuple[List[datetime], List[datetime]]:
+    """Une intervalos ordenados por início em listas disjuntas (inícios, fins)"""
+    starts: List[datetime] = []
+    ends: List[datetime] = []
+    for start, end in intervals:
+        if ends and start <= ends[-1]:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def _overlaps(starts: List[datetime], ends: List[datetime], start: datetime, end: datetime) -> bool:
+    """True se [start, end) cruza algum intervalo ocupado (listas disjuntas e ordenadas)"""
+    index = bisect_right(ends, start)
+    return index < len(starts) and starts[index] < end
+
+
+def _align(moment: datetime, step: timedelta) -> datetime:
+    """Arredonda para cima até o próximo múltiplo de ``step`` a partir da meia-noite"""
+    midnight = datetime.combine(moment.date(), time(0), tzinfo=moment.tzinfo)
+    offset = moment - midnight
+    remainder = offset % step
+    return moment if not remainder else moment + (step - remainder)
+
+
+def working_windows(start: datetime, end: datetime,
+                    working_hours: Tuple[time, time] = DEFAULT_WORKING_HOURS,
+                    working_days: frozenset = DEFAULT_WORKING_DAYS) -> Iterator[Tuple[datetime, datetime]]:
+    """Janelas de expediente contidas em [start, end)"""
+    day: date = start.date()
+    while True:
+        opening = datetime.combine(day, working_hours[0], tzinfo=start.tzinfo)
+        if opening >= end:
+            return
+        if day.weekday() in working_days:
+            closing = datetime.combine(day, working_hours[1], tzinfo=start.tzinfo)
+            window_start, window_end = max(opening, start), min(closing, end)
+            if window_start < window_end:
+                yield window_start, window_end
+        day += timedelta(days=1)
+
+
+def iter_free_slots(starts: List[datetime], ends: List[datetime], start: datetime, end: datetime,
+                    duration: timedelta, step: timedelta,
+                    working_hours: Tuple[time, time] = DEFAULT_WORKING_HOURS,
+                    working_days: frozenset = DEFAULT_WORKING_DAYS) -> Iterator[datetime]:
+    """Inícios de horários livres, em ordem, percorrendo as lacunas entre ocupações"""
+    for window_start, window_end in working_windows(start, end, working_hours, working_days):
+        index = bisect_right(ends, window_start)
+        cursor = window_start
+        while cursor < window_end:
+            busy = index < len(starts) and starts[index] < window_end
+            gap_end = starts[index] if busy else window_end
+
+            slot = _align(cursor, step)
+            while slot + duration <= gap_end:
+                yield slot
+                slot += step
+
+            if not busy:
+                break
+            cursor = max(cursor, ends[index])
+            index += 1
+
+
+class ScheduleIndex:
+    """
+    Horários ocupados de um recurso em uma janela carregada
+
+    Intervalos ficam ordenados por início; a união disjunta usada nas consultas
+    é calculada uma vez por carga.
+    """
+
+    def __init__(self, window_start: datetime, window_end: datetime,
+                 intervals: Iterable[BusyInterval] = ()):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.loaded_at = time_module.monotonic()
+        self._intervals: List[Tuple[datetime, datetime, Any]] = sorted(
+            (i.start, i.end, i.appointment_id) for i in intervals
+        )
+        self._busy: Optional[Tuple[List[datetime], List[datetime]]] = None
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        return self.window_start <= start and end <= self.window_end
+
+    @property
+    def busy(self) -> Tuple[List[datetime], List[datetime]]:
+        if self._busy is None:
+            self._busy = merge_intervals((s, e) for s, e, _ in self._intervals)
+        return self._busy
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        starts, ends = self.busy
+        return not _overlaps(starts, ends, start, end)
+
+
+class ScheduleEngine:
+    """
+    Cache de índices de agenda por recurso
+
+    Os índices de uma janela são carregados em uma única consulta (apoiada no
+    índice composto ``ix_appointments_physician_date``) e descartados quando
+    a transação que grava uma consulta do recurso é confirmada ou quando o TTL
+    expira, o que limita a defasagem em relação a gravações de outros processos.
+
+    A consulta roda fora do lock; uma carga que cruza uma invalidação é
+    devolvida a quem pediu mas não entra no cache.
+    """
+
+    def __init__(self, loader: Optional[Callable[..., Iterable[BusyInterval]]] = None,
+                 ttl_seconds: float = 30.0, horizon_days: int = 14):
+        self._loader = loader or load_busy_intervals
+        self.ttl_seconds = ttl_seconds
+        self.horizon = timedelta(days=horizon_days)
+        self._indexes: Dict[ResourceKey, ScheduleIndex] = {}
+        self._lock = threading.Lock()
+        # Incrementado a cada invalidação
+        self._generation = 0
+
+    # === CARGA E INVALIDAÇÃO ===
+
+    def _is_fresh(self, index: Optional[ScheduleIndex], start: datetime, end: datetime) -> bool:
+        return (
+            index is not None
+            and index.covers(start, end)
+            and time_module.monotonic() - index.loaded_at < self.ttl_seconds
+        )
+
+    def indexes_for(self, db: Any, keys: Sequence[ResourceKey],
+                    start: datetime, end: datetime) -> Dict[ResourceKey, ScheduleIndex]:
+        """Índices dos recursos cobrindo [start, end), carregando os ausentes em uma consulta"""
+        result = {}
+        missing = []
+        with self._lock:
+            generation = self._generation
+            for key in keys:
+                index = self._indexes.get(key)
+                if self._is_fresh(index, start, end):
+                    result[key] = index
+                else:
+                    missing.append(key)
+        if not missing:
+            return result
+
+        # Carrega dias inteiros para que verificações vizinhas usem o cache
+        load_start = datetime.combine(start.date(), time(0), tzinfo=start.tzinfo)
+        load_end = datetime.combine(end.date(), time(0), tzinfo=end.tzinfo)
+        if load_end < end:
+            load_end += timedelta(days=1)
+
+        grouped: Dict[ResourceKey, List[BusyInterval]] = {key: [] for key in missing}
+        for interval in self._loader(db, missing, load_start, load_end):
+            for key in interval.resource_keys():
+                if key in grouped:
+                    grouped[key].append(interval)
+        loaded = {key: ScheduleIndex(load_start, load_end, intervals) for key, intervals in grouped.items()}
+        result.update(loaded)
+
+        with self._lock:
+            if self._generation == generation:
+                self._indexes.update(loaded)
+        return result
+
+    def invalidate(self, keys: Iterable[ResourceKey]) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._indexes.pop(key, None)
+
+    def invalidate_kind(self, kind: str) -> None:
+        """Descarta todos os índices de um tipo de recurso ('physician', 'room', 'equipment')"""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._indexes if k[0] == kind]:
+                del self._indexes[key]
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._indexes.clear()
+
+    # === CONSULTAS ===
+
+    def is_available(self, db: Any, keys: Sequence[ResourceKey],
+                     start: datetime, duration_minutes: int = 30) -> bool:
+        """Verifica se todos os recursos estão livres no horário"""
+        end = start + timedelta(minutes=duration_minutes)
+        indexes = self.indexes_for(db, keys, start, end)
+        return all(index.is_free(start, end) for index in indexes.values())
+
+    def find_free_slots(self, db: Any, keys: Sequence[ResourceKey], start: datetime,
+                        end: Optional[datetime] = None, duration_minutes: int = 30,
+                        limit: int = 20, step_minutes: int = 15,
+                        working_hours: Tuple[time, time] = DEFAULT_WORKING_HOURS,
+                        working_days: frozenset = DEFAULT_WORKING_DAYS) -> List[datetime]:
+        """
+        Próximos horários em que todos os recursos (médico, sala, equipamentos)
+        estão livres simultaneamente
+        """
+        end = end or start + self.horizon
+        starts, ends = self._combined_busy(db, keys, start, end)
+        slots = iter_free_slots(
+            starts, ends, start, end,
+            timedelta(minutes=duration_minutes), timedelta(minutes=step_minutes),
+            working_hours, working_days
+        )
+        return list(islice(slots, limit))
+
+    def _combined_busy(self, db: Any, keys: Sequence[ResourceKey],
+                       start: datetime, end: datetime) -> Tuple[List[datetime], List[datetime]]:
+        indexes = self.indexes_for(db, keys, start, end)
+        if len(indexes) == 1:
+            return next(iter(indexes.values())).busy
+        streams = [list(zip(*index.busy)) for index in indexes.values()]
+        return merge_intervals(heapq.merge(*streams))
+
+
+def load_busy_intervals(db: Any, keys: Sequence[ResourceKey],
+                        start: datetime, end: datetime) -> List[BusyInterval]:
+    """Carrega em uma consulta as consultas ativas que usam os recursos em [start, end)"""
+    from sqlalchemy import or_
+
+    from app.models.appointment import Appointment
+
+    physician_ids = [key[1] for key in keys if key[0] == "physician"]
+    room_numbers = [key[2] for key in keys if key[0] == "room"]
+    wants_equipment = any(key[0] == "equipment" for key in keys)
+
+    query = db.query(
+        Appointment.id,
+        Appointment.physician_id,
+        Appointment.room_number,
+        Appointment.building,
+        Appointment.metadata,
+        Appointment.scheduled_datetime,
+        Appointment.end_datetime,
+        Appointment.duration_minutes
+    ).filter(
+        Appointment.appointment_status.in_(BLOCKING_STATUSES),
+        Appointment.scheduled_datetime >= start - MAX_APPOINTMENT_DURATION,
+        Appointment.scheduled_datetime < end,
+        Appointment.is_deleted.is_(False)
+    )
+
+    # Equipamentos ficam nos metadados; sem filtro por recurso a consulta usa
+    # apenas o intervalo de datas
+    if not wants_equipment:
+        conditions = []
+        if physician_ids:
+            conditions.append(Appointment.physician_id.in_(physician_ids))
+        if room_numbers:
+            conditions.append(Appointment.room_number.in_(room_numbers))
+        query = query.filter(or_(*conditions))
+
+    intervals = []
+    for row in query.all():
+        row_end = row.end_datetime or row.scheduled_datetime + timedelta(minutes=row.duration_minutes or 30)
+        if row_end <= start:
+            continue
+        intervals.append(BusyInterval(
+            appointment_id=row.id,
+            start=row.scheduled_datetime,
+            end=row_end,
+            physician_id=row.physician_id,
+            room_number=row.room_number,
+            building=row.building,
+            equipment=tuple((row.metadata or {}).get("equipment", ()))
+        ))
+    return intervals
+
+
+def appointment_resource_keys(appointment: Any) -> List[ResourceKey]:
+    """
+    Médico e sala usados por uma consulta, incluindo valores anteriores à
+    alteração pendente
+    """
+    from sqlalchemy import inspect
+
+    keys: List[ResourceKey] = []
+    state = inspect(appointment)
+    physicians = set(state.attrs.physician_id.history.deleted) | {appointment.physician_id}
+    rooms = set(state.attrs.room_number.history.deleted) | {appointment.room_number}
+    buildings = set(state.attrs.building.history.deleted) | {appointment.building}
+
+    keys.extend(physician_key(p) for p in physicians if p is not None)
+    keys.extend(room_key(r, b) for r in rooms if r for b in buildings)
+    return keys
+
+
+_engine: Optional[ScheduleEngine] = None
+_engine_lock = threading.Lock()
+
+
+_PENDING_KEY = "schedule_index_invalidations"
+
+
+def _record_write(mapper, connection, target) -> None:
+    """
+    Guarda na sessão os recursos da consulta gravada (no flush)
+
+    O histórico dos atributos só existe durante o flush, mas o cache só é
+    descartado no commit: antes dele outra sessão ainda leria a agenda antiga
+    e a recolocaria no cache.
+    """
+    from sqlalchemy.orm import object_session
+
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).update(appointment_resource_keys(target))
+
+
+def _invalidate_on_commit(session) -> None:
+    keys = session.info.pop(_PENDING_KEY, None)
+    if keys is not None and _engine is not None:
+        _engine.invalidate(keys)
+        # Alterações em metadados JSON não têm histórico; descarta todos os equipamentos
+        _engine.invalidate_kind("equipment")
+
+
+def _discard_on_rollback(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def get_schedule_engine() -> ScheduleEngine:
+    """Retorna o índice de agendas compartilhado pelo processo"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import event
+                from sqlalchemy.orm import Session
+
+                from app.models.appointment import Appointment
+
+                for identifier in ("after_insert", "after_update", "after_delete"):
+                    event.listen(Appointment, identifier, _record_write)
+                event.listen(Session, "after_commit", _invalidate_on_commit)
+                event.listen(Session, "after_rollback", _discard_on_rollback)
+                _engine = ScheduleEngine()
+    return _engine
@@ -0,0 +1,171 @@
+"""
+Threshold Store
+Online statistics (Welford/EWMA) and an append-only SQLite history for
+adaptive thresholds, with compacted snapshots for fast startup
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+DEFAULT_EWMA_ALPHA = 0.01
+DEFAULT_SNAPSHOTS_KEPT = 3
+
+@dataclass
+class OnlineStats:
+    """Running mean/variance (Welford, merged per chunk) plus an EWMA of the same"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    ewma_mean: float | None = None
+    ewma_var: float = 0.0
+    ewma_alpha: float = DEFAULT_EWMA_ALPHA
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def ewma_std(self) -> float:
+        return float(np.sqrt(self.ewma_var))
+
+    def update(self, values: Any) -> "OnlineStats":
+        """Add a chunk of observations (scalar or array); NaN values are ignored"""
+        data = np.asarray(values, dtype=float).ravel()
+        data = data[~np.isnan(data)]
+        n = data.size
+        if n == 0:
+            return self
+
+        chunk_mean = float(data.mean())
+        chunk_m2 = float(((data - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        # EWMA over the chunk: each observation weighs alpha, applied as one step
+        # of weight 1-(1-alpha)^n towards the chunk statistics
+        weight = 1.0 - (1.0 - self.ewma_alpha) ** n
+        if self.ewma_mean is None:
+            self.ewma_mean = chunk_mean
+            self.ewma_var = chunk_m2 / n
+        else:
+            ewma_delta = chunk_mean - self.ewma_mean
+            self.ewma_mean += weight * ewma_delta
+            self.ewma_var = (1 - weight) * (self.ewma_var + weight * ewma_delta * ewma_delta) + weight * chunk_m2 / n
+        return self
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "OnlineStats":
+        return cls(**data)
+
+class ThresholdHistoryStore:
+    """
+    Append-only threshold history and learner snapshots in SQLite
+
+    History rows are never updated; range queries use the
+    (parameter, stratum, timestamp) index. Snapshots hold the full learner
+    state and the last history row they cover, so startup only replays the
+    rows written after it; only the newest few snapshots are kept.
+    """
+
+    def __init__(self, path: str = ":memory:", snapshots_kept: int = DEFAULT_SNAPSHOTS_KEPT):
+        self.path = path
+        self.snapshots_kept = snapshots_kept
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS threshold_history ("
+                " timestamp REAL NOT NULL, parameter TEXT NOT NULL, stratum TEXT NOT NULL,"
+                " lower REAL, upper REAL, samples INTEGER NOT NULL, source TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_threshold_history_lookup"
+                " ON threshold_history (parameter, stratum, timestamp)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS threshold_snapshots ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+
+    def append(self, records: Iterable[tuple]) -> None:
+        """Append (timestamp, parameter, stratum, lower, upper, samples, source) rows"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO threshold_history VALUES (?, ?, ?, ?, ?, ?, ?)", list(records)
+            )
+
+    def query(self, parameter: str, start: float, end: float | None = None,
+              stratum: str = "general") -> list[dict[str, Any]]:
+        """History of a parameter/stratum between two epoch timestamps, newest first"""
+        end = time.time() if end is None else end
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, lower, upper, samples, source FROM threshold_history"
+                " WHERE parameter = ? AND stratum = ? AND timestamp BETWEEN ? AND ?"
+                " ORDER BY timestamp DESC",
+                (parameter, stratum, start, end)
+            ).fetchall()
+        return [
+            {"timestamp": ts, "lower": lower, "upper": upper, "samples": samples, "source": source}
+            for ts, lower, upper, samples, source in rows
+        ]
+
+    def history_since(self, history_id: int) -> list[tuple]:
+        """(parameter, stratum, lower, upper) rows appended after ``history_id``, oldest first"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT parameter, stratum, lower, upper FROM threshold_history"
+                " WHERE rowid > ? ORDER BY rowid",
+                (history_id,)
+            ).fetchall()
+
+    def save_snapshot(self, payload: dict[str, Any]) -> None:
+        """
+        Store a learner snapshot and drop all but the newest ``snapshots_kept``
+
+        The payload gains ``history_id``, the last history row it includes.
+        """
+        with self._lock, self._conn:
+            history_id = self._conn.execute("SELECT MAX(rowid) FROM threshold_history").fetchone()[0]
+            payload = {**payload, "history_id": history_id or 0}
+            self._conn.execute(
+                "INSERT INTO threshold_snapshots (created_at, payload) VALUES (?, ?)",
+                (time.time(), json.dumps(payload))
+            )
+            self._conn.execute(
+                "DELETE FROM threshold_snapshots WHERE id NOT IN"
+                " (SELECT id FROM threshold_snapshots ORDER BY id DESC LIMIT ?)",
+                (self.snapshots_kept,)
+            )
+
+    def latest_snapshot(self) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM threshold_snapshots ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
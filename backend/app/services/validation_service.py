@@ -16,6 +16,7 @@ from backend.app.core.constants import (
     ECG_DURATION,
     ECG_LEADS
 )
+from backend.app.core.identifiers import is_valid_cns, is_valid_cpf
 
 logger = logging.getLogger(__name__)
 
@@ -147,32 +148,13 @@ class ValidationService:
     
     @classmethod
     def validate_cpf(cls, cpf: str) -> bool:
-        """Valida CPF brasileiro"""
-        # Remover caracteres não numéricos
-        cpf_clean = re.sub(r'\D', '', cpf)
-        
-        # Verificar tamanho
-        if len(cpf_clean) != 11:
-            return False
-        
-        # Verificar se todos os dígitos são iguais
-        if len(set(cpf_clean)) == 1:
-            return False
-        
-        # Calcular primeiro dígito verificador
-        sum_digits = sum(int(cpf_clean[i]) * (10 - i) for i in range(9))
-        first_digit = (sum_digits * 10) % 11
-        first_digit = 0 if first_digit == 10 else first_digit
-        
-        if int(cpf_clean[9]) != first_digit:
-            return False
-        
-        # Calcular segundo dígito verificador
-        sum_digits = sum(int(cpf_clean[i]) * (11 - i) for i in range(10))
-        second_digit = (sum_digits * 10) % 11
-        second_digit = 0 if second_digit == 10 else second_digit
-        
-        return int(cpf_clean[10]) == second_digit
+        """Valida CPF brasileiro (aceita apenas dígitos e separadores de formatação)"""
+        return is_valid_cpf(cpf)
+    
+    @classmethod
+    def validate_cns(cls, cns: str) -> bool:
+        """Valida número do Cartão Nacional de Saúde (CNS)"""
+        return is_valid_cns(cns)
     
     @classmethod
     def validate_phone(cls, phone: str) -> bool:
@@ -16,7 +16,8 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.config import settings
 from app.core.database import engine, db_manager
-from app.utils.logging_config import get_logger
+from app.monitoring.logging_config import get_logger
+from app.monitoring.memory import get_memory_monitor
 
 logger = get_logger(__name__)
 
@@ -379,6 +380,52 @@ class AIModelsHealthCheck(BaseHealthCheck):
         return HealthStatus.HEALTHY
 
 
+class MemoryHealthCheck(BaseHealthCheck):
+    """Verificação de crescimento de memória do processo"""
+    
+    def __init__(self):
+        super().__init__("memory", timeout=5)
+    
+    async def _perform_check(self) -> Dict[str, Any]:
+        """Resume o perfil amostrado e a detecção de vazamentos"""
+        monitor = get_memory_monitor()
+        
+        # Comparação de snapshots do tracemalloc é CPU-bound
+        profile = await asyncio.to_thread(monitor.get_profile)
+        leaks = await asyncio.to_thread(
+            monitor.detect_memory_leaks,
+            settings.MEMORY_LEAK_THRESHOLD_MB,
+            settings.MEMORY_LEAK_WINDOW
+        )
+        
+        return {
+            "current_memory_mb": round(profile.get("current_memory_mb", 0), 2),
+            "peak_memory_mb": round(profile.get("peak_memory_mb", 0), 2),
+            "average_memory_mb": round(profile.get("average_memory_mb", 0), 2),
+            "growth_rate_mb_per_hour": round(profile.get("memory_growth_rate", 0), 2),
+            "memory_budget_mb": profile.get("memory_budget_mb"),
+            "evictions": profile.get("evictions", 0),
+            "sampler_running": profile.get("sampler_running", False),
+            "samples": profile.get("samples", 0),
+            "has_leak": leaks["has_leak"],
+            "suspected_sources": leaks["leak_details"]["suspected_sources"]
+        }
+    
+    def _determine_status(self, details: Dict[str, Any], errors: List[str]) -> HealthStatus:
+        """Determina status pelo orçamento de memória e crescimento sustentado"""
+        if errors:
+            return HealthStatus.UNHEALTHY
+        
+        budget = details.get("memory_budget_mb")
+        if budget and details.get("current_memory_mb", 0) > budget:
+            return HealthStatus.UNHEALTHY
+        
+        if details.get("has_leak"):
+            return HealthStatus.WARNING
+        
+        return HealthStatus.HEALTHY
+
+
 class HealthChecker:
     """Gerenciador principal de verificações de saúde"""
     
@@ -387,7 +434,8 @@ class HealthChecker:
             DatabaseHealthCheck(),
             RedisHealthCheck(),
             SystemResourcesHealthCheck(),
-            AIModelsHealthCheck()
+            AIModelsHealthCheck(),
+            MemoryHealthCheck()
         ]
         self._cache = {}
         self._cache_ttl = 30  # 30 segundos
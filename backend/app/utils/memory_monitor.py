@@ -1,156 +1,16 @@
 """
 Memory monitoring utilities.
-"""
-
-import logging
-from typing import Any
-
-import psutil
-
-logger = logging.getLogger(__name__)
-
-class MemoryMonitor:
-    """Monitor memory usage for ML models and processing."""
-
-    def get_memory_usage(self) -> dict[str, Any]:
-        """Get current memory usage statistics."""
-        try:
-            process = psutil.Process()
-            memory_info = process.memory_info()
-
-            system_memory = psutil.virtual_memory()
-
-            return {
-                "process_memory_mb": memory_info.rss / 1024 / 1024,
-                "process_memory_percent": process.memory_percent(),
-                "system_memory_total_gb": system_memory.total / 1024 / 1024 / 1024,
-                "system_memory_available_gb": system_memory.available / 1024 / 1024 / 1024,
-                "system_memory_percent": system_memory.percent,
-            }
 
-        except Exception as e:
-            logger.error("Failed to get memory usage: %s", str(e))
-            return {
-                "process_memory_mb": 0,
-                "process_memory_percent": 0,
-                "system_memory_total_gb": 0,
-                "system_memory_available_gb": 0,
-                "system_memory_percent": 0,
-            }
-
-    def check_memory_threshold(self, threshold_percent: float = 80.0) -> bool:
-        """Check if memory usage exceeds threshold."""
-        try:
-            memory_info = self.get_memory_usage()
-            system_percent = memory_info["system_memory_percent"]
-            if isinstance(system_percent, int | float):
-                return system_percent > threshold_percent
-            return False
-        except Exception:
-            return False
-
-    def log_memory_usage(self, context: str = "") -> None:
-        """Log current memory usage."""
-        try:
-            memory_info = self.get_memory_usage()
-            logger.info(
-                "Memory usage %s - Process: %.1f MB, System: %.1f%%",
-                context,
-                memory_info["process_memory_mb"],
-                memory_info["system_memory_percent"])
-        except Exception as e:
-            logger.error("Failed to log memory usage: %s", str(e))
-
-    def start_profiling(self) -> dict[str, Any]:
-        """Start memory profiling session."""
-        try:
-            initial_memory = self.get_memory_usage()
-            logger.info("Started memory profiling session")
-            return {
-                "status": "started",
-                "initial_memory": initial_memory,
-                "session_id": "profiling_session_001"
-            }
-        except Exception as e:
-            logger.error(f"Failed to start profiling: {e}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "initial_memory": {}
-            }
-
-    def get_profile(self) -> dict[str, Any]:
-        """Get current memory profile."""
-        try:
-            current_memory = self.get_memory_usage()
-            logger.info("Retrieved memory profile")
-            return {
-                "status": "success",
-                "current_memory": current_memory,
-                "peak_memory_mb": current_memory.get("process_memory_mb", 0) * 1.2,
-                "current_memory_mb": current_memory.get("process_memory_mb", 0),
-                "average_memory_mb": current_memory.get("process_memory_mb", 0) * 0.9,
-                "memory_growth_rate": 0.05
-            }
-        except Exception as e:
-            logger.error(f"Failed to get profile: {e}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "current_memory": {},
-                "peak_memory_mb": 0,
-                "current_memory_mb": 0,
-                "average_memory_mb": 0,
-                "memory_growth_rate": 0
-            }
-
-    def stop_profiling(self) -> dict[str, Any]:
-        """Stop memory profiling session."""
-        try:
-            final_memory = self.get_memory_usage()
-            logger.info("Stopped memory profiling session")
-            return {
-                "status": "stopped",
-                "final_memory": final_memory,
-                "session_id": "profiling_session_001"
-            }
-        except Exception as e:
-            logger.error(f"Failed to stop profiling: {e}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "final_memory": {}
-            }
-
-    def detect_memory_leaks(self, threshold_mb: float = 10.0, time_window_seconds: int = 60) -> dict[str, Any]:
-        """Detect memory leaks based on threshold and time window."""
-        try:
-            current_memory = self.get_memory_usage()
-            current_mb = current_memory.get("process_memory_mb", 0)
-
-            has_leak = current_mb > threshold_mb
+The implementation lives in app.monitoring.memory so it can be imported
+without the app.utils package (which pulls in auth and the database layer).
+"""
 
-            logger.info(f"Memory leak detection: threshold={threshold_mb}MB, current={current_mb}MB, has_leak={has_leak}")
+from app.monitoring.memory import (
+    BYTES_PER_MB,
+    MemoryMonitor,
+    MemorySample,
+    get_memory_monitor,
+    linear_growth,
+)
 
-            return {
-                "has_leak": has_leak,
-                "current_memory_mb": current_mb,
-                "threshold_mb": threshold_mb,
-                "time_window_seconds": time_window_seconds,
-                "leak_details": {
-                    "growth_rate": 0.02 if has_leak else 0.0,
-                    "suspected_sources": ["large_arrays"] if has_leak else []
-                }
-            }
-        except Exception as e:
-            logger.error(f"Failed to detect memory leaks: {e}")
-            return {
-                "has_leak": False,
-                "current_memory_mb": 0,
-                "threshold_mb": threshold_mb,
-                "time_window_seconds": time_window_seconds,
-                "leak_details": {
-                    "growth_rate": 0.0,
-                    "suspected_sources": []
-                }
-            }
+__all__ = ["BYTES_PER_MB", "MemoryMonitor", "MemorySample", "get_memory_monitor", "linear_growth"]
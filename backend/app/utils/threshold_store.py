@@ -0,0 +1,10 @@
+"""
+Threshold history store.
+
+The implementation lives in app.services.threshold_store so it can be
+imported without the app.utils package (which pulls in auth and the database layer).
+"""
+
+from app.services.threshold_store import OnlineStats, ThresholdHistoryStore
+
+__all__ = ["OnlineStats", "ThresholdHistoryStore"]
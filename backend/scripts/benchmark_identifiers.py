@@ -0,0 +1,116 @@
+"""
+Benchmark do kernel de identificadores (CPF, CNS e telefone)
+
+Compara a validação de CPF caractere a caractere usada anteriormente pelos
+serviços com o caminho escalar (com e sem cache) e o caminho vetorizado.
+
+Uso:
+    python scripts/benchmark_identifiers.py --count 1000000
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core import identifiers  # noqa: E402
+from app.core.identifiers import (  # noqa: E402
+    cns_valid, cpf_valid, format_cpf, is_valid_cpf, normalize_cpf, normalize_phone
+)
+
+
+def legacy_validate_cpf(cpf: str) -> bool:
+    """Implementação anterior de ``ValidationService.validate_cpf``"""
+    cpf_clean = re.sub(r'\D', '', cpf)
+    if len(cpf_clean) != 11:
+        return False
+    if len(set(cpf_clean)) == 1:
+        return False
+    sum_digits = sum(int(cpf_clean[i]) * (10 - i) for i in range(9))
+    first_digit = (sum_digits * 10) % 11
+    first_digit = 0 if first_digit == 10 else first_digit
+    if int(cpf_clean[9]) != first_digit:
+        return False
+    sum_digits = sum(int(cpf_clean[i]) * (11 - i) for i in range(10))
+    second_digit = (sum_digits * 10) % 11
+    second_digit = 0 if second_digit == 10 else second_digit
+    return int(cpf_clean[10]) == second_digit
+
+
+def generate_cpfs(count: int, seed: int) -> list:
+    """CPFs aleatórios, metade com dígitos verificadores corretos, metade formatados"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 10, size=(count, 9))
+    first = (base @ np.arange(10, 1, -1)) % 11
+    first = np.where(first < 2, 0, 11 - first)
+    digits = np.column_stack([base, first])
+    second = (digits @ np.arange(11, 1, -1)) % 11
+    second = np.where(second < 2, 0, 11 - second)
+    digits = np.column_stack([digits, second])
+    digits[1::2, 10] = (digits[1::2, 10] + 1) % 10  # metade inválida
+
+    values = ["".join(map(str, row)) for row in digits]
+    return [format_cpf(value) if i % 4 < 2 else value for i, value in enumerate(values)]
+
+
+def generate_phones(count: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    ddd = rng.integers(11, 100, size=count)
+    number = rng.integers(0, 10 ** 8, size=count)
+    return [f"({d}) 9{n // 10000:04d}-{n % 10000:04d}" for d, n in zip(ddd, number)]
+
+
+def measure(label: str, function, count: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best * 1000:10.1f} ms {count / best / 1e6:10.2f} M ids/s")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    cpfs = generate_cpfs(args.count, args.seed)
+    phones = generate_phones(args.count, args.seed)
+    # CNS provisórios têm formato igual; para vazão basta a mesma quantidade de dígitos
+    cns = [value.replace(".", "").replace("-", "") + "0000" for value in cpfs]
+
+    expected = [legacy_validate_cpf(value) for value in cpfs[:10000]]
+    assert cpf_valid(cpfs[:10000]).tolist() == expected
+    assert [is_valid_cpf(value) for value in cpfs[:10000]] == expected
+
+    print(f"{args.count} identificadores, melhor de {args.repeat}\n")
+    legacy = measure("CPF legado (caractere a caractere)", lambda: [legacy_validate_cpf(v) for v in cpfs],
+                     args.count, args.repeat)
+
+    def scalar_cold():
+        identifiers._is_valid_cpf.cache_clear()
+        return [is_valid_cpf(v) for v in cpfs]
+
+    measure("CPF escalar (cache vazio)", scalar_cold, args.count, args.repeat)
+    # Valores repetidos (criação e busca de pacientes já vistos) dentro do tamanho do cache
+    hot = cpfs[:identifiers.SCALAR_CACHE_SIZE // 2] * (args.count // (identifiers.SCALAR_CACHE_SIZE // 2) + 1)
+    hot = hot[:args.count]
+    measure("CPF escalar (valores repetidos, cache)", lambda: [is_valid_cpf(v) for v in hot], args.count, args.repeat)
+    vector = measure("CPF vetorizado (cpf_valid)", lambda: cpf_valid(cpfs), args.count, args.repeat)
+    measure("CPF normalização (normalize_cpf)", lambda: normalize_cpf(cpfs), args.count, args.repeat)
+    measure("CNS vetorizado (cns_valid)", lambda: cns_valid(cns), args.count, args.repeat)
+    measure("Telefone (normalize_phone)", lambda: normalize_phone(phones), args.count, args.repeat)
+
+    print(f"\nCPF vetorizado: {legacy / vector:.1f}x mais rápido que o legado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark do motor de previsão de demanda
+
+Ajusta o formulário inteiro (SKUs x dias de consumo), aplica um dia novo de
+consumo incrementalmente e mede a previsão de 30 dias de todos os SKUs.
+
+Uso:
+    python scripts/benchmark_previsao.py --skus 6000 --dias 730 --workers 4
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.modules.farmacia.previsao_demanda import MotorPrevisaoDemanda  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--skus", type=int, default=6000)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    t = np.arange(args.dias + 1)
+    base = rng.uniform(5, 200, (args.skus, 1))
+    consumo = np.maximum(base * (1 + 0.2 * np.sin(2 * np.pi * t / 7)) + rng.normal(0, 5, (args.skus, t.size)), 0)
+    # Um quarto do formulário com demanda intermitente
+    intermitentes = args.skus // 4
+    consumo[:intermitentes] *= rng.random((intermitentes, t.size)) < 0.2
+    skus = [f"SKU{i:05d}" for i in range(args.skus)]
+
+    motor = MotorPrevisaoDemanda(periodo_sazonal=7, workers=args.workers)
+    inicio = time.perf_counter()
+    motor.ajustar({sku: consumo[i, :-1] for i, sku in enumerate(skus)})
+    ajuste = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    motor.registrar_consumo({sku: consumo[i, -1:] for i, sku in enumerate(skus)})
+    incremental = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    previsoes = motor.prever(horizonte=30)
+    previsao = time.perf_counter() - inicio
+
+    modelos = [p["modelo"] for p in previsoes.values()]
+    print(f"{args.skus} SKUs x {args.dias} dias")
+    print(f"ajuste completo: {ajuste:.2f} s")
+    print(f"atualização incremental (1 dia): {incremental * 1000:.1f} ms")
+    print(f"previsão de 30 dias: {previsao * 1000:.1f} ms")
+    print(f"croston: {modelos.count('croston')}, holt_winters: {modelos.count('holt_winters')}")
+
+
+if __name__ == "__main__":
+    main()
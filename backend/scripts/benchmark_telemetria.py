@@ -0,0 +1,73 @@
+"""
+Benchmark da telemetria de cadeia fria
+
+Ingere séries diárias densas (lotes x minutos) e mede o tempo total até os
+agregados por lote (MKT, excursões, exposição) estarem disponíveis. Em
+seguida mede a ingestão contínua (uma leitura por lote a cada minuto) com a
+retenção padrão da série bruta ligada.
+
+Uso:
+    python scripts/benchmark_telemetria.py --lotes 10000 --dias 30 --minutos 3000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.modules.farmacia.telemetria_cadeia_fria import RETENCAO_PADRAO, TelemetriaCadeiaFria  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lotes", type=int, default=10_000)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--minutos", type=int, default=3000)
+    parser.add_argument("--lotes-fluxo", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lotes = [f"LOTE{i:06d}" for i in range(args.lotes)]
+    # Refrigerados (2-8 °C) com excursões esporádicas
+    dia = rng.normal(5.0, 1.2, (args.lotes, 1440)).astype(np.float32)
+    dia[rng.random(dia.shape) < 0.001] += 6.0
+
+    telemetria = TelemetriaCadeiaFria(retencao=0)
+    for lote in lotes:
+        telemetria.definir_faixa(lote, 2.0, 8.0)
+
+    inicio = time.perf_counter()
+    for d in range(args.dias):
+        telemetria.registrar_serie_densa(lotes, d * 86400.0, 60.0, dia)
+    ingestao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    rollups = telemetria.rollups()
+    consulta = time.perf_counter() - inicio
+
+    leituras = args.lotes * args.dias * 1440
+    print(f"{leituras / 1e6:.0f} M leituras ({args.lotes} lotes x {args.dias} dias, 1 min)")
+    print(f"ingestão + agregados: {ingestao:.2f} s ({leituras / ingestao / 1e6:.1f} M leituras/s)")
+    print(f"rollups de todos os lotes: {consulta * 1000:.1f} ms")
+    print(f"MKT médio {np.nanmean(rollups['mkt']):.2f} °C, "
+          f"lotes com excursão {int((rollups['excursoes'] > 0).sum())}")
+
+    # Ingestão contínua com retenção: o custo por ingestão deve ser constante
+    telemetria = TelemetriaCadeiaFria()
+    lotes = lotes[:args.lotes_fluxo]
+    leituras = rng.normal(5.0, 1.2, (args.minutos, len(lotes)))
+    inicio = time.perf_counter()
+    for minuto in range(args.minutos):
+        telemetria.registrar_leituras(lotes, np.full(len(lotes), minuto * 60.0), leituras[minuto])
+    fluxo = time.perf_counter() - inicio
+    print(f"ingestão contínua: {args.minutos} ingestões de {len(lotes)} lotes em {fluxo:.2f} s "
+          f"({fluxo / args.minutos * 1e3:.2f} ms/ingestão, retenção {RETENCAO_PADRAO / 3600:.0f} h)")
+
+
+if __name__ == "__main__":
+    main()
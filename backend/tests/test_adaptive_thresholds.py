@@ -0,0 +1,204 @@
+"""
+Tests for the vectorized adaptive threshold manager
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services.adaptive_thresholds import AdaptiveThresholdManager
+from app.services.threshold_store import ThresholdHistoryStore
+
+
+@pytest.fixture
+def manager():
+    return AdaptiveThresholdManager(history_store=ThresholdHistoryStore())
+
+
+class TestContextualThresholds:
+    """Compiled contextual and population adjustments"""
+
+    def test_medication_and_condition_offsets(self, manager):
+        thresholds = manager.get_contextual_thresholds(
+            {"medications": ["beta_blockers", "unknown"], "conditions": "hypertension"}
+        )
+
+        assert thresholds["heart_rate"]["upper"] == pytest.approx(90.0)
+        assert thresholds["heart_rate"]["lower"] == pytest.approx(60.0)
+        assert thresholds["qt_interval"]["upper"] == pytest.approx(450.0)
+
+    def test_population_multipliers(self, manager):
+        pediatric = manager.get_adjusted_thresholds({"age": 10})
+        athlete = manager.get_adjusted_thresholds({"age": 30, "activity_level": "high"})
+
+        assert pediatric["heart_rate"]["upper"] == pytest.approx(150.0)
+        assert pediatric["heart_rate"]["critical_upper"] == pytest.approx(150.0)
+        assert athlete["heart_rate"]["lower"] == pytest.approx(42.0)
+
+    def test_signature_ignores_order_and_unknown_names(self, manager):
+        first = manager.context_signature({"medications": ["digoxin", "amiodarone", "foo"]})
+        second = manager.context_signature({"medications": ["amiodarone", "digoxin"]})
+
+        assert first == second
+
+    def test_cache_is_invalidated_by_learning(self, manager):
+        context = {"medications": ["beta_blockers"]}
+        before = manager.get_contextual_thresholds(context)["heart_rate"]["lower"]
+
+        manager.learn_from_feedback({"parameter": "heart_rate", "value": 40.0, "clinical_judgment": "normal"})
+
+        assert manager.get_contextual_thresholds(context)["heart_rate"]["lower"] < before
+
+    def test_returned_tables_are_copies(self, manager):
+        manager.get_current_thresholds()["heart_rate"]["lower"] = 0.0
+
+        assert manager.thresholds["heart_rate"]["lower"] == 60.0
+
+    def test_thresholds_are_replaced_by_assignment(self, manager):
+        manager.thresholds["heart_rate"]["lower"] = 0.0
+        assert manager.thresholds["heart_rate"]["lower"] == 60.0
+
+        table = manager.thresholds
+        table["heart_rate"]["lower"] = 55.0
+        manager.thresholds = table
+
+        assert manager.get_contextual_thresholds({})["heart_rate"]["lower"] == 55.0
+
+    def test_cache_is_shared_between_threads(self, manager):
+        contexts = [{"medications": [name]} for name in ("beta_blockers", "amiodarone", "digoxin")]
+
+        def lookup(i):
+            if i % 50 == 0:
+                manager.compile_adjustments()  # clears the cache while others read it
+            return manager.get_contextual_thresholds(contexts[i % len(contexts)])
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lookup, range(400)))
+
+        assert results[0] == manager.get_contextual_thresholds(contexts[0])
+
+
+class TestScalarScoring:
+    """Per-measurement detection and confidence"""
+
+    def test_detect_anomalies(self, manager):
+        measurements = {"heart_rate": 95.0, "qt_interval": 470.0, "unknown": 1.0}
+
+        assert manager.detect_anomalies(measurements) == ["qt_interval"]
+        assert manager.detect_anomalies(measurements, {"medications": ["beta_blockers", "amiodarone"]}) == ["heart_rate"]
+
+    def test_confidence(self, manager):
+        assert manager.calculate_confidence("heart_rate", 80.0) == pytest.approx(1.0)
+        assert manager.calculate_confidence("heart_rate", 30.0) == pytest.approx(0.0)
+        assert manager.calculate_confidence("heart_rate", 125.0) == pytest.approx(0.25)
+        assert manager.calculate_confidence("unknown", 1.0) == 0.5
+
+    def test_normal_limit_on_critical_limit(self, manager):
+        context = {"medications": ["amiodarone"], "conditions": ["diabetes"]}
+
+        assert manager.calculate_confidence("qt_interval", 560.0, context) == 0.0
+
+
+class TestMatrixScoring:
+    """Patients x measurements in one call"""
+
+    def test_matches_scalar_path(self, manager):
+        rng = np.random.default_rng(7)
+        parameters = ["heart_rate", "qt_interval", "st_elevation"]
+        values = np.column_stack([rng.uniform(30, 170, 300), rng.uniform(280, 520, 300), rng.uniform(-3, 3, 300)])
+        contexts = [{"medications": ["beta_blockers"]} if i % 3 else None for i in range(300)]
+
+        result = manager.score_matrix(values, parameters, contexts)
+
+        for i in range(300):
+            expected = manager.detect_anomalies(dict(zip(parameters, values[i])), contexts[i])
+            assert [p for p, flag in zip(parameters, result["anomalies"][i]) if flag] == expected
+            for j, parameter in enumerate(parameters):
+                assert result["confidence"][i, j] == pytest.approx(
+                    manager.calculate_confidence(parameter, values[i, j], contexts[i])
+                )
+
+    def test_missing_values(self, manager):
+        result = manager.score_matrix([[np.nan, 300.0]], ["heart_rate", "qt_interval"])
+
+        assert result["anomalies"].tolist() == [[False, True]]
+        assert np.isnan(result["confidence"][0, 0])
+
+    def test_rejects_unknown_parameter(self, manager):
+        with pytest.raises(ValueError):
+            manager.score_matrix([[1.0]], ["unknown"])
+
+
+class TestIncrementalLearning:
+    """Streaming updates, history and snapshots"""
+
+    def test_streamed_chunks_match_single_array(self):
+        data = np.random.default_rng(5).normal(80, 10, 5000)
+        single = AdaptiveThresholdManager(history_store=ThresholdHistoryStore())
+        streamed = AdaptiveThresholdManager(history_store=ThresholdHistoryStore())
+
+        single.update_thresholds({"heart_rate": data})
+        streamed.update_thresholds({"heart_rate": (chunk for chunk in np.array_split(data, 50))})
+
+        assert streamed.thresholds["heart_rate"]["lower"] == pytest.approx(single.thresholds["heart_rate"]["lower"])
+        assert streamed.thresholds["heart_rate"]["upper"] == pytest.approx(single.thresholds["heart_rate"]["upper"])
+        assert streamed.get_learned_statistics("heart_rate")["count"] == 5000
+
+    def test_history_records_changes(self, manager):
+        manager.update_thresholds({"heart_rate": np.array([70.0, 80.0, 90.0])})
+        manager.learn_from_feedback({"parameter": "heart_rate", "value": 110.0, "clinical_judgment": "normal"})
+
+        history = manager.get_threshold_history("heart_rate", days=1)
+
+        assert [entry["source"] for entry in history] == ["feedback", "historical"]
+        assert history[0]["upper"] == pytest.approx(manager.thresholds["heart_rate"]["upper"])
+        assert manager.get_threshold_history("qt_interval") == []
+
+    def test_stratum_table_replaces_multipliers(self, manager):
+        manager.update_thresholds({"heart_rate": np.full(100, 120.0)}, stratum="pediatric")
+
+        pediatric = manager.get_adjusted_thresholds({"age": 8})["heart_rate"]
+
+        assert pediatric["lower"] == pytest.approx(0.99 * 90.0 + 0.01 * 120.0)
+        assert manager.thresholds["heart_rate"]["lower"] == 60.0
+
+    def test_snapshot_restores_learner(self, tmp_path):
+        store = ThresholdHistoryStore(str(tmp_path / "thresholds.db"))
+        manager = AdaptiveThresholdManager(history_store=store, snapshot_every=1)
+        manager.update_thresholds({"qt_interval": np.array([400.0, 420.0])})
+        manager.update_thresholds({"heart_rate": np.full(10, 130.0)}, stratum="geriatric")
+
+        restored = AdaptiveThresholdManager(history_store=ThresholdHistoryStore(str(tmp_path / "thresholds.db")))
+
+        assert restored.thresholds == manager.thresholds
+        assert restored.get_adjusted_thresholds({"age": 80}) == manager.get_adjusted_thresholds({"age": 80})
+        assert restored.get_learned_statistics("qt_interval") == manager.get_learned_statistics("qt_interval")
+
+    def test_history_after_snapshot_is_replayed(self, tmp_path):
+        path = str(tmp_path / "thresholds.db")
+        manager = AdaptiveThresholdManager(history_store=ThresholdHistoryStore(path), snapshot_every=2)
+        manager.update_thresholds({"qt_interval": np.array([400.0, 420.0])})
+        manager.update_thresholds({"qt_interval": np.array([480.0, 500.0])})  # snapshot
+        manager.update_thresholds({"heart_rate": np.full(10, 130.0)}, stratum="geriatric")
+        manager.learn_from_feedback({"parameter": "heart_rate", "value": 120.0, "clinical_judgment": "normal"})
+
+        restored = AdaptiveThresholdManager(history_store=ThresholdHistoryStore(path))
+
+        assert restored.thresholds == manager.thresholds
+        assert restored.get_adjusted_thresholds({"age": 80}) == manager.get_adjusted_thresholds({"age": 80})
+
+    def test_close_snapshots_pending_changes(self, tmp_path, monkeypatch):
+        from app.core.config import settings
+        from app.services import adaptive_thresholds
+
+        path = str(tmp_path / "thresholds.db")
+        monkeypatch.setattr(settings, "ADAPTIVE_THRESHOLDS_DB", path)
+        monkeypatch.setattr(adaptive_thresholds, "_manager", None)
+        manager = adaptive_thresholds.get_adaptive_threshold_manager()
+        manager.update_thresholds({"qt_interval": np.array([400.0, 420.0])})
+
+        adaptive_thresholds.close_adaptive_threshold_manager()
+
+        snapshot = ThresholdHistoryStore(path).latest_snapshot()
+        assert snapshot["thresholds"] == manager.thresholds
+        assert snapshot["history_id"] == 1
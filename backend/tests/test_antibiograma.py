@@ -0,0 +1,156 @@
+"""
+Testes do antibiograma local e do stewardship sobre ele
+"""
+import pytest
+
+from app.modules.farmacia.antibiograma import AntibiogramaLocal
+from app.modules.farmacia.antimicrobial_stewardship import AntimicrobialStewardshipIA
+from app.modules.farmacia.periodos import periodo_de, rotulo_periodo
+
+
+def _resultados(organismo, antimicrobiano, unidade, data, resistentes, sensiveis, inicio_paciente=0):
+    interpretacoes = ["R"] * resistentes + ["S"] * sensiveis
+    return [{"organismo": organismo, "antimicrobiano": antimicrobiano, "unidade": unidade, "data": data,
+             "resultado": r, "paciente_id": inicio_paciente + i} for i, r in enumerate(interpretacoes)]
+
+
+def _prescricao(**extra) -> dict:
+    prescricao = {
+        "id": "RX1",
+        "unidade": "uti",
+        "microorganismo_isolado": "klebsiella",
+        "antimicrobiano": {"nome": "ciprofloxacina", "dose": 1400, "via": "ev", "indicacao": "sepse",
+                           "duracao_dias": 7, "dias_tratamento": 4, "espectro": "amplo"},
+        "paciente": {"peso": 70, "clearance_creatinina": 90, "melhora_clinica": True}
+    }
+    prescricao.update(extra)
+    return prescricao
+
+
+class TestAntibiogramaLocal:
+    """Cubo incremental, janelas móveis e recortes"""
+
+    def test_janela_movel_e_margens(self):
+        antibiograma = AntibiogramaLocal(janela=3, minimo_isolados=5)
+        antibiograma.registrar_resultados(_resultados("Klebsiella", "meropenem", "UTI", "2024-01-10", 2, 8))
+        antibiograma.registrar_resultados(_resultados("Klebsiella", "meropenem", "Enfermaria", "2024-03-05", 1, 9, 100))
+        antibiograma.registrar_resultados(_resultados("E coli", "meropenem", "UTI", "2024-04-01", 0, 10, 200))
+
+        assert rotulo_periodo(antibiograma.ultimo_periodo) == "2024-04"
+        # Janela de 3 meses terminando em abril já não contém janeiro
+        assert antibiograma.suscetibilidade("meropenem", "klebsiella")["testados"] == 10
+        marco = antibiograma.suscetibilidade("meropenem", "klebsiella", periodo="2024-03")
+        assert marco["testados"] == 20 and marco["taxa_resistencia"] == pytest.approx(0.15)
+        assert antibiograma.suscetibilidade("meropenem", unidade="uti", periodo="2024-03")["resistentes"] == 2
+        assert antibiograma.suscetibilidade("meropenem", periodo="2024-01", janela=False)["testados"] == 10
+        assert antibiograma.suscetibilidade("vancomicina")["taxa_resistencia"] is None
+
+    def test_primeiro_isolado_por_paciente(self):
+        antibiograma = AntibiogramaLocal()
+        resultado = {"organismo": "pseudomonas", "antimicrobiano": "cefepime", "unidade": "uti",
+                     "data": "2024-05-02", "resultado": "R", "paciente_id": "P1"}
+
+        contados = antibiograma.registrar_resultados([resultado, {**resultado, "resultado": "S"},
+                                                      {**resultado, "resultado": "X"}])
+
+        assert contados == 1
+        assert antibiograma.suscetibilidade("cefepime", "pseudomonas")["resistentes"] == 1
+
+    def test_recorte_mais_especifico_com_isolados_suficientes(self):
+        antibiograma = AntibiogramaLocal(minimo_isolados=10)
+        antibiograma.registrar_resultados(_resultados("klebsiella", "ciprofloxacina", "uti", "2024-06-01", 3, 2))
+        antibiograma.registrar_resultados(_resultados("klebsiella", "ciprofloxacina", "clinica", "2024-06-01", 1, 9, 50))
+
+        assert antibiograma.taxa_resistencia("ciprofloxacina", "klebsiella", "uti") == (pytest.approx(4 / 15), "organismo_hospital")
+        assert antibiograma.taxa_resistencia("ciprofloxacina", "klebsiella", "clinica") == (0.1, "organismo_unidade")
+        assert antibiograma.taxa_resistencia("amicacina") == (None, "sem_dados")
+        assert periodo_de("2024-06-30") == antibiograma.ultimo_periodo
+
+
+    def test_primeiro_isolado_na_janela_inteira(self):
+        antibiograma = AntibiogramaLocal(janela=3, minimo_isolados=1)
+        isolado = {"organismo": "klebsiella", "antimicrobiano": "meropenem", "unidade": "uti", "paciente_id": 7}
+
+        antibiograma.registrar_resultados([{**isolado, "data": "2024-01-05", "resultado": "S"},
+                                           {**isolado, "data": "2024-02-05", "resultado": "R"}])
+        contagens = [antibiograma.suscetibilidade("meropenem", periodo=f"2024-{mes:02d}")
+                     for mes in (1, 2, 3, 4)]
+
+        # Janelas jan-mar: só o isolado de janeiro; fev-abr já não contém janeiro
+        assert [c["testados"] for c in contagens] == [1, 1, 1, 1]
+        assert [c["resistentes"] for c in contagens] == [0, 0, 0, 1]
+        assert antibiograma.suscetibilidade("meropenem", periodo="2024-02", janela=False)["resistentes"] == 1
+
+    def test_isolado_atrasado_desloca_o_seguinte(self):
+        antibiograma = AntibiogramaLocal(janela=3, minimo_isolados=1)
+        isolado = {"organismo": "klebsiella", "antimicrobiano": "meropenem", "unidade": "uti", "paciente_id": 7}
+
+        antibiograma.registrar_resultados([{**isolado, "data": "2024-03-05", "resultado": "R"}])
+        antibiograma.registrar_resultados([{**isolado, "data": "2024-02-05", "resultado": "S"}])
+
+        contagens = [antibiograma.suscetibilidade("meropenem", periodo=f"2024-{mes:02d}") for mes in range(2, 7)]
+        # Janelas fev-abr contêm fevereiro; maio (mar-mai) conta março; junho (abr-jun) nenhum
+        assert [c["testados"] for c in contagens] == [1, 1, 1, 1, 0]
+        assert [c["resistentes"] for c in contagens] == [0, 0, 0, 1, 0]
+
+    def test_cubo_persistido_e_tabela(self, tmp_path):
+        caminho = str(tmp_path / "antibiograma.db")
+        antibiograma = AntibiogramaLocal(minimo_isolados=5, caminho=caminho)
+        antibiograma.registrar_resultados(_resultados("klebsiella", "meropenem", "uti", "2024-01-10", 2, 8))
+        antibiograma.fechar()
+
+        reaberto = AntibiogramaLocal(minimo_isolados=5, caminho=caminho, intervalo_sincronizacao=0)
+        outro = AntibiogramaLocal(minimo_isolados=5, caminho=caminho)
+        outro.registrar_resultados(_resultados("e_coli", "meropenem", "uti", "2024-02-10", 1, 4, 100))
+        # Repetição do mesmo paciente vinda de outro processo também é descartada
+        assert outro.registrar_resultados(_resultados("klebsiella", "meropenem", "uti", "2024-01-25", 1, 0)) == 0
+
+        assert [linha["organismo"] for linha in reaberto.tabela()] == ["klebsiella"]  # antes de sincronizar
+        reaberto.sincronizar()
+        assert [(linha["organismo"], linha["testados"]) for linha in reaberto.tabela()] == [
+            ("e_coli", 5), ("klebsiella", 10)]
+        assert reaberto.suscetibilidade("meropenem")["taxa_resistencia"] == pytest.approx(0.2)
+
+
+class TestStewardshipComAntibiograma:
+    """Avaliação de prescrições e revisão em lote"""
+
+    @pytest.mark.asyncio
+    async def test_registrar_culturas(self):
+        stewardship = AntimicrobialStewardshipIA(AntibiogramaLocal(minimo_isolados=1))
+
+        resumo = await stewardship.registrar_culturas(_resultados("klebsiella", "ciprofloxacina", "uti", "2024-06-01", 3, 1))
+
+        assert resumo == {"recebidos": 4, "contados": 4}
+        assert stewardship.obter_taxa_resistencia_local("ciprofloxacina", "klebsiella", "uti") == 0.75
+
+    @pytest.mark.asyncio
+    async def test_taxa_local_e_revisao_em_lote(self):
+        antibiograma = AntibiogramaLocal(minimo_isolados=10)
+        antibiograma.registrar_resultados(_resultados("klebsiella", "ciprofloxacina", "uti", "2024-06-01", 6, 4))
+        stewardship = AntimicrobialStewardshipIA(antibiograma)
+
+        avaliacao = await stewardship.avaliar_prescricao_antimicrobiana(_prescricao())
+        revisao = await stewardship.revisar_prescricoes_ativas(
+            [_prescricao(id=f"RX{i}") for i in range(20)] + [_prescricao(id="RUIM", antimicrobiano={"dose": 1})]
+        )
+
+        assert avaliacao["risco_resistencia"]["taxa_resistencia_local"] == pytest.approx(0.6)
+        assert avaliacao["descalonamento"]["pode_descalonar"] is True
+        assert revisao["resumo"]["total_prescricoes"] == 21
+        assert revisao["resumo"]["erros"] == 1
+        assert revisao["resumo"]["descalonamento_possivel"] == 20
+        assert [a["prescricao_id"] for a in revisao["avaliacoes"]][:2] == ["RX0", "RX1"]
+        relatorio = await stewardship.gerar_relatorio_stewardship()
+        assert relatorio["resistencia_bacteriana"]["microorganismos_criticos"] == ["klebsiella"]
+
+    @pytest.mark.asyncio
+    async def test_sem_dados_locais(self):
+        stewardship = AntimicrobialStewardshipIA(AntibiogramaLocal())
+
+        risco = await stewardship.prever_resistencia_bacteriana(_prescricao())
+
+        assert stewardship.obter_taxa_resistencia_local("ciprofloxacina") is None
+        assert risco["taxa_resistencia_local"] is None
+        assert "Sem dados locais de resistência (antibiograma)" in risco["fatores_risco"]
+        assert stewardship.resumir_resistencia_local()["tendencia_resistencia"] == "sem_dados"
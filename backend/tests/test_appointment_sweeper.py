@@ -0,0 +1,122 @@
+"""
+Tests for the leased keyset appointment sweeps
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.services.appointment_sweeper import REMINDER_SWEEP, AppointmentSweeper
+
+NOW = datetime(2024, 3, 10, 8, 0)
+
+SCHEMA = [
+    "CREATE TABLE patients (id CHAR(32) PRIMARY KEY, user_id CHAR(32))",
+    "CREATE TABLE appointments (id CHAR(32) PRIMARY KEY, appointment_code TEXT, patient_id CHAR(32),"
+    " physician_id CHAR(32), title TEXT, scheduled_datetime DATETIME, location_type TEXT, room_number TEXT,"
+    " building TEXT, virtual_meeting_url TEXT, appointment_status TEXT, reminder_sent BOOLEAN,"
+    " reminder_sent_at DATETIME, confirmation_required BOOLEAN, confirmed_at DATETIME,"
+    " confirmation_requested_at DATETIME, is_deleted BOOLEAN, sweep_lease_owner TEXT,"
+    " sweep_lease_until DATETIME, updated_at DATETIME)",
+]
+
+
+def _id(n: int) -> uuid.UUID:
+    return uuid.UUID(int=n)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO patients VALUES (:id, :user)"), {"id": _id(1000).hex, "user": _id(2000).hex})
+        # Five due reminders; appointments 3 and 4 share the same time (id breaks the tie)
+        for n, hours in ((1, 2), (2, 4), (3, 6), (4, 6), (5, 8)):
+            conn.execute(text(
+                "INSERT INTO appointments VALUES (:id, :code, :patient, :physician, 'Consulta', :when, 'in_person',"
+                " NULL, NULL, NULL, 'scheduled', 0, NULL, 0, NULL, NULL, 0, NULL, NULL, :now)"
+            ), {"id": _id(n).hex, "code": f"APT{n}", "patient": _id(1000).hex, "physician": _id(3000).hex,
+                "when": NOW + timedelta(hours=hours), "now": NOW})
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+class RecordingNotifier:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, db, sweep, recipients):
+        if self.fail:
+            raise RuntimeError("worker crashed")
+        self.batches.append([recipient.appointment_id for recipient in recipients])
+        return len(recipients)
+
+
+def test_keyset_cursor_moves_forward_through_all_batches(session_factory):
+    notifier = RecordingNotifier()
+    sweeper = AppointmentSweeper(session_factory, notifier=notifier, batch_size=2, worker_id="a")
+
+    stats = sweeper.sweep(REMINDER_SWEEP, now=NOW)
+
+    assert stats == {"batches": 3, "claimed": 5, "notified": 5}
+    assert notifier.batches == [[_id(1), _id(2)], [_id(3), _id(4)], [_id(5)]]
+    # Everything is marked, so a second run finds nothing
+    assert sweeper.sweep(REMINDER_SWEEP, now=NOW)["claimed"] == 0
+
+
+def test_claimed_rows_are_not_reclaimed_by_another_worker(session_factory):
+    crashed = AppointmentSweeper(session_factory, notifier=RecordingNotifier(fail=True), worker_id="a",
+                                 lease_seconds=300)
+    with pytest.raises(RuntimeError):
+        crashed.sweep(REMINDER_SWEEP, now=NOW)
+
+    notifier = RecordingNotifier()
+    other = AppointmentSweeper(session_factory, notifier=notifier, worker_id="b", lease_seconds=300)
+    stats = other.sweep(REMINDER_SWEEP, now=NOW + timedelta(seconds=60))
+
+    assert stats["claimed"] == 0
+    assert notifier.batches == []
+
+
+def test_expired_lease_is_reclaimed(session_factory):
+    crashed = AppointmentSweeper(session_factory, notifier=RecordingNotifier(fail=True), worker_id="a",
+                                 lease_seconds=300)
+    with pytest.raises(RuntimeError):
+        crashed.sweep(REMINDER_SWEEP, now=NOW)
+
+    notifier = RecordingNotifier()
+    other = AppointmentSweeper(session_factory, notifier=notifier, worker_id="b", lease_seconds=300)
+    stats = other.sweep(REMINDER_SWEEP, now=NOW + timedelta(seconds=301))
+
+    assert stats["claimed"] == 5
+    assert sorted(sum(notifier.batches, [])) == [_id(n) for n in range(1, 6)]
+    with session_factory() as db:
+        owners = db.execute(text("SELECT DISTINCT sweep_lease_owner, reminder_sent FROM appointments")).all()
+    assert owners == [(None, 1)]
+
+
+def test_schema_migration_adds_sweep_columns_to_existing_table():
+    from sqlalchemy import inspect
+
+    from app.core.database import MigrationUtils
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE appointments (id CHAR(32) PRIMARY KEY, reminder_sent BOOLEAN,"
+                          " scheduled_datetime DATETIME)"))
+    migrations = MigrationUtils(engine)
+
+    applied = migrations.apply_schema_migrations()
+
+    assert applied == ["appointments.confirmation_requested_at", "appointments.sweep_lease_owner",
+                       "appointments.sweep_lease_until", "ix_appointments_reminder_due"]
+    columns = {column["name"] for column in inspect(engine).get_columns("appointments")}
+    assert {"sweep_lease_owner", "sweep_lease_until", "confirmation_requested_at"} <= columns
+    assert migrations.apply_schema_migrations() == []
+    engine.dispose()
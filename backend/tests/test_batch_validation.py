@@ -0,0 +1,124 @@
+"""
+Testes da validação em lote colunar
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app.repositories.batch_validation import BatchValidator, validate_cpf_bulk
+from app.repositories.validation_service import ValidationService
+
+
+def _patients():
+    """Registros cobrindo campos ausentes, vazios, inválidos e avisos"""
+    return [
+        {"first_name": "Ana", "last_name": "Silva", "gender": "F", "birth_date": "1990-04-12",
+         "cpf": "111.444.777-35", "email": "ana@hospital.com.br", "height": 1.65, "weight": 60},
+        {"first_name": "Jo", "last_name": "", "gender": "M", "birth_date": "2020-02-30",
+         "cpf": "111.444.777-36", "phone_primary": "123"},
+        {"first_name": "Bia", "last_name": "Souza", "gender": "F", "birth_date": date.today(),
+         "email": "invalido", "height": "5"},
+        {"last_name": "Costa", "gender": "M", "birth_date": None, "cpf": "11111111111", "weight": 0.1},
+        {"first_name": "Caio", "last_name": "Lima", "gender": "M", "birth_date": "12/05/1985",
+         "cpf": "529.982.247-25", "phone_primary": "+5511999998888"},
+        {"first_name": "Rui", "last_name": "Melo", "gender": "M", "birth_date": "1899-12-31", "cpf": "123"},
+    ]
+
+
+def _row_by_row(service, rows):
+    details = []
+    for i, row in enumerate(rows):
+        result = service.validate_patient_data(row)
+        details.append({
+            "index": i,
+            "is_valid": result.is_valid,
+            "errors": result.errors,
+            "warnings": result.warnings,
+            "field_errors": result.field_errors
+        })
+    return details
+
+
+class TestCpfBulk:
+    """CPF em lote"""
+
+    def test_matches_scalar_validation(self):
+        service = ValidationService()
+        values = ["111.444.777-35", "11144477736", "529.982.247-25", "00000000000", "123", "000.000.001-91"]
+
+        bulk = validate_cpf_bulk(service, values)
+
+        for value, result in zip(values, bulk):
+            expected = service.validate_cpf(value)
+            assert (result.is_valid, result.errors) == (expected.is_valid, expected.errors)
+
+
+class TestBatchValidator:
+    """Equivalência com a validação registro a registro e opções do lote"""
+
+    def test_matches_row_by_row_validation(self):
+        service = ValidationService()
+        rows = _patients()
+
+        results = service.validate_batch_data(rows, "patient", include_valid=True, workers=0)
+
+        assert results["details"] == _row_by_row(service, rows)
+        assert results["valid"] == 2
+        assert results["invalid"] == 4
+        assert results["error_counts"]["CPF inválido"] == 2
+
+    def test_chunked_parallel_matches_single_chunk(self):
+        rows = _patients() * 50
+        expected = BatchValidator("patient", workers=0).validate(rows)
+
+        validator = BatchValidator("patient", chunk_size=7, workers=3)
+        with ThreadPoolExecutor(3) as executor:
+            results = validator.validate(rows, executor=executor)
+
+        assert results["details"] == expected["details"]
+        assert results["error_counts"] == expected["error_counts"]
+
+    def test_dataframe_input(self):
+        rows = _patients()
+        frame = pd.DataFrame(rows)
+
+        results = BatchValidator("patient", include_valid=True, workers=0).validate(frame)
+
+        # Células vazias do DataFrame valem como campos presentes sem valor
+        normalized = [{key: row.get(key) for key in frame.columns} for row in rows]
+        assert results["details"] == _row_by_row(ValidationService(), normalized)
+
+    def test_fail_fast_stops_at_first_invalid_row(self):
+        rows = _patients() * 100
+
+        results = BatchValidator("patient", chunk_size=4, fail_fast=True, workers=0).validate(rows)
+
+        assert results["stopped_early"] is True
+        assert results["processed"] == 2
+        assert results["first_invalid_index"] == 1
+        assert results["total"] == len(rows)
+
+    def test_error_aggregation_is_capped_by_default(self):
+        rows = _patients() * 100
+
+        results = BatchValidator("patient", max_errors=5, workers=0).validate(rows)
+
+        assert len(results["summary_errors"]) == 5
+        assert len(results["details"]) == 5
+        assert all(not item["is_valid"] for item in results["details"])
+        assert results["error_counts"]["CPF inválido"] == 200
+        assert results["truncated"] is True
+
+    def test_row_validators_for_other_types(self):
+        rows = [{"exam_id": "1", "patient_id": "2", "ai_confidence": 1.5}, {"exam_id": "1", "patient_id": "2"}]
+
+        results = ValidationService().validate_batch_data(rows, "diagnostic", workers=0)
+
+        assert results["valid"] == 1
+        assert results["unique_errors"] == ["Confiança da IA deve estar entre 0.0 e 1.0"]
+
+    def test_unsupported_type(self):
+        with pytest.raises(ValueError):
+            ValidationService().validate_batch_data([], "unknown")
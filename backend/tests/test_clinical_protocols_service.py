@@ -0,0 +1,105 @@
+"""
+Tests for rule-compiled clinical protocol evaluation
+"""
+import pytest
+
+from app.services.clinical_protocols_service import (
+    ClinicalProtocolsService,
+    ProtocolType,
+    RiskLevel,
+    get_compiled_protocols)
+
+
+@pytest.fixture
+def service():
+    return ClinicalProtocolsService(db=None)
+
+
+SEPTIC = {
+    "vital_signs": {"systolic_blood_pressure": 95, "respiratory_rate": 24, "temperature": 39.0},
+    "glasgow_coma_scale": 15,
+    "lab_values": {"lactate": 3.1}
+}
+
+CHEST_PAIN = {"ecg_findings": {"st_depression": True, "t_wave_changes": True}}
+
+STROKE = {
+    "neurological": {"facial_droop": True, "arm_weakness": True},
+    "timing": {"symptom_onset": 2}
+}
+
+
+class TestProtocolAssessment:
+    """Single-patient assessment through compiled predicates"""
+
+    @pytest.mark.asyncio
+    async def test_sepsis_qsofa(self, service):
+        assessment = await service.assess_protocol(ProtocolType.SEPSIS, {}, SEPTIC)
+
+        assert assessment["score"] == 2
+        assert assessment["risk_level"] == RiskLevel.HIGH
+        assert assessment["criteria_met"]["elevated_lactate"] is True
+        assert "Blood cultures before antibiotics" in assessment["recommendations"]
+
+    @pytest.mark.asyncio
+    async def test_heart_score_counts_ecg_changes_once(self, service):
+        patient = {"age": 70, "risk_factors": ["diabetes", "smoking", "hypertension"]}
+
+        assessment = await service.assess_protocol(ProtocolType.CHEST_PAIN, patient, CHEST_PAIN)
+
+        assert assessment["score"] == 5
+        assert assessment["criteria_met"] == {
+            "high_risk_age": True, "multiple_risk_factors": True, "ecg_changes": True
+        }
+        assert assessment["risk_level"] == RiskLevel.MODERATE
+
+    @pytest.mark.asyncio
+    async def test_missing_age_is_not_an_error(self, service):
+        assessment = await service.assess_protocol(ProtocolType.CHEST_PAIN, {"age": None}, {})
+
+        assert "error" not in assessment
+        assert assessment["applicable"] is False
+
+    @pytest.mark.asyncio
+    async def test_stroke_within_window(self, service):
+        assessment = await service.assess_protocol(ProtocolType.STROKE, {}, STROKE)
+
+        assert assessment["score"] == 4
+        assert assessment["risk_level"] == RiskLevel.HIGH
+
+    @pytest.mark.asyncio
+    async def test_applicable_protocols_sorted_by_risk(self, service):
+        clinical = {**SEPTIC, "neurological": {"facial_droop": True}}
+
+        protocols = await service.get_applicable_protocols({}, clinical)
+
+        assert [p["protocol_type"] for p in protocols] == [ProtocolType.SEPSIS, ProtocolType.STROKE]
+
+    def test_protocols_compiled_once(self, service):
+        assert service.compiled_protocols is get_compiled_protocols()
+        assert ClinicalProtocolsService(db=None).compiled_protocols is service.compiled_protocols
+
+
+class TestWardScreening:
+    """Bulk vectorized screening"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_matches_single_patient_path(self, service):
+        patients = [
+            {"patient_id": "P1", "patient_data": {"age": 70, "risk_factors": ["diabetes"]}, "clinical_data": SEPTIC},
+            {"patient_id": "P2", "patient_data": {"age": 50}, "clinical_data": CHEST_PAIN},
+            {"patient_id": "P3", "patient_data": {}, "clinical_data": STROKE},
+            {"patient_id": "P4", "patient_data": {}, "clinical_data": {}},
+        ]
+
+        screening = await service.screen_ward(patients)
+
+        assert [entry["patient_id"] for entry in screening] == ["P1", "P2", "P3", "P4"]
+        for patient, entry in zip(patients, screening):
+            expected = await service.get_applicable_protocols(patient["patient_data"], patient["clinical_data"])
+            strip = lambda items: [{k: v for k, v in a.items() if k != "assessment_timestamp"} for a in items]
+            assert strip(entry["applicable_protocols"]) == strip(expected)
+
+    @pytest.mark.asyncio
+    async def test_empty_ward(self, service):
+        assert await service.screen_ward([]) == []
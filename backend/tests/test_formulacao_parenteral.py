@@ -0,0 +1,106 @@
+"""
+Testes do formulador de nutrição parenteral por otimização
+"""
+import pytest
+
+from app.modules.farmacia.formulacao_parenteral import (
+    LIMITE_PRODUTO_CALCIO_FOSFATO,
+    FormuladorNutricaoParenteral,
+    MetaNutricional,
+)
+from app.modules.farmacia.nutricao_parenteral import NutricaoParenteralIA
+
+ALVOS = {'aminoacidos': 84, 'glicose': 249, 'lipidios': 66, 'sodio': 105, 'potassio': 70,
+         'calcio': 14, 'magnesio': 10.5, 'fosforo': 21}
+
+
+def _meta(**extra) -> MetaNutricional:
+    dados = {'alvos': dict(ALVOS), 'volume_alvo': 2240, 'volume_maximo': 2240, 'peso': 70}
+    dados.update(extra)
+    return MetaNutricional(**dados)
+
+
+def _paciente(id_, peso=70, **extra) -> dict:
+    paciente = {'id': id_, 'idade': 60, 'sexo': 'masculino', 'antropometria': {'peso': peso, 'altura': 172},
+                'laboratorio': {'albumina': 3.2}, 'clinicos': {'sepse': True}}
+    paciente.update(extra)
+    return paciente
+
+
+class TestFormuladorNutricaoParenteral:
+    """Volumes resolvidos, restrições e warm start"""
+
+    def test_metas_atingidas_quando_viaveis(self):
+        formulacao = FormuladorNutricaoParenteral().formular(_meta())
+
+        assert formulacao['solver']['convergiu']
+        assert all(abs(desvio) < 1e-3 for desvio in formulacao['desvios_metas'].values())
+        assert formulacao['volume_final'] == pytest.approx(2240, abs=1)
+        assert formulacao['volumes_ml']['aminoacidos_10%'] == pytest.approx(840, abs=1)
+        assert formulacao['concentracoes']['produto_calcio_fosforo'] <= LIMITE_PRODUTO_CALCIO_FOSFATO
+        assert formulacao['alertas'] == []
+
+    def test_restricoes_limitam_as_metas(self):
+        formulador = FormuladorNutricaoParenteral()
+
+        periferica = formulador.formular(_meta(via='periferica'))
+        solubilidade = formulador.formular(_meta(alvos={**ALVOS, 'calcio': 60, 'fosforo': 60}))
+        pediatrica = formulador.formular(_meta(peso=20))
+
+        assert periferica['osmolaridade'] <= 900 * 1.001
+        assert 'osmolaridade' in periferica['restricoes_ativas']
+        assert periferica['desvios_metas']['glicose'] < -0.05 and periferica['alertas']
+        assert solubilidade['concentracoes']['produto_calcio_fosforo'] <= LIMITE_PRODUTO_CALCIO_FOSFATO * 1.001
+        assert 'calcio_fosforo' in solubilidade['restricoes_ativas']
+        assert pediatrica['componentes']['glicose']['taxa_infusao_mg_kg_min'] <= 5.0 * 1.001
+        assert pediatrica['componentes']['lipidios']['quantidade_g'] <= 50 * 1.001
+
+    def test_warm_start_reduz_iteracoes(self):
+        formulador = FormuladorNutricaoParenteral()
+        frio = formulador.formular(_meta(paciente_id='P1'))
+
+        ajuste = formulador.formular(_meta(paciente_id='P1', alvos={**ALVOS, 'aminoacidos': 95}))
+        formulador.esquecer('P1')
+        sem_estado = formulador.formular(_meta(paciente_id='P1', alvos={**ALVOS, 'aminoacidos': 95}))
+        da_bolsa = FormuladorNutricaoParenteral().formular(_meta(), frio['volumes_ml'])
+
+        assert ajuste['solver']['warm_start'] and not sem_estado['solver']['warm_start']
+        assert ajuste['solver']['iteracoes'] < sem_estado['solver']['iteracoes']
+        assert ajuste['componentes']['aminoacidos']['quantidade_g'] == pytest.approx(95, rel=1e-3)
+        assert da_bolsa['solver']['iteracoes'] < frio['solver']['iteracoes']
+
+    def test_lote_igual_a_bolsas_individuais(self):
+        metas = [_meta(alvos={nutriente: alvo * (0.6 + 0.02 * i) for nutriente, alvo in ALVOS.items()},
+                       volume_alvo=1500 + 30 * i, volume_maximo=1500 + 30 * i, peso=45 + i,
+                       via='periferica' if i % 3 == 0 else 'central') for i in range(12)]
+
+        lote = FormuladorNutricaoParenteral().formular_lote(metas)
+        individuais = [FormuladorNutricaoParenteral().formular(meta) for meta in metas]
+
+        assert all(formulacao['solver']['convergiu'] for formulacao in lote)
+        for em_lote, individual in zip(lote, individuais):
+            for solucao, volume in individual['volumes_ml'].items():
+                assert em_lote['volumes_ml'][solucao] == pytest.approx(volume, abs=1.0)
+
+
+class TestNutricaoParenteralIA:
+    """Integração com o cálculo de necessidades"""
+
+    @pytest.mark.asyncio
+    async def test_calculo_individual_e_lote_da_uti(self):
+        sistema = NutricaoParenteralIA(FormuladorNutricaoParenteral())
+
+        individual = await sistema.calcular_nutricao_parenteral(_paciente('UTI-1'))
+        lote = await sistema.calcular_nutricao_parenteral_lote(
+            [_paciente(f'UTI-{i}', peso=55 + 3 * i) for i in range(1, 9)]
+            + [_paciente('UTI-9', acesso_venoso='periferica'), {'id': 'UTI-X', 'antropometria': None}]
+        )
+
+        assert individual['compatibilidade']['compativel']
+        # Sepse: as metas não cabem em 32 mL/kg e a bolsa sai com o volume máximo
+        assert 'volume' in individual['formulacao_np']['restricoes_ativas']
+        assert individual['formulacao_np']['alertas'][-1] == 'Metas limitadas por: volume'
+        assert lote['resumo']['total_bolsas'] == 10 and lote['resumo']['erros'] == 1
+        assert lote['bolsas'][1]['formulacao_np']['solver']['warm_start']
+        periferica = next(bolsa for bolsa in lote['bolsas'] if bolsa['paciente_id'] == 'UTI-9')
+        assert periferica['formulacao_np']['osmolaridade'] <= 900 * 1.001
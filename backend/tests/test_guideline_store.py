@@ -0,0 +1,124 @@
+"""
+Tests for the indexed clinical guideline store
+"""
+import json
+import os
+
+import pytest
+
+from app.services.guideline_store import GuidelineStore, normalizar_termo
+from app.services.medical_guidelines_engine import (
+    MotorDiretrizesMedicasIA,
+    SolicitacaoExamesBaseadaDiretrizes,
+    get_motor_diretrizes)
+
+
+def _write_guideline(path, guideline_id, condicoes, cid10, medicamentos, titulo="Diretriz"):
+    path.write_text(json.dumps({
+        "schema_version": 1,
+        "diretrizes": [{
+            "id": guideline_id,
+            "titulo": titulo,
+            "especialidade": "clinica",
+            "fonte": "MS_PCDT",
+            "versao": "1",
+            "data_atualizacao": "2024-01-01",
+            "nivel_evidencia": "A",
+            "grau_recomendacao": "I",
+            "condicoes": condicoes,
+            "cid10": cid10,
+            "conteudo": {"primeira_linha": {"medicamentos": medicamentos}},
+            "referencias": []
+        }]
+    }), encoding="utf-8")
+
+
+class TestGuidelineIndex:
+    """Lookups against the bundled guideline files"""
+
+    @pytest.fixture
+    def indice(self):
+        return GuidelineStore().indice
+
+    def test_normalizar_termo(self):
+        assert normalizar_termo("Hipertensão  Arterial") == "hipertensao_arterial"
+
+    def test_resolve_synonyms_and_accents(self, indice):
+        assert indice.resolver("Diabetes Mellitus Tipo 2") == ("DM2_SBD_2023",)
+        assert indice.resolver("hipertensão arterial") == ("HAS_SBC_2020",)
+
+    def test_resolve_icd10_by_prefix(self, indice):
+        assert indice.resolver("E11.65") == ("DM2_SBD_2023",)
+        assert indice.resolver("I10") == ("HAS_SBC_2020",)
+        assert indice.resolver("E10") == ()
+
+    def test_drug_line_lookup(self, indice):
+        assert indice.linha_do_medicamento("DM2_SBD_2023", "Metformina 850mg") == "primeira_linha"
+        assert indice.linha_do_medicamento("DM2_SBD_2023", "iSGLT2") == "segunda_linha"
+        assert indice.linha_do_medicamento("DM2_SBD_2023", "insulina") is None
+
+    def test_index_is_read_only(self, indice):
+        with pytest.raises(TypeError):
+            indice.diretrizes["NOVA"] = None
+
+
+class TestGuidelineStoreReload:
+    """Hot reload from the guideline directory"""
+
+    def test_reloads_when_files_change(self, tmp_path):
+        arquivo = tmp_path / "asma.json"
+        _write_guideline(arquivo, "ASMA_1", ["asma"], ["J45"], ["budesonida"])
+        store = GuidelineStore(tmp_path, intervalo_verificacao=0)
+        versao_inicial = store.indice.versao
+
+        _write_guideline(arquivo, "ASMA_2", ["asma"], ["J45"], ["formoterol"])
+        os.utime(arquivo, ns=(1, 1))
+
+        assert store.indice.resolver("asma") == ("ASMA_2",)
+        assert store.indice.versao != versao_inicial
+
+    def test_keeps_previous_index_on_invalid_file(self, tmp_path):
+        _write_guideline(tmp_path / "asma.json", "ASMA_1", ["asma"], [], ["budesonida"])
+        store = GuidelineStore(tmp_path, intervalo_verificacao=0)
+        assert store.indice.resolver("asma") == ("ASMA_1",)
+
+        (tmp_path / "quebrado.json").write_text("{", encoding="utf-8")
+
+        assert store.indice.resolver("asma") == ("ASMA_1",)
+
+    def test_directory_from_settings(self, tmp_path, monkeypatch):
+        from app.core.config import settings
+
+        _write_guideline(tmp_path / "asma.json", "ASMA_1", ["asma"], [], ["budesonida"])
+        monkeypatch.setattr(settings, "GUIDELINES_PATH", str(tmp_path))
+
+        store = GuidelineStore(intervalo_verificacao=0)
+
+        assert store.diretorio == tmp_path
+        assert store.indice.resolver("asma") == ("ASMA_1",)
+
+
+class TestGuidelineEngines:
+    """Engines backed by the shared store"""
+
+    def test_shared_engine_instance(self):
+        assert get_motor_diretrizes() is get_motor_diretrizes()
+
+    @pytest.mark.asyncio
+    async def test_validate_prescription(self, tmp_path):
+        _write_guideline(tmp_path / "asma.json", "ASMA_1", ["asma"], ["J45"], ["budesonida"])
+        motor = MotorDiretrizesMedicasIA(GuidelineStore(tmp_path))
+
+        resultado = await motor.validar_prescricao_contra_diretrizes(
+            {"medications": [{"name": "Budesonida 200mcg"}, {"name": "salbutamol"}]}, "J45.0"
+        )
+
+        assert resultado["status"] == "parcialmente_conforme"
+        assert resultado["medicamentos_conformes"] == ["budesonida 200mcg"]
+
+    @pytest.mark.asyncio
+    async def test_suggest_exams_by_icd10(self):
+        sugestao = await SolicitacaoExamesBaseadaDiretrizes().sugerir_exames("E11.9", {})
+
+        assert sugestao["protocolo_aplicado"] == "diabetes_mellitus_tipo_2"
+        assert sugestao["exames_essenciais"]
@@ -0,0 +1,108 @@
+"""
+Testes do kernel de identificadores (CPF, CNS e telefone)
+"""
+import numpy as np
+import pytest
+
+from app.core.identifiers import (
+    cns_valid, cpf_digits_valid, cpf_valid, digit_matrix, format_cpf, is_valid_cns,
+    is_valid_cpf, normalize_cns, normalize_cpf, normalize_phone, normalize_phone_number
+)
+
+
+def _legacy_cpf(cpf):
+    """Implementação anterior, caractere a caractere"""
+    clean = "".join(char for char in cpf if char.isdigit())
+    if len(clean) != 11 or len(set(clean)) == 1:
+        return False
+    first = (sum(int(clean[i]) * (10 - i) for i in range(9)) * 10) % 11
+    if int(clean[9]) != (0 if first == 10 else first):
+        return False
+    second = (sum(int(clean[i]) * (11 - i) for i in range(10)) * 10) % 11
+    return int(clean[10]) == (0 if second == 10 else second)
+
+
+def _random_cpfs(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return ["".join(map(str, row)) for row in rng.integers(0, 10, size=(count, 11))]
+
+
+class TestDigitMatrix:
+    """Extração de dígitos"""
+
+    def test_accepts_only_separators(self):
+        well_formed, digits = digit_matrix(["123.456.789-09", "12345678909", "123.456.789-09!", None, ""], 11)
+
+        assert well_formed.tolist() == [True, True, False, False, False]
+        assert digits.tolist() == [[1, 2, 3, 4, 5, 6, 7, 8, 9, 0, 9]] * 2
+
+    def test_empty_input(self):
+        assert cpf_valid([]).tolist() == []
+        assert normalize_phone([]) == []
+
+
+class TestCpf:
+    """CPF vetorizado e escalar"""
+
+    def test_matches_legacy_implementation(self):
+        values = _random_cpfs(20000)
+        # Garante CPFs válidos na amostra
+        values += [format_cpf(cpf) for cpf in values if _legacy_cpf(cpf)] + ["111.444.777-35", "000.000.001-91"]
+        expected = [_legacy_cpf(value) for value in values]
+
+        assert cpf_valid(values).tolist() == expected
+        assert [is_valid_cpf(value) for value in values] == expected
+
+    def test_rejects_repeated_sequences(self):
+        digits = np.array([[7] * 11, [1, 1, 1, 4, 4, 4, 7, 7, 7, 3, 5]])
+
+        assert cpf_digits_valid(digits).tolist() == [False, True]
+
+    def test_invalid_inputs(self):
+        values = [None, 12345678909, "", "123.456.789-09!", "1" * 100, "abcd.efgh.ijk"]
+
+        assert not cpf_valid(values).any()
+        assert not any(is_valid_cpf(value) for value in values)
+
+    def test_normalize(self):
+        assert normalize_cpf(["111.444.777-35", "111.444.777-36", "529 982 247 25"]) == [
+            "11144477735", None, "52998224725"
+        ]
+
+
+class TestCns:
+    """Cartão Nacional de Saúde"""
+
+    @pytest.mark.parametrize("cns", ["100000000060018", "200000000000003", "700000000000005", "898 0010 6618 3203"])
+    def test_valid_numbers(self, cns):
+        assert is_valid_cns(cns)
+        assert cns_valid([cns]).tolist() == [True]
+
+    @pytest.mark.parametrize("cns", ["100000000060019", "300000000000000", "70000000000000", None])
+    def test_invalid_numbers(self, cns):
+        assert not is_valid_cns(cns)
+        assert cns_valid([cns]).tolist() == [False]
+
+    def test_normalize(self):
+        assert normalize_cns(["898 0010 6618 3203", "100000000060019"]) == ["898001066183203", None]
+
+
+class TestPhone:
+    """Normalização de telefones"""
+
+    def test_brazilian_formats(self):
+        values = ["(11) 98765-4321", "+55 11 98765-4321", "011 3456-7890", "5511987654321", "11 1234-5678"]
+
+        assert normalize_phone(values) == [
+            "+5511987654321", "+5511987654321", "+551134567890", "+5511987654321", None
+        ]
+
+    def test_international_and_invalid(self):
+        values = ["+1 415 555 2671", "+55 11 1234", "(00) 98765-4321", "11 98765-4321 ramal 2", None]
+
+        assert normalize_phone(values) == ["+14155552671", None, None, None, None]
+
+    def test_scalar_matches_vector(self):
+        values = ["(21) 99876-5432", "+44 20 7946 0958", "123"]
+
+        assert [normalize_phone_number(value) for value in values] == normalize_phone(values)
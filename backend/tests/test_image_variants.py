@@ -0,0 +1,105 @@
+"""
+Tests for the image variant derivation service
+"""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from app.services.image_variants import (
+    AVATAR_VARIANTS,
+    EXAM_THUMBNAIL_VARIANTS,
+    ImageVariantService,
+    VariantSpec,
+    decode_image,
+    derive_variants)
+
+
+def jpeg_bytes(width, height, color=(200, 30, 30), exif_orientation=None):
+    img = Image.new("RGB", (width, height), color)
+    buffer = io.BytesIO()
+    if exif_orientation:
+        exif = Image.Exif()
+        exif[0x0112] = exif_orientation
+        img.save(buffer, "JPEG", exif=exif)
+    else:
+        img.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def png_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (0, 0, 255, 128)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestDeriveVariants:
+    """Variant geometry and output files"""
+
+    def test_avatar_variants_have_exact_sizes(self, tmp_path):
+        specs = AVATAR_VARIANTS[:3]
+
+        results = derive_variants(jpeg_bytes(2400, 1600), specs, str(tmp_path))
+
+        assert [r.name for r in results] == ["100x100", "400x400", "1920x1080"]
+        for spec, result in zip(specs, results):
+            with Image.open(result.path) as img:
+                assert img.size == (spec.width, spec.height)
+                assert img.format == "JPEG"
+            assert result.file_size == os.path.getsize(result.path)
+
+    def test_fit_variants_keep_aspect_and_never_upscale(self, tmp_path):
+        results = derive_variants(jpeg_bytes(2000, 1000), EXAM_THUMBNAIL_VARIANTS, str(tmp_path))
+        small = derive_variants(png_bytes(300, 150), EXAM_THUMBNAIL_VARIANTS, str(tmp_path / "small"))
+
+        assert [(r.width, r.height) for r in results] == [(256, 128), (1024, 512)]
+        assert [(r.width, r.height) for r in small] == [(256, 128), (300, 150)]
+
+    def test_exif_orientation_is_applied(self, tmp_path):
+        spec = VariantSpec("fit", 500, 500, "fit.jpg", crop=False)
+
+        (result,) = derive_variants(jpeg_bytes(400, 200, exif_orientation=6), [spec], str(tmp_path))
+
+        assert (result.width, result.height) == (200, 400)
+
+    def test_no_temporary_files_left(self, tmp_path):
+        derive_variants(jpeg_bytes(800, 800), AVATAR_VARIANTS[:2], str(tmp_path))
+
+        assert sorted(os.listdir(tmp_path)) == ["avatar_100x100.jpg", "avatar_400x400.jpg"]
+
+
+class TestDecode:
+    """Large JPEG decoding"""
+
+    def test_draft_reduces_large_jpeg(self):
+        img = decode_image(jpeg_bytes(4000, 3000), EXAM_THUMBNAIL_VARIANTS[:1])
+
+        assert img.size == (500, 375)
+
+    def test_draft_keeps_enough_resolution(self):
+        img = decode_image(jpeg_bytes(4000, 3000), EXAM_THUMBNAIL_VARIANTS)
+
+        assert min(img.size) >= 1024
+
+
+class TestImageVariantService:
+    """Off-loop execution"""
+
+    @pytest.mark.asyncio
+    async def test_thread_mode(self, tmp_path):
+        service = ImageVariantService(max_workers=0)
+
+        results = await service.derive(png_bytes(640, 480), AVATAR_VARIANTS[:2], tmp_path)
+
+        assert [r.name for r in results] == ["100x100", "400x400"]
+
+    @pytest.mark.asyncio
+    async def test_process_pool(self, tmp_path):
+        service = ImageVariantService(max_workers=1)
+        try:
+            results = await service.derive(jpeg_bytes(1200, 900), AVATAR_VARIANTS[:2], tmp_path)
+        finally:
+            service.shutdown()
+
+        assert all(os.path.exists(r.path) for r in results)
@@ -0,0 +1,179 @@
+"""
+Testes do inventário por lote e da gestão de estoque sobre ele
+"""
+from datetime import date, timedelta
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.modules.farmacia.gestor_estoque import GestorEstoqueInteligente
+from app.modules.farmacia.inventario_lotes import InventarioLotes, calcular_reposicao
+
+HOJE = date.today()
+
+
+def _inventario() -> InventarioLotes:
+    inventario = InventarioLotes()
+    inventario.cadastrar_medicamento("insulina", preco_unitario=45.0, critico=True)
+    inventario.cadastrar_medicamento("paracetamol", preco_unitario=0.8)
+    inventario.registrar_lote("insulina", "INS1", HOJE + timedelta(days=5))
+    inventario.registrar_lote("insulina", "INS2", HOJE + timedelta(days=200))
+    inventario.registrar_lote("paracetamol", "PAR1", HOJE + timedelta(days=20))
+    inventario.registrar_lote("paracetamol", "PAR0", HOJE - timedelta(days=3))
+    inventario.registrar_movimentacoes(["INS1", "INS2", "PAR1", "PAR0"], [10, 30, 500, 40], "entrada")
+    return inventario
+
+
+class TestInventarioLotes:
+    """Ledger só de inclusão, saldos materializados e índice de validade"""
+
+    def test_saldos_materializados(self):
+        inventario = _inventario()
+        inventario.registrar_movimentacoes(["PAR1", "PAR1", "INS2"], [-100, -50, -5], "dispensacao")
+
+        assert inventario.saldo_lote("PAR1") == 350
+        assert inventario.saldo("paracetamol") == 390
+        assert inventario.saldo("insulina") == 35
+        assert inventario.saldo("desconhecido") == 0
+        assert inventario.saldos(["insulina", "x", "paracetamol"]).tolist() == [35, 0, 390]
+        assert inventario.total_movimentacoes == 7
+        historico = inventario.movimentacoes_lote("PAR1")
+        assert historico["quantidade"].tolist() == [500, -100, -50]
+        assert historico["tipo"].tolist() == ["entrada", "dispensacao", "dispensacao"]
+
+    def test_saida_acima_do_saldo_rejeita_o_lote_inteiro(self):
+        inventario = _inventario()
+
+        with pytest.raises(ValueError, match="INS1"):
+            inventario.registrar_movimentacoes(["INS2", "INS1", "INS1"], [-1, -6, -6], "dispensacao")
+        with pytest.raises(KeyError):
+            inventario.movimentar("NAO_EXISTE", 1)
+
+        assert inventario.saldo("insulina") == 40
+        assert inventario.total_movimentacoes == 4
+
+    def test_lotes_vencendo_em_ordem_de_validade(self):
+        inventario = _inventario()
+        inventario.movimentar("INS1", -10, "dispensacao")
+
+        vencendo = inventario.lotes_vencendo(30)
+
+        assert vencendo["lote"] == ["PAR0", "PAR1"]  # INS1 zerado, INS2 fora da janela
+        assert vencendo["dias_para_vencimento"].tolist() == [-3, 20]
+        assert inventario.lotes_vencendo(30, incluir_vencidos=False)["lote"] == ["PAR1"]
+
+    def test_crescimento_do_ledger(self):
+        inventario = InventarioLotes()
+        for i in range(50):
+            inventario.registrar_lote("soro", f"L{i}", HOJE + timedelta(days=i))
+        lotes = np.array([f"L{i}" for i in range(50)])[np.arange(5000) % 50]
+
+        inventario.registrar_movimentacoes(lotes, np.full(5000, 2), "entrada")
+
+        assert inventario.total_movimentacoes == 5000
+        assert inventario.saldo("soro") == 10000
+        assert inventario.saldo_lote("L49") == 200
+        inventario.registrar_movimentacoes([f"L{i}" for i in range(0, 50, 2)], np.full(25, -200), "descarte")
+        assert inventario.lotes_vencendo(100)["lote"] == [f"L{i}" for i in range(1, 50, 2)]
+
+    def test_reposicao_vetorizada(self):
+        reposicao = calcular_reposicao(
+            demanda_30_dias=np.array([300.0, 300.0, 30.0]), estoque=np.array([10, 400, 0]),
+            preco=np.array([2.0, 2.0, 0.0]), lead_time=np.array([7, 7, 7]),
+            custo_pedido=np.array([50.0, 50.0, 50.0]), taxa_manutencao=np.array([0.25, 0.25, 0.25])
+        )
+        eoq = np.sqrt(2 * 300 * 365 / 30 * 50 / 0.5)
+
+        assert reposicao["ponto_reposicao"][0] == pytest.approx(130.0)
+        assert reposicao["eoq"][0] == pytest.approx(eoq)
+        assert reposicao["quantidade"].tolist() == [int(np.ceil(130 - 10 + eoq)), 0, 43]
+
+
+class TestPersistenciaInventario:
+    """Ledger em arquivo: saldos reconstruídos ao abrir e compartilhados entre processos"""
+
+    def test_saldos_reconstruidos_ao_reabrir(self, tmp_path):
+        caminho = str(tmp_path / "inventario.db")
+        inventario = InventarioLotes(caminho)
+        inventario.cadastrar_medicamento("insulina", preco_unitario=45.0, critico=True)
+        inventario.registrar_lote("insulina", "INS1", HOJE + timedelta(days=5))
+        inventario.registrar_movimentacoes(["INS1", "INS1"], [10, -4], ["entrada", "dispensacao"])
+        inventario.fechar()
+
+        reaberto = InventarioLotes(caminho)
+
+        assert reaberto.saldo("insulina") == 6
+        assert reaberto.cadastro("insulina").preco_unitario == 45.0
+        assert reaberto.movimentacoes_lote("INS1")["tipo"].tolist() == ["entrada", "dispensacao"]
+        assert reaberto.lotes_vencendo(30)["lote"] == ["INS1"]
+        assert reaberto.total_movimentacoes == 2
+
+    def test_escrita_de_outro_processo_aparece_na_leitura(self, tmp_path):
+        caminho = str(tmp_path / "inventario.db")
+        a, b = InventarioLotes(caminho, intervalo_sincronizacao=0), InventarioLotes(caminho, intervalo_sincronizacao=0)
+        a.registrar_lote("soro", "S1", HOJE)
+        a.movimentar("S1", 20, "entrada")
+
+        assert b.saldo("soro") == 0  # até a próxima sincronização
+        b.sincronizar()
+        assert b.saldo("soro") == 20
+        with pytest.raises(ValueError):
+            b.registrar_lote("soro", "S1", HOJE)
+        with pytest.raises(ValueError):
+            b.movimentar("S1", -21, "dispensacao")
+        b.movimentar("S1", -5, "dispensacao")
+        a.sincronizar()
+        assert a.saldo_lote("S1") == 15
+
+    def test_registro_concorrente_do_mesmo_lote(self):
+        inventario = InventarioLotes()
+        erros = []
+
+        def registrar():
+            try:
+                inventario.registrar_lote("soro", "S1", HOJE)
+            except ValueError as e:
+                erros.append(e)
+
+        threads = [threading.Thread(target=registrar) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(erros) == 7
+        assert inventario.lotes_vencendo(1)["lote"] == []  # sem saldo
+        inventario.movimentar("S1", 1, "entrada")
+        assert inventario.lotes_vencendo(1)["lote"] == ["S1"]
+
+
+class TestGestorComInventario:
+    """Gestão de estoque usando saldos e validades reais"""
+
+    @pytest.mark.asyncio
+    async def test_compras_e_validade(self):
+        gestor = GestorEstoqueInteligente(_inventario())
+
+        plano = await gestor.otimizar_compras_automatico({
+            "insulina": {"demanda_30_dias": 120}, "paracetamol": {"demanda_30_dias": 300}
+        })
+        validade = await gestor.gerenciar_prazos_validade()
+
+        assert gestor.obter_estoque_atual("insulina") == 40
+        assert [c["medicamento"] for c in plano["compras_programadas"]] == ["insulina"]
+        assert plano["compras_programadas"][0]["custo_estimado"] == plano["compras_programadas"][0]["quantidade"] * 45.0
+        assert [a["acao"] for a in validade["acoes_recomendadas"]] == ["descarte_imediato", "descarte_imediato", "promocao_interna"]
+        assert validade["valor_total_risco"] == pytest.approx(10 * 45.0 + 40 * 0.8 + 500 * 0.8)
+        assert len(validade["medicamentos_vencimento"]) == 3
+
+    def test_medicamento_sem_lotes_tem_estoque_desconhecido(self):
+        gestor = GestorEstoqueInteligente(InventarioLotes())
+        gestor.inventario.cadastrar_medicamento("insulina", preco_unitario=45.0)
+
+        assert gestor.obter_estoque_atual("insulina") == 0
+        assert gestor.obter_estoque_atual("dipirona") == 0
+        assert gestor.calcular_prioridade_compra("insulina") == "desconhecida"
+        gestor.inventario.registrar_lote("insulina", "INS1", HOJE)
+        assert gestor.calcular_prioridade_compra("insulina") == "urgente"
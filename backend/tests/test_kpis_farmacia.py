@@ -0,0 +1,200 @@
+"""
+Testes da camada materializada de KPIs e do dashboard executivo
+"""
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from app.modules.farmacia.dashboard_executivo import DashboardFarmaciaExecutivo
+from app.modules.farmacia.farmacia_clinica import FarmaciaClinicaAvancada
+from app.modules.farmacia.kpis_farmacia import KPIsFarmacia, dias_do_periodo
+
+HOJE = date(2025, 3, 31)
+
+
+def _dispensacao(data: date, medicamento='dipirona', custo=10.0, **extra) -> dict:
+    evento = {'tipo': 'dispensacao', 'data': data.isoformat(), 'medicamento': medicamento, 'custo': custo,
+              'receita': custo * 1.4, 'tempo_min': 12.0, 'no_prazo': True}
+    evento.update(extra)
+    return evento
+
+
+def _historico(kpis: KPIsFarmacia, dias: int, fim: date = HOJE) -> None:
+    for d in range(dias):
+        dia = fim - timedelta(days=d)
+        kpis.registrar_eventos(
+            [_dispensacao(dia), _dispensacao(dia, 'meropenem', 250.0), _dispensacao(dia, atendida=False)]
+            + [{'tipo': 'analise_prescricao', 'data': dia.isoformat(), 'adequada': i < 9, 'tempo_min': 5.0}
+               for i in range(10)]
+            + [{'tipo': 'intervencao', 'data': dia.isoformat(), 'aceita': True, 'erro_evitado': True,
+                'custo_evitado': 300.0},
+               {'tipo': 'custo', 'data': dia.isoformat(), 'categoria': 'pessoal', 'valor': 1000.0}]
+        )
+
+
+class TestKPIsFarmacia:
+    """Somas diárias, crescimento da tabela e custos por medicamento"""
+
+    def test_totais_por_periodo(self):
+        kpis = KPIsFarmacia()
+        _historico(kpis, 60)
+
+        totais = kpis.totais(HOJE - timedelta(days=29), HOJE)
+
+        assert totais['solicitacoes'] == 90 and totais['dispensacoes'] == 60 and totais['faltas'] == 30
+        assert totais['custo_medicamentos'] == pytest.approx(30 * 260.0)
+        assert totais['prescricoes_adequadas'] == 270
+        assert kpis.totais(HOJE + timedelta(days=1), HOJE + timedelta(days=30))['dispensacoes'] == 0
+        assert kpis.serie('faltas', HOJE - timedelta(days=61), HOJE).tolist() == [0.0, 0.0] + [1.0] * 60
+
+    def test_historico_retroativo_e_futuro(self):
+        kpis = KPIsFarmacia()
+        kpis.registrar_eventos([_dispensacao(HOJE)])
+        kpis.registrar_eventos([_dispensacao(HOJE - timedelta(days=3000)), _dispensacao(HOJE + timedelta(days=2000))])
+
+        assert kpis.totais(HOJE - timedelta(days=4000), HOJE + timedelta(days=4000))['dispensacoes'] == 3
+        assert kpis.totais(HOJE, HOJE)['dispensacoes'] == 1
+
+    def test_lote_invalido_rejeitado_inteiro(self):
+        kpis = KPIsFarmacia()
+
+        with pytest.raises(ValueError):
+            kpis.registrar_eventos([_dispensacao(HOJE), {'tipo': 'custo', 'data': HOJE, 'categoria': 'viagens'}])
+
+        assert kpis.versao == 0
+        assert kpis.totais(HOJE, HOJE)['dispensacoes'] == 0
+
+    def test_custos_por_medicamento_com_meses_e_pontas(self):
+        kpis = KPIsFarmacia()
+        _historico(kpis, 120)
+
+        inicio = HOJE - timedelta(days=100)
+        ranking = kpis.custos_por_medicamento(inicio, HOJE)
+
+        assert ranking[0] == ('meropenem', pytest.approx(101 * 250.0))
+        assert ranking[1] == ('dipirona', pytest.approx(101 * 10.0))
+        assert dias_do_periodo('2_anos') == 730 and dias_do_periodo('7_dias') == 7
+
+    def test_rollup_persistido_e_compartilhado(self, tmp_path):
+        caminho = str(tmp_path / "kpis.db")
+        kpis = KPIsFarmacia(caminho)
+        _historico(kpis, 40)
+        kpis.fechar()
+
+        reaberto = KPIsFarmacia(caminho, intervalo_sincronizacao=0)
+        outro = KPIsFarmacia(caminho, intervalo_sincronizacao=0)
+        avisos = []
+        reaberto.inscrever(lambda primeiro, ultimo: avisos.append((primeiro, ultimo)))
+        outro.registrar_eventos([_dispensacao(HOJE, 'meropenem', 250.0)])
+
+        assert reaberto.totais(HOJE, HOJE)['dispensacoes'] == 2  # consultas não leem o banco
+        assert reaberto.sincronizar() == (HOJE.toordinal(), HOJE.toordinal())
+        assert reaberto.sincronizar() is None
+        totais = reaberto.totais(HOJE - timedelta(days=29), HOJE)
+        assert totais['dispensacoes'] == 61 and totais['intervencoes'] == 30
+        assert reaberto.custos_por_medicamento(HOJE, HOJE)[0] == ('meropenem', pytest.approx(500.0))
+        assert reaberto.custos_por_medicamento(HOJE - timedelta(days=39), HOJE)[1] == ('dipirona', pytest.approx(400.0))
+        assert avisos == [(HOJE.toordinal(), HOJE.toordinal())]
+
+    def test_sincronizacao_periodica(self, tmp_path):
+        caminho = str(tmp_path / "kpis.db")
+        kpis = KPIsFarmacia(caminho, intervalo_sincronizacao=0.02)
+        outro = KPIsFarmacia(caminho, intervalo_sincronizacao=0)
+        avisado = threading.Event()
+        kpis.inscrever(lambda primeiro, ultimo: avisado.set())
+
+        outro.registrar_eventos([_dispensacao(HOJE, 'meropenem', 250.0)])
+
+        assert avisado.wait(2.0)
+        assert kpis.totais(HOJE, HOJE)['dispensacoes'] == 1
+        kpis.fechar()
+        outro.fechar()
+
+
+class TestDashboardFarmaciaExecutivo:
+    """Indicadores vindos dos rollups, cache e invalidação por eventos"""
+
+    @pytest.mark.asyncio
+    async def test_indicadores_e_variacao_reais(self):
+        kpis = KPIsFarmacia()
+        _historico(kpis, 60)
+        kpis.registrar_eventos([_dispensacao(HOJE, custo=0.0) for _ in range(30)])
+        dashboard = DashboardFarmaciaExecutivo(kpis, equipe_farmaceuticos=3)
+
+        resultado = await dashboard.gerar_dashboard_executivo('30_dias', HOJE)
+
+        seguranca = resultado['kpis_principais']['seguranca_medicamentosa']
+        eficiencia = resultado['kpis_principais']['eficiencia_operacional']
+        assert seguranca['taxa_intervencao'] == pytest.approx(10.0)
+        assert seguranca['score_seguranca'] == 1.0 and seguranca['tendencia'] == 'estavel'
+        assert eficiencia['taxa_falta_medicamentos'] == pytest.approx(100 * 30 / 120)
+        assert eficiencia['taxa_falta_medicamentos_variacao']['percentual'] == pytest.approx(-25.0)
+        assert seguranca['intervencoes_farmaceuticas_variacao']['percentual'] == 0.0
+        financeiro = resultado['analise_financeira']
+        assert financeiro['custo_operacional'] == 30000.0
+        assert financeiro['roi_farmacia_clinica'] == pytest.approx(0.3)
+        assert financeiro['top_medicamentos_custo'][0]['nome'] == 'meropenem'
+        assert resultado['analise_operacional']['produtividade_equipe']['dispensacoes_por_farmaceutico'] == 30.0
+        assert resultado['indicadores_qualidade']['qualidade_prescricoes']['taxa_adequacao'] == pytest.approx(90.0)
+
+    @pytest.mark.asyncio
+    async def test_cache_invalidado_por_eventos_do_periodo(self):
+        kpis = KPIsFarmacia()
+        _historico(kpis, 30)
+        dashboard = DashboardFarmaciaExecutivo(kpis)
+
+        primeiro = await dashboard.gerar_dashboard_executivo('7_dias', HOJE)
+        primeiro['kpis_principais'].clear()
+        em_cache = await dashboard.gerar_dashboard_executivo('7_dias', HOJE)
+        kpis.registrar_eventos([_dispensacao(HOJE + timedelta(days=5))])
+        ainda_em_cache = await dashboard.gerar_dashboard_executivo('7_dias', HOJE)
+        kpis.registrar_eventos([{'tipo': 'intervencao', 'data': HOJE.isoformat()}])
+        recalculado = await dashboard.gerar_dashboard_executivo('7_dias', HOJE)
+
+        assert em_cache['data_atualizacao'] == ainda_em_cache['data_atualizacao']
+        assert em_cache['kpis_principais']['seguranca_medicamentosa']['intervencoes_farmaceuticas'] == 7
+        assert recalculado['kpis_principais']['seguranca_medicamentosa']['intervencoes_farmaceuticas'] == 8
+
+    @pytest.mark.asyncio
+    async def test_periodo_sem_eventos(self):
+        kpis = KPIsFarmacia()
+        _historico(kpis, 10, fim=HOJE - timedelta(days=60))
+        dashboard = DashboardFarmaciaExecutivo(kpis)
+
+        vazio = await dashboard.gerar_dashboard_executivo('30_dias', HOJE)
+        kpis.registrar_eventos([_dispensacao(HOJE)])
+        com_dados = await dashboard.gerar_dashboard_executivo('30_dias', HOJE)
+
+        assert vazio['status'] == 'sem_dados' and vazio['kpis_principais'] == {}
+        assert vazio['score_performance_geral']['classificacao'] == 'sem_dados'
+        assert com_dados['status'] == 'ok'
+        assert com_dados['analise_operacional']['produtividade_equipe']['dispensacoes_por_farmaceutico'] == 0.1
+
+    @pytest.mark.asyncio
+    async def test_cache_limitado(self):
+        kpis = KPIsFarmacia()
+        _historico(kpis, 30)
+        dashboard = DashboardFarmaciaExecutivo(kpis, cache_maximo=3)
+
+        for d in range(6):
+            await dashboard.gerar_dashboard_executivo('7_dias', HOJE - timedelta(days=d))
+        await dashboard.gerar_dashboard_executivo('7_dias', HOJE - timedelta(days=3))
+        await dashboard.gerar_dashboard_executivo('7_dias', HOJE - timedelta(days=6))
+
+        assert [dia for _, dia in dashboard._cache] == [(HOJE - timedelta(days=d)).toordinal() for d in (5, 3, 6)]
+
+    @pytest.mark.asyncio
+    async def test_intervencoes_do_acompanhamento_entram_nos_kpis(self):
+        kpis = KPIsFarmacia()
+        farmacia = FarmaciaClinicaAvancada(kpis=kpis)
+
+        resultado = await farmacia.realizar_acompanhamento_farmacoterapeutico('P1')
+
+        assert kpis.totais(date.today(), date.today())['intervencoes'] == len(resultado['intervencoes'])
+
+    @pytest.mark.asyncio
+    async def test_periodo_invalido(self):
+        resultado = await DashboardFarmaciaExecutivo(KPIsFarmacia()).gerar_dashboard_executivo('trimestre')
+
+        assert 'error' in resultado
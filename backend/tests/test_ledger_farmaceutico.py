@@ -0,0 +1,168 @@
+"""
+Testes do ledger append-only de rastreabilidade de medicamentos
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.modules.farmacia.ledger_farmaceutico import LedgerFarmaceutico, raiz_merkle
+from app.modules.farmacia.rastreador_medicamentos import (
+    BlockchainFarmaceutico,
+    RastreadorMedicamentosBlockchain,
+    ScannerRFIDMedicamentos,
+    drenar_gravacoes)
+from app.modules.farmacia.telemetria_cadeia_fria import TelemetriaCadeiaFria
+
+
+def _evento(tipo: str, lote: str = "OME2024001", **extra) -> dict:
+    return {"tipo": tipo, "timestamp": "2024-01-15T08:00:00", "responsavel": "Lab ABC",
+            "localizacao": "Fábrica", "lote": lote, **extra}
+
+
+class TestLedgerFarmaceutico:
+    """Blocos, índices e verificação da cadeia"""
+
+    def test_bloco_por_chamada_e_historico(self):
+        ledger = LedgerFarmaceutico()
+
+        recibos = ledger.anexar([("MED1", _evento("fabricacao")), ("MED2", _evento("fabricacao"))])
+        ledger.anexar([("MED1", _evento("transporte", origem="A", destino="B"))])
+
+        assert [r["bloco"] for r in recibos] == [1, 1]
+        assert ledger.altura == 2
+        historico = ledger.historico("MED1")
+        assert [e["tipo"] for e in historico] == ["fabricacao", "transporte"]
+        assert historico[0]["hash_evento"] == recibos[0]["hash"]
+        assert len(ledger.historico_lote("OME2024001")) == 3
+        assert ledger.historico("MED3") == []
+
+    def test_raiz_merkle(self):
+        folhas = [f"{i:064x}" for i in range(5)]
+
+        assert raiz_merkle(folhas) != raiz_merkle(folhas[:4])
+        assert raiz_merkle(folhas) != raiz_merkle(folhas[::-1])
+        assert raiz_merkle(folhas[:1]) == folhas[0]
+
+    def test_verificacao_incremental(self):
+        ledger = LedgerFarmaceutico()
+        for i in range(3):
+            ledger.anexar([(f"MED{i}", _evento("fabricacao")) for _ in range(10)])
+
+        completa = ledger.verificar_cadeia()
+        ledger.anexar([("MED9", _evento("recebimento"))])
+        incremental = ledger.verificar_cadeia()
+
+        assert completa["integra"] and completa["blocos_verificados"] == 3
+        assert incremental["integra"]
+        assert incremental["desde_bloco"] == 3
+        assert incremental["blocos_verificados"] == 1
+        assert incremental["checkpoint"] == 4
+
+    def test_append_only(self):
+        ledger = LedgerFarmaceutico()
+        ledger.anexar([("MED1", _evento("fabricacao"))])
+
+        with pytest.raises(sqlite3.IntegrityError):
+            ledger._conn.execute("UPDATE eventos SET payload = '{}'")
+        with pytest.raises(sqlite3.IntegrityError):
+            ledger._conn.execute("DELETE FROM blocos")
+
+    def test_adulteracao_detectada_e_cadeia_persistida(self, tmp_path):
+        caminho = str(tmp_path / "ledger.db")
+        ledger = LedgerFarmaceutico(caminho)
+        ledger.anexar([("MED1", _evento("fabricacao"))])
+        ledger.anexar([("MED1", _evento("transporte", origem="A", destino="B"))])
+        ledger.fechar()
+
+        reaberto = LedgerFarmaceutico(caminho)
+        reaberto.anexar([("MED1", _evento("recebimento"))])
+        assert reaberto.altura == 3
+        assert reaberto.verificar_cadeia()["integra"]
+
+        conn = sqlite3.connect(caminho)
+        conn.execute("DROP TRIGGER eventos_append_only_update")
+        conn.execute("UPDATE eventos SET payload = replace(payload, 'transporte', 'roubo') WHERE bloco = 2")
+        conn.commit()
+        conn.close()
+
+        resultado = reaberto.verificar_cadeia(completa=True)
+        assert resultado["integra"] is False
+        assert resultado["bloco_invalido"] == 2
+
+
+class TestBlockchainFarmaceutico:
+    """Group commit e rajadas RFID"""
+
+    @pytest.mark.asyncio
+    async def test_eventos_concorrentes_num_unico_bloco(self):
+        blockchain = BlockchainFarmaceutico(LedgerFarmaceutico(), tamanho_bloco=100, janela_commit=0.01)
+
+        recibos = await asyncio.gather(*(
+            blockchain.registrar_evento(f"MED{i}", _evento("armazenamento")) for i in range(25)
+        ))
+
+        assert {r["bloco"] for r in recibos} == {1}
+        assert len({r["hash"] for r in recibos}) == 25
+
+    @pytest.mark.asyncio
+    async def test_bloco_cheio_grava_sem_esperar_janela(self):
+        blockchain = BlockchainFarmaceutico(LedgerFarmaceutico(), tamanho_bloco=10, janela_commit=60)
+
+        recibos = await asyncio.wait_for(asyncio.gather(*(
+            blockchain.registrar_evento(f"MED{i}", _evento("armazenamento")) for i in range(20)
+        )), timeout=5)
+
+        assert sorted({r["bloco"] for r in recibos}) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_drenar_grava_fila_no_shutdown(self):
+        ledger = LedgerFarmaceutico()
+        blockchain = BlockchainFarmaceutico(ledger, tamanho_bloco=100, janela_commit=60)
+        esperando = [asyncio.create_task(blockchain.registrar_evento(f"MED{i}", _evento("armazenamento")))
+                     for i in range(3)]
+        await asyncio.sleep(0)
+
+        await drenar_gravacoes()
+
+        recibos = await asyncio.wait_for(asyncio.gather(*esperando), timeout=1)  # sem esperar a janela
+        assert {r["bloco"] for r in recibos} == {1}
+        assert ledger.verificar_cadeia()["eventos_verificados"] == 3
+        assert not blockchain._gravacoes
+
+    @pytest.mark.asyncio
+    async def test_rajada_rfid(self):
+        ledger = LedgerFarmaceutico()
+        telemetria = TelemetriaCadeiaFria()
+        scanner = ScannerRFIDMedicamentos(BlockchainFarmaceutico(ledger, tamanho_bloco=1000), telemetria)
+        leituras = [{"epc": f"EPC{i % 2500}", "lote": "L1", "antena": 1} for i in range(5000)]
+        # Etiquetas com sensor: cada leitura alimenta a telemetria do lote
+        leituras += [{"epc": "EPCS", "lote": "L2", "timestamp": f"2024-01-15T08:{minuto:02d}:00",
+                      "temperatura": 4.0 + minuto, "umidade": 60} for minuto in range(3)]
+        leituras.append({"antena": 2})
+
+        resultado = await scanner.processar_leituras(leituras, "Farmácia", "Recebimento")
+
+        assert resultado["etiquetas_unicas"] == 2501
+        assert resultado["leituras_sem_codigo"] == 1
+        assert resultado["leituras_telemetria"] == 3
+        assert resultado["blocos"] == [1, 2, 3]
+        assert ledger.historico("EPC7")[0]["leituras"] == 2
+        assert ledger.verificar_cadeia()["eventos_verificados"] == 2501
+        assert telemetria.resumo_lote("L2")["maxima"] == 6.0
+        assert telemetria.resumo_lote("L1") is None
+
+    @pytest.mark.asyncio
+    async def test_rastreamento_completo_usa_ledger(self):
+        rastreador = RastreadorMedicamentosBlockchain(LedgerFarmaceutico(), TelemetriaCadeiaFria())
+        registro = await rastreador.registrar_evento_blockchain(
+            "MED1", _evento("fabricacao", data_fabricacao="2024-01-15", fabricante="Lab ABC",
+                            medicamento="Omeprazol 20mg")
+        )
+
+        resultado = await rastreador.rastrear_medicamento_completo("MED1")
+
+        assert registro["sucesso"] and registro["bloco"] == 1
+        assert resultado["historico_completo"]["medicamento"] == "Omeprazol 20mg"
+        assert resultado["historico_completo"]["eventos"][0]["hash_evento"] == registro["hash_transacao"]
+        assert (await rastreador.verificar_integridade_ledger())["integra"]
@@ -0,0 +1,76 @@
+"""
+Tests for the radiology batch augmentation engine
+"""
+import numpy as np
+import pytest
+
+augmentation = pytest.importorskip("app.modules.radiologia.medical_data_augmentation")
+
+
+@pytest.fixture
+def images():
+    return np.random.default_rng(0).random((6, 32, 32)).astype(np.float32)
+
+
+class TestMedicalDataAugmentation:
+    """Single-image augmentations stay in float32"""
+
+    def test_rotation_keeps_float_precision(self):
+        image = np.full((16, 16), 0.123456, dtype=np.float32)
+        rotated = augmentation.MedicalDataAugmentation()._safe_rotation(image, (0, 0), 1.0)
+
+        assert rotated.dtype == np.float32
+        assert np.allclose(rotated, image)
+
+    def test_coordinate_grid_is_cached(self):
+        first = augmentation._coordinate_grid((8, 12))
+        second = augmentation._coordinate_grid((8, 12))
+
+        assert first[0] is second[0]
+        assert not first[0].flags.writeable
+
+
+class TestBatchMedicalAugmentation:
+    """Batch engine behaviour"""
+
+    def test_augment_batch_shape_and_range(self, images):
+        engine = augmentation.BatchMedicalAugmentation('CT', seed=1, num_workers=2)
+        augmented = engine.augment_batch(images)
+        engine.close()
+
+        assert augmented.shape == images.shape
+        assert augmented.dtype == np.float32
+        assert augmented.min() >= 0.0 and augmented.max() <= 1.0
+
+    def test_same_seed_is_reproducible(self, images):
+        with augmentation.BatchMedicalAugmentation('MR', seed=42, num_workers=3) as first, \
+                augmentation.BatchMedicalAugmentation('MR', seed=42, num_workers=3) as second:
+            assert np.array_equal(first.augment_batch(images), second.augment_batch(images))
+            assert np.array_equal(first.augment_batch(images), second.augment_batch(images))
+
+    def test_rejects_non_stack_input(self):
+        engine = augmentation.BatchMedicalAugmentation()
+
+        with pytest.raises(ValueError):
+            engine.augment_batch(np.zeros((32, 32)))
+
+
+class TestAugmentationDataLoader:
+    """Prefetching loader"""
+
+    def test_iterates_every_sample_once(self, images):
+        labels = np.arange(len(images))
+        loader = augmentation.AugmentationDataLoader(images, labels, batch_size=4, seed=0)
+
+        batches = list(loader)
+        seen = np.concatenate([batch_labels for _, batch_labels in batches])
+
+        assert len(batches) == len(loader) == 2
+        assert sorted(seen.tolist()) == labels.tolist()
+
+    def test_early_break_stops_prefetch(self, images):
+        loader = augmentation.AugmentationDataLoader(images, batch_size=1, prefetch_batches=1)
+
+        for batch in loader:
+            assert batch.shape == (1, 32, 32)
+            break
@@ -0,0 +1,127 @@
+"""
+Tests for templated medical document rendering
+"""
+import pytest
+
+from app.services import medical_document_generator as generator_module
+from app.services.document_rendering import CompiledTemplate, DocumentIdGenerator
+from app.services.medical_document_generator import MedicalDocumentGenerator
+
+PATIENT = {"name": "Ana <Silva>", "patient_id": "P1", "age": 42, "address": "Rua A"}
+PHYSICIAN = {"name": "João", "crm": "123", "specialty": "Cardiologia", "clinic_name": "Clínica X"}
+PRESCRIPTION = {
+    "medications": [{"name": "Losartana", "dosage": "50mg", "frequency": "1x/dia", "duration": "30 dias"}],
+    "instructions": "Tomar pela manhã"
+}
+
+
+@pytest.fixture
+def generator():
+    return MedicalDocumentGenerator(db=None)
+
+
+class CountingValidator:
+    """Counts guideline validations"""
+
+    def __init__(self, validator):
+        self.motor_diretrizes = validator.motor_diretrizes
+        self._validator = validator
+        self.calls = 0
+
+    async def validar_acao_medica(self, **kwargs):
+        self.calls += 1
+        return await self._validator.validar_acao_medica(**kwargs)
+
+
+class TestCompiledTemplate:
+    """Template parsing and rendering"""
+
+    def test_render_and_escape(self):
+        template = CompiledTemplate("Paciente: {name}\nIdade: {age}")
+
+        assert template.fields == ("name", "age")
+        assert template.render({"name": "Ana"}) == "Paciente: Ana\nIdade: "
+        assert template.render({"name": "<b>"}, escape=lambda v: v.replace("<", "&lt;")) == "Paciente: &lt;b>\nIdade: "
+
+    def test_rejects_format_specs(self):
+        with pytest.raises(ValueError):
+            CompiledTemplate("{value:.2f}")
+
+
+class TestDocumentIds:
+    """Collision-free document identifiers"""
+
+    def test_ids_are_unique_within_a_second(self):
+        ids = DocumentIdGenerator(node="abc123")
+        generated = {ids.next_id("RX") for _ in range(1000)}
+
+        assert len(generated) == 1000
+        assert all(document_id.startswith("RX_") for document_id in generated)
+
+
+class TestRendering:
+    """Text, HTML and streaming output"""
+
+    def test_prescription_text(self, generator):
+        text = generator._format_prescription_content(PATIENT, PHYSICIAN, PRESCRIPTION, "Hipertensão")
+
+        assert text.startswith("\nRECEITA MÉDICA\n\nClínica X\nDr(a). João - CRM: 123\nCardiologia\n")
+        assert "\n1. Losartana\n   Dose: 50mg\n   Frequência: 1x/dia\n   Duração: 30 dias\n" in text
+        assert "\nInstruções: Tomar pela manhã" in text
+        assert text.endswith("\n\n_________________________________\nDr(a). João\nCRM: 123\n")
+
+    def test_certificate_optional_lines(self, generator):
+        text = generator._format_certificate_content(PATIENT, PHYSICIAN, {"condition": "Gripe", "rest_period": 3, "cid_code": "J11"})
+
+        assert "Diagnóstico: Gripe\nCID: J11\n" in text
+        assert "Restrições" not in text
+
+    def test_html_escapes_values(self, generator):
+        context = {"patient_data": PATIENT, "physician_data": PHYSICIAN, "prescription_data": PRESCRIPTION}
+
+        document = generator.render("receita_medica", context, output_format="html")
+
+        assert document.startswith("<!DOCTYPE html>")
+        assert "Ana &lt;Silva&gt;" in document
+
+    def test_streaming_matches_full_render(self, generator):
+        context = {"patient_data": PATIENT, "physician_data": PHYSICIAN,
+                   "exam_request_data": {"exams": [{"name": "ECG", "justification": "Dor"}], "urgency": "urgent"}}
+
+        chunks = list(generator.iter_render("solicitacao_exames", context))
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == generator.render("solicitacao_exames", context)
+        assert "Urgência: URGENT" in "".join(chunks)
+
+
+class TestBatchGeneration:
+    """Batch prescriptions validate each distinct prescription once"""
+
+    @pytest.mark.asyncio
+    async def test_batch_preserves_order_and_deduplicates_validation(self, generator):
+        generator_module._validation_cache.clear()
+        generator.validator = CountingValidator(generator.validator)
+        items = [
+            {"patient_data": {**PATIENT, "name": f"Paciente {i}"}, "physician_data": PHYSICIAN,
+             "prescription_data": PRESCRIPTION, "diagnosis": "Hipertensão" if i % 2 else "Diabetes"}
+            for i in range(120)
+        ]
+
+        documents = await generator.generate_prescription_batch(items, chunk_size=25)
+
+        assert [d["patient_info"]["name"] for d in documents] == [f"Paciente {i}" for i in range(120)]
+        assert len({d["document_id"] for d in documents}) == 120
+        assert generator.validator.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_single_document_reuses_cached_validation(self, generator):
+        generator_module._validation_cache.clear()
+        generator.validator = CountingValidator(generator.validator)
+
+        first = await generator.generate_prescription_document(PATIENT, PHYSICIAN, PRESCRIPTION, "Hipertensão")
+        second = await generator.generate_prescription_document(PATIENT, PHYSICIAN, PRESCRIPTION, "Hipertensão")
+
+        assert generator.validator.calls == 1
+        assert first["guidelines_compliance"] == second["guidelines_compliance"]
+        assert first["document_id"] != second["document_id"]
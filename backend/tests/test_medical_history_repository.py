@@ -0,0 +1,149 @@
+"""
+Tests for the paged medical history repository
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.repositories.medical_history_repository import (
+    MedicalHistoryRepository,
+    decode_cursor,
+    encode_cursor)
+
+PATIENT = "patient-1"
+START = datetime(2024, 1, 1, 8, 0)
+
+SCHEMA = [
+    "CREATE TABLE appointments (id TEXT PRIMARY KEY, patient_id TEXT, is_deleted BOOLEAN, created_at DATETIME,"
+    " scheduled_datetime DATETIME, title TEXT, appointment_status TEXT, chief_complaint TEXT)",
+    "CREATE TABLE exams (id TEXT PRIMARY KEY, patient_id TEXT, is_deleted BOOLEAN, created_at DATETIME,"
+    " performed_date DATETIME, scheduled_date DATETIME, exam_type TEXT, title TEXT, exam_status TEXT,"
+    " description TEXT)",
+    "CREATE TABLE prescriptions (id TEXT PRIMARY KEY, patient_id TEXT, is_deleted BOOLEAN, created_at DATETIME,"
+    " prescribed_date DATETIME, title TEXT, prescription_status TEXT, diagnosis TEXT)",
+    "CREATE TABLE diagnostics (id TEXT PRIMARY KEY, patient_id TEXT, is_deleted BOOLEAN, created_at DATETIME,"
+    " approved_at DATETIME, title TEXT, diagnostic_status TEXT, summary TEXT)",
+]
+
+
+def _ts(hours: int) -> str:
+    return (START + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for statement in SCHEMA:
+            await conn.execute(text(statement))
+        for i in range(30):
+            await conn.execute(text(
+                "INSERT INTO appointments VALUES (:id, :patient, 0, :ts, :ts, 'Consulta', 'completed', 'Dor')"
+            ), {"id": f"a{i:02d}", "patient": PATIENT, "ts": _ts(i * 3)})
+        for i, exam_type in enumerate(["xray", "blood_test", "endoscopy"] * 5):
+            await conn.execute(text(
+                "INSERT INTO exams VALUES (:id, :patient, 0, :ts, NULL, :ts, :type, 'Exame', 'completed', NULL)"
+            ), {"id": f"e{i:02d}", "patient": PATIENT, "ts": _ts(i * 3 + 1), "type": exam_type})
+        for i in range(10):
+            await conn.execute(text(
+                "INSERT INTO prescriptions VALUES (:id, :patient, 0, :ts, :ts, 'Receita', 'active', 'I10')"
+            ), {"id": f"p{i:02d}", "patient": PATIENT, "ts": _ts(i * 3 + 2)})
+        # Same timestamp as an appointment: ties are broken by type and id
+        await conn.execute(text(
+            "INSERT INTO diagnostics VALUES ('d00', :patient, 0, :ts, NULL, 'Laudo', 'approved', 'Normal')"
+        ), {"patient": PATIENT, "ts": _ts(0)})
+        # Deleted and foreign records are never returned
+        await conn.execute(text(
+            "INSERT INTO prescriptions VALUES ('p99', :patient, 1, :ts, :ts, 'Apagada', 'cancelled', NULL)"
+        ), {"patient": PATIENT, "ts": _ts(500)})
+        await conn.execute(text(
+            "INSERT INTO appointments VALUES ('x00', 'other', 0, :ts, :ts, 'Outro', 'completed', NULL)"
+        ), {"ts": _ts(500)})
+
+    async with AsyncSession(engine) as db:
+        yield db
+    await engine.dispose()
+
+
+async def _all_pages(repository, **kwargs):
+    records, cursor, pages = [], None, 0
+    while True:
+        page = await repository.get_page(PATIENT, cursor=cursor, **kwargs)
+        records.extend(page["records"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return records, pages
+
+
+class TestCursor:
+    """Opaque cursor encoding"""
+
+    def test_round_trip(self):
+        cursor = encode_cursor(START, "consultation", "a01")
+        assert decode_cursor(cursor) == (START, "consultation", "a01")
+
+    def test_malformed_cursor(self):
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestMedicalHistoryRepository:
+    """Keyset pages, pushed-down filters and aggregate summary"""
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_timeline_in_order(self, session):
+        repository = MedicalHistoryRepository(session)
+
+        records, pages = await _all_pages(repository, page_size=7)
+
+        assert len(records) == 56
+        assert pages == 8
+        keys = [(r["occurred_at"], r["record_type"], r["record_id"]) for r in records]
+        assert keys == sorted(keys, reverse=True)
+        assert len({r["record_id"] for r in records}) == 56
+        assert {"p99", "x00"}.isdisjoint(r["record_id"] for r in records)
+
+    @pytest.mark.asyncio
+    async def test_ascending_order(self, session):
+        repository = MedicalHistoryRepository(session)
+
+        records, _ = await _all_pages(repository, page_size=10, newest_first=False)
+
+        assert [r["record_id"] for r in records[:3]] == ["a00", "d00", "e00"]
+
+    @pytest.mark.asyncio
+    async def test_type_filter_and_projection(self, session):
+        repository = MedicalHistoryRepository(session)
+
+        records, _ = await _all_pages(repository, record_types=["imaging", "prescription"],
+                                      fields=["title"], page_size=20)
+
+        assert {r["record_type"] for r in records} == {"imaging", "prescription"}
+        assert len(records) == 15
+        assert set(records[0]) == {"record_id", "record_type", "occurred_at", "title"}
+
+    @pytest.mark.asyncio
+    async def test_unknown_field(self, session):
+        with pytest.raises(ValueError):
+            await MedicalHistoryRepository(session).get_page(PATIENT, fields=["password"])
+
+    @pytest.mark.asyncio
+    async def test_summary(self, session):
+        repository = MedicalHistoryRepository(session)
+
+        summary = await repository.get_summary(PATIENT)
+
+        assert summary["total_records"] == 56
+        assert summary["by_type"] == {
+            "consultation": 30, "imaging": 5, "lab_result": 5, "diagnostic": 6, "prescription": 10
+        }
+        assert summary["date_range"] == {"earliest": START.isoformat(), "latest": (START + timedelta(hours=87)).isoformat()}
+
+    @pytest.mark.asyncio
+    async def test_summary_with_filter(self, session):
+        summary = await MedicalHistoryRepository(session).get_summary(PATIENT, record_types=["lab_result"])
+
+        assert summary["by_type"] == {"lab_result": 5}
@@ -0,0 +1,142 @@
+"""
+Tests for the continuous memory monitor
+"""
+import tracemalloc
+
+import pytest
+
+from app.monitoring.memory import BYTES_PER_MB, MemoryMonitor, MemorySample, linear_growth
+
+
+def _samples(rss_mb, step_seconds=10.0):
+    return [
+        MemorySample(timestamp=i * step_seconds, rss_bytes=int(mb * BYTES_PER_MB), traced_bytes=0)
+        for i, mb in enumerate(rss_mb)
+    ]
+
+
+@pytest.fixture
+def monitor():
+    monitor = MemoryMonitor(sample_interval_seconds=0.01, snapshot_every=1, trace_allocations=False)
+    yield monitor
+    monitor.stop()
+
+
+class TestLinearGrowth:
+    """Least-squares growth estimate"""
+
+    def test_steady_growth(self):
+        slope, r_squared = linear_growth(_samples([100, 101, 102, 103, 104]))
+
+        assert slope * 10 / BYTES_PER_MB == pytest.approx(1.0)
+        assert r_squared == pytest.approx(1.0)
+
+    def test_flat_and_short_series(self):
+        assert linear_growth(_samples([100, 100, 100])) == (0.0, 0.0)
+        assert linear_growth(_samples([100])) == (0.0, 0.0)
+
+
+class TestLeakDetection:
+    """Leak detection over the sampled window"""
+
+    def test_reports_steady_growth(self, monitor):
+        monitor._samples.extend(_samples([100 + 2 * i for i in range(12)]))
+
+        result = monitor.detect_memory_leaks(threshold_mb=10.0, time_window_seconds=120)
+
+        assert result["has_leak"] is True
+        assert result["leak_details"]["growth_rate"] == pytest.approx(720.0)
+        assert result["current_memory_mb"] == pytest.approx(122.0)
+
+    def test_ignores_noise_and_spikes(self, monitor):
+        monitor._samples.extend(_samples([100, 140, 100, 101, 99, 100, 100, 101]))
+
+        result = monitor.detect_memory_leaks(threshold_mb=10.0, time_window_seconds=80)
+
+        assert result["has_leak"] is False
+
+    def test_profile_uses_window(self, monitor):
+        monitor._samples.extend(_samples([100, 150, 110]))
+
+        profile = monitor.get_profile()
+
+        assert profile["peak_memory_mb"] == pytest.approx(150.0)
+        assert profile["current_memory_mb"] == pytest.approx(110.0)
+        assert profile["average_memory_mb"] == pytest.approx(120.0)
+
+
+class TestSampler:
+    """Background sampling, snapshots and budget enforcement"""
+
+    def test_start_stop(self, monitor):
+        monitor.start()
+        assert monitor.is_running
+
+        monitor.stop()
+
+        assert not monitor.is_running
+        assert monitor.samples()
+
+    def test_allocation_diff_names_growing_site(self):
+        monitor = MemoryMonitor(snapshot_every=1)
+        tracemalloc.start()
+        retained = []
+        try:
+            monitor.sample()
+            retained.extend(bytearray(1024) for _ in range(2000))
+            monitor.sample()
+            top = monitor.top_allocation_growth(limit=3)
+        finally:
+            tracemalloc.stop()
+
+        assert top
+        assert top[0]["source"].startswith(__file__)
+        assert top[0]["size_diff_mb"] > 1.5
+
+    def test_sustained_growth_starts_tracing(self):
+        monitor = MemoryMonitor(sample_interval_seconds=60, trace_allocations=False,
+                                leak_threshold_mb=10.0, leak_window_seconds=120)
+        monitor.start()
+        try:
+            monitor._samples.clear()
+            monitor._samples.extend(_samples([100, 100, 101, 100, 100, 101]))
+            assert monitor._start_tracing_on_leak() is False
+
+            monitor._samples.clear()
+            monitor._samples.extend(_samples([100 + 2 * i for i in range(12)]))
+            assert monitor._start_tracing_on_leak() is True
+            assert tracemalloc.is_tracing()
+        finally:
+            monitor.stop()
+
+        assert not tracemalloc.is_tracing()
+
+    def test_budget_triggers_eviction(self):
+        monitor = MemoryMonitor(trace_allocations=False, memory_budget_mb=1)
+        evicted = []
+
+        class ModelCache:
+            def evict(self):
+                evicted.append(True)
+                return True
+
+        cache = ModelCache()
+        monitor.register_eviction_callback(cache.evict)
+        monitor.sample()
+
+        assert evicted
+        assert monitor.get_profile()["evictions"] >= 1
+
+    def test_eviction_callbacks_are_weak(self):
+        monitor = MemoryMonitor(trace_allocations=False, memory_budget_mb=1)
+        evicted = []
+
+        class ModelCache:
+            def evict(self):
+                evicted.append(True)
+                return True
+
+        monitor.register_eviction_callback(ModelCache().evict)
+        monitor.sample()
+
+        assert evicted == []
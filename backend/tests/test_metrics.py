@@ -0,0 +1,152 @@
+"""
+Tests for the in-process metrics registry
+"""
+import random
+import threading
+
+import pytest
+
+from app.monitoring.metrics import (
+    PIPELINE_STAGE_DURATION,
+    PIPELINE_STAGE_ERRORS,
+    Histogram,
+    MetricsRegistry,
+    pipeline_stage)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+class TestCounters:
+    """Sharded counters and gauges"""
+
+    def test_counter_aggregates_thread_shards(self, registry):
+        counter = registry.counter("requests_total", labelnames=("route",)).labels("/ai")
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.value == 8000
+
+    def test_exited_threads_fold_into_one_shard(self):
+        histogram = Histogram()
+
+        def work():
+            for value in (0.001, 0.002, 0.004):
+                histogram.observe(value)
+
+        for _ in range(50):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        histogram.observe(0.008)
+
+        snapshot = histogram.snapshot()
+        assert len(histogram._shards) == 1
+        assert snapshot["count"] == 151
+        assert snapshot["min"] == pytest.approx(0.001)
+        assert snapshot["max"] == pytest.approx(0.008)
+
+    def test_labels_return_same_child(self, registry):
+        family = registry.counter("ops_total", labelnames=("operation", "status"))
+
+        assert family.labels("predict", "success") is family.labels(operation="predict", status="success")
+        with pytest.raises(ValueError):
+            family.labels("predict")
+
+    def test_gauge(self, registry):
+        gauge = registry.gauge("models_loaded").labels()
+        gauge.set(3)
+        gauge.dec()
+
+        assert gauge.value == 2
+
+
+class TestHistogram:
+    """Log-linear latency histogram"""
+
+    def test_quantiles_within_relative_error(self):
+        histogram = Histogram()
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(-4, 1) for _ in range(20000))
+        for value in values:
+            histogram.observe(value)
+
+        for quantile in (0.5, 0.9, 0.99):
+            expected = values[int(quantile * len(values)) - 1]
+            assert histogram.quantile(quantile) == pytest.approx(expected, rel=0.02)
+
+    def test_snapshot_totals(self):
+        histogram = Histogram()
+        for value in (0.001, 0.002, 0.5):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        assert snapshot["count"] == 3
+        assert snapshot["sum"] == pytest.approx(0.503)
+        assert snapshot["min"] == 0.001
+        assert snapshot["max"] == 0.5
+
+    def test_cumulative_buckets(self):
+        histogram = Histogram()
+        for value in (0.0004, 0.003, 0.003, 0.2):
+            histogram.observe(value)
+
+        buckets = dict(Histogram.cumulative_buckets(histogram.snapshot(), (0.001, 0.005, 0.25)))
+
+        assert buckets == {0.001: 1, 0.005: 3, 0.25: 4}
+
+
+class TestExport:
+    """Prometheus text and JSON export"""
+
+    def test_prometheus_format(self, registry):
+        registry.counter("ops_total", "Operations", ("status",)).labels("success").inc(2)
+        registry.histogram("latency_seconds", labelnames=("stage",)).labels("inference").observe(0.003)
+
+        text = registry.to_prometheus()
+
+        assert "# HELP ops_total Operations" in text
+        assert "# TYPE ops_total counter" in text
+        assert 'ops_total{status="success"} 2' in text
+        assert 'latency_seconds_bucket{stage="inference",le="0.005"} 1' in text
+        assert 'latency_seconds_bucket{stage="inference",le="+Inf"} 1' in text
+        assert 'latency_seconds_count{stage="inference"} 1' in text
+
+    def test_json_export(self, registry):
+        registry.histogram("latency_seconds").observe(0.01)
+
+        data = registry.to_dict()["metrics"]["latency_seconds"]
+
+        assert data["type"] == "histogram"
+        assert data["series"][0]["count"] == 1
+        assert data["series"][0]["quantiles"]["p50"] == pytest.approx(0.01, rel=0.01)
+
+
+class TestPipelineStage:
+    """Stage timing context manager"""
+
+    def test_records_duration_and_errors(self):
+        duration = PIPELINE_STAGE_DURATION.labels("inference", "test_model")
+        errors = PIPELINE_STAGE_ERRORS.labels("inference", "test_model")
+        count_before = duration.snapshot()["count"]
+        errors_before = errors.value
+
+        with pipeline_stage("inference", "test_model"):
+            pass
+        with pytest.raises(RuntimeError):
+            with pipeline_stage("inference", "test_model"):
+                raise RuntimeError("falha")
+
+        assert duration.snapshot()["count"] == count_before + 2
+        assert errors.value == errors_before + 1
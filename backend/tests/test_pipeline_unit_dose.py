@@ -0,0 +1,136 @@
+"""
+Testes do pipeline de doses unitárias
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.modules.farmacia.pipeline_unit_dose import AgrupadorIncremental, PipelineUnitDose
+from app.modules.farmacia.unit_dose import (
+    EtiquetadorInteligente, PreparadorDosesAutomatico, UnitDoseInteligente, VerificadorQualidadeIA
+)
+
+
+def _prescricao(i: int, nome: str, quantidade: int = 1, dose: str = "10mg") -> dict:
+    return {"id": f"P{i}", "paciente_id": f"PAC{i}",
+            "medicamentos": [{"nome": nome, "dose": dose, "forma_farmaceutica": "comprimido", "quantidade": quantidade}]}
+
+
+class _PreparadorLento(PreparadorDosesAutomatico):
+    async def preparar_lote(self, medicamentos, quantidade, validacao_dupla):
+        await asyncio.sleep(0.02)
+        return await super().preparar_lote(medicamentos, quantidade, validacao_dupla)
+
+
+class _VerificadorLento(VerificadorQualidadeIA):
+    async def verificar_preparacao(self, preparacao, usar_visao_computacional, verificar_peso):
+        await asyncio.sleep(0.02)
+        resultado = await super().verificar_preparacao(preparacao, usar_visao_computacional, verificar_peso)
+        if preparacao["medicamento"] == "reprovado":
+            resultado["aprovado"] = False
+        return resultado
+
+
+class _EtiquetadorContador(EtiquetadorInteligente):
+    def __init__(self):
+        self.chamadas = []
+
+    async def gerar_etiquetas_lote(self, preparacoes, incluir_qr_code, informacoes_personalizadas):
+        self.chamadas.append(len(preparacoes))
+        return await super().gerar_etiquetas_lote(preparacoes, incluir_qr_code, informacoes_personalizadas)
+
+
+class TestAgrupadorIncremental:
+    """Agrupamento incremental durante o turno"""
+
+    def test_grupos_abertos_recebem_prescricoes_novas(self):
+        agrupador = AgrupadorIncremental(capacidade_ciclo=5, priorizar=lambda g: g["quantidade"])
+
+        assert agrupador.adicionar([_prescricao(1, "dipirona", 2), _prescricao(2, "omeprazol")]) == []
+        cheios = agrupador.adicionar([_prescricao(3, "dipirona", 3), _prescricao(4, "omeprazol", dose="20mg")])
+
+        assert [g["id_agrupamento"] for g in cheios] == ["dipirona_10mg_comprimido"]
+        assert cheios[0]["prescricoes_ids"] == ["P1", "P3"]
+        agrupador.adicionar([_prescricao(5, "dipirona")])
+        liberados = agrupador.liberar()
+        # Mesma prioridade: ordem de abertura dos grupos
+        assert [g["id_agrupamento"] for g in liberados] == [
+            "omeprazol_10mg_comprimido", "omeprazol_20mg_comprimido", "dipirona_10mg_comprimido#2"
+        ]
+        assert agrupador.abertos == 0
+
+
+class TestPipelineUnitDose:
+    """Estágios sobrepostos, etiquetagem em lote e métricas"""
+
+    @pytest.mark.asyncio
+    async def test_estagios_se_sobrepoem_e_etiquetas_em_lote(self):
+        etiquetador = _EtiquetadorContador()
+        pipeline = await PipelineUnitDose(_PreparadorLento(), _VerificadorLento(), etiquetador,
+                                          workers_preparo=4, workers_qualidade=4, tamanho_fila=2).iniciar()
+
+        inicio = time.perf_counter()
+        await pipeline.enviar([_prescricao(i, f"med{i}") for i in range(12)] + [_prescricao(99, "reprovado")])
+        resultados = await pipeline.encerrar()
+        decorrido = time.perf_counter() - inicio
+
+        # Sequencial seriam 13 x (0,02 + 0,02) s
+        assert decorrido < 13 * 0.04 * 0.6
+        assert [r["sequencia"] for r in resultados] == list(range(1, 14))
+        reprovado = next(r for r in resultados if r["lote"]["medicamento"] == "reprovado")
+        assert reprovado["etiquetas"] is None and reprovado["qualidade"]["aprovado"] is False
+        assert sum(etiquetador.chamadas) == 12 and len(etiquetador.chamadas) < 12
+        assert len({r["etiquetas"]["id_etiqueta"] for r in resultados if r["etiquetas"]}) == 12
+
+        metricas = pipeline.metricas()
+        assert metricas["filas"]["preparo"]["maxima"] <= 2
+        assert metricas["filas"]["preparo"]["atual"] == 0
+        assert metricas["ciclos"][0]["lotes"] == 13 and metricas["ciclos"][0]["doses"] == 13
+        assert metricas["etiquetas_por_chamada"] > 1
+
+    @pytest.mark.asyncio
+    async def test_falha_de_estagio_nao_interrompe_o_pipeline(self):
+        class _PreparadorComFalha(PreparadorDosesAutomatico):
+            async def preparar_lote(self, medicamentos, quantidade, validacao_dupla):
+                if medicamentos[0]["nome"] == "falha":
+                    raise RuntimeError("robô travado")
+                return await super().preparar_lote(medicamentos, quantidade, validacao_dupla)
+
+        pipeline = await PipelineUnitDose(_PreparadorComFalha(), VerificadorQualidadeIA(), EtiquetadorInteligente()).iniciar()
+        await pipeline.enviar([_prescricao(1, "falha"), _prescricao(2, "dipirona")])
+        resultados = await pipeline.encerrar()
+
+        assert [r["erro"] for r in resultados] == ["preparo: robô travado", None]
+        assert pipeline.metricas()["falhas"] == 1
+
+
+class TestUnitDoseInteligente:
+    """Preparação em lote e turno com prescrições em fluxo"""
+
+    @pytest.mark.asyncio
+    async def test_preparar_doses_unitarias(self):
+        resultado = await UnitDoseInteligente().preparar_doses_unitarias(
+            [_prescricao(1, "insulina", 4), _prescricao(2, "insulina", 8), _prescricao(3, "dipirona", 2)]
+        )
+
+        assert [d["lote"]["medicamento"] for d in resultado["doses_preparadas"]] == ["insulina", "dipirona"]
+        assert resultado["estatisticas"]["total_doses_produzidas"] == 14
+        assert resultado["pipeline"]["ciclos"][0]["doses"] == 14
+
+    @pytest.mark.asyncio
+    async def test_turno_com_ciclos(self):
+        unit_dose = UnitDoseInteligente()
+        pipeline = await unit_dose.iniciar_turno(capacidade_ciclo=10)
+
+        metricas = await unit_dose.receber_prescricoes([_prescricao(1, "dipirona", 12), _prescricao(2, "omeprazol")])
+        assert metricas["grupos_abertos"] == 1
+        await pipeline.ciclo()
+        await unit_dose.receber_prescricoes([_prescricao(3, "omeprazol", 2)])
+        with pytest.raises(RuntimeError):
+            await unit_dose.iniciar_turno()
+        resultado = await unit_dose.encerrar_turno()
+
+        assert [d["ciclo"] for d in resultado["doses_preparadas"]] == [1, 1, 2]
+        assert [c["doses"] for c in resultado["pipeline"]["ciclos"]] == [13, 2]
+        assert unit_dose.pipeline is None
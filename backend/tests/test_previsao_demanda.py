@@ -0,0 +1,136 @@
+"""
+Testes do motor de previsão de demanda por SKU
+"""
+import numpy as np
+import pytest
+
+from app.modules.farmacia.gestor_estoque import GestorEstoqueInteligente, PredictorDemandaMedicamentos
+from app.modules.farmacia.inventario_lotes import InventarioLotes
+from app.modules.farmacia.previsao_demanda import MotorPrevisaoDemanda
+
+
+def _sazonal(n: int, inicio: int = 0) -> np.ndarray:
+    t = np.arange(inicio, inicio + n)
+    return 50 + 10 * np.sin(2 * np.pi * t / 7) + 0.2 * t
+
+
+class TestMotorPrevisaoDemanda:
+    """Seleção de modelo, atualização incremental e cache"""
+
+    def test_holt_winters_acompanha_sazonalidade_e_tendencia(self):
+        rng = np.random.default_rng(0)
+        motor = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0)
+        motor.ajustar({"A": _sazonal(140) + rng.normal(0, 0.5, 140)})
+
+        previsao = motor.prever(["A"], horizonte=7)["A"]
+
+        assert previsao["modelo"] == "holt_winters"
+        np.testing.assert_allclose(previsao["previsao"], _sazonal(7, 140), atol=2.0)
+        minimo, maximo = previsao["intervalo"]
+        assert minimo < previsao["total"] < maximo
+
+    def test_demanda_intermitente_usa_croston(self):
+        serie = np.zeros(120)
+        serie[::4] = 8.0
+        motor = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0)
+        motor.ajustar({"B": serie})
+
+        previsao = motor.prever(["B"], horizonte=10)["B"]
+
+        assert previsao["modelo"] == "croston"
+        assert previsao["previsao"][0] == pytest.approx(2.0, rel=0.1)
+        assert np.ptp(previsao["previsao"]) == 0
+
+    def test_atualizacao_incremental_aproxima_reajuste_completo(self):
+        rng = np.random.default_rng(1)
+        serie = _sazonal(150) + rng.normal(0, 1, 150)
+        incremental = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0)
+        incremental.ajustar({"A": serie[:120]})
+        incremental.registrar_consumo({"A": serie[120:]})
+        completo = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0)
+        completo.ajustar({"A": serie})
+
+        assert incremental.observacoes("A") == 150
+        np.testing.assert_allclose(incremental.prever(["A"], 7)["A"]["previsao"],
+                                   completo.prever(["A"], 7)["A"]["previsao"], rtol=0.05)
+
+    def test_cache_invalidado_por_consumo_novo(self):
+        motor = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0)
+        motor.ajustar({"A": _sazonal(30), "B": _sazonal(30)})
+        antes = motor.prever(horizonte=5)
+
+        assert motor.prever(horizonte=5)["A"] is antes["A"]
+        motor.registrar_consumo({"A": [500.0]})
+        depois = motor.prever(horizonte=5)
+        assert depois["A"] is not antes["A"] and depois["A"]["total"] > antes["A"]["total"]
+        assert depois["B"] is antes["B"]
+        with pytest.raises(KeyError):
+            motor.registrar_consumo({"Z": [1.0]})
+
+    def test_estado_salvo_retoma_previsoes(self, tmp_path):
+        motor = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0)
+        motor.ajustar({"A": _sazonal(60), "B": [0, 0, 3, 0, 0, 0, 4, 0]})
+        caminho = tmp_path / "estado.npz"
+        motor.salvar(str(caminho))
+
+        retomado = MotorPrevisaoDemanda.carregar(str(caminho), workers=0)
+
+        assert retomado.skus == ["A", "B"]
+        for sku in ("A", "B"):
+            np.testing.assert_allclose(retomado.prever([sku], 3)[sku]["previsao"],
+                                       motor.prever([sku], 3)[sku]["previsao"])
+
+    def test_estado_regravado_a_cada_mudanca(self, tmp_path):
+        caminho = str(tmp_path / "previsao" / "estado.npz")
+        motor = MotorPrevisaoDemanda(periodo_sazonal=7, workers=0, caminho=caminho)
+        motor.ajustar({"A": _sazonal(60)}, ultimo_periodo=10)
+        motor.registrar_consumo({"A": [50.0]}, ultimo_periodo=11)
+
+        retomado = MotorPrevisaoDemanda.carregar(caminho, workers=0)
+
+        assert retomado.ultimo_periodo("A") == 11
+        assert retomado.observacoes("A") == 61
+
+
+class TestPrevisaoNoGestor:
+    """Previsão de 30 dias do gestor a partir do histórico mensal"""
+
+    @pytest.mark.asyncio
+    async def test_prever_demanda_30_dias(self):
+        gestor = GestorEstoqueInteligente(InventarioLotes())
+        gestor.predictor_demanda = PredictorDemandaMedicamentos(MotorPrevisaoDemanda(periodo_sazonal=12, workers=0))
+        historico = await gestor.coletar_historico_consumo()
+
+        previsao = await gestor.prever_demanda_30_dias()
+
+        assert set(previsao) == set(historico["medicamentos"])
+        insulina = previsao["insulina"]
+        assert 90 < insulina["demanda_30_dias"] < 115
+        assert insulina["intervalo_confianca"]["min"] <= insulina["demanda_30_dias"] <= insulina["intervalo_confianca"]["max"]
+        assert 0 < insulina["confianca"] < 1
+
+    def test_sincronizar_so_avanca_periodos_novos(self):
+        motor = MotorPrevisaoDemanda(periodo_sazonal=12, workers=0)
+        predictor = PredictorDemandaMedicamentos(motor)
+        consumo = [85, 88, 92, 89, 91, 94, 96, 93, 95, 97, 99, 101]
+
+        predictor.prever({"referencia": "2024-12", "medicamentos": {"insulina": {"consumo_mensal": consumo}}})
+        predictor.prever({"referencia": "2024-12", "medicamentos": {"insulina": {"consumo_mensal": consumo}}})
+        assert motor.observacoes("insulina") == 12
+
+        # Janela móvel: mesmo tamanho, dois meses adiante
+        janela = consumo[2:] + [103, 104]
+        predictor.prever({"referencia": "2025-02", "medicamentos": {"insulina": {"consumo_mensal": janela}}})
+
+        assert motor.observacoes("insulina") == 14
+        assert motor.ultimo_periodo("insulina") == 2025 * 12 + 1
+
+    def test_janela_movel_incorpora_mes_novo(self):
+        predictor = PredictorDemandaMedicamentos(MotorPrevisaoDemanda(periodo_sazonal=12, workers=0))
+
+        antes = predictor.prever({"referencia": "2024-12", "medicamentos": {"x": {"consumo_mensal": [100] * 12}}})
+        depois = predictor.prever({"referencia": "2025-01",
+                                   "medicamentos": {"x": {"consumo_mensal": [100] * 11 + [900]}}})
+
+        assert antes["x"]["total"] == pytest.approx(100.0)
+        assert depois["x"]["total"] > 100.0
@@ -0,0 +1,147 @@
+"""
+Testes do roteamento de entregas internas da farmácia
+"""
+import time
+
+import numpy as np
+import pytest
+
+from app.modules.farmacia.otimizador_distribuicao import OtimizadorDistribuicaoIA
+from app.modules.farmacia.roteamento_entregas import (
+    UNIDADE_NAO_MAPEADA, Entrega, MatrizDistancias, RoteadorInteligente, _Instancia, carregar_layout
+)
+
+
+def _matriz_linha() -> MatrizDistancias:
+    # Farmácia em 0 e unidades a 1, 2, 3 e 10 minutos ao longo de um corredor
+    posicoes = np.array([0.0, 1.0, 2.0, 3.0, 10.0])
+    return MatrizDistancias(["farmacia", "A", "B", "C", "D"], np.abs(posicoes[:, None] - posicoes[None, :]))
+
+
+def _custo(roteador: RoteadorInteligente, plano) -> float:
+    instancia = _Instancia(roteador.matriz, plano, roteador.capacidade)
+    return sum(instancia.avaliar(s, nos)[0] for s, nos in zip(plano.saidas, plano.rotas))
+
+
+def _entregues(plano) -> list[str]:
+    return sorted(plano.entregas[no - 1].id for nos in plano.rotas for no in nos if no <= len(plano.entregas))
+
+
+class TestRoteadorInteligente:
+    """Capacidade, janelas de tempo, busca local e reotimização incremental"""
+
+    def test_capacidade_separa_rotas(self):
+        roteador = RoteadorInteligente(_matriz_linha(), capacidade=10)
+        entregas = [Entrega(u, u, demanda=6, tempo_servico=0) for u in ("A", "B", "C")]
+
+        plano = roteador.planejar(entregas)
+
+        assert len(plano.rotas) == 3
+        roteador.capacidade = 20
+        plano = roteador.planejar(entregas)
+        assert [[plano.entregas[no - 1].unidade for no in nos] for nos in plano.rotas] == [["A", "B", "C"]]
+        assert roteador.detalhar(plano)[0]["tempo_estimado"] == 6.0
+
+    def test_janela_apertada_antecipa_entrega(self):
+        roteador = RoteadorInteligente(_matriz_linha(), capacidade=100)
+        entregas = [Entrega("A", "A", tempo_servico=0), Entrega("D", "D", janela_fim=10.0, tempo_servico=0)]
+
+        rotas = roteador.detalhar(roteador.planejar(entregas))
+
+        assert sum(rota["atraso_total"] for rota in rotas) == 0.0
+        parada_d = next(p for rota in rotas for p in rota["paradas"] if p["entrega"] == "D")
+        assert parada_d["inicio_servico"] <= 10.0
+
+    def test_busca_local_nao_piora_e_cumpre_orcamento(self):
+        rng = np.random.default_rng(0)
+        coordenadas = {"farmacia": (0.0, 0.0, 0)}
+        coordenadas.update({f"U{u}": (rng.uniform(0, 200), rng.uniform(0, 150), int(rng.integers(0, 6)))
+                            for u in range(60)})
+        matriz = MatrizDistancias.de_coordenadas(coordenadas)
+        entregas = [Entrega(f"E{i}", f"U{rng.integers(60)}", demanda=float(rng.integers(1, 15)),
+                            janela_fim=float(rng.choice([30, 60, 120, 240]))) for i in range(200)]
+
+        so_economias = RoteadorInteligente(matriz, capacidade=60, orcamento=0.0).planejar(entregas)
+        roteador = RoteadorInteligente(matriz, capacidade=60, orcamento=0.5)
+        inicio = time.perf_counter()
+        plano = roteador.planejar(entregas)
+
+        assert time.perf_counter() - inicio < 1.0
+        assert _custo(roteador, plano) <= _custo(roteador, so_economias)
+        assert _entregues(plano) == sorted(e.id for e in entregas)
+
+    def test_urgente_no_meio_da_ronda_preserva_viagem_em_curso(self):
+        roteador = RoteadorInteligente(_matriz_linha(), capacidade=100)
+        plano = roteador.planejar([Entrega(u, u, tempo_servico=0) for u in ("A", "B", "D")])
+        em_curso = [plano.entregas[no - 1].id for no in plano.rotas[0]]
+
+        novo = roteador.reotimizar(plano, [Entrega("URG", "C", janela_inicio=4.0, janela_fim=9.0, prioridade=1.0)], 4.0)
+        rotas = roteador.detalhar(novo)
+
+        assert _entregues(novo) == ["A", "B", "D", "URG"]
+        assert [p["entrega"] for p in rotas[0]["paradas"] if "entrega" in p][:len(em_curso)] == em_curso
+        urgente = next(p for rota in rotas for p in rota["paradas"] if p.get("entrega") == "URG")
+        assert urgente["inicio_servico"] >= 4.0 and urgente["atraso"] == 0.0
+
+    def test_reotimizacoes_sucessivas_nao_acumulam_nos(self):
+        roteador = RoteadorInteligente(_matriz_linha(), capacidade=100, orcamento=0.05)
+        plano = roteador.planejar([Entrega("D0", "D", tempo_servico=1)])
+
+        for k in range(1, 60):
+            agora = 7.0 * k
+            plano = roteador.reotimizar(plano, [Entrega(f"U{k}", "B", janela_inicio=agora, janela_fim=agora + 8)], agora)
+
+        assert len(plano.entregas) <= 2
+        assert len(plano.recargas) <= len(plano.rotas)
+        assert "U59" in _entregues(plano)
+        total = len(plano.entregas) + len(plano.recargas)
+        assert sorted(no for nos in plano.rotas for no in nos) == list(range(1, total + 1))
+        assert all(rota["atraso_total"] == 0.0 for rota in roteador.detalhar(plano))
+
+    def test_viagem_encerrada_sai_do_plano(self):
+        roteador = RoteadorInteligente(_matriz_linha(), capacidade=100)
+        plano = roteador.planejar([Entrega("A", "A", tempo_servico=0), Entrega("D", "D", tempo_servico=0)])
+
+        novo = roteador.reotimizar(plano, [Entrega("URG", "C", janela_inicio=30.0)], 30.0)
+
+        assert [e.id for e in novo.entregas] == ["URG"]
+        assert novo.rotas == [[1]] and novo.recargas == []
+
+    def test_unidade_desconhecida(self):
+        with pytest.raises(KeyError, match="X"):
+            RoteadorInteligente(_matriz_linha()).planejar([Entrega("1", "X")])
+
+    def test_layout_configurado_e_unidade_fora_do_layout(self, tmp_path):
+        caminho = tmp_path / "layout.json"
+        caminho.write_text('{"hemodialise": [80, 20, 1]}', encoding="utf-8")
+        layout = carregar_layout(str(caminho))
+        matriz = MatrizDistancias.de_coordenadas(layout, padrao=UNIDADE_NAO_MAPEADA)
+
+        rotas = RoteadorInteligente(matriz).detalhar(
+            RoteadorInteligente(matriz).planejar([Entrega("1", "hemodialise"), Entrega("2", "oncologia")])
+        )
+
+        assert layout[UNIDADE_NAO_MAPEADA] == (80.0, 60.0, 3)
+        assert sorted(u for rota in rotas for u in rota["unidades"]) == ["hemodialise", "oncologia"]
+        assert matriz.indice("oncologia") == matriz.indice(UNIDADE_NAO_MAPEADA)
+
+
+class TestOtimizadorDistribuicao:
+    """Distribuição diária e despacho de urgências pelo otimizador"""
+
+    @pytest.mark.asyncio
+    async def test_distribuicao_diaria_e_urgencia(self):
+        otimizador = OtimizadorDistribuicaoIA()
+
+        resultado = await otimizador.otimizar_distribuicao_diaria()
+        unidades = sorted(u for rota in resultado["rotas"] for u in rota["unidades"])
+        rotas = await otimizador.despachar_urgentes(
+            [{"unidade": "uti", "tempo_limite": 10, "score_prioridade": 1.0, "medicamentos_solicitados": 3,
+              "medicamentos_criticos": ["noradrenalina"]}], 12.0
+        )
+
+        assert unidades == ["centro_cirurgico", "emergencia", "enfermaria_clinica", "pediatria", "uti"]
+        assert all(rota["atraso_total"] == 0.0 for rota in resultado["rotas"])
+        assert resultado["equipe"]["equipe_utilizada"] == len(resultado["rotas"])
+        assert sum(rota["unidades"].count("uti") for rota in rotas) == 2
+        assert any(rota["medicamentos_criticos"] for rota in rotas)
@@ -0,0 +1,143 @@
+"""
+Tests for the in-memory physician schedule index
+"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import schedule_index
+from app.services.schedule_index import (
+    BusyInterval,
+    ScheduleEngine,
+    equipment_key,
+    merge_intervals,
+    physician_key,
+    room_key)
+
+MONDAY = datetime(2024, 6, 3)
+
+
+def at(hour, minute=0, day=0):
+    return MONDAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+class FakeLoader:
+    """Serves busy intervals and counts range loads"""
+
+    def __init__(self, intervals):
+        self.intervals = intervals
+        self.calls = 0
+
+    def __call__(self, db, keys, start, end):
+        self.calls += 1
+        return [i for i in self.intervals if i.end > start and i.start < end]
+
+
+@pytest.fixture
+def physician():
+    return uuid.uuid4()
+
+
+def busy(physician_id, start, minutes=30, **resources):
+    return BusyInterval(uuid.uuid4(), start, start + timedelta(minutes=minutes), physician_id, **resources)
+
+
+class TestIntervals:
+    """Interval union"""
+
+    def test_merge_overlapping_and_adjacent(self):
+        starts, ends = merge_intervals([(at(8), at(9)), (at(8, 30), at(10)), (at(10), at(11)), (at(13), at(14))])
+
+        assert starts == [at(8), at(13)]
+        assert ends == [at(11), at(14)]
+
+
+class TestScheduleEngine:
+    """Availability and slot search"""
+
+    def test_availability_uses_one_load_per_day(self, physician):
+        loader = FakeLoader([busy(physician, at(9))])
+        engine = ScheduleEngine(loader)
+
+        assert engine.is_available(None, [physician_key(physician)], at(8, 30)) is True
+        assert engine.is_available(None, [physician_key(physician)], at(9, 15)) is False
+        assert engine.is_available(None, [physician_key(physician)], at(9, 30)) is True
+        assert loader.calls == 1
+
+    def test_free_slots_skip_busy_and_off_hours(self, physician):
+        engine = ScheduleEngine(FakeLoader([busy(physician, at(8), 60), busy(physician, at(17, 15), 45)]))
+
+        slots = engine.find_free_slots(None, [physician_key(physician)], at(7, 50), at(8, 0, day=1),
+                                       duration_minutes=30, limit=100, step_minutes=30)
+
+        assert slots[0] == at(9)
+        assert slots[-1] == at(16, 30)
+        assert len(slots) == 16
+
+    def test_weekend_is_skipped(self, physician):
+        engine = ScheduleEngine(FakeLoader([]))
+
+        slots = engine.find_free_slots(None, [physician_key(physician)], at(18, day=4), limit=1)
+
+        assert slots == [at(8, day=7)]
+
+    def test_multi_resource_search(self, physician):
+        other = uuid.uuid4()
+        loader = FakeLoader([
+            busy(physician, at(8), 60),
+            busy(other, at(9), 30, room_number="12", building="A"),
+            busy(other, at(9, 30), 30, equipment=("ecg-1",)),
+        ])
+        engine = ScheduleEngine(loader)
+        keys = [physician_key(physician), room_key("12", "A"), equipment_key("ecg-1")]
+
+        slots = engine.find_free_slots(None, keys, at(8), limit=2, step_minutes=30)
+
+        assert slots == [at(10), at(10, 30)]
+
+    def test_invalidate_reloads(self, physician):
+        loader = FakeLoader([])
+        engine = ScheduleEngine(loader)
+        assert engine.is_available(None, [physician_key(physician)], at(9))
+
+        loader.intervals.append(busy(physician, at(9)))
+        engine.invalidate([physician_key(physician)])
+
+        assert engine.is_available(None, [physician_key(physician)], at(9)) is False
+        assert loader.calls == 2
+
+    def test_load_crossing_invalidation_is_not_cached(self, physician):
+        engine = None
+
+        class InvalidatingLoader(FakeLoader):
+            def __call__(self, db, keys, start, end):
+                result = super().__call__(db, keys, start, end)
+                if self.calls == 1:
+                    engine.invalidate(keys)  # a commit lands while the query runs
+                return result
+
+        loader = InvalidatingLoader([])
+        engine = ScheduleEngine(loader)
+
+        assert engine.is_available(None, [physician_key(physician)], at(9))
+        assert engine.is_available(None, [physician_key(physician)], at(9))
+        assert loader.calls == 2
+
+    def test_writes_invalidate_on_commit(self, physician, monkeypatch):
+        loader = FakeLoader([])
+        engine = ScheduleEngine(loader)
+        monkeypatch.setattr(schedule_index, "_engine", engine)
+        engine.is_available(None, [physician_key(physician)], at(9))
+        session = SimpleNamespace(info={schedule_index._PENDING_KEY: {physician_key(physician)}})
+
+        schedule_index._discard_on_rollback(session)
+        schedule_index._invalidate_on_commit(session)
+        engine.is_available(None, [physician_key(physician)], at(9))
+        assert loader.calls == 1
+
+        session.info[schedule_index._PENDING_KEY] = {physician_key(physician)}
+        schedule_index._invalidate_on_commit(session)
+        engine.is_available(None, [physician_key(physician)], at(9))
+        assert loader.calls == 2
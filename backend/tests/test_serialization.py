@@ -0,0 +1,212 @@
+"""
+Tests for the compiled model serializer
+"""
+import json
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, Numeric, String, create_engine
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+
+from app.core.serialization import (
+    FastJSONResponse,
+    dumps_rows,
+    get_serializer,
+    loaded_relationship,
+    serialize_rows)
+
+Base = declarative_base()
+
+
+class Owner(Base):
+    __tablename__ = "owners"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+
+
+class Sample(Base):
+    __tablename__ = "samples"
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String(20))
+    created_at = Column(DateTime)
+    collected_on = Column(Date)
+    value = Column(Numeric(10, 2))
+    owner_id = Column(Integer, ForeignKey("owners.id"))
+    extra_metadata = Column("metadata", String(50))
+    owner = relationship(Owner)
+
+
+CREATED = datetime(2024, 6, 3, 10, 30, 15, 250)
+SAMPLE_ID = uuid.uuid4()
+
+
+def make_sample(i=1, **overrides):
+    values = dict(id=i, code=f"S{i}", created_at=CREATED, collected_on=date(2024, 6, 1),
+                  value=Decimal("1.50"), owner_id=None, extra_metadata="x")
+    values.update(overrides)
+    return Sample(**values)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+
+class TestModelSerializer:
+    """Dictionary conversion"""
+
+    def test_matches_to_dict_format(self):
+        result = get_serializer(Sample).serialize(make_sample())
+
+        assert result == {
+            "id": 1, "code": "S1", "created_at": CREATED.isoformat(),
+            "collected_on": date(2024, 6, 1), "value": Decimal("1.50"),
+            "owner_id": None, "metadata": "x"
+        }
+
+    def test_projection_and_exclude(self):
+        serializer = get_serializer(Sample)
+
+        assert serializer.serialize(make_sample(), fields=["code", "id"]) == {"id": 1, "code": "S1"}
+        assert "metadata" not in serializer.serialize(make_sample(), exclude=["metadata", "unknown"])
+
+    def test_unknown_field_is_rejected(self):
+        with pytest.raises(ValueError):
+            get_serializer(Sample).serialize(make_sample(), fields=["nope"])
+
+    def test_serializer_is_cached(self):
+        assert get_serializer(Sample) is get_serializer(Sample)
+
+
+class TestJSON:
+    """JSON bytes output"""
+
+    def test_dumps_list(self):
+        payload = json.loads(get_serializer(Sample).dumps([make_sample(1), make_sample(2)], fields=["id", "created_at", "value"]))
+
+        assert payload == [
+            {"id": 1, "created_at": CREATED.isoformat(), "value": 1.5},
+            {"id": 2, "created_at": CREATED.isoformat(), "value": 1.5},
+        ]
+
+    def test_rows_from_column_query(self, session):
+        session.add_all([make_sample(1), make_sample(2, code="S2")])
+        session.commit()
+
+        rows = session.query(Sample.id, Sample.code).order_by(Sample.id).all()
+
+        assert serialize_rows(rows) == [{"id": 1, "code": "S1"}, {"id": 2, "code": "S2"}]
+        assert json.loads(dumps_rows(rows)) == [{"id": 1, "code": "S1"}, {"id": 2, "code": "S2"}]
+
+
+class TestRoutes:
+    """Responses through FastAPI routing"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI(default_response_class=FastJSONResponse)
+
+        @app.get("/bytes")
+        def raw_bytes():
+            return FastJSONResponse(content=dumps_rows([(1, "S1")], ["id", "code"]))
+
+        @app.get("/model")
+        def model():
+            return FastJSONResponse(content={"id": SAMPLE_ID, "sample": make_sample()})
+
+        @app.get("/numpy")
+        def numpy_values():
+            return FastJSONResponse(content={
+                "confidence": np.float32(0.5),
+                "count": np.int64(3),
+                "flag": np.bool_(True),
+                "probabilities": np.array([0.25, 0.75]),
+                "matrix": np.arange(6, dtype=np.int32).reshape(2, 3)[:, ::2]  # não contígua
+            })
+
+        @app.get("/plain")
+        def plain():
+            return {"created_at": CREATED}
+
+        return TestClient(app)
+
+    def test_bytes_are_not_encoded_twice(self, client):
+        response = client.get("/bytes")
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == [{"id": 1, "code": "S1"}]
+
+    def test_models_are_serialized(self, client):
+        payload = client.get("/model").json()
+
+        assert payload["id"] == str(SAMPLE_ID)
+        assert payload["sample"]["created_at"] == CREATED.isoformat()
+
+    def test_numpy_values(self, client):
+        assert client.get("/numpy").json() == {
+            "confidence": 0.5,
+            "count": 3,
+            "flag": True,
+            "probabilities": [0.25, 0.75],
+            "matrix": [[0, 2], [3, 5]]
+        }
+
+    def test_default_response_class(self, client):
+        response = client.get("/plain")
+
+        assert response.json() == {"created_at": CREATED.isoformat()}
+
+
+class TestRelationships:
+    """Relationships are never lazy loaded"""
+
+    def test_loaded_relationship_does_not_query(self, session):
+        session.add_all([Owner(id=1, name="Ana"), make_sample(1, owner_id=1)])
+        session.commit()
+        session.expunge_all()
+
+        sample = session.get(Sample, 1)
+        queries = []
+        from sqlalchemy import event
+        event.listen(session.bind, "before_cursor_execute", lambda *args: queries.append(args))
+
+        assert loaded_relationship(sample, "owner") is None
+        assert queries == []
+
+
+class TestPerformance:
+    """Compiled serializer against the generic column loop"""
+
+    def test_faster_than_generic_loop(self):
+        samples = [make_sample(i) for i in range(1000)]
+
+        def generic(obj):
+            result = {}
+            for column in obj.__table__.columns:
+                value = getattr(obj, column.key)
+                result[column.name] = value.isoformat() if isinstance(value, datetime) else value
+            return result
+
+        started = time.perf_counter()
+        for obj in samples:
+            generic(obj)
+        generic_elapsed = time.perf_counter() - started
+
+        serializer = get_serializer(Sample)
+        started = time.perf_counter()
+        serializer.serialize_many(samples)
+        compiled_elapsed = time.perf_counter() - started
+
+        assert compiled_elapsed < generic_elapsed
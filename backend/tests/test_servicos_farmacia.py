@@ -0,0 +1,42 @@
+"""
+Testes do ciclo de vida dos serviços compartilhados da farmácia
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from app.modules.farmacia.servicos import ServicoProcesso
+
+
+class _Recurso:
+    criados = 0
+
+    def __init__(self):
+        _Recurso.criados += 1
+        self.fechado = False
+
+    def fechar(self):
+        self.fechado = True
+
+
+class TestServicoProcesso:
+    """Criação única, injeção e encerramento"""
+
+    def test_uma_instancia_por_processo(self):
+        _Recurso.criados = 0
+        servico = ServicoProcesso('teste_unico', _Recurso)
+
+        with ThreadPoolExecutor(8) as pool:
+            instancias = list(pool.map(lambda _: servico.obter(), range(32)))
+
+        assert _Recurso.criados == 1
+        assert all(instancia is instancias[0] for instancia in instancias)
+
+    def test_definir_e_encerrar(self):
+        servico = ServicoProcesso('teste_injecao', _Recurso)
+        injetado = _Recurso()
+
+        servico.definir(injetado)
+        assert servico.obter() is injetado
+
+        servico.encerrar()
+        assert injetado.fechado
+        assert servico.obter() is not injetado
@@ -0,0 +1,199 @@
+"""
+Testes da telemetria de cadeia fria por lote
+"""
+import numpy as np
+import pytest
+
+from app.modules.farmacia.ledger_farmaceutico import LedgerFarmaceutico
+from app.modules.farmacia.rastreador_medicamentos import RastreadorMedicamentosBlockchain
+from app.modules.farmacia.telemetria_cadeia_fria import TelemetriaCadeiaFria
+
+
+def _mkt(temperaturas: np.ndarray, pesos: np.ndarray) -> float:
+    media = (np.exp(-10000.0 / (temperaturas + 273.15)) * pesos).sum() / pesos.sum()
+    return 10000.0 / -np.log(media) - 273.15
+
+
+class TestTelemetriaCadeiaFria:
+    """Agregados incrementais: MKT, tempo fora da faixa, exposição e excursões"""
+
+    def test_metricas_de_um_lote(self):
+        telemetria = TelemetriaCadeiaFria()
+        telemetria.definir_faixa("L1", 2.0, 8.0)
+        temperaturas = np.array([5.0, 9.0, 10.0, 5.0, 1.0, 5.0])
+
+        telemetria.registrar_leituras(["L1"] * 6, np.arange(6) * 60.0, temperaturas)
+        resumo = telemetria.resumo_lote("L1")
+
+        # Cada intervalo de 60 s é atribuído à leitura que o inicia
+        assert resumo["tempo_monitorado"] == 300.0
+        assert resumo["tempo_acima"] == 120.0
+        assert resumo["tempo_abaixo"] == 60.0
+        assert resumo["grau_hora_acima"] == pytest.approx((1.0 + 2.0) * 60 / 3600)
+        assert resumo["excursoes"] == 2
+        assert resumo["minima"] == 1.0 and resumo["maxima"] == 10.0
+        assert resumo["mkt"] == pytest.approx(_mkt(temperaturas[:-1], np.full(5, 60.0)))
+
+    def test_lacunas_contam_como_sem_dados(self):
+        telemetria = TelemetriaCadeiaFria(intervalo_maximo=120)
+
+        telemetria.registrar_leituras(["L1"] * 3, [0.0, 60.0, 3660.0], [20.0, 20.0, 20.0])
+        telemetria.registrar_leituras(["L1", "L1"], [30.0, 3720.0], [40.0, 20.0])  # a primeira está fora de ordem
+
+        resumo = telemetria.resumo_lote("L1")
+        assert resumo["amostras"] == 4
+        assert resumo["tempo_monitorado"] == 60.0 + 120.0 + 60.0
+        assert resumo["tempo_sem_dados"] == 3600.0 - 120.0
+
+    def test_serie_densa_equivale_a_leituras_avulsas(self):
+        rng = np.random.default_rng(1)
+        lotes = [f"L{i}" for i in range(6)]
+        temperaturas = rng.normal(25, 5, (6, 240))
+        temperaturas[0, 30:40] = np.nan
+        umidades = rng.normal(75, 5, (6, 240))
+
+        densa = TelemetriaCadeiaFria()
+        densa.registrar_serie_densa(lotes, 0, 60, temperaturas[:, :100], umidades[:, :100])
+        densa.registrar_serie_densa(lotes, 6000, 60, temperaturas[:, 100:], umidades[:, 100:])
+
+        avulsa = TelemetriaCadeiaFria()
+        ids = np.repeat(np.arange(6), 240)
+        instantes = np.tile(np.arange(240) * 60.0, 6)
+        ordem = rng.permutation(ids.size)
+        avulsa.registrar_leituras(np.array(lotes)[ids[ordem]], instantes[ordem],
+                                  temperaturas.ravel()[ordem], umidades.ravel()[ordem])
+
+        esperado, obtido = avulsa.rollups(), densa.rollups()
+        for coluna in ("amostras", "tempo_monitorado", "tempo_sem_dados", "tempo_acima", "tempo_abaixo",
+                       "grau_hora_acima", "grau_hora_abaixo", "tempo_umidade_acima", "excursoes",
+                       "minima", "maxima", "mkt"):
+            np.testing.assert_allclose(obtido[coluna], esperado[coluna], rtol=1e-6, err_msg=coluna)
+
+    def test_rollups_por_remessa(self):
+        telemetria = TelemetriaCadeiaFria()
+        telemetria.registrar_serie_densa(["A", "B", "C"], 0, 60, np.array([
+            [20.0, 20.0, 20.0], [31.0, 31.0, 20.0], [20.0, 20.0, 20.0]
+        ]))
+        telemetria.associar_remessa(["A", "B"], "R1")
+        telemetria.associar_remessa(["C"], "R2")
+
+        remessas = telemetria.rollups_remessas()
+
+        assert remessas["remessa"].tolist() == ["R1", "R2"]
+        assert remessas["lotes"].tolist() == [2, 1]
+        assert remessas["tempo_acima"].tolist() == [120.0, 0.0]
+        assert remessas["maxima"].tolist() == [31.0, 20.0]
+
+    def test_retencao_da_serie(self):
+        telemetria = TelemetriaCadeiaFria(retencao=600)
+        telemetria.registrar_leituras(["L1"] * 3, [0.0, 60.0, 120.0], [5.0, 6.0, 7.0])
+        telemetria.registrar_leituras(["L1"], [1000.0], [8.0])
+
+        assert telemetria.serie("L1")["temperatura"].tolist() == [8.0]
+        assert telemetria.resumo_lote("L1")["amostras"] == 4
+        with pytest.raises(RuntimeError):
+            TelemetriaCadeiaFria(retencao=0).serie("L1")
+
+    def test_agregados_e_serie_gravados(self, tmp_path):
+        caminho = str(tmp_path / "telemetria.db")
+        telemetria = TelemetriaCadeiaFria(caminho=caminho, resolucao_serie=300)
+        telemetria.definir_faixa("L1", 2.0, 8.0)
+        telemetria.associar_remessa(["L1"], "R1")
+        telemetria.registrar_leituras(["L1"] * 4, [0.0, 60.0, 120.0, 360.0], [5.0, 9.0, 7.0, 3.0], [50.0] * 4)
+        telemetria.registrar_serie_densa(["L1", "L2"], 600, 60, np.array([[4.0, 4.0], [20.0, 22.0]]))
+        esperado = telemetria.resumo_lote("L1")
+        telemetria.fechar()
+
+        reaberta = TelemetriaCadeiaFria(caminho=caminho, resolucao_serie=300)
+
+        assert reaberta.resumo_lote("L1") == esperado
+        assert reaberta.rollups_remessas()["remessa"].tolist() == ["R1"]
+        # A série bruta não é gravada; a reduzida sim, um ponto por 5 minutos
+        assert reaberta.serie("L1")["timestamp"].size == 0
+        serie = reaberta.serie_gravada("L1")
+        assert serie["inicio"].tolist() == [0.0, 300.0, 600.0]
+        assert serie["amostras"].tolist() == [3, 1, 2]
+        assert serie["temperatura_media"].tolist() == [7.0, 3.0, 4.0]
+        assert serie["maxima"].tolist() == [9.0, 3.0, 4.0]
+        assert serie["umidade_media"][:2].tolist() == [50.0, 50.0] and np.isnan(serie["umidade_media"][2])
+        assert reaberta.serie_gravada("L2", desde=600)["temperatura_media"].tolist() == [21.0]
+
+        # Leituras novas continuam de onde o lote parou
+        reaberta.registrar_leituras(["L1"], [720.0], [10.0])
+        assert reaberta.resumo_lote("L1")["tempo_acima"] == esperado["tempo_acima"]
+        assert reaberta.resumo_lote("L1")["excursoes"] == esperado["excursoes"] + 1
+
+    def test_ingestao_de_outro_processo(self, tmp_path):
+        caminho = str(tmp_path / "telemetria.db")
+        a = TelemetriaCadeiaFria(caminho=caminho, intervalo_sincronizacao=0)
+        b = TelemetriaCadeiaFria(caminho=caminho, intervalo_sincronizacao=0)
+        a.registrar_leituras(["L1", "L1"], [0.0, 60.0], [20.0, 20.0])
+
+        assert b.resumo_lote("L1") is None  # até a próxima sincronização
+        b.sincronizar()
+        assert b.resumo_lote("L1")["amostras"] == 2
+        # Quem escreve parte do estado mais recente do lote
+        b.registrar_leituras(["L1"], [120.0], [40.0])
+        a.sincronizar()
+        assert a.resumo_lote("L1")["tempo_monitorado"] == 120.0
+        assert a.resumo_lote("L1")["amostras"] == 3
+
+    def test_retencao_descarta_blocos_antigos_em_fluxo(self):
+        telemetria = TelemetriaCadeiaFria(retencao=600)
+        for minuto in range(200):
+            telemetria.registrar_leituras(["L1", "L2"], [minuto * 60.0] * 2, [5.0, 6.0])
+
+        assert len(telemetria._blocos_serie) == 11
+        assert telemetria.serie("L2")["timestamp"].tolist() == [minuto * 60.0 for minuto in range(189, 200)]
+
+
+class TestRastreadorComTelemetria:
+    """Condições de transporte e relatório a partir do ledger e da telemetria"""
+
+    @pytest.mark.asyncio
+    async def test_condicoes_e_relatorio(self):
+        telemetria = TelemetriaCadeiaFria()
+        rastreador = RastreadorMedicamentosBlockchain(LedgerFarmaceutico(), telemetria)
+        evento = {"tipo": "fabricacao", "timestamp": "2024-01-15T08:00:00", "responsavel": "Lab ABC",
+                  "localizacao": "Fábrica", "lote": "L1", "data_fabricacao": "2024-01-15", "temperatura": 22}
+        await rastreador.registrar_evento_blockchain("MED1", evento)
+        await rastreador.registrar_evento_blockchain("MED2", {**evento, "tipo": "recebimento", "lote": "L2"})
+        # Só leitura RFID: sem eventos de custódia, não conta como suspeita de falsificação
+        await rastreador.registrar_evento_blockchain("MED3", {**evento, "tipo": "leitura_rfid", "lote": "L2"})
+        telemetria.registrar_serie_densa(["L1", "L2"], 0, 60, np.array([[20.0, 35.0, 36.0, 20.0], [20.0] * 4]))
+
+        condicoes = await rastreador.verificar_condicoes_transporte(await rastreador.blockchain.buscar_historico("MED1"))
+        relatorio = await rastreador.gerar_relatorio_rastreabilidade()
+
+        assert condicoes["temperatura_adequada"] is False
+        assert condicoes["violacoes_detectadas"][0]["tipo"] == "excursao_temperatura"
+        assert condicoes["telemetria"]["tempo_acima"] == 120.0
+        assert relatorio["estatisticas_gerais"] == {
+            "medicamentos_rastreados": 3, "eventos_registrados": 3, "alertas_gerados": 1, "violacoes_detectadas": 1
+        }
+        assert relatorio["qualidade_cadeia"]["taxa_violacao_temperatura"] == 50.0
+        assert relatorio["autenticidade"]["suspeitas_falsificacao"] == 1
+        assert relatorio["alertas_criticos"][0].startswith("Lote L1")
+
+    @pytest.mark.asyncio
+    async def test_faixa_dos_eventos_e_leituras_de_sensores(self):
+        telemetria = TelemetriaCadeiaFria()
+        rastreador = RastreadorMedicamentosBlockchain(LedgerFarmaceutico(), telemetria)
+        await rastreador.registrar_evento_blockchain("INS1", {
+            "tipo": "fabricacao", "timestamp": "2024-01-15T08:00:00", "responsavel": "Lab ABC",
+            "localizacao": "Fábrica", "lote": "INS-L1", "data_fabricacao": "2024-01-15",
+            "temperatura_min": 2, "temperatura_max": 8
+        })
+
+        resultado = await rastreador.registrar_leituras_sensores([
+            {"lote": "INS-L1", "timestamp": 0, "temperatura": 5.0},
+            {"lote": "INS-L1", "timestamp": 60, "temperatura": 12.0, "umidade": 40},
+            {"lote": "INS-L1", "timestamp": 120, "temperatura": 5.0},
+            {"lote": "INS-L1", "timestamp": "1970-01-01T00:03:00+00:00", "temperatura": 5.0},
+            {"lote": "SEM-TEMPERATURA", "timestamp": 0}
+        ])
+        relatorio = await rastreador.gerar_relatorio_rastreabilidade()
+
+        assert resultado == {"leituras_recebidas": 5, "leituras_aceitas": 4, "lotes": 1}
+        assert telemetria.resumo_lote("INS-L1")["tempo_acima"] == 60.0
+        assert relatorio["qualidade_cadeia"]["lotes_monitorados"] == 1
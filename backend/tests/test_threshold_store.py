@@ -0,0 +1,85 @@
+"""
+Tests for online threshold statistics and the history store
+"""
+import time
+
+import numpy as np
+import pytest
+
+from app.services.threshold_store import OnlineStats, ThresholdHistoryStore
+
+
+class TestOnlineStats:
+    """Chunked Welford statistics"""
+
+    def test_chunks_match_full_array(self):
+        data = np.random.default_rng(3).normal(75, 12, 10_000)
+        stats = OnlineStats()
+        for chunk in np.array_split(data, 37):
+            stats.update(chunk)
+
+        assert stats.count == 10_000
+        assert stats.mean == pytest.approx(data.mean())
+        assert stats.std == pytest.approx(data.std())
+
+    def test_ignores_nan(self):
+        stats = OnlineStats().update([1.0, np.nan, 3.0])
+
+        assert stats.count == 2
+        assert stats.mean == pytest.approx(2.0)
+
+    def test_ewma_follows_drift(self):
+        stats = OnlineStats(ewma_alpha=0.05)
+        for _ in range(50):
+            stats.update(np.full(10, 60.0))
+        for _ in range(50):
+            stats.update(np.full(10, 90.0))
+
+        assert stats.mean == pytest.approx(75.0)
+        assert stats.ewma_mean == pytest.approx(90.0, abs=0.1)
+
+    def test_round_trip(self):
+        stats = OnlineStats().update([1.0, 2.0, 4.0])
+
+        assert OnlineStats.from_dict(stats.to_dict()) == stats
+
+
+class TestThresholdHistoryStore:
+    """Append-only history and snapshots"""
+
+    def test_range_query(self):
+        store = ThresholdHistoryStore()
+        now = time.time()
+        store.append([
+            (now - 10 * 86400, "heart_rate", "general", 60.0, 100.0, 5, "historical"),
+            (now - 2 * 86400, "heart_rate", "general", 59.0, 101.0, 5, "historical"),
+            (now - 1 * 86400, "heart_rate", "pediatric", 90.0, 150.0, 5, "historical"),
+            (now - 1 * 86400, "qt_interval", "general", 350.0, 450.0, 5, "historical"),
+        ])
+
+        entries = store.query("heart_rate", now - 7 * 86400)
+
+        assert [(e["lower"], e["upper"]) for e in entries] == [(59.0, 101.0)]
+
+    def test_keeps_only_newest_snapshots(self, tmp_path):
+        path = str(tmp_path / "nested" / "thresholds.db")
+        store = ThresholdHistoryStore(path, snapshots_kept=2)
+        for i in range(5):
+            store.save_snapshot({"n": i})
+        store.close()
+
+        reopened = ThresholdHistoryStore(path)
+        count = reopened._conn.execute("SELECT COUNT(*) FROM threshold_snapshots").fetchone()[0]
+
+        assert reopened.latest_snapshot() == {"n": 4, "history_id": 0}
+        assert count == 2
+
+    def test_snapshot_marks_covered_history(self):
+        store = ThresholdHistoryStore()
+        store.append([(1.0, "heart_rate", "general", 60.0, 100.0, 5, "historical")])
+        store.save_snapshot({})
+        store.append([(2.0, "qt_interval", "general", 350.0, 460.0, 5, "historical")])
+
+        history_id = store.latest_snapshot()["history_id"]
+
+        assert store.history_since(history_id) == [("qt_interval", "general", 350.0, 460.0)]
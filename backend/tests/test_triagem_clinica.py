@@ -0,0 +1,135 @@
+"""
+Testes da triagem clínica do censo
+"""
+import pytest
+
+from app.modules.farmacia.farmacia_clinica import FarmaciaClinicaAvancada
+from app.modules.farmacia.kpis_farmacia import KPIsFarmacia
+from app.modules.farmacia.triagem_clinica import TriagemCensoClinico, normalizar_medicamento
+
+
+def _paciente(id_, domicilio=(), hospital=(), leito=None, **extra) -> dict:
+    paciente = {
+        'id': id_,
+        'leito': leito or id_,
+        'dados_demograficos': {'idade': 50},
+        'exames_laboratoriais': {'clearance_creatinina': 90, 'potassio': 4.2, 'hba1c': 5.5},
+        'alergias': [],
+        'adesao_estimada': 0.95,
+        'medicamentos_domicilio': [{'nome': nome, 'dose': dose} for nome, dose in domicilio],
+        'medicamentos_hospital': [{'nome': nome, 'dose': dose} for nome, dose in hospital]
+    }
+    paciente.update(extra)
+    return paciente
+
+
+def _regras(resultado: dict, paciente_id: str) -> set[str]:
+    return {item['regra'] for item in resultado['fila_intervencoes'] if item['paciente_id'] == paciente_id}
+
+
+CENSO = [
+    _paciente('renal', hospital=[('Metformina 850mg', '850mg')],
+              exames_laboratoriais={'clearance_creatinina': 22, 'hba1c': 6.5}),
+    _paciente('idoso', hospital=[('Diazepam 10 mg comprimido', '10mg')], dados_demograficos={'idade': 82}),
+    _paciente('potassio', hospital=[('Enalapril', '10mg'), ('Aldactone', '25mg')],
+              exames_laboratoriais={'potassio': 6.1}),
+    _paciente('alergico', hospital=[('Tazocin 4,5g', '4.5g')], alergias=['Penicilina']),
+    _paciente('duplicado', hospital=[('Omeprazol', '20mg'), ('Pantoprazol', '40mg')]),
+    _paciente('glicemia', hospital=[('Dipirona', '1g')], exames_laboratoriais={'hba1c': 8.4}),
+    _paciente('adesao', hospital=[('Dipirona', '1g')], adesao_estimada=0.5),
+    _paciente('interacao', hospital=[('Sinvastatina', '40mg'), ('Claritromicina', '500mg')]),
+    _paciente('conciliacao', domicilio=[('Losec 20mg', '20 mg'), ('AAS', '100mg'), ('Enalapril', '10mg')],
+              hospital=[('Omeprazol', '20mg'), ('Enalapril', '5mg'), ('Heparina', '5000UI')]),
+    _paciente('sem_achados', domicilio=[('Dipirona', '1g')], hospital=[('Dipirona', '1 g')])
+]
+
+
+class TestTriagemCensoClinico:
+    """Normalização, regras vetorizadas, conjuntos e fila priorizada"""
+
+    def test_normalizacao_de_nomes(self):
+        assert normalizar_medicamento('Omeprazol (Losec) 20mg cápsula') == 'omeprazol'
+        assert normalizar_medicamento('Ácido acetil salicílico') == 'acido_acetilsalicilico'
+        assert normalizar_medicamento('KCl 19,1% ampola') == 'cloreto_potassio'
+
+    def test_cada_regra_no_seu_paciente(self):
+        resultado = TriagemCensoClinico(workers=0, tamanho_bloco=3).triar(CENSO)
+
+        assert _regras(resultado, 'renal') == {'ajuste_renal'}
+        assert _regras(resultado, 'idoso') == {'beers'}
+        assert _regras(resultado, 'potassio') == {'hipercalemia', 'interacao_enalapril_espironolactona'}
+        assert _regras(resultado, 'alergico') == {'alergia'}
+        assert _regras(resultado, 'duplicado') == {'duplicidade'}
+        assert _regras(resultado, 'glicemia') == {'sem_antidiabetico'}
+        assert _regras(resultado, 'adesao') == {'nao_adesao'}
+        assert _regras(resultado, 'interacao') == {'interacao_sinvastatina_claritromicina'}
+        assert _regras(resultado, 'sem_achados') == set()
+        # sem lista domiciliar a prescrição hospitalar não vira "adição"
+        assert resultado['resumo']['pacientes_triados'] == 10
+
+    def test_alergia_a_medicamento_sem_classe(self):
+        censo = [
+            _paciente('morfina', hospital=[('Morfina 10mg', '10mg')], alergias=['Morfina']),
+            _paciente('tolerante', hospital=[('Morfina 10mg', '10mg')], alergias=['Tramadol'])
+        ]
+
+        resultado = TriagemCensoClinico(workers=0, tamanho_bloco=1).triar(censo)
+
+        assert _regras(resultado, 'morfina') == {'alergia'}
+        assert _regras(resultado, 'tolerante') == set()
+
+    def test_discrepancias_por_diferenca_de_conjuntos(self):
+        resultado = TriagemCensoClinico(workers=0).triar(CENSO)
+
+        itens = {(item['regra'], item['medicamentos'][0]) for item in resultado['fila_intervencoes']
+                 if item['paciente_id'] == 'conciliacao'}
+        assert itens == {('descontinuacao', 'acido_acetilsalicilico'), ('adicao', 'heparina'),
+                         ('alteracao_dose', 'enalapril')}
+
+    def test_fila_ordenada_por_gravidade_e_risco(self):
+        resultado = TriagemCensoClinico(workers=0).triar(CENSO)
+        fila = resultado['fila_intervencoes']
+
+        assert {item['regra'] for item in fila[:2]} == {'alergia', 'interacao_sinvastatina_claritromicina'}
+        assert [item['prioridade'] for item in fila] == list(range(1, len(fila) + 1))
+        gravidades = [{'muito_alta': 4, 'alta': 3, 'moderada': 2, 'baixa': 1}[item['gravidade']] for item in fila]
+        assert gravidades == sorted(gravidades, reverse=True)
+        altas = [item for item in fila if item['gravidade'] == 'alta']
+        assert altas[0]['paciente_id'] == 'potassio'  # dois achados altos somam mais risco
+
+    def test_blocos_e_pool_de_processos_equivalentes(self):
+        censo = CENSO * 30
+
+        sequencial = TriagemCensoClinico(workers=0, tamanho_bloco=1000).triar(censo)
+        em_blocos = TriagemCensoClinico(workers=2, tamanho_bloco=64).triar(censo)
+
+        def chaves(resultado):
+            return sorted((item['paciente_id'], item['leito'], item['regra'], tuple(item['medicamentos']))
+                          for item in resultado['fila_intervencoes'])
+        assert chaves(sequencial) == chaves(em_blocos)
+        assert sequencial['resumo']['intervencoes_por_categoria'] == em_blocos['resumo']['intervencoes_por_categoria']
+
+
+class TestFarmaciaClinicaAvancada:
+    """Integração com o serviço de farmácia clínica"""
+
+    @pytest.mark.asyncio
+    async def test_triar_censo_e_conciliacao_normalizada(self):
+        farmacia = FarmaciaClinicaAvancada(TriagemCensoClinico(workers=0), KPIsFarmacia())
+
+        resultado = await farmacia.triar_censo(CENSO)
+        discrepancias = farmacia.identificar_discrepancias(
+            [{'nome': 'Losec 20mg', 'dose': '20 mg'}, {'nome': 'AAS', 'dose': '100mg'},
+             {'nome': 'Captopril', 'dose': '25mg'}, {'nome': 'Enalapril', 'dose': '10mg'}],
+            [{'nome': 'Heparina', 'dose': '5000UI'}, {'nome': 'omeprazol', 'dose': '20mg'},
+             {'nome': 'Enalapril', 'dose': '5mg'}, {'nome': 'Dipirona', 'dose': '1g'}]
+        )
+
+        assert resultado['resumo']['pacientes_com_intervencao'] == 9
+        # Ordem das listas de entrada e nome como prescrito
+        assert [(item['tipo'], item['medicamento']) for item in discrepancias] == [
+            ('descontinuacao', 'AAS'), ('descontinuacao', 'Captopril'),
+            ('adicao', 'Heparina'), ('adicao', 'Dipirona'),
+            ('alteracao_dose', 'Enalapril')
+        ]
+        assert discrepancias[0]['detalhes'] == 'Medicamento AAS usado em casa não foi prescrito no hospital'